@@ -12,9 +12,38 @@ class Settings(BaseSettings):
     openai_api_key: str = ""
     anthropic_api_key: str = ""
     db_path: str = "ferrofluids.db"
+    default_corpus: str = "ferrofluids"
+    corpora_file: str = ""
     concurrency: int = 10
     openai_tpm_limit: int = 27_000
     anthropic_tpm_limit: int = 480_000
+    schedule_policy: str = "default"
+    fair_share_weights: str = ""
+    dedup_threshold: float = 0.85
+    breaker_failure_threshold: int = 5
+    breaker_cooldown_seconds: float = 60.0
+    db_pool_size: int = 8
+    db_statement_cache: int = 256
+    db_executor_workers: int = 4
+    writer_batch_size: int = 50
+    writer_max_delay_ms: int = 250
+    writer_queue_size: int = 1000
+    cache_size: int = 256
+    max_upload_mb: int = 2048
+    upload_dir: str = ""
+    import_chunk_rows: int = 10_000
+    import_workers: int = 0
+    swap_timeout_seconds: float = 30.0
+    db_profile: str = "serving"
+    maintenance_interval_seconds: float = 300.0
+    vacuum_interval_seconds: float = 3600.0
+    vacuum_pages: int = 2000
+    wal_truncate_mb: int = 64
+    read_snapshots: bool = False
+    snapshot_max_age_seconds: float = 5.0
+    snapshot_min_age_seconds: float = 0.5
+    change_log_retention_days: float = 7.0
+    analytics_engine: str = "sqlite"
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
@@ -0,0 +1,209 @@
+"""
+Corpus registry.
+
+One process can serve several corpora (ferrofluids, magnetorheological
+fluids, ...), each with its own database file, taxonomy module and CSV
+column mappings. The default corpus (DEFAULT_CORPUS) is always registered
+and uses DB_PATH and app.taxonomy; others are listed in the JSON file named
+by CORPORA_FILE:
+
+    {
+      "mr_fluids": {
+        "db_path": "data/mr_fluids.db",
+        "taxonomy": "corpora.mr_taxonomy",
+        "mappings": {"paper": {"authors_delimiter": ";"}},
+        "imports": {"papers": ["data/MR_PAPERS.csv", "paper"]},
+        "openai_tpm_limit": 10000
+      }
+    }
+
+A taxonomy module defines TAXONOMY (dict[int, ClassCode]) and optionally
+PROMPT_HEADER. A mapping entry overrides fields of the importer's mapping for
+that doc_type; a doc_type the importer has no mapping for must set every
+field. Requests pick their corpus with a /corpora/<name>/ path prefix
+or an X-Corpus header (see corpus_middleware); everything below that runs
+inside using_corpus(), which routes connections, pools, caches and the
+writer to the corpus's database and gives it its own rate-limit budget.
+"""
+import importlib
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, fields
+from typing import Iterator, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+from app.db.connection import using_db
+
+CORPUS_HEADER = "X-Corpus"
+CORPUS_PREFIX = "/corpora/"
+
+# Files import_all() loads for the default corpus: name -> (csv path, doc_type)
+DEFAULT_IMPORTS = {
+    "papers": ("data/MANI_KW_PAPERS_scopus.csv", "paper"),
+    "patents_a": ("data/MANI_KW_PATENTS_A_weds1969to2009.csv", "patent"),
+    "patents_b": ("data/MANI_KW_PATENTS_B_weds2010tonow.csv", "patent"),
+}
+
+_FIELDS = {"db_path", "taxonomy", "mappings", "imports", "openai_tpm_limit", "anthropic_tpm_limit"}
+
+
+@dataclass
+class Corpus:
+    name: str
+    # None: DB_PATH (the default corpus only)
+    db_path: Optional[str] = None
+    taxonomy_module: str = "app.taxonomy"
+    # doc_type -> CsvMapping field overrides
+    mappings: dict[str, dict] = field(default_factory=dict)
+    imports: dict[str, tuple[str, str]] = field(default_factory=dict)
+    # None: OPENAI_TPM_LIMIT / ANTHROPIC_TPM_LIMIT
+    openai_tpm_limit: Optional[int] = None
+    anthropic_tpm_limit: Optional[int] = None
+
+    @property
+    def path(self) -> str:
+        return self.db_path or settings.db_path
+
+    def taxonomy(self):
+        return importlib.import_module(self.taxonomy_module)
+
+    def tpm_limits(self) -> dict[str, int]:
+        return {
+            "openai": self.openai_tpm_limit if self.openai_tpm_limit is not None else settings.openai_tpm_limit,
+            "anthropic": (self.anthropic_tpm_limit if self.anthropic_tpm_limit is not None
+                          else settings.anthropic_tpm_limit),
+        }
+
+
+def _check_mappings(name: str, mappings: dict, imports: dict[str, tuple[str, str]]):
+    """Raise ValueError for mapping overrides (or imports) the importer could not use."""
+    # Deferred: the importer imports this module
+    from app.services.importer import MAPPINGS, CsvMapping
+
+    settable = {f.name for f in fields(CsvMapping)} - {"doc_type"}
+    if not isinstance(mappings, dict):
+        raise ValueError(f"Corpus {name!r}: mappings must map doc_type to column settings")
+    for doc_type, overrides in mappings.items():
+        if not isinstance(overrides, dict):
+            raise ValueError(f"Corpus {name!r}: mapping {doc_type!r} must be an object")
+        unknown = set(overrides) - settable
+        if unknown:
+            raise ValueError(f"Corpus {name!r}: mapping {doc_type!r} has unknown fields {sorted(unknown)}")
+        missing = set() if doc_type in MAPPINGS else settable - set(overrides)
+        if missing:
+            raise ValueError(f"Corpus {name!r}: new doc_type {doc_type!r} needs the mapping fields "
+                             f"{sorted(missing)}")
+        if not all(isinstance(value, str) and value for value in overrides.values()):
+            raise ValueError(f"Corpus {name!r}: mapping {doc_type!r} values must be non-empty strings")
+    for key, value in imports.items():
+        if len(value) != 2 or value[1] not in set(MAPPINGS) | set(mappings):
+            raise ValueError(f"Corpus {name!r}: import {key!r} must be [csv path, doc_type] with a "
+                             f"mapped doc_type")
+
+
+def _parse(name: str, entry: dict) -> Corpus:
+    unknown = set(entry) - _FIELDS
+    if unknown:
+        raise ValueError(f"Corpus {name!r}: unknown settings {sorted(unknown)}")
+    if not entry.get("db_path"):
+        raise ValueError(f"Corpus {name!r} needs its own db_path")
+    mappings = entry.get("mappings", {})
+    imports = {key: tuple(value) for key, value in entry.get("imports", {}).items()}
+    _check_mappings(name, mappings, imports)
+    return Corpus(
+        name=name,
+        db_path=entry["db_path"],
+        taxonomy_module=entry.get("taxonomy", "app.taxonomy"),
+        mappings=mappings,
+        imports=imports,
+        openai_tpm_limit=entry.get("openai_tpm_limit"),
+        anthropic_tpm_limit=entry.get("anthropic_tpm_limit"),
+    )
+
+
+def _load() -> dict[str, Corpus]:
+    registry = {settings.default_corpus: Corpus(settings.default_corpus, imports=dict(DEFAULT_IMPORTS))}
+    if settings.corpora_file:
+        with open(settings.corpora_file, encoding="utf-8") as f:
+            entries = json.load(f)
+        for name, entry in entries.items():
+            if name == settings.default_corpus:
+                raise ValueError(f"Corpus {name!r} is the default corpus; configure it with DB_PATH")
+            registry[name] = _parse(name, entry)
+    paths = [corpus.path for corpus in registry.values()]
+    if len(set(paths)) != len(paths):
+        raise ValueError("Corpora must not share a database file")
+    return registry
+
+
+_registry: Optional[dict[str, Corpus]] = None
+_registry_source: Optional[tuple[str, str]] = None
+_registry_lock = threading.Lock()
+
+
+def corpora() -> dict[str, Corpus]:
+    """Every registered corpus by name (reloaded when CORPORA_FILE or DEFAULT_CORPUS change)."""
+    global _registry, _registry_source
+    source = (settings.corpora_file, settings.default_corpus)
+    with _registry_lock:
+        if _registry is None or _registry_source != source:
+            _registry, _registry_source = _load(), source
+        return _registry
+
+
+def get_corpus(name: str) -> Corpus:
+    """Raises KeyError for an unknown corpus."""
+    registry = corpora()
+    if name not in registry:
+        raise KeyError(f"Unknown corpus {name!r}; expected one of {sorted(registry)}")
+    return registry[name]
+
+
+_current: ContextVar[Optional[str]] = ContextVar("corpus", default=None)
+
+
+def current_corpus() -> Corpus:
+    """The corpus of the current request or job (the default corpus outside using_corpus())."""
+    return get_corpus(_current.get() or settings.default_corpus)
+
+
+@contextmanager
+def using_corpus(name: str) -> Iterator[Corpus]:
+    """Run the block against corpus `name`: its database, taxonomy, mappings and rate limits."""
+    corpus = get_corpus(name)
+    token = _current.set(corpus.name)
+    try:
+        with using_db(corpus.db_path):
+            yield corpus
+    finally:
+        _current.reset(token)
+
+
+def db_paths() -> list[str]:
+    """The database file of every corpus (for init and maintenance)."""
+    return [corpus.path for corpus in corpora().values()]
+
+
+async def corpus_middleware(request: Request, call_next):
+    """
+    Route the request to a corpus: /corpora/<name>/rest is served as /rest,
+    otherwise the X-Corpus header (default: the default corpus) picks it.
+    """
+    path = request.scope["path"]
+    name = request.headers.get(CORPUS_HEADER)
+    if path.startswith(CORPUS_PREFIX):
+        name, _, rest = path[len(CORPUS_PREFIX):].partition("/")
+        request.scope["path"] = "/" + rest
+    if name is None:
+        return await call_next(request)
+    try:
+        corpus = get_corpus(name)
+    except KeyError as e:
+        return JSONResponse({"detail": e.args[0]}, status_code=404)
+    with using_corpus(corpus.name):
+        return await call_next(request)
@@ -1,10 +1,18 @@
-from app.db.connection import get_connection, transaction, init_db
+from app.db.connection import get_connection, transaction, init_db, close_pools, pool_stats
 from app.db.documents import (
     insert_document,
+    get_row_hashes,
+    upsert_documents,
+    get_import_ledger,
+    record_import,
     get_document,
+    get_original_data,
+    unpack_original,
     get_documents,
     get_documents_paginated,
+    get_documents_page,
     get_unclassified_documents,
+    get_pending_abstract_lengths,
     count_documents,
 )
 from app.db.classifications import (
@@ -13,6 +21,31 @@ from app.db.classifications import (
     get_classification,
     get_classifications_by_status,
     get_finalized_classifications,
+    get_pending_second_opinion,
+    get_ai_result,
+    record_taxonomy_version,
+    get_taxonomy_snapshots,
+    get_stale_results,
+    get_result_changes,
+    rebuild_model_columns,
+)
+from app.db.aggregates import (
+    rebuild_aggregates,
+    check_aggregates,
+    get_status_counts,
+    get_class_counts,
+    get_cooccurrence,
+)
+from app.db.search import search_documents, rebuild_search_index
+from app.db.cache import get_data_version, data_token, clear_cache, cache_stats
+from app.db.changes import (
+    latest_change,
+    get_changes,
+    changes_since,
+    set_consumer_position,
+    reset_consumer,
+    prune_change_log,
+    change_stats,
 )
 from app.db.links import (
     save_paper_patent_link,
@@ -26,20 +59,55 @@ __all__ = [
     "get_connection",
     "transaction",
     "init_db",
+    "close_pools",
+    "pool_stats",
     "insert_document",
+    "get_row_hashes",
+    "upsert_documents",
+    "get_import_ledger",
+    "record_import",
     "get_document",
+    "get_original_data",
+    "unpack_original",
     "get_documents",
     "get_documents_paginated",
+    "get_documents_page",
     "get_unclassified_documents",
+    "get_pending_abstract_lengths",
     "count_documents",
     "save_ai_result",
     "finalize_classification",
     "get_classification",
     "get_classifications_by_status",
     "get_finalized_classifications",
+    "get_pending_second_opinion",
+    "get_ai_result",
+    "record_taxonomy_version",
+    "get_taxonomy_snapshots",
+    "get_stale_results",
+    "get_result_changes",
+    "rebuild_model_columns",
+    "rebuild_aggregates",
+    "check_aggregates",
+    "get_status_counts",
+    "get_class_counts",
+    "get_cooccurrence",
+    "search_documents",
+    "rebuild_search_index",
+    "get_data_version",
+    "data_token",
+    "clear_cache",
+    "cache_stats",
     "save_paper_patent_link",
     "save_paper_patent_links_batch",
     "save_assignee_crossref",
     "get_links_for_patent",
     "get_crossrefs_for_patent",
+    "latest_change",
+    "get_changes",
+    "changes_since",
+    "set_consumer_position",
+    "reset_consumer",
+    "prune_change_log",
+    "change_stats",
 ]
@@ -0,0 +1,131 @@
+"""
+Materialized aggregate tables.
+
+class_counts (doc_type x year x final_primary x status) and
+class_cooccurrence (final_primary x final_secondary x status) are kept
+current by triggers on classifications and documents (see init_db), so
+dashboard and gap queries read a few hundred rows instead of joining every
+document. rebuild_aggregates() recomputes both from scratch and
+check_aggregates() reports any drift between them and the base tables.
+"""
+import logging
+from typing import Optional
+
+from app.db.connection import transaction
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ("agreed", "human_reviewed")
+
+_COMPUTED_CLASS_COUNTS = """
+    SELECT d.doc_type, COALESCE(d.year, 0) AS year, COALESCE(c.final_primary, 0) AS final_primary,
+           c.status, COUNT(*) AS cnt
+    FROM classifications c JOIN documents d ON c.serial_number = d.serial_number
+    GROUP BY 1, 2, 3, 4
+"""
+
+_COMPUTED_COOCCURRENCE = """
+    SELECT COALESCE(final_primary, 0) AS final_primary, COALESCE(final_secondary, 0) AS final_secondary,
+           status, COUNT(*) AS cnt
+    FROM classifications
+    GROUP BY 1, 2, 3
+"""
+
+
+def rebuild_aggregates(conn=None) -> dict:
+    """Recompute the aggregate tables from documents and classifications."""
+    def _execute(c):
+        c.execute("DELETE FROM class_counts")
+        c.execute("DELETE FROM class_cooccurrence")
+        c.execute(f"INSERT INTO class_counts (doc_type, year, final_primary, status, cnt) {_COMPUTED_CLASS_COUNTS}")
+        c.execute(f"INSERT INTO class_cooccurrence (final_primary, final_secondary, status, cnt) {_COMPUTED_COOCCURRENCE}")
+        return {
+            "class_counts": c.execute("SELECT COUNT(*) FROM class_counts").fetchone()[0],
+            "class_cooccurrence": c.execute("SELECT COUNT(*) FROM class_cooccurrence").fetchone()[0],
+        }
+
+    if conn is not None:
+        result = _execute(conn)
+    else:
+        with transaction() as c:
+            result = _execute(c)
+    logger.info("Rebuilt aggregate tables: %s", result)
+    return result
+
+
+def _diff(conn, table: str, computed: str, keys: tuple[str, ...]) -> list[dict]:
+    """Keys whose materialized count differs from the computed one (zero rows count as absent)."""
+    materialized = {
+        tuple(r[k] for k in keys): r["cnt"]
+        for r in conn.execute(f"SELECT * FROM {table} WHERE cnt != 0")
+    }
+    expected = {tuple(r[k] for k in keys): r["cnt"] for r in conn.execute(computed)}
+    return [
+        {**dict(zip(keys, key)), "materialized": materialized.get(key, 0), "expected": expected.get(key, 0)}
+        for key in sorted(materialized.keys() | expected.keys(), key=str)
+        if materialized.get(key, 0) != expected.get(key, 0)
+    ]
+
+
+def check_aggregates() -> dict:
+    """Compare the aggregate tables with a full recount of the base tables."""
+    with transaction(readonly=True) as conn:
+        class_counts = _diff(conn, "class_counts", _COMPUTED_CLASS_COUNTS,
+                             ("doc_type", "year", "final_primary", "status"))
+        cooccurrence = _diff(conn, "class_cooccurrence", _COMPUTED_COOCCURRENCE,
+                             ("final_primary", "final_secondary", "status"))
+    return {
+        "consistent": not class_counts and not cooccurrence,
+        "class_counts": class_counts,
+        "class_cooccurrence": cooccurrence,
+    }
+
+
+def get_status_counts(conn=None) -> dict[str, int]:
+    """Number of classifications per status."""
+    def _execute(c):
+        rows = c.execute(
+            "SELECT status, SUM(cnt) AS cnt FROM class_counts GROUP BY status HAVING SUM(cnt) > 0"
+        ).fetchall()
+        return {r["status"]: r["cnt"] for r in rows}
+
+    if conn is not None:
+        return _execute(conn)
+    with transaction(readonly=True) as c:
+        return _execute(c)
+
+
+def get_class_counts(doc_type: Optional[str] = None, statuses=FINAL_STATUSES,
+                     by_year: bool = False, conn=None) -> list[dict]:
+    """
+    Finalized documents per (doc_type, final_primary), or per
+    (doc_type, year, final_primary) with `by_year`.
+    """
+    group = "doc_type, year, final_primary" if by_year else "doc_type, final_primary"
+    query = f"""SELECT {group}, SUM(cnt) AS cnt FROM class_counts
+                WHERE status IN ({','.join('?' * len(statuses))})"""
+    params: list = list(statuses)
+    if doc_type:
+        query += " AND doc_type = ?"
+        params.append(doc_type)
+    query += f" GROUP BY {group} HAVING SUM(cnt) > 0 ORDER BY {group}"
+
+    if conn is not None:
+        return [dict(r) for r in conn.execute(query, params)]
+    with transaction(readonly=True) as c:
+        return [dict(r) for r in c.execute(query, params)]
+
+
+def get_cooccurrence(min_count: int = 1, statuses=FINAL_STATUSES, conn=None) -> list[dict]:
+    """(final_primary, final_secondary) pairs of distinct, assigned classes with their counts."""
+    query = f"""SELECT final_primary, final_secondary, SUM(cnt) AS cnt FROM class_cooccurrence
+                WHERE status IN ({','.join('?' * len(statuses))})
+                  AND final_primary != final_secondary
+                  AND final_primary != 0 AND final_secondary != 0
+                GROUP BY final_primary, final_secondary
+                HAVING SUM(cnt) >= ?"""
+    params = [*statuses, min_count]
+    if conn is not None:
+        return [dict(r) for r in conn.execute(query, params)]
+    with transaction(readonly=True) as c:
+        return [dict(r) for r in c.execute(query, params)]
@@ -0,0 +1,103 @@
+"""
+Async access to the database for the FastAPI routes.
+
+sqlite3 calls block, so calling app.db directly from an `async def` route
+stalls the event loop, and with it every other request and any pipeline
+run started through the API. Every function here has the same name and
+signature as its app.db counterpart but runs on a dedicated pool of DB
+threads. Route-level queries and other blocking work go through `run()`.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app import db
+from app.config import settings
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.db_executor_workers,
+                                           thread_name_prefix="db")
+        return _executor
+
+
+def shutdown():
+    """Stop the DB threads (called on application shutdown)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+async def run(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking callable on the DB thread pool, in the caller's context (see snapshot_reads)."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), functools.partial(context.run, fn, *args, **kwargs))
+
+
+def _delegate(name: str) -> Callable:
+    # Resolved on every call so monkeypatched app.db functions are honoured
+    @functools.wraps(getattr(db, name))
+    async def wrapper(*args, **kwargs):
+        return await run(getattr(db, name), *args, **kwargs)
+    return wrapper
+
+
+init_db = _delegate("init_db")
+insert_document = _delegate("insert_document")
+get_row_hashes = _delegate("get_row_hashes")
+upsert_documents = _delegate("upsert_documents")
+get_import_ledger = _delegate("get_import_ledger")
+record_import = _delegate("record_import")
+get_document = _delegate("get_document")
+get_original_data = _delegate("get_original_data")
+get_documents = _delegate("get_documents")
+get_documents_paginated = _delegate("get_documents_paginated")
+get_documents_page = _delegate("get_documents_page")
+get_unclassified_documents = _delegate("get_unclassified_documents")
+get_pending_abstract_lengths = _delegate("get_pending_abstract_lengths")
+count_documents = _delegate("count_documents")
+save_ai_result = _delegate("save_ai_result")
+finalize_classification = _delegate("finalize_classification")
+get_classification = _delegate("get_classification")
+get_classifications_by_status = _delegate("get_classifications_by_status")
+get_finalized_classifications = _delegate("get_finalized_classifications")
+get_pending_second_opinion = _delegate("get_pending_second_opinion")
+get_ai_result = _delegate("get_ai_result")
+record_taxonomy_version = _delegate("record_taxonomy_version")
+get_taxonomy_snapshots = _delegate("get_taxonomy_snapshots")
+get_stale_results = _delegate("get_stale_results")
+get_result_changes = _delegate("get_result_changes")
+rebuild_model_columns = _delegate("rebuild_model_columns")
+rebuild_aggregates = _delegate("rebuild_aggregates")
+check_aggregates = _delegate("check_aggregates")
+get_status_counts = _delegate("get_status_counts")
+get_class_counts = _delegate("get_class_counts")
+get_cooccurrence = _delegate("get_cooccurrence")
+search_documents = _delegate("search_documents")
+rebuild_search_index = _delegate("rebuild_search_index")
+get_data_version = _delegate("get_data_version")
+data_token = _delegate("data_token")
+save_paper_patent_link = _delegate("save_paper_patent_link")
+save_paper_patent_links_batch = _delegate("save_paper_patent_links_batch")
+save_assignee_crossref = _delegate("save_assignee_crossref")
+get_links_for_patent = _delegate("get_links_for_patent")
+get_crossrefs_for_patent = _delegate("get_crossrefs_for_patent")
+latest_change = _delegate("latest_change")
+get_changes = _delegate("get_changes")
+changes_since = _delegate("changes_since")
+set_consumer_position = _delegate("set_consumer_position")
+reset_consumer = _delegate("reset_consumer")
+prune_change_log = _delegate("prune_change_log")
+change_stats = _delegate("change_stats")
@@ -0,0 +1,256 @@
+"""
+Aggregate-only analytics queries, optionally answered by DuckDB.
+
+Disagreement pairs, human picks, link statistics, decade and by-year class
+breakdowns scan whole columns. With ANALYTICS_ENGINE=duckdb (and the optional
+duckdb package installed) the columns they read are copied into an in-process
+DuckDB database by refresh_snapshot(), which the maintenance scheduler runs
+whenever the data has changed, and these functions query that copy instead.
+A snapshot is only used while it matches the current data token; until the
+next refresh after a write, queries fall back to SQLite, so answers are never
+stale. The SQL is written once in the dialect both engines share.
+
+Compare the engines with `python -m scripts.benchmark_analytics`.
+"""
+import logging
+import threading
+import time
+from typing import Optional
+
+from app.config import settings
+from app.db.aggregates import FINAL_STATUSES
+from app.db.cache import data_token
+from app.db.connection import current_db_path, transaction
+
+try:
+    import duckdb
+except ImportError:  # optional: pip install duckdb
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ("sqlite", "duckdb")
+
+# Columns copied into the DuckDB snapshot: only what the queries below read
+SNAPSHOT_TABLES = {
+    "documents": {"serial_number": "VARCHAR", "doc_type": "VARCHAR", "year": "INTEGER"},
+    "classifications": {
+        "serial_number": "VARCHAR", "status": "VARCHAR", "final_primary": "INTEGER",
+        "gpt_primary": "INTEGER", "claude_primary": "INTEGER",
+    },
+    "class_counts": {"doc_type": "VARCHAR", "year": "INTEGER", "final_primary": "INTEGER",
+                     "status": "VARCHAR", "cnt": "BIGINT"},
+    "paper_patent_links": {"similarity_score": "DOUBLE"},
+}
+
+_LOAD_CHUNK = 100_000
+
+
+class AnalyticsSnapshot:
+    """An in-memory DuckDB copy of SNAPSHOT_TABLES as of one data token."""
+
+    def __init__(self, conn, token: str, rows: dict[str, int], load_ms: float):
+        self.conn = conn
+        self.token = token
+        self.rows = rows
+        self.load_ms = load_ms
+        self.created = time.monotonic()
+
+    def query(self, sql: str, params=()) -> list[dict]:
+        # A cursor is a separate DuckDB connection to the same database, safe per thread
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, list(params))
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.conn.close()
+
+
+_snapshots: dict[str, AnalyticsSnapshot] = {}
+_snapshots_lock = threading.Lock()
+_stats = {"duckdb_queries": 0, "sqlite_queries": 0, "refreshes": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _engine() -> str:
+    engine = settings.analytics_engine
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown analytics engine {engine!r}; expected one of {ENGINES}")
+    if engine == "duckdb" and duckdb is None:
+        logger.warning("ANALYTICS_ENGINE=duckdb but the duckdb package is not installed; using SQLite")
+        return "sqlite"
+    return engine
+
+
+def _load(conn) -> AnalyticsSnapshot:
+    import pandas as pd
+
+    start = time.perf_counter()
+    token = data_token(conn)
+    duck = duckdb.connect(":memory:")
+    rows = {}
+    for table, columns in SNAPSHOT_TABLES.items():
+        schema = ", ".join(f"{name} {kind}" for name, kind in columns.items())
+        duck.execute(f"CREATE TABLE {table} ({schema})")
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table}")
+        rows[table] = 0
+        # Chunked so a large corpus is never held twice in Python objects
+        while chunk := cursor.fetchmany(_LOAD_CHUNK):
+            frame = pd.DataFrame.from_records(chunk, columns=list(columns))
+            duck.register("chunk", frame)
+            duck.execute(f"INSERT INTO {table} SELECT * FROM chunk")
+            duck.unregister("chunk")
+            rows[table] += len(chunk)
+    return AnalyticsSnapshot(duck, token, rows, round((time.perf_counter() - start) * 1000, 2))
+
+
+def refresh_snapshot(force: bool = False) -> dict:
+    """
+    Rebuild the DuckDB snapshot of the current database if the data changed
+    since the last one (always with `force`). A no-op on the SQLite engine.
+    """
+    if _engine() != "duckdb":
+        return {"skipped": "analytics engine is sqlite"}
+    with _snapshots_lock:
+        current = _snapshots.get(current_db_path())
+        # One read transaction, so every table comes from the same commit
+        with transaction(readonly=True) as conn:
+            if not force and current is not None and current.token == data_token(conn):
+                return {"skipped": "unchanged", "token": current.token}
+            snapshot = _load(conn)
+        _snapshots[current_db_path()] = snapshot
+    # The replaced snapshot is not closed here: queries may still be running on
+    # it, and DuckDB closes it once the last reference is gone
+    _count("refreshes")
+    logger.info("Refreshed analytics snapshot in %.1fms: %s", snapshot.load_ms, snapshot.rows)
+    return {"token": snapshot.token, "rows": snapshot.rows, "load_ms": snapshot.load_ms}
+
+
+def close_snapshots(db_path: Optional[str] = None):
+    """Drop the DuckDB snapshot of one database (default: all)."""
+    with _snapshots_lock:
+        paths = [db_path] if db_path is not None else list(_snapshots)
+        for path in paths:
+            snapshot = _snapshots.pop(path, None)
+            if snapshot is not None:
+                snapshot.close()
+
+
+def _current_snapshot() -> Optional[AnalyticsSnapshot]:
+    if _engine() != "duckdb":
+        return None
+    snapshot = _snapshots.get(current_db_path())
+    if snapshot is None or snapshot.token != data_token():
+        return None
+    return snapshot
+
+
+def _query(sql: str, params=()) -> list[dict]:
+    snapshot = _current_snapshot()
+    if snapshot is not None:
+        _count("duckdb_queries")
+        return snapshot.query(sql, params)
+    _count("sqlite_queries")
+    with transaction(readonly=True) as conn:
+        return [dict(r) for r in conn.execute(sql, params)]
+
+
+def _placeholders(values) -> str:
+    return ",".join("?" * len(values))
+
+
+def disagreement_pairs(statuses=("disagreed", "human_reviewed"), limit: int = 15) -> list[dict]:
+    """Most common (GPT primary, Claude primary) pairs among documents with the given statuses."""
+    return _query(
+        f"""SELECT gpt_primary AS gpt_code, claude_primary AS claude_code, COUNT(*) AS cnt
+            FROM classifications
+            WHERE status IN ({_placeholders(statuses)})
+              AND gpt_primary IS NOT NULL AND claude_primary IS NOT NULL
+            GROUP BY gpt_primary, claude_primary
+            ORDER BY cnt DESC, gpt_code, claude_code LIMIT ?""",
+        (*statuses, limit),
+    )
+
+
+def major_category_agreement(status: str = "disagreed") -> dict:
+    """Documents with `status`, and how many of them have both models in the same major category."""
+    row = _query(
+        """SELECT COUNT(*) AS total,
+                  COALESCE(SUM(CASE WHEN gpt_primary - gpt_primary % 10
+                                         = claude_primary - claude_primary % 10 THEN 1 ELSE 0 END), 0)
+                      AS same_major
+           FROM classifications WHERE status = ?""",
+        (status,),
+    )[0]
+    return {"total": row["total"], "same_major": int(row["same_major"])}
+
+
+def human_picks() -> dict:
+    """How often a human reviewer's final class was GPT's or Claude's primary."""
+    row = _query(
+        """SELECT COALESCE(SUM(CASE WHEN final_primary = gpt_primary THEN 1 ELSE 0 END), 0) AS gpt,
+                  COALESCE(SUM(CASE WHEN final_primary = claude_primary THEN 1 ELSE 0 END), 0) AS claude
+           FROM classifications WHERE status = 'human_reviewed'"""
+    )[0]
+    return {"gpt": int(row["gpt"]), "claude": int(row["claude"])}
+
+
+def year_range() -> dict:
+    """Earliest and latest known publication year."""
+    row = _query("SELECT MIN(year) AS first, MAX(year) AS last FROM documents WHERE year > 0")[0]
+    return {"min": row["first"], "max": row["last"]}
+
+
+def link_stats() -> dict:
+    """Count, mean and best similarity of the patent-paper links."""
+    return _query(
+        """SELECT COUNT(*) AS total, AVG(similarity_score) AS avg_similarity,
+                  MAX(similarity_score) AS max_similarity
+           FROM paper_patent_links"""
+    )[0]
+
+
+def decade_counts(doc_type: str, statuses=FINAL_STATUSES) -> list[dict]:
+    """Finalized documents of `doc_type` per publication decade."""
+    rows = _query(
+        f"""SELECT year - year % 10 AS decade, SUM(cnt) AS cnt FROM class_counts
+            WHERE doc_type = ? AND year > 0 AND status IN ({_placeholders(statuses)})
+            GROUP BY decade HAVING SUM(cnt) > 0 ORDER BY decade""",
+        (doc_type, *statuses),
+    )
+    return [{"decade": r["decade"], "cnt": int(r["cnt"])} for r in rows]
+
+
+def class_counts_by_year(doc_type: str, statuses=FINAL_STATUSES) -> list[dict]:
+    """Finalized documents of `doc_type` per (year, final_primary)."""
+    rows = _query(
+        f"""SELECT year, final_primary, SUM(cnt) AS cnt FROM class_counts
+            WHERE doc_type = ? AND status IN ({_placeholders(statuses)})
+            GROUP BY year, final_primary HAVING SUM(cnt) > 0 ORDER BY year, final_primary""",
+        (doc_type, *statuses),
+    )
+    return [{"year": r["year"], "final_primary": r["final_primary"], "cnt": int(r["cnt"])} for r in rows]
+
+
+def analytics_stats() -> dict:
+    snapshot = _snapshots.get(current_db_path())
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        "engine": settings.analytics_engine,
+        "duckdb_installed": duckdb is not None,
+        **stats,
+        "snapshot": None if snapshot is None else {
+            "token": snapshot.token, "rows": snapshot.rows, "load_ms": snapshot.load_ms,
+            "age_seconds": round(time.monotonic() - snapshot.created, 1),
+        },
+    }
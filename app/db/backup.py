@@ -0,0 +1,181 @@
+"""
+Consistent database snapshots and validated replacement.
+
+Downloads are built with SQLite's online backup API, which copies a single
+point-in-time view even while the pipeline is writing, then gzipped. The
+snapshot is kept per data token, so repeated and resumed (Range) downloads
+of an unchanged database reuse the same file.
+
+Uploads are checked (SQLite header, integrity_check, required tables and
+columns) before being swapped in under exclusive_access(): new
+transactions wait, running ones finish, pooled connections are closed and
+the file is renamed into place.
+"""
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.db.cache import clear_cache, data_token
+from app.db.connection import close_pools, current_db_path, exclusive_access, init_db, transaction
+
+logger = logging.getLogger(__name__)
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Tables (and the columns the app reads from them) an uploaded database must have
+REQUIRED_SCHEMA = {
+    "documents": {"serial_number", "doc_type", "title", "abstract", "year", "authors", "source"},
+    "classifications": {"serial_number", "final_primary", "final_secondary", "final_tertiary", "status"},
+    "ai_results": {"serial_number", "model_name", "primary_code", "secondary_code", "tertiary_code"},
+}
+
+_snapshot_lock = threading.Lock()
+
+
+def _snapshot_dir() -> Path:
+    return Path(f"{current_db_path()}.snapshots")
+
+
+def backup_database(dest: str):
+    """Write a consistent copy of the current database to `dest` (rollback-journal mode)."""
+    target = sqlite3.connect(dest)
+    try:
+        with transaction(readonly=True) as conn:
+            conn.backup(target)
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+
+
+def get_snapshot(compress: bool = True) -> Path:
+    """
+    Path of a snapshot of the current data (gzipped unless `compress` is
+    False), created if the data changed since the last one.
+    """
+    token = data_token()
+    directory = _snapshot_dir()
+    plain = directory / f"snapshot-{token}.db"
+    path = plain.with_name(plain.name + ".gz") if compress else plain
+    with _snapshot_lock:
+        if path.exists():
+            return path
+        directory.mkdir(exist_ok=True)
+        if not plain.exists():
+            tmp = plain.with_name(plain.name + ".tmp")
+            backup_database(str(tmp))
+            os.replace(tmp, plain)
+        if compress:
+            tmp = path.with_name(path.name + ".tmp")
+            with open(plain, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(tmp, path)
+        # Older snapshots are superseded (open downloads keep their file handle)
+        for old in directory.glob("snapshot-*"):
+            if not old.name.startswith(f"snapshot-{token}."):
+                old.unlink(missing_ok=True)
+    logger.info("Created database snapshot %s (%d bytes)", path.name, path.stat().st_size)
+    return path
+
+
+class DecompressedTooLarge(Exception):
+    """A gzipped upload expands past the size limit."""
+
+
+def decompress_if_gzipped(path: str, limit: Optional[int] = None) -> str:
+    """
+    Gunzip `path` in place if it is a gzip file. Returns `path`. Raises
+    DecompressedTooLarge as soon as the output passes `limit` bytes, so a
+    small upload cannot expand without bound onto the disk.
+    """
+    with open(path, "rb") as f:
+        if f.read(2) != GZIP_MAGIC:
+            return path
+    tmp = path + ".gunzip"
+    size = 0
+    try:
+        with gzip.open(path, "rb") as src, open(tmp, "wb") as dst:
+            while block := src.read(1024 * 1024):
+                size += len(block)
+                if limit is not None and size > limit:
+                    raise DecompressedTooLarge(f"Decompressed upload exceeds {limit:,} bytes")
+                dst.write(block)
+        os.replace(tmp, path)
+    finally:
+        Path(tmp).unlink(missing_ok=True)
+    return path
+
+
+def validate_database(path: str) -> dict:
+    """
+    Check that `path` is an intact SQLite database with the tables this app
+    needs. Returns row counts; raises ValueError describing the first problem.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+            raise ValueError("Not a SQLite database")
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        problems = [r[0] for r in conn.execute("PRAGMA integrity_check(10)")]
+        if problems != ["ok"]:
+            raise ValueError("Integrity check failed: " + "; ".join(problems))
+        counts = {}
+        for table, columns in REQUIRED_SCHEMA.items():
+            present = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+            if not present:
+                raise ValueError(f"Missing table: {table}")
+            missing = columns - present
+            if missing:
+                raise ValueError(f"Table {table} is missing columns: {', '.join(sorted(missing))}")
+            counts[table] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"Unreadable database: {e}") from None
+    finally:
+        conn.close()
+    return counts
+
+
+def replace_database(path: str) -> dict:
+    """
+    Swap the validated database at `path` in for the current one, keeping
+    the current one as <db>.bak. Restores the backup if the new file cannot
+    be initialized.
+    """
+    db_path = Path(current_db_path())
+    backup_path = db_path.with_suffix(".db.bak")
+    if db_path.exists():
+        backup_database(str(backup_path))
+
+    with exclusive_access():
+        close_pools(current_db_path())
+        # With every connection closed the WAL is checkpointed; leftovers
+        # must not be replayed onto the new file
+        for suffix in ("-wal", "-shm"):
+            Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+        os.replace(path, db_path)
+        clear_cache(current_db_path())
+        try:
+            # Bring an older uploaded schema up to date
+            init_db()
+        except Exception:
+            logger.exception("Uploaded database failed to initialize; restoring backup")
+            close_pools(current_db_path())
+            if backup_path.exists():
+                shutil.copy2(backup_path, db_path)
+            clear_cache(current_db_path())
+            raise
+    logger.info("Replaced database %s (backup at %s)", db_path, backup_path)
+    return {"backup": str(backup_path)}
+
+
+def new_upload_path() -> str:
+    """A temporary file beside the database, so the final rename is atomic."""
+    fd, path = tempfile.mkstemp(prefix=".upload-", suffix=".db", dir=str(Path(current_db_path()).parent))
+    os.close(fd)
+    return path
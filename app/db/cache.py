@@ -0,0 +1,84 @@
+"""
+Data-version counter and result cache.
+
+Triggers bump data_version.version on every write to documents,
+classifications, ai_results, paper_patent_links and assignee_crossrefs.
+Read-heavy functions decorated with @cached are memoized per
+(data token, arguments), so polling dashboards get the stored answer until
+something is written. Each database (corpus) has its own LRU of CACHE_SIZE
+entries, so a busy corpus cannot evict another's answers. The same token is sent as the HTTP
+ETag for those endpoints (see app.middleware).
+"""
+import functools
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from app.config import settings
+from app.db.connection import current_db_path, transaction
+
+_caches: "dict[str, OrderedDict[tuple, object]]" = {}
+_lock = threading.Lock()
+_stats: dict[str, dict[str, int]] = {}
+
+
+def get_data_version(conn=None) -> int:
+    """Monotonic counter of writes to the data tables."""
+    if conn is not None:
+        return conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+    with transaction(readonly=True) as c:
+        return c.execute("SELECT version FROM data_version WHERE id = 1").fetchone()[0]
+
+
+def data_token(conn=None) -> str:
+    """'<epoch>-<version>': changes on every write and whenever the database file is replaced."""
+    def _execute(c):
+        row = c.execute("SELECT epoch, version FROM data_version WHERE id = 1").fetchone()
+        return f"{row['epoch']}-{row['version']}"
+
+    if conn is not None:
+        return _execute(conn)
+    with transaction(readonly=True) as c:
+        return _execute(c)
+
+
+def cached(fn: Callable) -> Callable:
+    """Memoize `fn` until the next write. Results are shared: callers must not mutate them."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if settings.cache_size <= 0:
+            return fn(*args, **kwargs)
+        path = current_db_path()
+        key = (data_token(), fn.__module__, fn.__qualname__, args, tuple(sorted(kwargs.items())))
+        with _lock:
+            cache = _caches.setdefault(path, OrderedDict())
+            stats = _stats.setdefault(path, {"hits": 0, "misses": 0})
+            if key in cache:
+                cache.move_to_end(key)
+                stats["hits"] += 1
+                return cache[key]
+            stats["misses"] += 1
+        value = fn(*args, **kwargs)
+        with _lock:
+            cache[key] = value
+            while len(cache) > settings.cache_size:
+                cache.popitem(last=False)
+        return value
+
+    wrapper.uncached = fn
+    return wrapper
+
+
+def clear_cache(db_path: str = None):
+    """Drop cached results (all, or one database's)."""
+    with _lock:
+        for path in [p for p in _caches if db_path is None or p == db_path]:
+            _caches[path].clear()
+
+
+def cache_stats() -> dict:
+    """Hit/miss counts and size of the current database's cache."""
+    path = current_db_path()
+    with _lock:
+        return {**_stats.get(path, {"hits": 0, "misses": 0}), "entries": len(_caches.get(path, ())),
+                "max_entries": settings.cache_size}
@@ -0,0 +1,186 @@
+"""
+Change-data capture.
+
+Triggers on the tables in CHANGE_TRACKED (see init_db) append one change_log
+row per inserted, updated or deleted row, keyed by serial number, with an
+increasing seq. A downstream consumer (crossrefs, exports, ...) keeps its own
+cursor in change_consumers and asks only for what changed since its last run:
+
+    with consume("crossref_assignees", ("documents", "classifications")) as delta:
+        if delta.full:
+            ...recompute everything...
+        else:
+            ...recompute delta.changed / delta.deleted...
+
+The cursor only advances when the block exits cleanly. A consumer that has
+never run, or whose unread changes have been pruned, gets full=True.
+"""
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+from app.config import settings
+from app.db.connection import CHANGE_TRACKED, transaction
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChangeSet:
+    consumer: str
+    start: int
+    end: int
+    full: bool
+    # table -> serial numbers whose last change was an insert/update, or a delete
+    changed: dict[str, set[str]] = field(default_factory=dict)
+    deleted: dict[str, set[str]] = field(default_factory=dict)
+
+    def serials(self, table: str) -> set[str]:
+        """Every serial number of the table touched in the delta."""
+        return self.changed.get(table, set()) | self.deleted.get(table, set())
+
+    def __bool__(self) -> bool:
+        return self.full or any(self.changed.values()) or any(self.deleted.values())
+
+
+def _check_tables(tables: Optional[tuple[str, ...]]) -> tuple[str, ...]:
+    tables = tuple(tables) if tables else tuple(CHANGE_TRACKED)
+    unknown = set(tables) - set(CHANGE_TRACKED)
+    if unknown:
+        raise ValueError(f"Untracked tables: {sorted(unknown)}")
+    return tables
+
+
+def _latest(conn) -> int:
+    # sqlite_sequence keeps the last seq even after the log is pruned empty
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+
+def latest_change(conn=None) -> int:
+    """The seq of the most recent change (0 if nothing was ever logged)."""
+    if conn is not None:
+        return _latest(conn)
+    with transaction(readonly=True) as c:
+        return _latest(c)
+
+
+def get_changes(since: int = 0, tables: Optional[tuple[str, ...]] = None, limit: int = 1000) -> list[dict]:
+    """Raw change_log rows after seq `since`, oldest first."""
+    tables = _check_tables(tables)
+    placeholders = ",".join("?" * len(tables))
+    with transaction(readonly=True) as conn:
+        rows = conn.execute(
+            f"""SELECT seq, table_name, serial_number, op, changed_at FROM change_log
+                WHERE seq > ? AND table_name IN ({placeholders})
+                ORDER BY seq LIMIT ?""",
+            (since, *tables, limit),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def _changes_since(conn, consumer: str, tables: tuple[str, ...]) -> ChangeSet:
+    row = conn.execute("SELECT position FROM change_consumers WHERE name = ?", (consumer,)).fetchone()
+    end = _latest(conn)
+    if row is None:
+        return ChangeSet(consumer, 0, end, full=True)
+    start = row["position"]
+    oldest = conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+    if (oldest if oldest is not None else end + 1) > start + 1:
+        # Changes this consumer has not seen were pruned
+        return ChangeSet(consumer, start, end, full=True)
+
+    delta = ChangeSet(consumer, start, end, full=False)
+    placeholders = ",".join("?" * len(tables))
+    last_op: dict[tuple[str, str], str] = {}
+    for r in conn.execute(
+        f"""SELECT table_name, serial_number, op FROM change_log
+            WHERE seq > ? AND seq <= ? AND table_name IN ({placeholders}) ORDER BY seq""",
+        (start, end, *tables),
+    ):
+        last_op[(r["table_name"], r["serial_number"])] = r["op"]
+    for (table, serial), op in last_op.items():
+        target = delta.deleted if op == "D" else delta.changed
+        target.setdefault(table, set()).add(serial)
+    return delta
+
+
+def changes_since(consumer: str, tables: Optional[tuple[str, ...]] = None) -> ChangeSet:
+    """What changed since the consumer's cursor, without advancing it."""
+    tables = _check_tables(tables)
+    with transaction(readonly=True) as conn:
+        return _changes_since(conn, consumer, tables)
+
+
+def set_consumer_position(consumer: str, position: int, conn=None):
+    """Move a consumer's cursor (0 re-reads everything still in the log)."""
+    def _execute(c):
+        c.execute(
+            """INSERT INTO change_consumers (name, position, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+               ON CONFLICT(name) DO UPDATE SET position = excluded.position, updated_at = excluded.updated_at""",
+            (consumer, position),
+        )
+
+    if conn is not None:
+        _execute(conn)
+    else:
+        with transaction() as c:
+            _execute(c)
+
+
+def reset_consumer(consumer: str):
+    """Forget a consumer's cursor so its next run is a full recomputation."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM change_consumers WHERE name = ?", (consumer,))
+
+
+@contextmanager
+def consume(consumer: str, tables: Optional[tuple[str, ...]] = None) -> Iterator[ChangeSet]:
+    """
+    Yield the consumer's pending ChangeSet and advance its cursor to the
+    ChangeSet's end if the block succeeds. Changes committed while the block
+    runs are left for the next run.
+    """
+    delta = changes_since(consumer, tables)
+    yield delta
+    set_consumer_position(consumer, delta.end)
+    logger.info("Consumer %s processed changes %d..%d (full=%s)", consumer, delta.start, delta.end, delta.full)
+
+
+def prune_change_log(retention_days: Optional[float] = None, conn=None) -> dict:
+    """
+    Delete changes every consumer has processed, and any older than
+    retention_days (default CHANGE_LOG_RETENTION_DAYS) regardless; a consumer
+    that falls behind the retention window gets a full recomputation.
+    """
+    if retention_days is None:
+        retention_days = settings.change_log_retention_days
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M:%S")
+
+    def _execute(c):
+        processed = c.execute(
+            "SELECT COALESCE(MIN(position), ?) FROM change_consumers", (_latest(c),)
+        ).fetchone()[0]
+        deleted = c.execute(
+            "DELETE FROM change_log WHERE seq <= ? OR changed_at < ?", (processed, cutoff)
+        ).rowcount
+        return {"deleted": deleted}
+
+    if conn is not None:
+        return _execute(conn)
+    with transaction() as c:
+        return _execute(c)
+
+
+def change_stats() -> dict:
+    """Log size and each consumer's lag behind the latest change."""
+    with transaction(readonly=True) as conn:
+        latest = _latest(conn)
+        retained = conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0]
+        consumers = {
+            r["name"]: {"position": r["position"], "lag": latest - r["position"], "updated_at": r["updated_at"]}
+            for r in conn.execute("SELECT name, position, updated_at FROM change_consumers ORDER BY name")
+        }
+    return {"latest": latest, "retained": retained, "consumers": consumers}
@@ -1,21 +1,44 @@
+import json
 import logging
 from typing import Optional
 
-from app.db.connection import transaction
+from app.db.connection import MODEL_COLUMNS, transaction
 
 logger = logging.getLogger(__name__)
 
 
 def save_ai_result(serial_number: str, model_name: str,
                    primary: int, secondary: int, tertiary: int,
-                   reasoning: str, conn=None):
-    """Save a single AI model's classification result. OCP-compliant: any model name works."""
+                   reasoning: str, conn=None,
+                   prompt_version: Optional[str] = None,
+                   taxonomy_version: Optional[str] = None,
+                   model_id: Optional[str] = None):
+    """Save a single AI model's classification result. OCP-compliant: any model name works.
+
+    A previous result produced under a different prompt/taxonomy/model, or
+    from an abstract that has since changed, is archived to ai_results_history
+    before being replaced.
+    """
     def _execute(c):
+        c.execute(
+            """INSERT INTO ai_results_history
+               (serial_number, model_name, primary_code, secondary_code, tertiary_code,
+                reasoning, prompt_version, taxonomy_version, model_id)
+               SELECT serial_number, model_name, primary_code, secondary_code, tertiary_code,
+                      reasoning, prompt_version, taxonomy_version, model_id
+               FROM ai_results
+               WHERE serial_number = ? AND model_name = ?
+                 AND (prompt_version IS NOT ? OR taxonomy_version IS NOT ? OR model_id IS NOT ?
+                      OR abstract_changed)""",
+            (serial_number, model_name, prompt_version, taxonomy_version, model_id),
+        )
         c.execute(
             """INSERT OR REPLACE INTO ai_results
-               (serial_number, model_name, primary_code, secondary_code, tertiary_code, reasoning)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (serial_number, model_name, primary, secondary, tertiary, reasoning),
+               (serial_number, model_name, primary_code, secondary_code, tertiary_code, reasoning,
+                prompt_version, taxonomy_version, model_id)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (serial_number, model_name, primary, secondary, tertiary, reasoning,
+             prompt_version, taxonomy_version, model_id),
         )
         # Ensure classification row exists
         c.execute(
@@ -49,12 +72,32 @@ def finalize_classification(serial_number: str, primary: int, secondary: int,
             _execute(c)
 
 
+def rebuild_model_columns(conn=None):
+    """Recompute classifications.<model>_primary/_secondary/_tertiary from ai_results."""
+    def _execute(c):
+        for model in MODEL_COLUMNS:
+            c.execute(
+                f"""UPDATE classifications
+                    SET ({model}_primary, {model}_secondary, {model}_tertiary) = (
+                        SELECT primary_code, secondary_code, tertiary_code FROM ai_results
+                        WHERE ai_results.serial_number = classifications.serial_number
+                          AND model_name = ?
+                    )""",
+                (model,),
+            )
+
+    if conn is not None:
+        _execute(conn)
+    else:
+        with transaction() as c:
+            _execute(c)
+    logger.info("Rebuilt per-model result columns on classifications")
+
+
 def get_classification(serial_number: str) -> Optional[dict]:
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         row = conn.execute(
-            """SELECT c.*, 
-                      gpt.primary_code AS gpt_primary, gpt.secondary_code AS gpt_secondary, gpt.tertiary_code AS gpt_tertiary, gpt.reasoning AS gpt_reasoning,
-                      claude.primary_code AS claude_primary, claude.secondary_code AS claude_secondary, claude.tertiary_code AS claude_tertiary, claude.reasoning AS claude_reasoning
+            """SELECT c.*, gpt.reasoning AS gpt_reasoning, claude.reasoning AS claude_reasoning
                FROM classifications c
                LEFT JOIN ai_results gpt ON c.serial_number = gpt.serial_number AND gpt.model_name = 'gpt'
                LEFT JOIN ai_results claude ON c.serial_number = claude.serial_number AND claude.model_name = 'claude'
@@ -65,25 +108,133 @@ def get_classification(serial_number: str) -> Optional[dict]:
 
 
 def get_classifications_by_status(status: str) -> list[dict]:
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
             "SELECT * FROM classifications WHERE status = ?", (status,)
         ).fetchall()
         return [dict(r) for r in rows]
 
 
+def get_pending_second_opinion(model_name: str) -> list[dict]:
+    """Documents stored in degraded single-model mode that still lack `model_name`'s result."""
+    with transaction(readonly=True) as conn:
+        rows = conn.execute(
+            """SELECT d.serial_number, d.abstract
+               FROM classifications c
+               JOIN documents d ON c.serial_number = d.serial_number
+               WHERE c.status = 'pending_second_opinion'
+                 AND NOT EXISTS (
+                     SELECT 1 FROM ai_results r
+                     WHERE r.serial_number = c.serial_number AND r.model_name = ?
+                 )
+               ORDER BY d.doc_type, COALESCE(d.year, 0), d.serial_number""",
+            (model_name,)
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
 def get_finalized_classifications() -> list[dict]:
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
             """SELECT d.*, c.final_primary, c.final_secondary, c.final_tertiary,
-                      c.final_reasoning, c.status,
-                      gpt.primary_code AS gpt_primary, gpt.reasoning AS gpt_reasoning,
-                      claude.primary_code AS claude_primary, claude.reasoning AS claude_reasoning
+                      c.final_reasoning, c.status, c.gpt_primary, c.claude_primary
                FROM documents d
                JOIN classifications c ON d.serial_number = c.serial_number
-               LEFT JOIN ai_results gpt ON d.serial_number = gpt.serial_number AND gpt.model_name = 'gpt'
-               LEFT JOIN ai_results claude ON d.serial_number = claude.serial_number AND claude.model_name = 'claude'
                WHERE c.status IN ('agreed', 'human_reviewed')
                ORDER BY d.year, c.final_primary, c.final_secondary, c.final_tertiary"""
         ).fetchall()
         return [dict(r) for r in rows]
+
+
+def get_ai_result(serial_number: str, model_name: str) -> Optional[dict]:
+    with transaction(readonly=True) as conn:
+        row = conn.execute(
+            "SELECT * FROM ai_results WHERE serial_number = ? AND model_name = ?",
+            (serial_number, model_name)
+        ).fetchone()
+        return dict(row) if row else None
+
+
+def record_taxonomy_version(version: str, snapshot: dict):
+    """Remember a taxonomy snapshot so later versions can be diffed against it."""
+    with transaction() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO taxonomy_versions (version, snapshot) VALUES (?, ?)",
+            (version, json.dumps(snapshot, sort_keys=True)),
+        )
+
+
+def get_taxonomy_snapshots() -> dict[str, dict]:
+    with transaction(readonly=True) as conn:
+        rows = conn.execute("SELECT version, snapshot FROM taxonomy_versions").fetchall()
+        return {r["version"]: json.loads(r["snapshot"]) for r in rows}
+
+
+def get_stale_results(model_name: str, prompt_version: str, taxonomy_version: str,
+                      model_id: Optional[str] = None, doc_type: Optional[str] = None) -> list[dict]:
+    """
+    Documents whose stored result for `model_name` was produced under another
+    prompt version, taxonomy version or (if given) model id, or from an
+    abstract a re-import has since changed. Legacy rows with no version stamp
+    count as stale.
+    """
+    query = """SELECT d.serial_number, d.doc_type, d.abstract, d.year,
+                      c.status, c.final_primary, c.final_secondary, c.final_tertiary,
+                      r.primary_code, r.secondary_code, r.tertiary_code,
+                      r.prompt_version, r.taxonomy_version, r.model_id, r.abstract_changed
+               FROM ai_results r
+               JOIN documents d ON r.serial_number = d.serial_number
+               JOIN classifications c ON r.serial_number = c.serial_number
+               WHERE r.model_name = ?
+                 AND d.abstract IS NOT NULL AND d.abstract != ''
+                 AND (r.abstract_changed OR r.prompt_version IS NOT ? OR r.taxonomy_version IS NOT ?"""
+    params: list = [model_name, prompt_version, taxonomy_version]
+    if model_id is not None:
+        query += " OR r.model_id IS NOT ?"
+        params.append(model_id)
+    query += ")"
+    if doc_type:
+        query += " AND d.doc_type = ?"
+        params.append(doc_type)
+    query += " ORDER BY d.doc_type, COALESCE(d.year, 0), d.serial_number"
+
+    with transaction(readonly=True) as conn:
+        rows = conn.execute(query, params).fetchall()
+        return [dict(r) for r in rows]
+
+
+def get_result_changes(model_name: str, serial_numbers: Optional[list[str]] = None) -> list[dict]:
+    """Side-by-side: the latest archived result vs the current one, per document."""
+    query = """SELECT r.serial_number,
+                      h.primary_code AS old_primary, h.secondary_code AS old_secondary,
+                      h.tertiary_code AS old_tertiary, h.prompt_version AS old_prompt_version,
+                      h.taxonomy_version AS old_taxonomy_version, h.model_id AS old_model_id,
+                      r.primary_code AS new_primary, r.secondary_code AS new_secondary,
+                      r.tertiary_code AS new_tertiary, r.prompt_version AS new_prompt_version,
+                      r.taxonomy_version AS new_taxonomy_version, r.model_id AS new_model_id
+               FROM ai_results r
+               JOIN ai_results_history h ON h.rowid = (
+                   SELECT MAX(h2.rowid) FROM ai_results_history h2
+                   WHERE h2.serial_number = r.serial_number AND h2.model_name = r.model_name
+               )
+               WHERE r.model_name = ?"""
+    params: list = [model_name]
+    if serial_numbers is not None:
+        if not serial_numbers:
+            return []
+        query += f" AND r.serial_number IN ({','.join('?' * len(serial_numbers))})"
+        params.extend(serial_numbers)
+    query += " ORDER BY r.serial_number"
+
+    with transaction(readonly=True) as conn:
+        rows = conn.execute(query, params).fetchall()
+    changes = []
+    for r in rows:
+        r = dict(r)
+        r["primary_changed"] = r["old_primary"] != r["new_primary"]
+        r["codes_changed"] = (
+            (r["old_primary"], r["old_secondary"], r["old_tertiary"])
+            != (r["new_primary"], r["new_secondary"], r["new_tertiary"])
+        )
+        changes.append(r)
+    return changes
@@ -1,36 +1,596 @@
 import logging
+import queue
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
 
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Pools are kept per database path; switching paths (tests, corpora) evicts the oldest
+_MAX_POOLS = 8
 
-def get_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(settings.db_path)
+# The database of the current context: a corpus (see app.corpus) routes its
+# requests and jobs here with using_db(); otherwise settings.db_path
+_db_path: ContextVar[Optional[str]] = ContextVar("db_path", default=None)
+
+
+def current_db_path() -> str:
+    return _db_path.get() or settings.db_path
+
+
+@contextmanager
+def using_db(path: Optional[str]):
+    """Route every connection, pool and snapshot opened in this context to `path` (None: settings.db_path)."""
+    token = _db_path.set(path)
+    try:
+        yield
+    finally:
+        _db_path.reset(token)
+
+
+# Per-connection performance pragmas by profile (DB_PROFILE) and role.
+# cache_size is in KiB when negative; mmap_size is shared page cache, not heap.
+#   serving:   the default; WAL with synchronous=NORMAL (a crash can lose the
+#              last commits, never corrupt), readers memory-mapped
+#   durable:   synchronous=FULL, every commit survives power loss
+#   bulk_load: synchronous=OFF and a large cache, for imports only (see
+#              tuned_transaction); never the process-wide profile on a live disk
+PROFILES = {
+    "serving": {
+        "write": {"synchronous": "NORMAL", "cache_size": -16000, "temp_store": "MEMORY",
+                  "mmap_size": 0, "wal_autocheckpoint": 1000},
+        "read": {"cache_size": -8000, "temp_store": "MEMORY", "mmap_size": 128 * 1024 * 1024},
+    },
+    "durable": {
+        "write": {"synchronous": "FULL", "cache_size": -8000, "temp_store": "DEFAULT",
+                  "mmap_size": 0, "wal_autocheckpoint": 1000},
+        "read": {"cache_size": -8000, "temp_store": "DEFAULT", "mmap_size": 0},
+    },
+    "bulk_load": {
+        "write": {"synchronous": "OFF", "cache_size": -64000, "temp_store": "MEMORY",
+                  "mmap_size": 0, "wal_autocheckpoint": 10000},
+        "read": {"cache_size": -8000, "temp_store": "MEMORY", "mmap_size": 128 * 1024 * 1024},
+    },
+}
+
+
+def apply_profile(conn: sqlite3.Connection, profile: str, role: str = "write") -> dict:
+    """
+    Set `profile`'s pragmas for `role` ("write" or "read") on `conn`.
+    Returns the previous values, so the caller can restore them.
+    Must not be called inside a transaction (synchronous cannot change there).
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DB profile {profile!r} (expected one of {', '.join(PROFILES)})")
+    previous = {}
+    for name, value in PROFILES[profile][role].items():
+        previous[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+        conn.execute(f"PRAGMA {name}={value}")
+    return previous
+
+
+def get_connection(readonly: bool = False) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        current_db_path(),
+        cached_statements=settings.db_statement_cache,
+        # Pooled connections are handed between FastAPI's worker threads,
+        # but only one holder uses a connection at a time
+        check_same_thread=False,
+    )
     conn.row_factory = sqlite3.Row
+    # Only takes effect on a new, empty file; existing databases are converted
+    # by the full_vacuum maintenance task
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA foreign_keys=ON")
+    # INSERT OR REPLACE must fire DELETE triggers so the aggregate tables stay exact
+    conn.execute("PRAGMA recursive_triggers=ON")
+    apply_profile(conn, settings.db_profile, "read" if readonly else "write")
+    if readonly:
+        conn.execute("PRAGMA query_only=ON")
+    if _trace_callback is not None:
+        conn.set_trace_callback(_trace_callback)
+    return conn
+
+
+_trace_callback = None
+
+
+@contextmanager
+def traced(callback):
+    """
+    Pass the SQL of every statement run on connections opened inside the
+    block to `callback` (for tooling such as scripts/query_plans.py).
+    Pooled connections are closed on entry and exit so none escape tracing.
+    """
+    global _trace_callback
+    close_pools(current_db_path())
+    _trace_callback = callback
+    try:
+        yield
+    finally:
+        _trace_callback = None
+        close_pools(current_db_path())
+
+
+class ConnectionPool:
+    """
+    Idle connections for one database file, configured once on creation.
+    Acquire never blocks: when no idle connection is available a new one is
+    opened, and on release connections beyond `size` are closed.
+    """
+
+    def __init__(self, size: int, readonly: bool = False):
+        self.size = size
+        self.readonly = readonly
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self.opened = 0
+        self.closed = False
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            self.opened += 1
+            return get_connection(self.readonly)
+
+    def release(self, conn: sqlite3.Connection):
+        # A closed pool may still get back connections that were in use when it closed
+        if not self.closed and self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools: "OrderedDict[tuple[str, bool], ConnectionPool]" = OrderedDict()
+_pools_lock = threading.Lock()
+
+
+def _get_pool(readonly: bool) -> ConnectionPool:
+    key = (current_db_path(), readonly)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(settings.db_pool_size, readonly)
+            while len(_pools) > 2 * _MAX_POOLS:
+                _, evicted = _pools.popitem(last=False)
+                evicted.close()
+        else:
+            _pools.move_to_end(key)
+        return pool
+
+
+def close_pools(db_path: str = None):
+    """
+    Close idle pooled connections and read snapshots (all, or one
+    database's). Required before replacing the file.
+    """
+    with _pools_lock:
+        for key in [k for k in _pools if db_path is None or k[0] == db_path]:
+            _pools.pop(key).close()
+    with _snapshots_lock:
+        for path in [p for p in _snapshots if db_path is None or p == db_path]:
+            _snapshots.pop(path).close()
+
+
+def pool_stats() -> dict:
+    with _pools_lock:
+        return {
+            f"{path} ({'read' if readonly else 'write'})": {"idle": pool._idle.qsize(), "opened": pool.opened}
+            for (path, readonly), pool in _pools.items()
+        }
+
+
+# Read snapshots (READ_SNAPSHOTS=true): requests inside snapshot_reads() -- GET
+# requests and exports, see app.middleware -- share an open read transaction
+# on a mode=ro connection instead of starting their own, so the pipeline's
+# writes never wait on them. The snapshot is replaced for new readers once it is
+# SNAPSHOT_MAX_AGE_SECONDS old, or SNAPSHOT_MIN_AGE_SECONDS old when the
+# database has changed since (PRAGMA data_version on a probe connection, which
+# sees commits from every process); a replaced snapshot closes when its last
+# reader finishes, so no read mark outlives its readers and checkpoints can
+# complete. A sqlite3 connection must not be used by two threads at once, so
+# each thread reads a snapshot through its own connection. A thread joins a
+# snapshot only if nothing was committed since it was fixed (otherwise it
+# starts a new one), so every reader of a snapshot sees the same state.
+_snapshot_reads: ContextVar[bool] = ContextVar("snapshot_reads", default=False)
+
+
+@contextmanager
+def snapshot_reads():
+    """Serve read-only transactions in this context from the shared snapshot (if READ_SNAPSHOTS is on)."""
+    token = _snapshot_reads.set(True)
+    try:
+        yield
+    finally:
+        _snapshot_reads.reset(token)
+
+
+def _open_readonly() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        Path(current_db_path()).resolve().as_uri() + "?mode=ro",
+        uri=True,
+        cached_statements=settings.db_statement_cache,
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    apply_profile(conn, settings.db_profile, "read")
+    conn.execute("PRAGMA query_only=ON")
+    if _trace_callback is not None:
+        conn.set_trace_callback(_trace_callback)
     return conn
 
 
+class Snapshot:
+    """
+    Open read transactions (one per reading thread) on the same committed
+    state, shared by concurrent readers. Used under _snapshots_lock.
+    """
+
+    def __init__(self, version: int):
+        # The probe's data_version when the snapshot was fixed (see SnapshotHolder)
+        self.version = version
+        self.created = time.monotonic()
+        self.users = 0
+        self._conns: dict[int, sqlite3.Connection] = {}
+
+    def connection(self) -> Optional[sqlite3.Connection]:
+        """The calling thread's connection to this snapshot, if it has one."""
+        return self._conns.get(threading.get_ident())
+
+    def open_connection(self) -> sqlite3.Connection:
+        """Open the calling thread's connection; the caller checks it saw the snapshot's state."""
+        conn = _open_readonly()
+        conn.execute("BEGIN")
+        # The first read fixes the transaction's state
+        conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        self._conns[threading.get_ident()] = conn
+        return conn
+
+    def age(self) -> float:
+        return time.monotonic() - self.created
+
+    def stale(self, version: int) -> bool:
+        age = self.age()
+        return age >= settings.snapshot_max_age_seconds or (
+            self.version != version and age >= settings.snapshot_min_age_seconds)
+
+    def close(self):
+        conns, self._conns = list(self._conns.values()), {}
+        for conn in conns:
+            try:
+                conn.rollback()
+            finally:
+                conn.close()
+
+
+class SnapshotHolder:
+    """The current snapshot of one database, plus replaced ones still being read."""
+
+    def __init__(self):
+        self.current = None
+        self.retired: set[Snapshot] = set()
+        self.opened = 0
+        # Never in a transaction, so its data_version moves with every commit
+        self._probe: Optional[sqlite3.Connection] = None
+
+    def _data_version(self) -> int:
+        if self._probe is None:
+            self._probe = _open_readonly()
+        return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
+    def _replace(self):
+        self._retire()
+        # Read before the first connection begins: a commit in between only makes a
+        # later thread's check replace the snapshot once more
+        self.current = Snapshot(self._data_version())
+        self.opened += 1
+
+    def acquire(self) -> tuple[Snapshot, sqlite3.Connection]:
+        """The snapshot for a new reader, and the calling thread's connection to it."""
+        if self.current is None or self.current.stale(self._data_version()):
+            self._replace()
+        conn = self.current.connection()
+        if conn is None:
+            conn = self.current.open_connection()
+            if self._data_version() != self.current.version:
+                # Something was committed since the snapshot was fixed, so this
+                # thread's transaction sees a newer state: start a new snapshot from it
+                self._replace()
+                conn = self.current.open_connection()
+        self.current.users += 1
+        return self.current, conn
+
+    def release(self, snapshot: Snapshot):
+        snapshot.users -= 1
+        if snapshot is not self.current and snapshot.users == 0:
+            self.retired.discard(snapshot)
+            snapshot.close()
+
+    def release_idle(self):
+        """Close the current snapshot if nobody is reading it."""
+        if self.current is not None and self.current.users == 0:
+            self._retire()
+
+    def _retire(self):
+        snapshot, self.current = self.current, None
+        if snapshot is None:
+            return
+        if snapshot.users == 0:
+            snapshot.close()
+        else:
+            self.retired.add(snapshot)
+
+    def close(self):
+        # Readers still inside a snapshot close it on release
+        self._retire()
+        if self._probe is not None:
+            self._probe.close()
+            self._probe = None
+
+    def stats(self) -> dict:
+        return {
+            "opened": self.opened,
+            "age_seconds": round(self.current.age(), 2) if self.current else None,
+            "readers": self.current.users if self.current else 0,
+            "retired_in_use": len(self.retired),
+            "oldest_retired_seconds": round(max((s.age() for s in self.retired), default=0), 2),
+        }
+
+
+_snapshots: dict[str, SnapshotHolder] = {}
+_snapshots_lock = threading.Lock()
+
+
+def release_idle_snapshots():
+    """Close snapshots nobody is reading (before a checkpoint, so they don't hold it back)."""
+    with _snapshots_lock:
+        for holder in _snapshots.values():
+            holder.release_idle()
+
+
+def snapshot_stats() -> dict:
+    with _snapshots_lock:
+        return {path: holder.stats() for path, holder in _snapshots.items()}
+
+
 @contextmanager
-def transaction():
-    """Context manager that provides a connection with automatic commit/rollback."""
-    conn = get_connection()
+def _snapshot_transaction():
+    with _snapshots_lock:
+        holder = _snapshots.setdefault(current_db_path(), SnapshotHolder())
+        snapshot, conn = holder.acquire()
     try:
         yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
     finally:
-        conn.close()
+        with _snapshots_lock:
+            holder.release(snapshot)
+
+
+# Admission gate: exclusive_access() holds off new transactions and waits for
+# running ones, so the database file can be swapped with no connection open
+_gate = threading.Condition()
+_active = 0
+_exclusive_owner = None
+_local = threading.local()
+
+
+@contextmanager
+def _admitted():
+    global _active
+    depth = getattr(_local, "depth", 0)
+    if depth == 0:
+        with _gate:
+            me = threading.get_ident()
+            while _exclusive_owner is not None and _exclusive_owner != me:
+                _gate.wait()
+            _active += 1
+    # Nested transactions on one thread are admitted with the outermost one
+    _local.depth = depth + 1
+    try:
+        yield
+    finally:
+        _local.depth = depth
+        if depth == 0:
+            with _gate:
+                _active -= 1
+                _gate.notify_all()
+
+
+@contextmanager
+def exclusive_access(timeout: float = None):
+    """
+    Block new transactions (except this thread's) and wait until all
+    running ones have finished. Raises TimeoutError if they don't finish
+    within `timeout` seconds (default SWAP_TIMEOUT_SECONDS).
+    """
+    global _exclusive_owner
+    timeout = settings.swap_timeout_seconds if timeout is None else timeout
+    me = threading.get_ident()
+    own = 1 if getattr(_local, "depth", 0) else 0
+    with _gate:
+        while _exclusive_owner is not None:
+            _gate.wait()
+        _exclusive_owner = me
+        if not _gate.wait_for(lambda: _active <= own, timeout):
+            _exclusive_owner = None
+            _gate.notify_all()
+            raise TimeoutError(f"{_active - own} database transactions still running after {timeout}s")
+    try:
+        yield
+    finally:
+        with _gate:
+            _exclusive_owner = None
+            _gate.notify_all()
+
+
+@contextmanager
+def transaction(readonly: bool = False):
+    """
+    Context manager that provides a connection with automatic commit/rollback.
+    With `readonly=True` the connection comes from the read pool and rejects writes
+    (or, inside snapshot_reads() with READ_SNAPSHOTS on, is the shared snapshot).
+    Set DB_POOL_SIZE=0 to open a fresh connection per call.
+    """
+    with _admitted():
+        if readonly and settings.read_snapshots and _snapshot_reads.get():
+            with _snapshot_transaction() as conn:
+                yield conn
+            return
+
+        if settings.db_pool_size <= 0:
+            conn = get_connection(readonly)
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+            return
+
+        pool = _get_pool(readonly)
+        conn = pool.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            raise
+        finally:
+            # Never hand out a connection left mid-transaction or broken
+            if conn.in_transaction:
+                conn.close()
+            else:
+                pool.release(conn)
+
+
+@contextmanager
+def tuned_transaction(profile: str):
+    """
+    A write transaction on a connection switched to `profile` (e.g.
+    "bulk_load" for imports) for its duration, then switched back.
+    """
+    with transaction() as conn:
+        previous = apply_profile(conn, profile, "write")
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            for name, value in previous.items():
+                conn.execute(f"PRAGMA {name}={value}")
+
+
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: dict[str, str]) -> list[str]:
+    """
+    Add columns missing from an existing table (databases created before they
+    existed). Returns the names of the columns added.
+    """
+    existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    added = []
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+            logger.info("Migrated %s: added column %s", table, name)
+            added.append(name)
+    return added
+
+
+# Models whose codes are copied onto classifications (<model>_primary, ...)
+MODEL_COLUMNS = ("gpt", "claude")
+
+_MODEL_COLUMN_TRIGGERS = "".join(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_model_{m}_insert AFTER INSERT ON ai_results WHEN new.model_name = '{m}'
+    BEGIN
+        UPDATE classifications
+        SET {m}_primary = new.primary_code, {m}_secondary = new.secondary_code, {m}_tertiary = new.tertiary_code
+        WHERE serial_number = new.serial_number;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_model_{m}_update AFTER UPDATE ON ai_results WHEN new.model_name = '{m}'
+    BEGIN
+        UPDATE classifications
+        SET {m}_primary = new.primary_code, {m}_secondary = new.secondary_code, {m}_tertiary = new.tertiary_code
+        WHERE serial_number = new.serial_number;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_model_{m}_delete AFTER DELETE ON ai_results WHEN old.model_name = '{m}'
+    BEGIN
+        UPDATE classifications
+        SET {m}_primary = NULL, {m}_secondary = NULL, {m}_tertiary = NULL
+        WHERE serial_number = old.serial_number;
+    END;
+""" for m in MODEL_COLUMNS) + "".join(f"""
+    -- save_ai_result writes the result before the classification row exists
+    CREATE TRIGGER IF NOT EXISTS trg_model_{m}_classification AFTER INSERT ON classifications
+    BEGIN
+        UPDATE classifications
+        SET ({m}_primary, {m}_secondary, {m}_tertiary) = (
+            SELECT primary_code, secondary_code, tertiary_code FROM ai_results
+            WHERE serial_number = new.serial_number AND model_name = '{m}'
+        )
+        WHERE serial_number = new.serial_number;
+    END;
+""" for m in MODEL_COLUMNS)
+
+
+# Tables whose writes are recorded in change_log (see app.db.changes), with the
+# column logged as the changed serial number; links are logged by patent
+CHANGE_TRACKED = {
+    "documents": "serial_number",
+    "classifications": "serial_number",
+    "ai_results": "serial_number",
+    "paper_patent_links": "patent_serial",
+    "assignee_crossrefs": "patent_serial",
+}
+
+_CHANGE_LOG = """
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        serial_number TEXT NOT NULL,
+        op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D')),
+        changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    -- Last change_log seq each downstream consumer has processed
+    CREATE TABLE IF NOT EXISTS change_consumers (
+        name TEXT PRIMARY KEY,
+        position INTEGER NOT NULL,
+        updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+""" + "".join(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_cdc_{table}_insert AFTER INSERT ON {table}
+    BEGIN INSERT INTO change_log (table_name, serial_number, op) VALUES ('{table}', new.{key}, 'I'); END;
+    CREATE TRIGGER IF NOT EXISTS trg_cdc_{table}_update AFTER UPDATE ON {table}
+    BEGIN INSERT INTO change_log (table_name, serial_number, op) VALUES ('{table}', new.{key}, 'U'); END;
+    CREATE TRIGGER IF NOT EXISTS trg_cdc_{table}_delete AFTER DELETE ON {table}
+    BEGIN INSERT INTO change_log (table_name, serial_number, op) VALUES ('{table}', old.{key}, 'D'); END;
+""" for table, key in CHANGE_TRACKED.items())
 
 
 def init_db():
     with transaction() as conn:
+        has_search_index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'documents_fts'"
+        ).fetchone() is not None
         conn.executescript("""
             CREATE TABLE IF NOT EXISTS documents (
                 serial_number TEXT PRIMARY KEY,
@@ -39,8 +599,19 @@ def init_db():
                 abstract TEXT,
                 year INTEGER,
                 authors TEXT,
-                source TEXT,
-                original_data TEXT NOT NULL
+                source TEXT
+            );
+
+            -- Full source CSV row, zlib-compressed JSON. Kept out of documents so
+            -- scans of the hot columns don't page it in; see get_original_data()
+            CREATE TABLE IF NOT EXISTS document_raw (
+                serial_number TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                -- Content hash of the source row, so re-imports skip unchanged rows,
+                -- and the file it was last written from (files may share serials)
+                row_hash TEXT,
+                source_file TEXT,
+                FOREIGN KEY (serial_number) REFERENCES documents(serial_number) ON DELETE CASCADE
             );
 
             CREATE TABLE IF NOT EXISTS classifications (
@@ -51,6 +622,22 @@ def init_db():
                 final_reasoning TEXT,
                 status TEXT NOT NULL DEFAULT 'pending',
                 correct_model TEXT,
+                propagated_from TEXT,
+                -- Copies of each model's ai_results codes, kept by triggers so list
+                -- queries don't join ai_results twice
+                gpt_primary INTEGER,
+                gpt_secondary INTEGER,
+                gpt_tertiary INTEGER,
+                claude_primary INTEGER,
+                claude_secondary INTEGER,
+                claude_tertiary INTEGER,
+                FOREIGN KEY (serial_number) REFERENCES documents(serial_number)
+            );
+
+            CREATE TABLE IF NOT EXISTS duplicate_groups (
+                serial_number TEXT PRIMARY KEY,
+                representative TEXT NOT NULL,
+                similarity REAL,
                 FOREIGN KEY (serial_number) REFERENCES documents(serial_number)
             );
 
@@ -61,10 +648,46 @@ def init_db():
                 secondary_code INTEGER,
                 tertiary_code INTEGER,
                 reasoning TEXT,
+                prompt_version TEXT,
+                taxonomy_version TEXT,
+                model_id TEXT,
+                -- Set when a re-import changed the abstract this result was made from
+                abstract_changed INTEGER NOT NULL DEFAULT 0,
                 PRIMARY KEY (serial_number, model_name),
                 FOREIGN KEY (serial_number) REFERENCES documents(serial_number)
             );
 
+            CREATE TABLE IF NOT EXISTS ai_results_history (
+                serial_number TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                primary_code INTEGER,
+                secondary_code INTEGER,
+                tertiary_code INTEGER,
+                reasoning TEXT,
+                prompt_version TEXT,
+                taxonomy_version TEXT,
+                model_id TEXT,
+                archived_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+
+            -- Source files already imported; see app.services.importer.import_csv
+            CREATE TABLE IF NOT EXISTS import_ledger (
+                source TEXT PRIMARY KEY,
+                doc_type TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                mapping_hash TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                imported_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS taxonomy_versions (
+                version TEXT PRIMARY KEY,
+                snapshot TEXT NOT NULL,
+                recorded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+
             CREATE TABLE IF NOT EXISTS paper_patent_links (
                 patent_serial TEXT NOT NULL,
                 paper_serial TEXT NOT NULL,
@@ -83,10 +706,208 @@ def init_db():
                 FOREIGN KEY (paper_serial) REFERENCES documents(serial_number)
             );
 
+            -- Materialized aggregates for the dashboard, gap analysis and graph,
+            -- maintained by the triggers below. NULL years and class codes are
+            -- stored as 0 so they can be part of the key. Keys are bounded by
+            -- doc types x years x classes x statuses, so rows that drop to a
+            -- count of 0 are simply left in place.
+            CREATE TABLE IF NOT EXISTS class_counts (
+                doc_type TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                final_primary INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                cnt INTEGER NOT NULL,
+                PRIMARY KEY (doc_type, year, final_primary, status)
+            );
+
+            CREATE TABLE IF NOT EXISTS class_cooccurrence (
+                final_primary INTEGER NOT NULL,
+                final_secondary INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                cnt INTEGER NOT NULL,
+                PRIMARY KEY (final_primary, final_secondary, status)
+            );
+
+            CREATE TRIGGER IF NOT EXISTS trg_agg_class_insert AFTER INSERT ON classifications
+            BEGIN
+                INSERT INTO class_counts (doc_type, year, final_primary, status, cnt)
+                SELECT d.doc_type, COALESCE(d.year, 0), COALESCE(NEW.final_primary, 0), NEW.status, 1
+                FROM documents d WHERE d.serial_number = NEW.serial_number
+                ON CONFLICT (doc_type, year, final_primary, status) DO UPDATE SET cnt = cnt + 1;
+                INSERT INTO class_cooccurrence (final_primary, final_secondary, status, cnt)
+                VALUES (COALESCE(NEW.final_primary, 0), COALESCE(NEW.final_secondary, 0), NEW.status, 1)
+                ON CONFLICT (final_primary, final_secondary, status) DO UPDATE SET cnt = cnt + 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_agg_class_delete AFTER DELETE ON classifications
+            BEGIN
+                INSERT INTO class_counts (doc_type, year, final_primary, status, cnt)
+                SELECT d.doc_type, COALESCE(d.year, 0), COALESCE(OLD.final_primary, 0), OLD.status, -1
+                FROM documents d WHERE d.serial_number = OLD.serial_number
+                ON CONFLICT (doc_type, year, final_primary, status) DO UPDATE SET cnt = cnt - 1;
+                INSERT INTO class_cooccurrence (final_primary, final_secondary, status, cnt)
+                VALUES (COALESCE(OLD.final_primary, 0), COALESCE(OLD.final_secondary, 0), OLD.status, -1)
+                ON CONFLICT (final_primary, final_secondary, status) DO UPDATE SET cnt = cnt - 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_agg_class_update
+            AFTER UPDATE OF final_primary, final_secondary, status ON classifications
+            BEGIN
+                INSERT INTO class_counts (doc_type, year, final_primary, status, cnt)
+                SELECT d.doc_type, COALESCE(d.year, 0), COALESCE(OLD.final_primary, 0), OLD.status, -1
+                FROM documents d WHERE d.serial_number = OLD.serial_number
+                ON CONFLICT (doc_type, year, final_primary, status) DO UPDATE SET cnt = cnt - 1;
+                INSERT INTO class_cooccurrence (final_primary, final_secondary, status, cnt)
+                VALUES (COALESCE(OLD.final_primary, 0), COALESCE(OLD.final_secondary, 0), OLD.status, -1)
+                ON CONFLICT (final_primary, final_secondary, status) DO UPDATE SET cnt = cnt - 1;
+                INSERT INTO class_counts (doc_type, year, final_primary, status, cnt)
+                SELECT d.doc_type, COALESCE(d.year, 0), COALESCE(NEW.final_primary, 0), NEW.status, 1
+                FROM documents d WHERE d.serial_number = NEW.serial_number
+                ON CONFLICT (doc_type, year, final_primary, status) DO UPDATE SET cnt = cnt + 1;
+                INSERT INTO class_cooccurrence (final_primary, final_secondary, status, cnt)
+                VALUES (COALESCE(NEW.final_primary, 0), COALESCE(NEW.final_secondary, 0), NEW.status, 1)
+                ON CONFLICT (final_primary, final_secondary, status) DO UPDATE SET cnt = cnt + 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_agg_doc_insert AFTER INSERT ON documents
+            BEGIN
+                INSERT INTO class_counts (doc_type, year, final_primary, status, cnt)
+                SELECT NEW.doc_type, COALESCE(NEW.year, 0), COALESCE(c.final_primary, 0), c.status, 1
+                FROM classifications c WHERE c.serial_number = NEW.serial_number
+                ON CONFLICT (doc_type, year, final_primary, status) DO UPDATE SET cnt = cnt + 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_agg_doc_delete AFTER DELETE ON documents
+            BEGIN
+                INSERT INTO class_counts (doc_type, year, final_primary, status, cnt)
+                SELECT OLD.doc_type, COALESCE(OLD.year, 0), COALESCE(c.final_primary, 0), c.status, -1
+                FROM classifications c WHERE c.serial_number = OLD.serial_number
+                ON CONFLICT (doc_type, year, final_primary, status) DO UPDATE SET cnt = cnt - 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_agg_doc_update AFTER UPDATE OF doc_type, year ON documents
+            BEGIN
+                INSERT INTO class_counts (doc_type, year, final_primary, status, cnt)
+                SELECT OLD.doc_type, COALESCE(OLD.year, 0), COALESCE(c.final_primary, 0), c.status, -1
+                FROM classifications c WHERE c.serial_number = OLD.serial_number
+                ON CONFLICT (doc_type, year, final_primary, status) DO UPDATE SET cnt = cnt - 1;
+                INSERT INTO class_counts (doc_type, year, final_primary, status, cnt)
+                SELECT NEW.doc_type, COALESCE(NEW.year, 0), COALESCE(c.final_primary, 0), c.status, 1
+                FROM classifications c WHERE c.serial_number = NEW.serial_number
+                ON CONFLICT (doc_type, year, final_primary, status) DO UPDATE SET cnt = cnt + 1;
+            END;
+
+            -- Bumped on every write to the data tables; keys the result cache and ETags.
+            -- epoch changes when the database file is created, so a replaced file
+            -- never reuses an old (epoch, version) pair.
+            CREATE TABLE IF NOT EXISTS data_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL,
+                epoch TEXT NOT NULL
+            );
+            INSERT OR IGNORE INTO data_version (id, version, epoch) VALUES (1, 0, lower(hex(randomblob(4))));
+
+            CREATE TRIGGER IF NOT EXISTS trg_version_documents_insert AFTER INSERT ON documents
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_documents_update AFTER UPDATE ON documents
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_documents_delete AFTER DELETE ON documents
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_classifications_insert AFTER INSERT ON classifications
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_classifications_update AFTER UPDATE ON classifications
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_classifications_delete AFTER DELETE ON classifications
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_ai_results_insert AFTER INSERT ON ai_results
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_ai_results_update AFTER UPDATE ON ai_results
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_ai_results_delete AFTER DELETE ON ai_results
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_paper_patent_links_insert AFTER INSERT ON paper_patent_links
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_paper_patent_links_update AFTER UPDATE ON paper_patent_links
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_paper_patent_links_delete AFTER DELETE ON paper_patent_links
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_assignee_crossrefs_insert AFTER INSERT ON assignee_crossrefs
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_assignee_crossrefs_update AFTER UPDATE ON assignee_crossrefs
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_assignee_crossrefs_delete AFTER DELETE ON assignee_crossrefs
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_duplicate_groups_insert AFTER INSERT ON duplicate_groups
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_duplicate_groups_update AFTER UPDATE ON duplicate_groups
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+            CREATE TRIGGER IF NOT EXISTS trg_version_duplicate_groups_delete AFTER DELETE ON duplicate_groups
+            BEGIN UPDATE data_version SET version = version + 1 WHERE id = 1; END;
+
             CREATE INDEX IF NOT EXISTS idx_doc_type ON documents(doc_type);
             CREATE INDEX IF NOT EXISTS idx_doc_year ON documents(year);
             CREATE INDEX IF NOT EXISTS idx_class_status ON classifications(status);
             CREATE INDEX IF NOT EXISTS idx_class_primary ON classifications(final_primary);
             CREATE INDEX IF NOT EXISTS idx_ai_results_serial ON ai_results(serial_number);
+            CREATE INDEX IF NOT EXISTS idx_dup_representative ON duplicate_groups(representative);
+            CREATE INDEX IF NOT EXISTS idx_ai_history_serial ON ai_results_history(serial_number, model_name);
+
+            -- Keyset pagination: these match the ORDER BY of the paged listings
+            CREATE INDEX IF NOT EXISTS idx_doc_type_year_serial ON documents(doc_type, COALESCE(year, 0), serial_number);
+            CREATE INDEX IF NOT EXISTS idx_class_status_serial ON classifications(status, serial_number);
+            CREATE INDEX IF NOT EXISTS idx_links_patent_score ON paper_patent_links(patent_serial, similarity_score DESC, paper_serial);
+
+            -- Full-text index over documents (external content: the text lives only in
+            -- documents; the index is keyed by its rowid). See app.db.search.
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                title, abstract, authors, source,
+                content='documents', content_rowid='rowid', tokenize='porter unicode61'
+            );
+            CREATE TRIGGER IF NOT EXISTS trg_fts_insert AFTER INSERT ON documents BEGIN
+                INSERT INTO documents_fts (rowid, title, abstract, authors, source)
+                VALUES (new.rowid, new.title, new.abstract, new.authors, new.source);
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_fts_delete AFTER DELETE ON documents BEGIN
+                INSERT INTO documents_fts (documents_fts, rowid, title, abstract, authors, source)
+                VALUES ('delete', old.rowid, old.title, old.abstract, old.authors, old.source);
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_fts_update AFTER UPDATE OF title, abstract, authors, source ON documents BEGIN
+                INSERT INTO documents_fts (documents_fts, rowid, title, abstract, authors, source)
+                VALUES ('delete', old.rowid, old.title, old.abstract, old.authors, old.source);
+                INSERT INTO documents_fts (rowid, title, abstract, authors, source)
+                VALUES (new.rowid, new.title, new.abstract, new.authors, new.source);
+            END;
         """)
-    logger.info("Database initialized: %s", settings.db_path)
+        _ensure_columns(conn, "ai_results", {
+            "prompt_version": "TEXT",
+            "taxonomy_version": "TEXT",
+            "model_id": "TEXT",
+            "abstract_changed": "INTEGER NOT NULL DEFAULT 0",
+        })
+        _ensure_columns(conn, "document_raw", {"row_hash": "TEXT", "source_file": "TEXT"})
+        added = _ensure_columns(conn, "classifications", {
+            "propagated_from": "TEXT",
+            **{f"{model}_{rank}": "INTEGER" for model in MODEL_COLUMNS for rank in ("primary", "secondary", "tertiary")},
+        })
+        conn.executescript(_MODEL_COLUMN_TRIGGERS)
+        conn.executescript(_CHANGE_LOG)
+        if "gpt_primary" in added:
+            from app.db.classifications import rebuild_model_columns
+            rebuild_model_columns(conn)
+
+        # Databases created while original_data was a documents column
+        if "original_data" in {row["name"] for row in conn.execute("PRAGMA table_info(documents)")}:
+            from app.db.documents import migrate_original_data
+            migrate_original_data(conn)
+
+        # Databases created before the search index existed
+        if not has_search_index:
+            from app.db.search import rebuild_search_index
+            rebuild_search_index(conn)
+
+        # Databases created before the aggregate tables existed
+        if (conn.execute("SELECT COUNT(*) FROM class_counts").fetchone()[0] == 0
+                and conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0] > 0):
+            from app.db.aggregates import rebuild_aggregates
+            rebuild_aggregates(conn)
+    logger.info("Database initialized: %s", current_db_path())
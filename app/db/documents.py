@@ -1,12 +1,25 @@
 import json
 import logging
+import zlib
 from typing import Optional
 
+from app.db.cache import cached
 from app.db.connection import transaction
+from app.db.pagination import ASC, after_clause, decode_cursor, page
 
 logger = logging.getLogger(__name__)
 
 
+def pack_original(original_data: dict) -> bytes:
+    """Compress a source row for the document_raw table."""
+    return zlib.compress(json.dumps(original_data, default=str).encode("utf-8"))
+
+
+def unpack_original(data: Optional[bytes]) -> dict:
+    """Inverse of pack_original (an empty dict for a missing row)."""
+    return json.loads(zlib.decompress(data)) if data else {}
+
+
 def insert_document(serial_number: str, doc_type: str, title: str,
                     abstract: str, year: Optional[int], authors: list[str],
                     source: Optional[str], original_data: dict,
@@ -15,10 +28,110 @@ def insert_document(serial_number: str, doc_type: str, title: str,
     def _execute(c):
         c.execute(
             """INSERT OR REPLACE INTO documents
-               (serial_number, doc_type, title, abstract, year, authors, source, original_data)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (serial_number, doc_type, title, abstract, year,
-             json.dumps(authors), source, json.dumps(original_data, default=str)),
+               (serial_number, doc_type, title, abstract, year, authors, source)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (serial_number, doc_type, title, abstract, year, json.dumps(authors), source),
+        )
+        c.execute(
+            "INSERT OR REPLACE INTO document_raw (serial_number, data) VALUES (?, ?)",
+            (serial_number, pack_original(original_data)),
+        )
+
+    if conn is not None:
+        _execute(conn)
+    else:
+        with transaction() as c:
+            _execute(c)
+
+
+def get_row_hashes(serial_numbers: list[str], conn=None) -> dict[str, tuple[Optional[str], Optional[str]]]:
+    """
+    (source-row hash, source file) each of the documents that exist was last
+    imported with (None for what was never recorded).
+    """
+    def _execute(c):
+        rows = c.execute(
+            """SELECT d.serial_number, raw.row_hash, raw.source_file FROM documents d
+               LEFT JOIN document_raw raw ON raw.serial_number = d.serial_number
+               WHERE d.serial_number IN (SELECT value FROM json_each(?))""",
+            (json.dumps(serial_numbers),),
+        )
+        return {r["serial_number"]: (r["row_hash"], r["source_file"]) for r in rows}
+
+    if conn is not None:
+        return _execute(conn)
+    with transaction(readonly=True) as c:
+        return _execute(c)
+
+
+def upsert_documents(rows: list[tuple], conn=None) -> dict:
+    """
+    Write many source rows with one executemany per statement. Each row is
+    (serial_number, doc_type, title, abstract, year, authors, source,
+    original_data, row_hash, source_file). New serial numbers are inserted; existing
+    documents are updated in place, so their classifications, results and
+    links are kept. An existing document whose abstract changed has its AI
+    results flagged (abstract_changed) for re-classification.
+    """
+    def _execute(c):
+        serials = [row[0] for row in rows]
+        abstracts = {
+            r["serial_number"]: r["abstract"]
+            for r in c.execute(
+                "SELECT serial_number, abstract FROM documents WHERE serial_number IN (SELECT value FROM json_each(?))",
+                (json.dumps(serials),),
+            )
+        }
+        new = [row for row in rows if row[0] not in abstracts]
+        existing = [row for row in rows if row[0] in abstracts]
+        changed_abstracts = [(row[0],) for row in existing if row[3] != abstracts[row[0]]]
+
+        c.executemany(
+            """INSERT OR REPLACE INTO documents
+               (serial_number, doc_type, title, abstract, year, authors, source)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [(serial, doc_type, title, abstract, year, json.dumps(authors), source)
+             for serial, doc_type, title, abstract, year, authors, source, *_ in new],
+        )
+        c.executemany(
+            """UPDATE documents SET doc_type = ?, title = ?, abstract = ?, year = ?, authors = ?, source = ?
+               WHERE serial_number = ?""",
+            [(doc_type, title, abstract, year, json.dumps(authors), source, serial)
+             for serial, doc_type, title, abstract, year, authors, source, *_ in existing],
+        )
+        c.executemany(
+            "INSERT OR REPLACE INTO document_raw (serial_number, data, row_hash, source_file) VALUES (?, ?, ?, ?)",
+            [(row[0], pack_original(row[7]), row[8], row[9]) for row in rows],
+        )
+        c.executemany("UPDATE ai_results SET abstract_changed = 1 WHERE serial_number = ?", changed_abstracts)
+        return {"inserted": len(new), "updated": len(existing), "abstract_changed": len(changed_abstracts)}
+
+    if conn is not None:
+        return _execute(conn)
+    with transaction() as c:
+        return _execute(c)
+
+
+def get_import_ledger(source: Optional[str] = None) -> list[dict]:
+    """Imported source files, most recent first (or just `source`'s entry)."""
+    query = "SELECT * FROM import_ledger"
+    params: tuple = ()
+    if source is not None:
+        query += " WHERE source = ?"
+        params = (source,)
+    with transaction(readonly=True) as conn:
+        return [dict(r) for r in conn.execute(query + " ORDER BY imported_at DESC, source", params)]
+
+
+def record_import(source: str, doc_type: str, sha256: str, size: int, mtime: float,
+                  mapping_hash: str, rows: int, conn=None):
+    """Record (or refresh) a source file's fingerprint in the import ledger."""
+    def _execute(c):
+        c.execute(
+            """INSERT OR REPLACE INTO import_ledger
+               (source, doc_type, sha256, size, mtime, mapping_hash, rows, imported_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
+            (source, doc_type, sha256, size, mtime, mapping_hash, rows),
         )
 
     if conn is not None:
@@ -29,23 +142,52 @@ def insert_document(serial_number: str, doc_type: str, title: str,
 
 
 def get_document(serial_number: str) -> Optional[dict]:
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         row = conn.execute(
             "SELECT * FROM documents WHERE serial_number = ?", (serial_number,)
         ).fetchone()
         return dict(row) if row else None
 
 
+def get_original_data(serial_number: str) -> Optional[dict]:
+    """The document's source CSV row, or None if there is no such document."""
+    with transaction(readonly=True) as conn:
+        row = conn.execute(
+            "SELECT data FROM document_raw WHERE serial_number = ?", (serial_number,)
+        ).fetchone()
+        return unpack_original(row["data"]) if row else None
+
+
+def migrate_original_data(conn):
+    """
+    Move documents.original_data (plain JSON) into compressed document_raw
+    rows and drop the column.
+    """
+    moved = 0
+    cursor = conn.execute("SELECT serial_number, original_data FROM documents")
+    while batch := cursor.fetchmany(1000):
+        conn.executemany(
+            "INSERT OR REPLACE INTO document_raw (serial_number, data) VALUES (?, ?)",
+            [(r["serial_number"], zlib.compress((r["original_data"] or "{}").encode("utf-8")))
+             for r in batch],
+        )
+        moved += len(batch)
+    conn.execute("ALTER TABLE documents DROP COLUMN original_data")
+    logger.info("Migrated documents: moved original_data of %d rows to document_raw", moved)
+
+
 def get_documents(doc_type: Optional[str] = None) -> list[dict]:
-    with transaction() as conn:
+    # COALESCE(year, 0) sorts like year (NULLs first) and lets these ORDER BYs
+    # read idx_doc_type_year_serial instead of sorting
+    with transaction(readonly=True) as conn:
         if doc_type:
             rows = conn.execute(
-                "SELECT * FROM documents WHERE doc_type = ? ORDER BY year, serial_number",
+                "SELECT * FROM documents WHERE doc_type = ? ORDER BY COALESCE(year, 0), serial_number",
                 (doc_type,)
             ).fetchall()
         else:
             rows = conn.execute(
-                "SELECT * FROM documents ORDER BY doc_type, year, serial_number"
+                "SELECT * FROM documents ORDER BY doc_type, COALESCE(year, 0), serial_number"
             ).fetchall()
         return [dict(r) for r in rows]
 
@@ -53,54 +195,127 @@ def get_documents(doc_type: Optional[str] = None) -> list[dict]:
 def get_documents_paginated(doc_type: Optional[str] = None,
                             limit: int = 100, offset: int = 0) -> tuple[list[dict], int]:
     """Return (rows, total_count) using SQL LIMIT/OFFSET."""
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         if doc_type:
             total = conn.execute(
                 "SELECT COUNT(*) FROM documents WHERE doc_type = ?", (doc_type,)
             ).fetchone()[0]
             rows = conn.execute(
-                "SELECT * FROM documents WHERE doc_type = ? ORDER BY year, serial_number LIMIT ? OFFSET ?",
+                "SELECT * FROM documents WHERE doc_type = ? ORDER BY COALESCE(year, 0), serial_number LIMIT ? OFFSET ?",
                 (doc_type, limit, offset)
             ).fetchall()
         else:
             total = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
             rows = conn.execute(
-                "SELECT * FROM documents ORDER BY doc_type, year, serial_number LIMIT ? OFFSET ?",
+                "SELECT * FROM documents ORDER BY doc_type, COALESCE(year, 0), serial_number LIMIT ? OFFSET ?",
                 (limit, offset)
             ).fetchall()
         return [dict(r) for r in rows], total
 
 
+_DOCUMENT_KEYS = [("doc_type", ASC), ("COALESCE(year, 0)", ASC), ("serial_number", ASC)]
+
+
+def get_documents_page(doc_type: Optional[str] = None, limit: int = 100,
+                       cursor: Optional[str] = None) -> tuple[list[dict], Optional[str]]:
+    """
+    Keyset-paginated documents in (doc_type, year, serial_number) order.
+    Returns (rows, next_cursor); pass next_cursor back to get the following page.
+    """
+    keys = _DOCUMENT_KEYS[1:] if doc_type else _DOCUMENT_KEYS
+    where, params = [], []
+    if doc_type:
+        where.append("doc_type = ?")
+        params.append(doc_type)
+    if cursor:
+        clause, values = after_clause(keys, decode_cursor(cursor, len(keys)))
+        where.append(clause)
+        params.extend(values)
+    query = "SELECT * FROM documents"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += f" ORDER BY {', '.join(expr for expr, _ in keys)} LIMIT ?"
+    params.append(limit + 1)
+
+    with transaction(readonly=True) as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    def key(r):
+        values = [r["year"] or 0, r["serial_number"]]
+        return values if doc_type else [r["doc_type"], *values]
+
+    return page(rows, limit, key)
+
+
 def get_unclassified_documents(doc_type: Optional[str] = None) -> list[dict]:
-    with transaction() as conn:
+    """Pending documents, excluding near-duplicates that will reuse their representative's labels."""
+    with transaction(readonly=True) as conn:
         base_query = """SELECT d.* FROM documents d
                         LEFT JOIN classifications c ON d.serial_number = c.serial_number
                         WHERE c.serial_number IS NULL
-                          AND d.abstract IS NOT NULL AND d.abstract != ''"""
+                          AND d.abstract IS NOT NULL AND d.abstract != ''
+                          AND NOT EXISTS (
+                              SELECT 1 FROM duplicate_groups g
+                              WHERE g.serial_number = d.serial_number
+                                AND g.representative != d.serial_number
+                          )"""
         if doc_type:
             rows = conn.execute(
-                base_query + " AND d.doc_type = ? ORDER BY d.year, d.serial_number",
+                base_query + " AND d.doc_type = ? ORDER BY COALESCE(d.year, 0), d.serial_number",
                 (doc_type,)
             ).fetchall()
         else:
             rows = conn.execute(
-                base_query + " ORDER BY d.doc_type, d.year, d.serial_number"
+                base_query + " ORDER BY d.doc_type, COALESCE(d.year, 0), d.serial_number"
             ).fetchall()
         return [dict(r) for r in rows]
 
 
+def get_pending_abstract_lengths(doc_type: Optional[str] = None) -> list[tuple]:
+    """Return (serial_number, doc_type, abstract_length) for the pending queue.
+
+    Same filter and order as get_unclassified_documents, but only the length is
+    read so the planner never materializes the abstracts themselves.
+    """
+    with transaction(readonly=True) as conn:
+        base_query = """SELECT d.serial_number, d.doc_type, LENGTH(d.abstract) AS abstract_length
+                        FROM documents d
+                        LEFT JOIN classifications c ON d.serial_number = c.serial_number
+                        WHERE c.serial_number IS NULL
+                          AND d.abstract IS NOT NULL AND d.abstract != ''
+                          AND NOT EXISTS (
+                              SELECT 1 FROM duplicate_groups g
+                              WHERE g.serial_number = d.serial_number
+                                AND g.representative != d.serial_number
+                          )"""
+        if doc_type:
+            rows = conn.execute(
+                base_query + " AND d.doc_type = ? ORDER BY COALESCE(d.year, 0), d.serial_number",
+                (doc_type,)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                base_query + " ORDER BY d.doc_type, COALESCE(d.year, 0), d.serial_number"
+            ).fetchall()
+        return [tuple(r) for r in rows]
+
+
+@cached
 def count_documents() -> dict:
-    with transaction() as conn:
-        total = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
-        papers = conn.execute("SELECT COUNT(*) FROM documents WHERE doc_type = 'paper'").fetchone()[0]
-        patents = conn.execute("SELECT COUNT(*) FROM documents WHERE doc_type = 'patent'").fetchone()[0]
-        classified = conn.execute("SELECT COUNT(*) FROM classifications WHERE status != 'pending'").fetchone()[0]
+    with transaction(readonly=True) as conn:
+        by_type = {row[0]: row[1] for row in conn.execute(
+            "SELECT doc_type, COUNT(*) FROM documents GROUP BY doc_type")}
+        total = sum(by_type.values())
+        papers, patents = by_type.get("paper", 0), by_type.get("patent", 0)
+        classified = conn.execute(
+            "SELECT COALESCE(SUM(cnt), 0) FROM class_counts WHERE status != 'pending'"
+        ).fetchone()[0]
         pending = conn.execute(
             """SELECT COUNT(*) FROM documents d
                LEFT JOIN classifications c ON d.serial_number = c.serial_number
                WHERE c.serial_number IS NULL AND d.abstract IS NOT NULL AND d.abstract != ''"""
         ).fetchone()[0]
         return {
-            "total": total, "papers": papers, "patents": patents,
+            "total": total, "papers": papers, "patents": patents, "by_type": by_type,
             "classified": classified, "pending": pending,
         }
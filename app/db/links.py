@@ -43,7 +43,7 @@ def save_assignee_crossref(patent_serial: str, paper_serial: str, matched_name:
 
 
 def get_links_for_patent(patent_serial: str) -> list[dict]:
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
             """SELECT l.paper_serial, l.similarity_score, d.title, d.year
                FROM paper_patent_links l
@@ -56,7 +56,7 @@ def get_links_for_patent(patent_serial: str) -> list[dict]:
 
 
 def get_crossrefs_for_patent(patent_serial: str) -> list[dict]:
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
             """SELECT a.paper_serial, a.matched_name, d.title, d.year
                FROM assignee_crossrefs a
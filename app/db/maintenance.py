@@ -0,0 +1,233 @@
+"""
+Background database maintenance.
+
+Long pipeline runs keep a writer busy for hours; without help the -wal file
+grows without bound and the planner works from stale (or no) statistics.
+A scheduler task started with the app runs, every MAINTENANCE_INTERVAL_SECONDS:
+
+  checkpoint  PRAGMA wal_checkpoint(PASSIVE), never waiting on readers or
+              writers; TRUNCATE instead once the WAL exceeds WAL_TRUNCATE_MB
+              (skipped, not waited for, while readers are active)
+  optimize    PRAGMA optimize (a full ANALYZE the first time)
+  prune_changes
+              delete change_log rows every consumer has processed (or older
+              than CHANGE_LOG_RETENTION_DAYS)
+
+  analytics   refresh the DuckDB analytics snapshot if the data changed
+              (ANALYTICS_ENGINE=duckdb only)
+
+and every VACUUM_INTERVAL_SECONDS
+
+  vacuum      PRAGMA incremental_vacuum, returning up to VACUUM_PAGES free
+              pages to the filesystem (needs auto_vacuum=INCREMENTAL)
+
+full_vacuum (a VACUUM converting the file to auto_vacuum=INCREMENTAL) is
+run on request only. Each task's timings are kept per database for the
+metrics endpoint. With several corpora the scheduler runs the tasks on each
+corpus's database in turn.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from app.config import settings
+from app.db import aio, analytics
+from app.db.changes import change_stats, prune_change_log
+from app.db.connection import current_db_path, release_idle_snapshots, snapshot_stats, transaction, using_db
+from app.db.search import rebuild_search_index
+
+logger = logging.getLogger(__name__)
+
+_AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+def _wal_bytes() -> int:
+    try:
+        return os.path.getsize(f"{current_db_path()}-wal")
+    except OSError:
+        return 0
+
+
+def checkpoint(conn) -> dict:
+    # An idle read snapshot would pin the WAL
+    release_idle_snapshots()
+    mode = "TRUNCATE" if _wal_bytes() > settings.wal_truncate_mb * 1024 * 1024 else "PASSIVE"
+    # TRUNCATE holds off new writers while it waits for readers, so it must not
+    # wait at all: with readers still active it reports busy and is retried next run
+    timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+    conn.execute("PRAGMA busy_timeout=0")
+    try:
+        busy, wal_pages, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    finally:
+        conn.execute(f"PRAGMA busy_timeout={timeout}")
+    return {"mode": mode, "busy": bool(busy), "wal_pages": wal_pages,
+            "checkpointed": checkpointed, "wal_bytes": _wal_bytes()}
+
+
+def optimize(conn) -> dict:
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+    ).fetchone() is not None
+    if not has_stats:
+        conn.execute("ANALYZE")
+    else:
+        # Bounds the cost of any re-analysis optimize decides on
+        conn.execute("PRAGMA analysis_limit=1000")
+        conn.execute("PRAGMA optimize")
+    return {"analyzed": not has_stats}
+
+
+def vacuum(conn) -> dict:
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if mode != 2:
+        return {"skipped": f"auto_vacuum is {_AUTO_VACUUM_MODES.get(mode, mode)}", "free_pages": free}
+    # executescript steps the pragma to completion (execute frees one page per step)
+    conn.executescript(f"PRAGMA incremental_vacuum({settings.vacuum_pages})")
+    return {"freed_pages": free - conn.execute("PRAGMA freelist_count").fetchone()[0]}
+
+
+def full_vacuum(conn) -> dict:
+    before = os.path.getsize(current_db_path())
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    # VACUUM may renumber documents' rowids, which the FTS index refers to
+    rebuild_search_index(conn)
+    return {"bytes_before": before, "bytes_after": os.path.getsize(current_db_path())}
+
+
+def prune_changes(conn) -> dict:
+    return prune_change_log(conn=conn)
+
+
+def refresh_analytics(conn) -> dict:
+    # Loads from its own read transaction, so all tables come from one commit
+    return analytics.refresh_snapshot()
+
+
+TASKS: dict[str, Callable] = {
+    "checkpoint": checkpoint,
+    "optimize": optimize,
+    "prune_changes": prune_changes,
+    "analytics": refresh_analytics,
+    "vacuum": vacuum,
+    "full_vacuum": full_vacuum,
+}
+
+# db path -> task name -> timings
+_stats: dict[str, dict[str, dict]] = {}
+_stats_lock = threading.Lock()
+
+
+def run_task(name: str) -> dict:
+    """Run one maintenance task now (blocking) and record its timing. Raises KeyError for an unknown task."""
+    task = TASKS[name]
+    start = time.perf_counter()
+    error = None
+    try:
+        with transaction() as conn:
+            result = task(conn)
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        elapsed = round((time.perf_counter() - start) * 1000, 2)
+        with _stats_lock:
+            tasks = _stats.setdefault(current_db_path(), {})
+            entry = tasks.setdefault(name, {"runs": 0, "errors": 0, "total_ms": 0.0})
+            entry["runs"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + elapsed, 2)
+            entry["last_ms"] = elapsed
+            entry["last_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            if error is not None:
+                entry["errors"] += 1
+                entry["last_result"] = {"error": error}
+    with _stats_lock:
+        entry["last_result"] = result
+    logger.info("Maintenance %s took %.1fms: %s", name, elapsed, result)
+    return result
+
+
+def storage_stats() -> dict:
+    with transaction(readonly=True) as conn:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    return {
+        "db_bytes": os.path.getsize(current_db_path()),
+        "wal_bytes": _wal_bytes(),
+        "free_bytes": free * page_size,
+        "auto_vacuum": _AUTO_VACUUM_MODES.get(mode, mode),
+    }
+
+
+def maintenance_stats() -> dict:
+    with _stats_lock:
+        tasks = {name: dict(entry) for name, entry in _stats.get(current_db_path(), {}).items()}
+    return {"profile": settings.db_profile, "tasks": tasks, "storage": storage_stats(),
+            "snapshots": snapshot_stats(), "changes": change_stats(),
+            "analytics": analytics.analytics_stats()}
+
+
+class MaintenanceScheduler:
+    def __init__(self, interval: Optional[float] = None, vacuum_interval: Optional[float] = None,
+                 db_paths: Optional[Callable[[], list[str]]] = None):
+        # Asked before every round, so corpora registered later are picked up
+        self.db_paths = db_paths or (lambda: [current_db_path()])
+        self.interval = interval if interval is not None else settings.maintenance_interval_seconds
+        self.vacuum_interval = (vacuum_interval if vacuum_interval is not None
+                                else settings.vacuum_interval_seconds)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_vacuum = loop.time()
+        while True:
+            await asyncio.sleep(self.interval)
+            names = ["checkpoint", "optimize", "prune_changes", "analytics"]
+            if self.vacuum_interval > 0 and loop.time() - last_vacuum >= self.vacuum_interval:
+                names.append("vacuum")
+                last_vacuum = loop.time()
+            for path in self.db_paths():
+                with using_db(path):
+                    for name in names:
+                        try:
+                            await aio.run(run_task, name)
+                        except Exception as e:
+                            logger.error("Maintenance %s on %s failed: %s", name, path, e)
+
+
+_scheduler: Optional[MaintenanceScheduler] = None
+
+
+def start_maintenance(db_paths: Optional[Callable[[], list[str]]] = None):
+    """Start the maintenance scheduler (called on application startup)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = MaintenanceScheduler(db_paths=db_paths)
+        _scheduler.start()
+
+
+async def stop_maintenance():
+    """Stop the maintenance scheduler (called on application shutdown)."""
+    global _scheduler
+    if _scheduler is not None:
+        await _scheduler.stop()
+    _scheduler = None
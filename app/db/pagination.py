@@ -0,0 +1,70 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row of a page, JSON-encoded and
+base64url'd so clients treat it as opaque. The next page is selected with
+a "strictly after this key" predicate on the same ORDER BY, which an index
+on the sort columns can seek to directly, so every page costs the same no
+matter how deep it is (unlike LIMIT/OFFSET, which reads and discards every
+skipped row). Sort expressions must be non-NULL (COALESCE nullable columns)
+and end in a unique column so the order is total.
+"""
+import base64
+import json
+from typing import Callable, Optional, Sequence
+
+ASC = "ASC"
+DESC = "DESC"
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Decode a cursor holding `size` key values. Raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor") from None
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def after_clause(keys: Sequence[tuple[str, str]], values: Sequence) -> tuple[str, list]:
+    """
+    SQL predicate (and params) selecting rows that sort strictly after `values`
+    under ORDER BY `keys` ((expression, ASC|DESC) pairs).
+    """
+    exprs = [expr for expr, _ in keys]
+    # A bound on the leading key lets an index range-scan even where the full
+    # comparison cannot use it (e.g. sort keys from two joined tables)
+    lead = f"{exprs[0]} {'>=' if keys[0][1] == ASC else '<='} ?"
+
+    if all(direction == ASC for _, direction in keys):
+        placeholders = ", ".join("?" * len(keys))
+        return f"{lead} AND ({', '.join(exprs)}) > ({placeholders})", [values[0], *values]
+
+    # Mixed directions: (k1 > v1) OR (k1 = v1 AND k2 < v2) OR ...
+    terms, params = [], [values[0]]
+    for i, (expr, direction) in enumerate(keys):
+        equal = [f"{e} = ?" for e in exprs[:i]]
+        op = ">" if direction == ASC else "<"
+        terms.append("(" + " AND ".join(equal + [f"{expr} {op} ?"]) + ")")
+        params.extend(values[:i + 1])
+    return f"{lead} AND ({' OR '.join(terms)})", params
+
+
+def page(rows: list, limit: int, key: Callable[[dict], Sequence]) -> tuple[list[dict], Optional[str]]:
+    """
+    Trim a LIMIT limit+1 result to `limit` rows and build the next cursor
+    from `key(last row)` (None when this is the last page).
+    """
+    items = [dict(r) for r in rows]
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(key(items[-1]))
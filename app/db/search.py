@@ -0,0 +1,107 @@
+"""
+Full-text search over titles, abstracts, authors and sources.
+
+documents_fts is an FTS5 index kept in step with documents by triggers
+(see init_db). Results are ranked by BM25, with title and author matches
+weighted above abstract matches, and paged by (rank, serial_number) cursor.
+"""
+import html
+import logging
+from typing import Optional
+
+from app.db.connection import transaction
+from app.db.pagination import ASC, after_clause, decode_cursor, page
+
+logger = logging.getLogger(__name__)
+
+# Column weights: title, abstract, authors, source
+_RANK = "bm25(documents_fts, 5.0, 1.0, 2.0, 0.5)"
+_KEYS = [(_RANK, ASC), ("d.serial_number", ASC)]
+
+# Private-use characters mark matches so the text can be escaped before
+# the markers become <mark> tags
+_START, _END = "\ue000", "\ue001"
+
+
+def rebuild_search_index(conn=None):
+    """Re-index every document (after a bulk load, or if the index is suspected stale)."""
+    if conn is not None:
+        conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('rebuild')")
+    else:
+        with transaction() as c:
+            c.execute("INSERT INTO documents_fts (documents_fts) VALUES ('rebuild')")
+    logger.info("Rebuilt full-text search index")
+
+
+def to_match_query(text: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word must match, taken literally
+    (FTS5 operators and punctuation are quoted); a trailing * on a word makes
+    it a prefix search.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    if not terms:
+        raise ValueError("Empty search query")
+    return " ".join(terms)
+
+
+def _highlighted(text: Optional[str]) -> str:
+    return html.escape(text or "").replace(_START, "<mark>").replace(_END, "</mark>")
+
+
+def search_documents(query: str, doc_type: Optional[str] = None,
+                     year_from: Optional[int] = None, year_to: Optional[int] = None,
+                     primary: Optional[int] = None, status: Optional[str] = None,
+                     limit: int = 20, cursor: Optional[str] = None) -> tuple[list[dict], Optional[str]]:
+    """
+    Documents matching `query`, best first. `title` and `snippet` are HTML
+    with matches wrapped in <mark>. Returns (rows, next_cursor).
+    Raises ValueError for an empty query or a malformed cursor.
+    """
+    where, params = ["documents_fts MATCH ?"], [to_match_query(query)]
+    if doc_type:
+        where.append("d.doc_type = ?")
+        params.append(doc_type)
+    if year_from is not None:
+        where.append("d.year >= ?")
+        params.append(year_from)
+    if year_to is not None:
+        where.append("d.year <= ?")
+        params.append(year_to)
+    if primary is not None:
+        where.append("c.final_primary = ?")
+        params.append(primary)
+    if status:
+        where.append("c.status = ?")
+        params.append(status)
+    if cursor:
+        clause, values = after_clause(_KEYS, decode_cursor(cursor, len(_KEYS)))
+        where.append(clause)
+        params.extend(values)
+
+    with transaction(readonly=True) as conn:
+        rows = conn.execute(
+            f"""SELECT d.serial_number, d.doc_type, d.year, d.authors, d.source,
+                       highlight(documents_fts, 0, '{_START}', '{_END}') AS title,
+                       snippet(documents_fts, 1, '{_START}', '{_END}', '…', 32) AS snippet,
+                       c.status, c.final_primary, c.final_secondary, c.final_tertiary,
+                       {_RANK} AS rank
+                FROM documents_fts
+                JOIN documents d ON d.rowid = documents_fts.rowid
+                LEFT JOIN classifications c ON c.serial_number = d.serial_number
+                WHERE {' AND '.join(where)}
+                ORDER BY {', '.join(expr for expr, _ in _KEYS)}
+                LIMIT ?""",
+            (*params, limit + 1),
+        ).fetchall()
+
+    items, next_cursor = page(rows, limit, lambda r: [r["rank"], r["serial_number"]])
+    for item in items:
+        item["title"] = _highlighted(item["title"])
+        item["snippet"] = _highlighted(item["snippet"])
+    return items, next_cursor
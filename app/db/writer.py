@@ -0,0 +1,164 @@
+"""
+Single-writer, write-behind queue.
+
+SQLite allows one writer at a time. Instead of every classify_one coroutine
+and review request opening its own write transaction, they hand a write
+operation (a callable taking a connection) to one writer task, which
+commits whatever has queued up in grouped transactions: up to
+`batch_size` records, or whatever arrived within `max_delay` seconds of
+the first one. Each record runs inside its own SAVEPOINT so a failing
+record is rolled back without losing the rest of the group.
+
+The queue is bounded, so producers wait (backpressure) when the writer
+falls behind. `submit()` hands back an ack future per record (True once it
+is committed, False if it failed), so a caller sharing the writer can count
+its own failures. `flush()` waits until everything queued so far is committed.
+There is one writer per database (corpus), each committing only to its own.
+"""
+import asyncio
+import logging
+import sqlite3
+from typing import Any, Callable, Optional
+
+from app.config import settings
+from app.db import aio
+from app.db.connection import current_db_path, transaction, using_db
+
+logger = logging.getLogger(__name__)
+
+WriteOp = Callable[[sqlite3.Connection], Any]
+
+
+class ResultWriter:
+    def __init__(self, batch_size: Optional[int] = None, max_delay: Optional[float] = None,
+                 max_pending: Optional[int] = None, db_path: Optional[str] = None):
+        # Fixed on creation: the writer task may have been started from another corpus's context
+        self.db_path = db_path or current_db_path()
+        self.batch_size = batch_size or settings.writer_batch_size
+        self.max_delay = max_delay if max_delay is not None else settings.writer_max_delay_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending or settings.writer_queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self.commits = 0
+        self.records = 0
+        self.failed = 0
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, op: WriteOp) -> asyncio.Future:
+        """
+        Queue a write without waiting for it to commit (waits only if the queue
+        is full). Returns its ack: a future set to True once the record is
+        committed, or False if it failed (the error is logged).
+        """
+        self._ensure_running()
+        ack = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, ack, True))
+        return ack
+
+    async def write(self, op: WriteOp) -> Any:
+        """Queue a write and wait until it is committed. Returns op's result or raises its error."""
+        self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, future, False))
+        return await future
+
+    async def flush(self):
+        """Wait until every write queued so far is committed."""
+        if self._task is not None and not self._task.done():
+            await self._queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"commits": self.commits, "records": self.records,
+                "failed": self.failed, "queued": self._queue.qsize()}
+
+    async def _next_group(self) -> list:
+        loop = asyncio.get_running_loop()
+        group = [await self._queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(group) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                group.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return group
+
+    async def _run(self):
+        while True:
+            group = await self._next_group()
+            try:
+                outcomes = await aio.run(self._commit, [op for op, _, _ in group])
+            except Exception as e:
+                logger.error("Write group of %d records failed: %s", len(group), e)
+                outcomes = [(False, e)] * len(group)
+            for (_, future, ack), (ok, value) in zip(group, outcomes):
+                if not ok:
+                    self.failed += 1
+                    if ack:
+                        logger.error("Queued write failed: %s", value)
+                if not future.done():
+                    if ack:
+                        future.set_result(ok)
+                    elif ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(value)
+                self._queue.task_done()
+
+    def _commit(self, ops: list[WriteOp]) -> list[tuple[bool, Any]]:
+        """Runs on a DB thread: one transaction, one savepoint per record."""
+        outcomes = []
+        with using_db(self.db_path), transaction() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for op in ops:
+                conn.execute("SAVEPOINT record")
+                try:
+                    outcomes.append((True, op(conn)))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO record")
+                    outcomes.append((False, e))
+                conn.execute("RELEASE record")
+        self.commits += 1
+        self.records += len(ops)
+        return outcomes
+
+
+_writers: dict[str, ResultWriter] = {}
+_writer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_writer() -> ResultWriter:
+    """The writer for the current database in the running event loop."""
+    global _writer_loop
+    loop = asyncio.get_running_loop()
+    if _writer_loop is not loop:
+        _writers.clear()
+        _writer_loop = loop
+    path = current_db_path()
+    if path not in _writers:
+        _writers[path] = ResultWriter(db_path=path)
+    return _writers[path]
+
+
+async def close_writer():
+    """Flush and stop every writer (called on application shutdown)."""
+    global _writer_loop
+    if _writer_loop is asyncio.get_running_loop():
+        for writer in _writers.values():
+            await writer.close()
+    _writers.clear()
+    _writer_loop = None
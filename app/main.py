@@ -8,7 +8,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
 
 from app import db
+from app.db import aio, analytics
+from app.db.maintenance import start_maintenance, stop_maintenance
+from app.db.writer import close_writer
 from app.config import settings
+from app.corpus import corpora, corpus_middleware, db_paths
+from app.db.connection import using_db
+from app.middleware import etag_middleware, snapshot_middleware
 from app.routes import documents, classify, review, analysis, export, graph, progress, review_ui, dashboard
 
 logger = logging.getLogger(__name__)
@@ -43,8 +49,16 @@ def seed_database():
 @asynccontextmanager
 async def lifespan(application: FastAPI):
     seed_database()
-    db.init_db()
+    for corpus in corpora().values():
+        with using_db(corpus.db_path):
+            db.init_db()
+    start_maintenance(db_paths)
     yield
+    await stop_maintenance()
+    await close_writer()
+    aio.shutdown()
+    db.close_pools()
+    analytics.close_snapshots()
 
 
 app = FastAPI(
@@ -60,6 +74,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.middleware("http")(etag_middleware)
+# Added last so it is outermost: ETags are computed on the snapshot being served
+app.middleware("http")(snapshot_middleware)
+# Outermost of all: the snapshot and ETag are those of the request's corpus
+app.middleware("http")(corpus_middleware)
 
 app.include_router(documents.router)
 app.include_router(classify.router)
@@ -0,0 +1,50 @@
+"""HTTP middleware."""
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.db import aio
+from app.db.connection import snapshot_reads
+
+# GET endpoints whose responses depend only on the database contents (and the URL)
+ETAG_PREFIXES = (
+    "/dashboard/api/",
+    "/progress/api",
+    "/analysis/gaps",
+    "/analysis/duplicates",
+    "/documents/stats",
+    "/documents/search",
+    "/review/ui/stats",
+)
+ETAG_EXCLUDED = ("/dashboard/api/download-db", "/dashboard/api/metrics")
+
+
+async def etag_middleware(request: Request, call_next):
+    """
+    Tag analytics responses with the data version so browsers can revalidate:
+    an unchanged database answers If-None-Match with an empty 304.
+    """
+    path = request.url.path
+    if (request.method != "GET" or not path.startswith(ETAG_PREFIXES)
+            or path.startswith(ETAG_EXCLUDED)):
+        return await call_next(request)
+
+    etag = f'W/"{await aio.data_token()}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+async def snapshot_middleware(request: Request, call_next):
+    """
+    Serve GET requests and exports from the shared read snapshot (when
+    READ_SNAPSHOTS is on), so dashboards never contend with the pipeline.
+    """
+    if request.method == "GET" or request.url.path.startswith("/export/"):
+        with snapshot_reads():
+            return await call_next(request)
+    return await call_next(request)
@@ -1,11 +1,16 @@
+from typing import Optional
+
 from fastapi import APIRouter
 
+from app.db import aio
+
 from app.services.gap_analysis import (
     gap_summary,
     gap_by_five_year_periods,
     patent_class_frequency_by_year,
     paper_class_frequency_by_year,
 )
+from app.services.dedup import build_duplicate_index, dedup_report
 from app.services.linking import link_patents_to_papers, crossref_assignees
 
 router = APIRouter(prefix="/analysis", tags=["analysis"])
@@ -14,31 +19,68 @@ router = APIRouter(prefix="/analysis", tags=["analysis"])
 @router.get("/gaps")
 async def get_gap_analysis():
     """Goal 3: Gap analysis — which classes have patents vs papers."""
-    return gap_summary()
+    return await aio.run(gap_summary)
 
 
 @router.get("/gaps/by-year")
 async def get_gap_by_year():
     """Patent and paper class frequency by year."""
     return {
-        "patent_frequency": patent_class_frequency_by_year(),
-        "paper_frequency": paper_class_frequency_by_year(),
+        "patent_frequency": await aio.run(patent_class_frequency_by_year),
+        "paper_frequency": await aio.run(paper_class_frequency_by_year),
     }
 
 
 @router.get("/gaps/five-year")
 async def get_gap_five_year():
     """Gap analysis by 5-year periods (as shown in assignment example)."""
-    return gap_by_five_year_periods()
+    return await aio.run(gap_by_five_year_periods)
 
 
 @router.post("/link-patents")
 async def run_patent_paper_linking(top_n: int = 3):
     """Goal 3 (part 2): Link each patent to its top N most related papers."""
-    return link_patents_to_papers(top_n=top_n)
+    return await aio.run(link_patents_to_papers, top_n=top_n)
 
 
 @router.post("/crossref-assignees")
-async def run_assignee_crossref():
-    """Goal 4: Find patent assignees who also published papers on the same topic."""
-    return crossref_assignees()
+async def run_assignee_crossref(full: bool = False):
+    """
+    Goal 4: Find patent assignees who also published papers on the same topic.
+    Only documents changed since the last run are re-matched unless full=true.
+    """
+    return await aio.run(crossref_assignees, full=full)
+
+
+@router.get("/changes")
+async def get_change_log(since: int = 0, limit: int = 1000):
+    """
+    Inserted/updated/deleted serial numbers logged after seq `since`, for
+    downstream consumers outside the app: pass the returned `next` as `since`.
+    """
+    changes = await aio.get_changes(since, limit=limit)
+    return {"changes": changes, "next": changes[-1]["seq"] if changes else since}
+
+
+@router.get("/duplicates")
+async def get_duplicate_report():
+    """Near-duplicate groups and how many provider calls label reuse saved."""
+    return await aio.run(dedup_report)
+
+
+@router.post("/duplicates/rebuild")
+async def rebuild_duplicate_index(threshold: Optional[float] = None):
+    """Rebuild the MinHash/LSH near-duplicate index and propagate labels."""
+    return await aio.run(build_duplicate_index, threshold=threshold)
+
+
+@router.get("/aggregates/check")
+async def check_aggregate_tables():
+    """Compare the trigger-maintained aggregate tables with a full recount."""
+    return await aio.check_aggregates()
+
+
+@router.post("/aggregates/rebuild")
+async def rebuild_aggregate_tables():
+    """Recompute the aggregate tables from documents and classifications."""
+    return await aio.rebuild_aggregates()
@@ -1,9 +1,13 @@
 import logging
 from typing import Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 
+from app.db import aio
 from app.services.pipeline import run_classification
+from app.services.planner import plan_classification
+from app.services.reclassify import OTHER_MODEL, run_reclassification, stale_summary
+from app.services.scheduling import get_policy
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +19,8 @@ async def classify_documents(
     doc_type: Optional[str] = None,
     limit: Optional[int] = None,
     concurrency: Optional[int] = None,
+    policy: Optional[str] = None,
+    fair_share: Optional[str] = None,
 ):
     """
     Run the dual AI classification pipeline.
@@ -22,10 +28,109 @@ async def classify_documents(
     - doc_type: 'paper' or 'patent' (or None for all)
     - limit: max documents to classify in this run
     - concurrency: number of parallel requests
+    - policy: queue order — default, patents_first, newest_first, shortest_first, uncertainty
+    - fair_share: weighted share between doc types, e.g. 'patent:3,paper:1'
     """
+    try:
+        get_policy(policy, fair_share)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     result = await run_classification(
         doc_type=doc_type,
         limit=limit,
         concurrency=concurrency,
+        policy=policy,
+        fair_share=fair_share,
     )
     return result
+
+
+@router.post("/plan")
+async def plan_classification_run(
+    doc_type: Optional[str] = None,
+    limit: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    policy: Optional[str] = None,
+    fair_share: Optional[str] = None,
+):
+    """
+    Dry run: estimate tokens, bottleneck provider, wall time and cost
+    for the same selection POST /classify/ would process. No API calls are made.
+    """
+    try:
+        return await aio.run(
+            plan_classification,
+            doc_type=doc_type,
+            limit=limit,
+            concurrency=concurrency,
+            policy=policy,
+            fair_share=fair_share,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _parse_classes(classes: Optional[str]) -> Optional[set[int]]:
+    if not classes:
+        return None
+    try:
+        return {int(c) for c in classes.split(",") if c.strip()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid class list '{classes}'")
+
+
+@router.get("/stale")
+async def get_stale_results(
+    model: str,
+    changed_only: bool = False,
+    classes: Optional[str] = None,
+    doc_type: Optional[str] = None,
+):
+    """
+    Count documents whose stored result for `model` ('gpt' or 'claude') predates
+    the current prompt or taxonomy version.
+    - changed_only: only documents whose codes touch classes changed in the taxonomy
+    - classes: comma-separated class codes to restrict to, e.g. '38,47'
+    """
+    try:
+        return await aio.run(stale_summary, model, changed_only, _parse_classes(classes), doc_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/reclassify")
+async def reclassify_stale(
+    model: str,
+    changed_only: bool = False,
+    classes: Optional[str] = None,
+    doc_type: Optional[str] = None,
+    limit: Optional[int] = None,
+    concurrency: Optional[int] = None,
+):
+    """
+    Re-run one model on its stale documents only, archive the old results and
+    re-apply consensus (human-reviewed decisions are kept).
+    Returns an old-vs-new comparison of every re-run document.
+    """
+    if model not in OTHER_MODEL:
+        raise HTTPException(status_code=400, detail=f"Unknown model '{model}'. Valid: {sorted(OTHER_MODEL)}")
+    return await run_reclassification(
+        model,
+        changed_only=changed_only,
+        classes=_parse_classes(classes),
+        doc_type=doc_type,
+        limit=limit,
+        concurrency=concurrency,
+    )
+
+
+@router.get("/changes")
+async def get_result_changes(model: str):
+    """Side-by-side comparison of archived vs current results for `model`."""
+    changes = await aio.get_result_changes(model)
+    return {
+        "model": model,
+        "count": len(changes),
+        "primary_changed": sum(1 for c in changes if c["primary_changed"]),
+        "items": changes,
+    }
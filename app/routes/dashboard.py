@@ -1,14 +1,18 @@
 """Dashboard route: serves the main project dashboard and its data APIs."""
-import shutil
 from pathlib import Path
+from typing import Optional
 
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from fastapi.responses import HTMLResponse, FileResponse
 
 from app import db
+from app.db import aio, analytics, backup, maintenance
+from app.db.cache import cached
 from app.config import settings
-from app.db.connection import transaction
-from app.taxonomy import TAXONOMY
+from app.db.connection import current_db_path, transaction
+from app.db.pagination import ASC, DESC, after_clause, decode_cursor, page
+from app.db.writer import get_writer
+from app.taxonomy import classes
 from app.services.gap_analysis import gap_summary, gap_by_five_year_periods
 
 router = APIRouter(tags=["dashboard"])
@@ -16,88 +20,131 @@ router = APIRouter(tags=["dashboard"])
 _TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates"
 
 
-@router.get("/dashboard/api/overview")
-async def dashboard_overview():
-    """Aggregate stats for the overview cards."""
+@cached
+def _dashboard_overview():
     counts = db.count_documents()
-    with transaction() as conn:
-        agreed = conn.execute(
-            "SELECT COUNT(*) FROM classifications WHERE status = 'agreed'"
-        ).fetchone()[0]
-        disagreed = conn.execute(
-            "SELECT COUNT(*) FROM classifications WHERE status = 'disagreed'"
-        ).fetchone()[0]
-        human_reviewed = conn.execute(
-            "SELECT COUNT(*) FROM classifications WHERE status = 'human_reviewed'"
-        ).fetchone()[0]
+    statuses = db.get_status_counts()
     return {
         **counts,
-        "agreed": agreed,
-        "disagreed": disagreed,
-        "human_reviewed": human_reviewed,
+        "agreed": statuses.get("agreed", 0),
+        "disagreed": statuses.get("disagreed", 0),
+        "human_reviewed": statuses.get("human_reviewed", 0),
     }
 
 
+@router.get("/dashboard/api/overview")
+async def dashboard_overview():
+    """Aggregate stats for the overview cards."""
+    return await aio.run(_dashboard_overview)
+
+
 @router.get("/dashboard/api/gap-analysis")
 async def dashboard_gap_analysis():
     """Gap analysis data for charts."""
-    gaps = gap_summary()
-    periods = gap_by_five_year_periods()
+    gaps = await aio.run(gap_summary)
+    periods = await aio.run(gap_by_five_year_periods)
     return {"summary": gaps, "periods": periods}
 
 
-@router.get("/dashboard/api/classified")
-async def dashboard_classified(doc_type: str = "paper", limit: int = 100, offset: int = 0):
-    """Paginated classified documents for tables."""
-    with transaction() as conn:
-        total = conn.execute(
-            """SELECT COUNT(*) FROM documents d
-               JOIN classifications c ON d.serial_number = c.serial_number
-               WHERE d.doc_type = ? AND c.status IN ('agreed','human_reviewed')""",
-            (doc_type,)
-        ).fetchone()[0]
+_CLASSIFIED_KEYS = [
+    ("COALESCE(d.year, 0)", ASC), ("COALESCE(c.final_primary, 0)", ASC),
+    ("COALESCE(c.final_secondary, 0)", ASC), ("COALESCE(c.final_tertiary, 0)", ASC),
+    ("d.serial_number", ASC),
+]
+
+
+@cached
+def _dashboard_classified(doc_type: str = "paper", limit: int = 100, offset: int = 0,
+                          cursor: Optional[str] = None):
+    where, params = ["d.doc_type = ?", "c.status IN ('agreed','human_reviewed')"], [doc_type]
+    if cursor:
+        clause, values = after_clause(_CLASSIFIED_KEYS, decode_cursor(cursor, len(_CLASSIFIED_KEYS)))
+        where.append(clause)
+        params.extend(values)
+    with transaction(readonly=True) as conn:
+        total = sum(r["cnt"] for r in db.get_class_counts(doc_type, conn=conn))
         rows = conn.execute(
-            """SELECT d.serial_number, d.title, d.year, d.authors,
+            f"""SELECT d.serial_number, d.title, d.year, d.authors,
                       c.final_primary, c.final_secondary, c.final_tertiary,
-                      c.status,
-                      gpt.primary_code AS gpt_primary,
-                      claude.primary_code AS claude_primary
+                      c.status, c.gpt_primary, c.claude_primary
                FROM documents d
                JOIN classifications c ON d.serial_number = c.serial_number
-               LEFT JOIN ai_results gpt ON d.serial_number = gpt.serial_number AND gpt.model_name = 'gpt'
-               LEFT JOIN ai_results claude ON d.serial_number = claude.serial_number AND claude.model_name = 'claude'
-               WHERE d.doc_type = ? AND c.status IN ('agreed','human_reviewed')
-               ORDER BY d.year, c.final_primary, c.final_secondary, c.final_tertiary
+               WHERE {' AND '.join(where)}
+               ORDER BY {', '.join(expr for expr, _ in _CLASSIFIED_KEYS)}
                LIMIT ? OFFSET ?""",
-            (doc_type, limit, offset)
+            (*params, limit + 1, 0 if cursor else offset)
         ).fetchall()
-    return {"total": total, "rows": [dict(r) for r in rows]}
+    items, next_cursor = page(rows, limit, lambda r: [
+        r["year"] or 0, r["final_primary"] or 0, r["final_secondary"] or 0, r["final_tertiary"] or 0,
+        r["serial_number"],
+    ])
+    return {"total": total, "rows": items, "next_cursor": next_cursor}
 
 
-@router.get("/dashboard/api/links")
-async def dashboard_links(limit: int = 100, offset: int = 0):
-    """Patent-paper links for table."""
-    with transaction() as conn:
-        total = conn.execute("SELECT COUNT(*) FROM paper_patent_links").fetchone()[0]
+@router.get("/dashboard/api/classified")
+async def dashboard_classified(doc_type: str = "paper", limit: int = 100, offset: int = 0,
+                               cursor: Optional[str] = None):
+    """
+    Paginated classified documents for tables.
+    Pass the returned next_cursor as `cursor` for the following page
+    (`offset` still works but gets slower with depth).
+    """
+    try:
+        return await aio.run(_dashboard_classified, doc_type, limit, offset, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+_LINK_KEYS = [("l.patent_serial", ASC), ("l.similarity_score", DESC), ("l.paper_serial", ASC)]
+
+
+@cached
+def _links_total() -> int:
+    with transaction(readonly=True) as conn:
+        return conn.execute("SELECT COUNT(*) FROM paper_patent_links").fetchone()[0]
+
+
+@cached
+def _dashboard_links(limit: int = 100, offset: int = 0, cursor: Optional[str] = None):
+    where, params = "", []
+    if cursor:
+        where, params = after_clause(_LINK_KEYS, decode_cursor(cursor, len(_LINK_KEYS)))
+        where = "WHERE " + where
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
-            """SELECT l.patent_serial, l.paper_serial,
+            f"""SELECT l.patent_serial, l.paper_serial,
                       ROUND(l.similarity_score, 4) AS score,
+                      l.similarity_score,
                       dp.title AS patent_title, dp.year AS patent_year,
                       dr.title AS paper_title, dr.year AS paper_year
                FROM paper_patent_links l
                JOIN documents dp ON l.patent_serial = dp.serial_number
                JOIN documents dr ON l.paper_serial = dr.serial_number
-               ORDER BY l.patent_serial, l.similarity_score DESC
+               {where}
+               ORDER BY l.patent_serial, l.similarity_score DESC, l.paper_serial
                LIMIT ? OFFSET ?""",
-            (limit, offset)
+            (*params, limit + 1, 0 if cursor else offset)
         ).fetchall()
-    return {"total": total, "rows": [dict(r) for r in rows]}
+    items, next_cursor = page(rows, limit, lambda r: [
+        r["patent_serial"], r["similarity_score"], r["paper_serial"],
+    ])
+    for item in items:
+        del item["similarity_score"]
+    return {"total": _links_total(), "rows": items, "next_cursor": next_cursor}
 
 
-@router.get("/dashboard/api/crossrefs")
-async def dashboard_crossrefs():
-    """Assignee cross-references."""
-    with transaction() as conn:
+@router.get("/dashboard/api/links")
+async def dashboard_links(limit: int = 100, offset: int = 0, cursor: Optional[str] = None):
+    """Patent-paper links for table. Pass the returned next_cursor as `cursor` for the next page."""
+    try:
+        return await aio.run(_dashboard_links, limit, offset, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@cached
+def _dashboard_crossrefs():
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
             """SELECT a.patent_serial, a.paper_serial, a.matched_name,
                       dp.title AS patent_title, dr.title AS paper_title
@@ -109,83 +156,46 @@ async def dashboard_crossrefs():
     return {"total": len(rows), "rows": [dict(r) for r in rows]}
 
 
-@router.get("/dashboard/api/results")
-async def dashboard_results():
-    """Comprehensive results data for the Results page."""
+@router.get("/dashboard/api/crossrefs")
+async def dashboard_crossrefs():
+    """Assignee cross-references."""
+    return await aio.run(_dashboard_crossrefs)
+
+
+@cached
+def _dashboard_results():
     counts = db.count_documents()
-    with transaction() as conn:
-        agreed = conn.execute("SELECT COUNT(*) FROM classifications WHERE status = 'agreed'").fetchone()[0]
-        disagreed = conn.execute("SELECT COUNT(*) FROM classifications WHERE status = 'disagreed'").fetchone()[0]
-        human_reviewed = conn.execute("SELECT COUNT(*) FROM classifications WHERE status = 'human_reviewed'").fetchone()[0]
+    with transaction(readonly=True) as conn:
+        statuses = db.get_status_counts(conn=conn)
+        agreed = statuses.get("agreed", 0)
+        disagreed = statuses.get("disagreed", 0)
+        human_reviewed = statuses.get("human_reviewed", 0)
 
         # Top primary classes for papers
         top_paper_classes = conn.execute(
-            """SELECT c.final_primary AS code, COUNT(*) AS cnt
-               FROM classifications c JOIN documents d ON c.serial_number = d.serial_number
-               WHERE d.doc_type = 'paper' AND c.status IN ('agreed','human_reviewed')
-               GROUP BY c.final_primary ORDER BY cnt DESC LIMIT 10"""
+            """SELECT final_primary AS code, SUM(cnt) AS cnt FROM class_counts
+               WHERE doc_type = 'paper' AND status IN ('agreed','human_reviewed')
+               GROUP BY final_primary HAVING SUM(cnt) > 0 ORDER BY cnt DESC LIMIT 10"""
         ).fetchall()
 
         # Top primary classes for patents
         top_patent_classes = conn.execute(
-            """SELECT c.final_primary AS code, COUNT(*) AS cnt
-               FROM classifications c JOIN documents d ON c.serial_number = d.serial_number
-               WHERE d.doc_type = 'patent' AND c.status IN ('agreed','human_reviewed')
-               GROUP BY c.final_primary ORDER BY cnt DESC LIMIT 10"""
+            """SELECT final_primary AS code, SUM(cnt) AS cnt FROM class_counts
+               WHERE doc_type = 'patent' AND status IN ('agreed','human_reviewed')
+               GROUP BY final_primary HAVING SUM(cnt) > 0 ORDER BY cnt DESC LIMIT 10"""
         ).fetchall()
 
-        # Disagreement analysis: most common GPT vs Claude disagreement pairs
-        disagreement_pairs = conn.execute(
-            """SELECT gpt.primary_code AS gpt_code, claude.primary_code AS claude_code, COUNT(*) AS cnt
-               FROM classifications c
-               JOIN ai_results gpt ON c.serial_number = gpt.serial_number AND gpt.model_name = 'gpt'
-               JOIN ai_results claude ON c.serial_number = claude.serial_number AND claude.model_name = 'claude'
-               WHERE c.status IN ('disagreed','human_reviewed')
-               GROUP BY gpt.primary_code, claude.primary_code
-               ORDER BY cnt DESC LIMIT 15"""
-        ).fetchall()
-
-        # For human-reviewed: how often did the human pick GPT vs Claude vs something else
-        human_picked_gpt = conn.execute(
-            """SELECT COUNT(*) FROM classifications c
-               JOIN ai_results gpt ON c.serial_number = gpt.serial_number AND gpt.model_name = 'gpt'
-               WHERE c.status = 'human_reviewed' AND c.final_primary = gpt.primary_code"""
-        ).fetchone()[0]
-        human_picked_claude = conn.execute(
-            """SELECT COUNT(*) FROM classifications c
-               JOIN ai_results claude ON c.serial_number = claude.serial_number AND claude.model_name = 'claude'
-               WHERE c.status = 'human_reviewed' AND c.final_primary = claude.primary_code"""
-        ).fetchone()[0]
-
-        # Year range
-        year_range = conn.execute(
-            "SELECT MIN(year), MAX(year) FROM documents WHERE year IS NOT NULL AND year > 0"
-        ).fetchone()
-
-        # Papers by decade
-        papers_by_decade = conn.execute(
-            """SELECT (d.year / 10) * 10 AS decade, COUNT(*) AS cnt
-               FROM documents d JOIN classifications c ON d.serial_number = c.serial_number
-               WHERE d.doc_type = 'paper' AND d.year > 0 AND c.status IN ('agreed','human_reviewed')
-               GROUP BY decade ORDER BY decade"""
-        ).fetchall()
-
-        # Patents by decade
-        patents_by_decade = conn.execute(
-            """SELECT (d.year / 10) * 10 AS decade, COUNT(*) AS cnt
-               FROM documents d JOIN classifications c ON d.serial_number = c.serial_number
-               WHERE d.doc_type = 'patent' AND d.year > 0 AND c.status IN ('agreed','human_reviewed')
-               GROUP BY decade ORDER BY decade"""
-        ).fetchall()
-
-        # Link stats
-        total_links = conn.execute("SELECT COUNT(*) FROM paper_patent_links").fetchone()[0]
-        avg_similarity = conn.execute("SELECT AVG(similarity_score) FROM paper_patent_links").fetchone()[0]
-        max_similarity = conn.execute("SELECT MAX(similarity_score) FROM paper_patent_links").fetchone()[0]
-
         # Crossref count
         total_crossrefs = conn.execute("SELECT COUNT(*) FROM assignee_crossrefs").fetchone()[0]
 
+    # Column aggregates over the base tables (answered by DuckDB with ANALYTICS_ENGINE=duckdb)
+    disagreement_pairs = analytics.disagreement_pairs()
+    human_picks = analytics.human_picks()
+    year_range = analytics.year_range()
+    papers_by_decade = analytics.decade_counts("paper")
+    patents_by_decade = analytics.decade_counts("patent")
+    links = analytics.link_stats()
+
     # Gap summary
     gaps = gap_summary()
     papers_only_classes = [c for c in gaps["by_class"] if c["gap_type"] == "papers_only"]
@@ -200,16 +210,16 @@ async def dashboard_results():
         "agreement_rate": round(agreed / (agreed + disagreed + human_reviewed) * 100, 1) if (agreed + disagreed + human_reviewed) > 0 else 0,
         "top_paper_classes": [dict(r) for r in top_paper_classes],
         "top_patent_classes": [dict(r) for r in top_patent_classes],
-        "disagreement_pairs": [dict(r) for r in disagreement_pairs],
-        "human_picked_gpt": human_picked_gpt,
-        "human_picked_claude": human_picked_claude,
-        "human_picked_other": human_reviewed - human_picked_gpt - human_picked_claude,
-        "year_range": {"min": year_range[0], "max": year_range[1]} if year_range else None,
-        "papers_by_decade": [dict(r) for r in papers_by_decade],
-        "patents_by_decade": [dict(r) for r in patents_by_decade],
-        "total_links": total_links,
-        "avg_similarity": round(avg_similarity * 100, 1) if avg_similarity else 0,
-        "max_similarity": round(max_similarity * 100, 1) if max_similarity else 0,
+        "disagreement_pairs": disagreement_pairs,
+        "human_picked_gpt": human_picks["gpt"],
+        "human_picked_claude": human_picks["claude"],
+        "human_picked_other": human_reviewed - human_picks["gpt"] - human_picks["claude"],
+        "year_range": year_range,
+        "papers_by_decade": papers_by_decade,
+        "patents_by_decade": patents_by_decade,
+        "total_links": links["total"],
+        "avg_similarity": round(links["avg_similarity"] * 100, 1) if links["avg_similarity"] else 0,
+        "max_similarity": round(links["max_similarity"] * 100, 1) if links["max_similarity"] else 0,
         "total_crossrefs": total_crossrefs,
         "papers_only_classes": papers_only_classes,
         "both_classes": both_classes,
@@ -218,55 +228,99 @@ async def dashboard_results():
     }
 
 
+@router.get("/dashboard/api/results")
+async def dashboard_results():
+    """Comprehensive results data for the Results page."""
+    return await aio.run(_dashboard_results)
+
+
 @router.get("/dashboard/api/taxonomy")
 async def dashboard_taxonomy():
     """Taxonomy lookup for the frontend."""
     return {str(k): {"code": v.code, "category": v.major_category, "description": v.description}
-            for k, v in TAXONOMY.items()}
+            for k, v in classes().items()}
 
 
 @router.get("/dashboard/api/download-db")
-async def download_database():
-    """Download the current database file for backup or local sync."""
-    db_path = Path(settings.db_path)
-    if not db_path.exists():
+async def download_database(compress: bool = True):
+    """
+    Download a consistent snapshot of the database for backup or local sync,
+    gzipped unless compress=false. Supports Range requests for resuming.
+    """
+    if not Path(current_db_path()).exists():
         raise HTTPException(status_code=404, detail="Database file not found")
+    path = await aio.run(backup.get_snapshot, compress)
     return FileResponse(
-        path=str(db_path),
-        filename="ferrofluids.db",
-        media_type="application/octet-stream",
+        path=str(path),
+        filename="ferrofluids.db.gz" if compress else "ferrofluids.db",
+        media_type="application/gzip" if compress else "application/octet-stream",
     )
 
 
+_UPLOAD_CHUNK = 1024 * 1024
+
+
 @router.post("/dashboard/api/upload-db")
 async def upload_database(file: UploadFile = File(...)):
     """Upload a database file to replace the current one.
     
     Use this to restore a backup or sync your local database to Render.
-    The uploaded file must be named ferrofluids.db.
+    Accepts a plain or gzipped SQLite file (such as a download-db snapshot).
+    The file is checked before it replaces the current database, which is
+    kept as a .bak backup.
     """
-    db_path = Path(settings.db_path)
-    backup_path = db_path.with_suffix(".db.bak")
-    
-    # Create a backup of the current database
-    if db_path.exists():
-        shutil.copy2(db_path, backup_path)
-    
+    tmp = backup.new_upload_path()
+    limit = settings.max_upload_mb * 1024 * 1024
+    size = 0
     try:
-        # Write the uploaded file
-        with open(db_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        with open(tmp, "wb") as out:
+            while chunk := await file.read(_UPLOAD_CHUNK):
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {settings.max_upload_mb} MB")
+                await aio.run(out.write, chunk)
+        try:
+            await aio.run(backup.decompress_if_gzipped, tmp, limit)
+            counts = await aio.run(backup.validate_database, tmp)
+        except backup.DecompressedTooLarge:
+            raise HTTPException(status_code=413,
+                                detail=f"Decompressed upload exceeds {settings.max_upload_mb} MB")
+        except (ValueError, OSError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid database: {e}")
+
+        # Queued pipeline writes belong to the database being replaced
+        await get_writer().flush()
+        try:
+            result = await aio.run(backup.replace_database, tmp)
+        except TimeoutError as e:
+            raise HTTPException(status_code=503, detail=str(e))
         return {
             "status": "success",
-            "message": f"Database uploaded ({len(content):,} bytes)",
-            "backup": str(backup_path),
+            "message": f"Database uploaded ({size:,} bytes)",
+            "backup": result["backup"],
+            "counts": counts,
         }
-    except Exception:
-        # Restore backup on failure
-        if backup_path.exists():
-            shutil.copy2(backup_path, db_path)
-        raise
+    finally:
+        Path(tmp).unlink(missing_ok=True)
+
+
+@router.get("/dashboard/api/metrics")
+async def database_metrics():
+    """Maintenance task timings, storage sizes, connection pools, cache and writer counters."""
+    return {
+        **await aio.run(maintenance.maintenance_stats),
+        "pools": db.pool_stats(),
+        "cache": db.cache_stats(),
+        "writer": get_writer().stats(),
+    }
+
+
+@router.post("/dashboard/api/maintenance/{task}")
+async def run_maintenance(task: str):
+    """Run one maintenance task now: checkpoint, optimize, vacuum or full_vacuum."""
+    if task not in maintenance.TASKS:
+        raise HTTPException(status_code=404, detail=f"Unknown maintenance task: {task}")
+    return {"task": task, "result": await aio.run(maintenance.run_task, task)}
 
 
 @router.get("/dashboard", response_class=HTMLResponse)
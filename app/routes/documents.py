@@ -1,42 +1,142 @@
+import os
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, File, HTTPException, UploadFile
+from fastapi.responses import FileResponse
 
-from app import db
+from app.config import settings
+from app.db import aio
+from app.services import uploads
 from app.services.importer import import_all
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
 
 @router.post("/import")
-async def import_data():
-    """Load all CSV data into the database."""
-    result = import_all()
+async def import_data(force: bool = False):
+    """
+    Load all CSV data into the database. Files unchanged since their last
+    import are skipped and only new or changed rows are written, unless `force`.
+    """
+    result = await aio.run(import_all, force)
     return result
 
 
+_UPLOAD_CHUNK = 1024 * 1024
+
+
+@router.post("/upload", status_code=202)
+async def upload_data(background_tasks: BackgroundTasks, file: UploadFile = File(...),
+                      doc_type: Optional[str] = None):
+    """
+    Upload a CSV or XLSX export and import it in the background.
+    The file is streamed to disk; the mapping is picked from its columns
+    unless `doc_type` is given. Poll GET /documents/uploads/{id} for progress
+    and fetch skipped rows from /documents/uploads/{id}/rejected.
+    """
+    try:
+        job = uploads.create_job(file.filename or "", doc_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    limit = settings.max_upload_mb * 1024 * 1024
+    try:
+        with open(job.path, "wb") as out:
+            while chunk := await file.read(_UPLOAD_CHUNK):
+                job.bytes += len(chunk)
+                if job.bytes > limit:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {settings.max_upload_mb} MB")
+                await aio.run(out.write, chunk)
+    except BaseException as e:
+        uploads.fail_job(job, getattr(e, "detail", None) or "Upload interrupted")
+        raise
+    job.status = "queued"
+    background_tasks.add_task(aio.run, uploads.run_job, job.id)
+    return job.to_dict()
+
+
+@router.get("/uploads")
+async def list_uploads():
+    """Upload jobs of this corpus, newest first."""
+    return {"jobs": [job.to_dict() for job in uploads.list_jobs()]}
+
+
+@router.get("/uploads/{job_id}")
+async def get_upload(job_id: str):
+    """Status and row-level progress of an upload job."""
+    job = uploads.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Upload job not found")
+    return job.to_dict()
+
+
+@router.get("/uploads/{job_id}/rejected")
+async def get_upload_rejections(job_id: str):
+    """CSV of the rows an upload job skipped: row number, #, title and reason."""
+    job = uploads.get_job(job_id)
+    if not job or not os.path.exists(job.report_path):
+        raise HTTPException(status_code=404, detail="No rejected-rows report for this job")
+    return FileResponse(job.report_path, media_type="text/csv",
+                        filename=f"{os.path.splitext(job.filename)[0]}.rejected.csv")
+
+
 @router.get("/stats")
 async def get_stats():
     """Get document counts."""
-    return db.count_documents()
+    return await aio.count_documents()
 
 
 @router.get("/")
-async def list_documents(doc_type: Optional[str] = None, limit: int = 100, offset: int = 0):
-    """List documents with optional type filter."""
-    docs, total = db.get_documents_paginated(doc_type, limit=limit, offset=offset)
+async def list_documents(doc_type: Optional[str] = None, limit: int = 100, offset: int = 0,
+                         cursor: Optional[str] = None):
+    """
+    List documents with optional type filter.
+    Pass the returned next_cursor as `cursor` for the following page
+    (`offset` still works but gets slower with depth).
+    """
+    if offset and not cursor:
+        docs, total = await aio.get_documents_paginated(doc_type, limit=limit, offset=offset)
+        return {"total": total, "showing": len(docs), "documents": docs}
+
+    try:
+        docs, next_cursor = await aio.get_documents_page(doc_type, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    counts = await aio.count_documents()
+    total = counts["total"] if doc_type is None else counts["by_type"].get(doc_type, 0)
     return {
         "total": total,
         "showing": len(docs),
         "documents": docs,
+        "next_cursor": next_cursor,
     }
 
 
+@router.get("/search")
+async def search_documents(q: str, doc_type: Optional[str] = None,
+                           year_from: Optional[int] = None, year_to: Optional[int] = None,
+                           primary: Optional[int] = None, status: Optional[str] = None,
+                           limit: int = 20, cursor: Optional[str] = None):
+    """
+    Full-text search over titles, abstracts, authors and sources, best match first.
+    Words are ANDed; end a word with * to match it as a prefix. Pass the
+    returned next_cursor as `cursor` for more results.
+    """
+    try:
+        results, next_cursor = await aio.search_documents(
+            q, doc_type=doc_type, year_from=year_from, year_to=year_to,
+            primary=primary, status=status, limit=min(max(limit, 1), 100), cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": q, "results": results, "next_cursor": next_cursor}
+
+
 @router.get("/{serial_number}")
 async def get_document(serial_number: str):
     """Get a single document by serial number."""
-    doc = db.get_document(serial_number)
+    doc = await aio.get_document(serial_number)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
-    classification = db.get_classification(serial_number)
+    doc["original_data"] = await aio.get_original_data(serial_number)
+    classification = await aio.get_classification(serial_number)
     return {"document": doc, "classification": classification}
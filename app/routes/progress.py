@@ -4,28 +4,22 @@ from fastapi import APIRouter
 from fastapi.responses import HTMLResponse
 
 from app import db
-from app.db.connection import transaction
+from app.db import aio
+from app.db.cache import cached
 
 router = APIRouter(tags=["progress"])
 
 _TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates"
 
 
-@router.get("/progress/api")
-async def progress_api():
-    """JSON endpoint for live progress data."""
+@cached
+def _progress_api():
     counts = db.count_documents()
 
-    with transaction() as conn:
-        agreed = conn.execute(
-            "SELECT COUNT(*) FROM classifications WHERE status = 'agreed'"
-        ).fetchone()[0]
-        disagreed = conn.execute(
-            "SELECT COUNT(*) FROM classifications WHERE status = 'disagreed'"
-        ).fetchone()[0]
-        human_reviewed = conn.execute(
-            "SELECT COUNT(*) FROM classifications WHERE status = 'human_reviewed'"
-        ).fetchone()[0]
+    statuses = db.get_status_counts()
+    agreed = statuses.get("agreed", 0)
+    disagreed = statuses.get("disagreed", 0)
+    human_reviewed = statuses.get("human_reviewed", 0)
 
     classified = counts["classified"]
     total = counts["total"]
@@ -44,6 +38,12 @@ async def progress_api():
     }
 
 
+@router.get("/progress/api")
+async def progress_api():
+    """JSON endpoint for live progress data."""
+    return await aio.run(_progress_api)
+
+
 @router.get("/progress", response_class=HTMLResponse)
 async def progress_dashboard():
     """Live progress dashboard."""
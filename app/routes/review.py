@@ -3,8 +3,11 @@ from pydantic import BaseModel
 from typing import Optional
 
 from app import db
+from app.db import aio
 from app.db.connection import transaction
-from app.taxonomy import VALID_CODES
+from app.db.writer import get_writer
+from app.services.dedup import propagate_labels
+from app.taxonomy import valid_codes
 
 router = APIRouter(prefix="/review", tags=["review"])
 
@@ -17,17 +20,15 @@ class ReviewRequest(BaseModel):
     note: Optional[str] = None
 
 
-@router.get("/pending")
-async def list_disagreements():
-    """List all documents where GPT and Claude disagreed."""
-    with transaction() as conn:
+def _list_disagreements():
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
             """SELECT d.serial_number, d.doc_type, d.title, d.abstract, d.year,
                       d.authors, d.source,
                       c.final_primary, c.final_secondary, c.final_tertiary,
                       c.final_reasoning, c.status,
-                      gpt.primary_code AS gpt_primary, gpt.reasoning AS gpt_reasoning,
-                      claude.primary_code AS claude_primary, claude.reasoning AS claude_reasoning
+                      c.gpt_primary, gpt.reasoning AS gpt_reasoning,
+                      c.claude_primary, claude.reasoning AS claude_reasoning
                FROM classifications c
                JOIN documents d ON c.serial_number = d.serial_number
                LEFT JOIN ai_results gpt ON c.serial_number = gpt.serial_number AND gpt.model_name = 'gpt'
@@ -48,17 +49,24 @@ async def list_disagreements():
     return {"count": len(items), "items": items}
 
 
+@router.get("/pending")
+async def list_disagreements():
+    """List all documents where GPT and Claude disagreed."""
+    return await aio.run(_list_disagreements)
+
+
 @router.post("/resolve")
 async def resolve_disagreement(request: ReviewRequest):
     """Human review: finalize classification for a disagreed document."""
+    codes = valid_codes()
     for code in [request.primary, request.secondary, request.tertiary]:
-        if code not in VALID_CODES:
+        if code not in codes:
             raise HTTPException(
                 status_code=400,
-                detail=f"Invalid class code {code}. Valid: {sorted(VALID_CODES)}"
+                detail=f"Invalid class code {code}. Valid: {sorted(codes)}"
             )
 
-    existing = db.get_classification(request.serial_number)
+    existing = await aio.get_classification(request.serial_number)
     if not existing:
         raise HTTPException(status_code=404, detail="Classification not found")
     if existing["status"] not in ("disagreed", "pending"):
@@ -79,7 +87,8 @@ async def resolve_disagreement(request: ReviewRequest):
         # If neither matches, correct_model stays None (human chose different classification)
 
     note = request.note or "Human reviewed"
-    db.finalize_classification(
+    # Goes through the single writer so it never contends with a running pipeline
+    await get_writer().write(lambda conn: db.finalize_classification(
         request.serial_number,
         request.primary,
         request.secondary,
@@ -87,6 +96,9 @@ async def resolve_disagreement(request: ReviewRequest):
         note,
         "human_reviewed",
         correct_model,
-    )
+        conn=conn,
+    ))
+    # Near-duplicates that reused this document's labels follow the human decision
+    await aio.run(propagate_labels, [request.serial_number])
 
     return {"status": "resolved", "serial_number": request.serial_number, "correct_model": correct_model}
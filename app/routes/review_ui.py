@@ -1,8 +1,11 @@
+from typing import Optional
+
 from fastapi import APIRouter
 
 from app import db
+from app.db import aio
 from app.db.connection import transaction
-from app.taxonomy import TAXONOMY
+from app.taxonomy import classes
 
 router = APIRouter(tags=["review-ui"])
 
@@ -11,22 +14,25 @@ router = APIRouter(tags=["review-ui"])
 async def taxonomy_json():
     """Return taxonomy as JSON for the UI."""
     return {str(k): {"code": v.code, "category": v.major_category, "description": v.description}
-            for k, v in TAXONOMY.items()}
+            for k, v in classes().items()}
 
 
-@router.get("/review/ui/stats")
-async def review_stats():
-    """Return review progress stats and AI accuracy tracking."""
-    with transaction() as conn:
-        agreed = conn.execute("SELECT COUNT(1) FROM classifications WHERE status='agreed'").fetchone()[0]
-        disagreed = conn.execute("SELECT COUNT(1) FROM classifications WHERE status='disagreed'").fetchone()[0]
-        reviewed = conn.execute("SELECT COUNT(1) FROM classifications WHERE status='human_reviewed'").fetchone()[0]
-        
-        # AI accuracy tracking
-        gpt_correct = conn.execute("SELECT COUNT(1) FROM classifications WHERE correct_model='gpt-4o'").fetchone()[0]
-        claude_correct = conn.execute("SELECT COUNT(1) FROM classifications WHERE correct_model='claude-sonnet'").fetchone()[0]
-        neither_correct = conn.execute("SELECT COUNT(1) FROM classifications WHERE status='human_reviewed' AND correct_model IS NULL").fetchone()[0]
+def _review_stats():
+    with transaction(readonly=True) as conn:
+        statuses = db.get_status_counts(conn=conn)
+        agreed = statuses.get("agreed", 0)
+        disagreed = statuses.get("disagreed", 0)
+        reviewed = statuses.get("human_reviewed", 0)
         
+        # AI accuracy tracking: correct_model is only set by human review
+        by_model = {r[0]: r[1] for r in conn.execute(
+            """SELECT correct_model, COUNT(1) FROM classifications
+               WHERE status='human_reviewed' GROUP BY correct_model"""
+        )}
+    gpt_correct = by_model.get("gpt-4o", 0)
+    claude_correct = by_model.get("claude-sonnet", 0)
+    neither_correct = by_model.get(None, 0)
+
     total_reviewed = gpt_correct + claude_correct + neither_correct
     return {
         "agreed": agreed, 
@@ -43,37 +49,59 @@ async def review_stats():
     }
 
 
-@router.get("/review/ui/next")
-async def next_disagreement(offset: int = 0):
-    """Get the next unreviewed disagreement."""
-    with transaction() as conn:
-        row = conn.execute(
-            "SELECT serial_number FROM classifications WHERE status='disagreed' LIMIT 1 OFFSET ?",
-            (offset,)
-        ).fetchone()
+@router.get("/review/ui/stats")
+async def review_stats():
+    """Return review progress stats and AI accuracy tracking."""
+    return await aio.run(_review_stats)
+
+
+def _next_disagreement(offset: int = 0, after: Optional[str] = None):
+    with transaction(readonly=True) as conn:
+        if after is not None:
+            row = conn.execute(
+                """SELECT serial_number FROM classifications
+                   WHERE status='disagreed' AND serial_number > ?
+                   ORDER BY serial_number LIMIT 1""",
+                (after,)
+            ).fetchone()
+        else:
+            row = conn.execute(
+                """SELECT serial_number FROM classifications
+                   WHERE status='disagreed' ORDER BY serial_number LIMIT 1 OFFSET ?""",
+                (offset,)
+            ).fetchone()
+        remaining = db.get_status_counts(conn=conn).get("disagreed", 0)
     if not row:
         return {"done": True}
     serial = row["serial_number"]
     doc = db.get_document(serial)
     classification = db.get_classification(serial)
-    remaining = db.get_classifications_by_status("disagreed")
-    return {"done": False, "document": doc, "classification": classification, "remaining": len(remaining)}
+    return {"done": False, "document": doc, "classification": classification, "remaining": remaining}
 
 
-@router.get("/review/ui/reviewed")
-async def list_human_reviewed():
-    """Return all human-reviewed documents with which AI was correct."""
-    with transaction() as conn:
+@router.get("/review/ui/next")
+async def next_disagreement(offset: int = 0, after: Optional[str] = None):
+    """
+    Get the next unreviewed disagreement. Pass the serial number of the one
+    being skipped as `after` to move past it.
+    """
+    return await aio.run(_next_disagreement, offset, after)
+
+
+def _list_human_reviewed():
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
             """SELECT c.serial_number, c.final_primary, c.correct_model, c.final_reasoning,
-                      d.doc_type, d.title, d.year,
-                      gpt.primary_code AS gpt_primary,
-                      claude.primary_code AS claude_primary
+                      d.doc_type, d.title, d.year, c.gpt_primary, c.claude_primary
                FROM classifications c
                JOIN documents d ON c.serial_number = d.serial_number
-               LEFT JOIN ai_results gpt ON c.serial_number = gpt.serial_number AND gpt.model_name = 'gpt'
-               LEFT JOIN ai_results claude ON c.serial_number = claude.serial_number AND claude.model_name = 'claude'
                WHERE c.status = 'human_reviewed'
                ORDER BY c.serial_number"""
         ).fetchall()
     return {"count": len(rows), "items": [dict(r) for r in rows]}
+
+
+@router.get("/review/ui/reviewed")
+async def list_human_reviewed():
+    """Return all human-reviewed documents with which AI was correct."""
+    return await aio.run(_list_human_reviewed)
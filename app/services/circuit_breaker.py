@@ -0,0 +1,85 @@
+"""
+Per-provider circuit breaker.
+
+After `failure_threshold` consecutive provider failures the circuit opens
+and calls to that provider are skipped for `cooldown_seconds`. The first
+call after the cool-down is a trial (half-open): success closes the
+circuit, failure re-opens it for another cool-down. Only one trial is in
+flight at a time; other callers are refused until it resolves.
+"""
+import logging
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, cooldown_seconds: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if self._clock() - self._opened_at >= self._cooldown:
+            return HALF_OPEN
+        return OPEN
+
+    def available(self) -> bool:
+        """True if allow() would let a call through now; claims nothing."""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self._trial_in_flight)
+
+    def allow(self) -> bool:
+        """
+        True if a call may be made now: always when closed; when half-open,
+        only for the one caller that claims the trial. The caller must then
+        report the outcome (record_success/record_failure, or release).
+        """
+        if not self.available():
+            return False
+        if self.state == HALF_OPEN:
+            self._trial_in_flight = True
+        return True
+
+    def release(self):
+        """Give back a claimed trial whose call says nothing about the provider's health."""
+        self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit allows a trial call (0 if not open)."""
+        if self.state != OPEN:
+            return 0.0
+        return self._cooldown - (self._clock() - self._opened_at)
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info("Circuit %s closed: provider recovered", self.name)
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN or self._failures >= self._failure_threshold:
+            if self.state != OPEN:
+                logger.warning("Circuit %s opened after %d consecutive failures; pausing %.0fs",
+                               self.name, self._failures, self._cooldown)
+            self._opened_at = self._clock()
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._failures,
+                "retry_after": round(self.retry_after(), 1)}
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import logging
 from abc import ABC, abstractmethod
@@ -5,7 +6,7 @@ from abc import ABC, abstractmethod
 from openai import AsyncOpenAI
 from anthropic import AsyncAnthropic
 
-from app.taxonomy import format_taxonomy_for_prompt, VALID_CODES
+from app.taxonomy import format_taxonomy_for_prompt, valid_codes
 
 logger = logging.getLogger(__name__)
 
@@ -39,10 +40,18 @@ Respond ONLY with valid JSON in this exact format:
 """
 
 
+# Stamped on every ai_results row so prompt edits can be re-run incrementally
+PROMPT_VERSION = hashlib.sha256(CLASSIFICATION_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+
 class ClassificationError(Exception):
     """Raised when an AI classification call fails."""
 
 
+class ProviderError(ClassificationError):
+    """Raised when the provider API itself fails (as opposed to a bad answer)."""
+
+
 def parse_response(raw: str, model_name: str) -> dict:
     text = raw.strip()
     if text.startswith("```"):
@@ -63,11 +72,12 @@ def parse_response(raw: str, model_name: str) -> dict:
     tertiary = int(data["tertiary"])
 
     # Validate codes
+    codes = valid_codes()
     for code in [primary, secondary, tertiary]:
-        if code not in VALID_CODES:
+        if code not in codes:
             raise ClassificationError(
                 f"Model '{model_name}' returned invalid class code {code}. "
-                f"Valid codes: {sorted(VALID_CODES)}"
+                f"Valid codes: {sorted(codes)}"
             )
 
     return {
@@ -79,6 +89,11 @@ def parse_response(raw: str, model_name: str) -> dict:
 
 
 class BaseClassifier(ABC):
+    @property
+    def model_id(self) -> str:
+        """Provider model identifier, e.g. 'gpt-4o'."""
+        return getattr(self, "_model", type(self).__name__)
+
     @abstractmethod
     async def classify(self, abstract: str) -> dict:
         ...
@@ -106,7 +121,7 @@ class GPTClassifier(BaseClassifier):
             raw = response.choices[0].message.content
         except Exception as e:
             logger.error("GPT call failed: %s", e)
-            raise ClassificationError(f"GPT API call failed: {e}") from e
+            raise ProviderError(f"GPT API call failed: {e}") from e
 
         return parse_response(raw, self._model)
 
@@ -134,6 +149,6 @@ class ClaudeClassifier(BaseClassifier):
             raw = response.content[0].text
         except Exception as e:
             logger.error("Claude call failed: %s", e)
-            raise ClassificationError(f"Claude API call failed: {e}") from e
+            raise ProviderError(f"Claude API call failed: {e}") from e
 
         return parse_response(raw, self._model)
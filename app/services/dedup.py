@@ -0,0 +1,257 @@
+"""
+Near-duplicate abstract detection with MinHash / LSH.
+
+Patent exports contain family members and republications whose abstracts
+are nearly identical. The index groups documents of the same doc_type whose
+estimated Jaccard similarity over word shingles is above a threshold. The
+pipeline then classifies one representative per group and copies its
+labels to the other members, marking them with `propagated_from`.
+"""
+import logging
+import re
+import zlib
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+
+from app.config import settings
+from app.db.connection import transaction
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 3
+NUM_PERM = 128
+LSH_BANDS = 16  # 16 bands x 8 rows: candidate pairs start around 0.7 similarity
+SEED = 1
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _permutations() -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.RandomState(SEED)
+    a = rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+    b = rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+    return a, b
+
+
+_PERM_A, _PERM_B = _permutations()
+
+
+def shingles(text: str, k: int = SHINGLE_SIZE) -> set[str]:
+    """Lower-cased word k-grams; short texts fall back to the whole token string."""
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) < k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    """NUM_PERM-long MinHash signature of the text's shingles."""
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles(text)), dtype=np.uint64
+    )
+    if hashes.size == 0:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint64)
+    # Universal hashing (a*x + b) mod p, vectorized over all permutations at once
+    permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=1)
+
+
+def estimated_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+class _UnionFind:
+    def __init__(self):
+        self._parent: dict[str, str] = {}
+
+    def find(self, x: str) -> str:
+        self._parent.setdefault(x, x)
+        while self._parent[x] != x:
+            self._parent[x] = self._parent[self._parent[x]]
+            x = self._parent[x]
+        return x
+
+    def union(self, a: str, b: str):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self._parent[max(ra, rb)] = min(ra, rb)
+
+
+def find_duplicate_groups(docs: list[dict], threshold: float) -> list[dict]:
+    """
+    Group near-duplicate documents.
+    Returns [{serial_number, group_id, similarity}] for members of groups of 2+,
+    where similarity is the member's best verified match inside the group.
+    """
+    signatures = {d["serial_number"]: minhash(d["abstract"]) for d in docs}
+    doc_types = {d["serial_number"]: d["doc_type"] for d in docs}
+    rows_per_band = NUM_PERM // LSH_BANDS
+
+    buckets = defaultdict(list)
+    for serial, sig in signatures.items():
+        for band in range(LSH_BANDS):
+            chunk = sig[band * rows_per_band:(band + 1) * rows_per_band]
+            buckets[(doc_types[serial], band, chunk.tobytes())].append(serial)
+
+    uf = _UnionFind()
+    best = {}
+    checked = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                pair = (a, b) if a < b else (b, a)
+                if pair in checked:
+                    continue
+                checked.add(pair)
+                sim = estimated_jaccard(signatures[a], signatures[b])
+                if sim >= threshold:
+                    uf.union(a, b)
+                    best[a] = max(best.get(a, 0.0), sim)
+                    best[b] = max(best.get(b, 0.0), sim)
+
+    return [
+        {"serial_number": serial, "group_id": uf.find(serial), "similarity": round(sim, 4)}
+        for serial, sim in sorted(best.items())
+    ]
+
+
+def build_duplicate_index(threshold: Optional[float] = None) -> dict:
+    """
+    Rebuild duplicate_groups over all documents with an abstract.
+    The representative of each group is an already classified member if
+    there is one, otherwise the lowest serial number. Labels are then
+    propagated to members that have none yet.
+    """
+    if threshold is None:
+        threshold = settings.dedup_threshold
+
+    with transaction() as conn:
+        docs = [dict(r) for r in conn.execute(
+            """SELECT d.serial_number, d.doc_type, d.abstract,
+                      c.serial_number IS NOT NULL AND c.propagated_from IS NULL AS own_label
+               FROM documents d
+               LEFT JOIN classifications c ON d.serial_number = c.serial_number
+               WHERE d.abstract IS NOT NULL AND d.abstract != ''"""
+        ).fetchall()]
+
+    members = find_duplicate_groups(docs, threshold)
+    labelled = {d["serial_number"] for d in docs if d["own_label"]}
+
+    groups = defaultdict(list)
+    for m in members:
+        groups[m["group_id"]].append(m["serial_number"])
+    representative = {}
+    for group_id, serials in groups.items():
+        rep = min(serials, key=lambda s: (s not in labelled, s))
+        for s in serials:
+            representative[s] = rep
+
+    with transaction() as conn:
+        conn.execute("DELETE FROM duplicate_groups")
+        conn.executemany(
+            "INSERT INTO duplicate_groups (serial_number, representative, similarity) VALUES (?, ?, ?)",
+            [(m["serial_number"], representative[m["serial_number"]], m["similarity"]) for m in members],
+        )
+        # Members whose group changed go back to the queue
+        conn.execute(
+            """DELETE FROM classifications
+               WHERE propagated_from IS NOT NULL
+                 AND NOT EXISTS (
+                     SELECT 1 FROM duplicate_groups g
+                     WHERE g.serial_number = classifications.serial_number
+                       AND g.representative = classifications.propagated_from
+                 )"""
+        )
+
+    propagated = propagate_labels()
+    result = {
+        "documents": len(docs),
+        "groups": len(groups),
+        "duplicates": len(members) - len(groups),
+        "propagated": propagated,
+        "threshold": threshold,
+    }
+    logger.info("Duplicate index built: %s", result)
+    return result
+
+
+def propagate_labels(representatives: Optional[list[str]] = None) -> int:
+    """
+    Copy each finalized (agreed or human-reviewed) representative's
+    classification to its group members, so disagreements are reviewed once.
+    Members with their own (non-propagated) classification are left alone,
+    and members already in sync are not rewritten.
+    Returns the number of member rows written.
+    """
+    query = """SELECT g.serial_number AS member, g.representative,
+                      c.final_primary, c.final_secondary, c.final_tertiary,
+                      c.final_reasoning, c.status, c.correct_model
+               FROM duplicate_groups g
+               JOIN classifications c ON c.serial_number = g.representative
+               LEFT JOIN classifications m ON m.serial_number = g.serial_number
+               WHERE g.serial_number != g.representative
+                 AND c.status IN ('agreed', 'human_reviewed')
+                 AND (m.serial_number IS NULL OR (
+                      m.propagated_from IS NOT NULL AND (
+                          m.propagated_from IS NOT g.representative
+                          OR m.status IS NOT c.status
+                          OR m.final_primary IS NOT c.final_primary
+                          OR m.final_secondary IS NOT c.final_secondary
+                          OR m.final_tertiary IS NOT c.final_tertiary)))"""
+    params: list = []
+    if representatives is not None:
+        if not representatives:
+            return 0
+        query += f" AND g.representative IN ({','.join('?' * len(representatives))})"
+        params.extend(representatives)
+
+    with transaction() as conn:
+        rows = conn.execute(query, params).fetchall()
+        conn.executemany(
+            """INSERT OR REPLACE INTO classifications
+               (serial_number, final_primary, final_secondary, final_tertiary,
+                final_reasoning, status, correct_model, propagated_from)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(r["member"], r["final_primary"], r["final_secondary"], r["final_tertiary"],
+              f"Propagated from near-duplicate {r['representative']}. {r['final_reasoning'] or ''}".strip(),
+              r["status"], r["correct_model"], r["representative"]) for r in rows],
+        )
+    if rows:
+        logger.info("Propagated labels to %d near-duplicate documents", len(rows))
+    return len(rows)
+
+
+def dedup_report() -> dict:
+    """How many documents are grouped and how many provider calls label reuse saved."""
+    with transaction() as conn:
+        groups = conn.execute(
+            "SELECT COUNT(DISTINCT representative) FROM duplicate_groups"
+        ).fetchone()[0]
+        grouped = conn.execute("SELECT COUNT(*) FROM duplicate_groups").fetchone()[0]
+        propagated = conn.execute(
+            "SELECT COUNT(*) FROM classifications WHERE propagated_from IS NOT NULL"
+        ).fetchone()[0]
+        by_doc_type = conn.execute(
+            """SELECT d.doc_type, COUNT(*) AS cnt
+               FROM duplicate_groups g JOIN documents d ON g.serial_number = d.serial_number
+               WHERE g.serial_number != g.representative
+               GROUP BY d.doc_type"""
+        ).fetchall()
+
+    duplicates = grouped - groups
+    return {
+        "groups": groups,
+        "documents_in_groups": grouped,
+        "duplicates": duplicates,
+        "duplicates_by_doc_type": {r["doc_type"]: r["cnt"] for r in by_doc_type},
+        "propagated": propagated,
+        "awaiting_representative": duplicates - propagated,
+        # Each propagated document skipped one GPT and one Claude call
+        "provider_calls_saved": 2 * propagated,
+    }
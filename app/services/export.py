@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 from pathlib import Path
@@ -6,6 +5,7 @@ from pathlib import Path
 import pandas as pd
 
 from app.db.connection import transaction
+from app.db.documents import unpack_original
 from app.services.gap_analysis import gap_summary, gap_by_five_year_periods
 from app.taxonomy import get_class_description
 
@@ -20,16 +20,14 @@ def _ensure_output_dir():
 
 def _fetch_classified_rows(doc_type: str) -> list:
     """Shared query for fetching classified documents by type."""
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
-            """SELECT d.serial_number, d.year, d.title, d.original_data,
+            """SELECT d.serial_number, d.year, d.title, raw.data AS original_data,
                       c.final_primary, c.final_secondary, c.final_tertiary,
-                      c.final_reasoning, c.status,
-                      gpt.primary_code AS gpt_primary, claude.primary_code AS claude_primary
+                      c.final_reasoning, c.status, c.gpt_primary, c.claude_primary
                FROM documents d
                JOIN classifications c ON d.serial_number = c.serial_number
-               LEFT JOIN ai_results gpt ON d.serial_number = gpt.serial_number AND gpt.model_name = 'gpt'
-               LEFT JOIN ai_results claude ON d.serial_number = claude.serial_number AND claude.model_name = 'claude'
+               LEFT JOIN document_raw raw ON d.serial_number = raw.serial_number
                WHERE d.doc_type = ? AND c.status IN ('agreed', 'human_reviewed')
                ORDER BY d.year, c.final_primary, c.final_secondary, c.final_tertiary""",
             (doc_type,)
@@ -64,7 +62,7 @@ def _export_rows(rows: list, filepath: str, label: str) -> str:
     records = []
     for row in rows:
         row = dict(row)
-        original = json.loads(row["original_data"])
+        original = unpack_original(row["original_data"])
 
         record = {
             "Serial Number": row["serial_number"],
@@ -96,7 +94,7 @@ def _export_rows(rows: list, filepath: str, label: str) -> str:
 
 
 def export_gap_analysis(filepath: str = None) -> str:
-    """Export gap analysis as CSV."""
+    """Export gap analysis as CSV, with the 5-year period breakdown beside it."""
     _ensure_output_dir()
     if filepath is None:
         filepath = os.path.join(OUTPUT_DIR, "gap_analysis.csv")
@@ -106,7 +104,7 @@ def export_gap_analysis(filepath: str = None) -> str:
     df.to_csv(filepath, index=False, encoding="utf-8-sig")
 
     # Also export 5-year period breakdown
-    periods_path = os.path.join(OUTPUT_DIR, "gap_by_5year_periods.csv")
+    periods_path = os.path.join(os.path.dirname(filepath), "gap_by_5year_periods.csv")
     periods = gap_by_five_year_periods()
     if periods:
         pd.DataFrame(periods).to_csv(periods_path, index=False, encoding="utf-8-sig")
@@ -122,7 +120,7 @@ def export_patent_paper_links(filepath: str = None) -> str:
     if filepath is None:
         filepath = os.path.join(OUTPUT_DIR, "patent_paper_links.csv")
 
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
             """SELECT l.patent_serial, l.paper_serial, l.similarity_score,
                       dp.title AS patent_title, dp.year AS patent_year,
@@ -147,7 +145,7 @@ def export_assignee_crossrefs(filepath: str = None) -> str:
     if filepath is None:
         filepath = os.path.join(OUTPUT_DIR, "assignee_crossrefs.csv")
 
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
             """SELECT a.patent_serial, a.paper_serial, a.matched_name,
                       dp.title AS patent_title, dp.year AS patent_year,
@@ -172,17 +170,13 @@ def export_disagreements(filepath: str = None) -> str:
     if filepath is None:
         filepath = os.path.join(OUTPUT_DIR, "disagreements.csv")
 
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         rows = conn.execute(
             """SELECT d.serial_number, d.doc_type, d.year, d.title, d.abstract,
                       d.authors, d.source,
-                      gpt.primary_code AS gpt_primary,
-                      gpt.secondary_code AS gpt_secondary,
-                      gpt.tertiary_code AS gpt_tertiary,
+                      c.gpt_primary, c.gpt_secondary, c.gpt_tertiary,
                       gpt.reasoning AS gpt_reasoning,
-                      claude.primary_code AS claude_primary,
-                      claude.secondary_code AS claude_secondary,
-                      claude.tertiary_code AS claude_tertiary,
+                      c.claude_primary, c.claude_secondary, c.claude_tertiary,
                       claude.reasoning AS claude_reasoning
                FROM documents d
                JOIN classifications c ON d.serial_number = c.serial_number
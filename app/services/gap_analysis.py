@@ -1,8 +1,10 @@
 import logging
 from collections import defaultdict
 
-from app.db.connection import transaction
-from app.taxonomy import TAXONOMY, get_class_description
+from app import db
+from app.db import analytics
+from app.db.cache import cached
+from app.taxonomy import classes, get_class_description
 
 logger = logging.getLogger(__name__)
 
@@ -22,16 +24,7 @@ def paper_class_frequency_by_year() -> dict:
 
 def _class_frequency_by_year(doc_type: str) -> dict:
     """Shared implementation for class frequency by year."""
-    with transaction() as conn:
-        rows = conn.execute(
-            """SELECT d.year, c.final_primary, COUNT(*) as cnt
-               FROM documents d
-               JOIN classifications c ON d.serial_number = c.serial_number
-               WHERE d.doc_type = ? AND c.status IN ('agreed', 'human_reviewed')
-               GROUP BY d.year, c.final_primary
-               ORDER BY d.year, c.final_primary""",
-            (doc_type,)
-        ).fetchall()
+    rows = analytics.class_counts_by_year(doc_type)
 
     result = defaultdict(lambda: defaultdict(int))
     for row in rows:
@@ -41,6 +34,7 @@ def _class_frequency_by_year(doc_type: str) -> dict:
     return dict(result)
 
 
+@cached
 def gap_summary() -> dict:
     """
     Consolidated gap analysis:
@@ -48,14 +42,7 @@ def gap_summary() -> dict:
     - Which classes have NO patents
     - Totals per class per doc_type
     """
-    with transaction() as conn:
-        rows = conn.execute(
-            """SELECT d.doc_type, c.final_primary, COUNT(*) as cnt
-               FROM documents d
-               JOIN classifications c ON d.serial_number = c.serial_number
-               WHERE c.status IN ('agreed', 'human_reviewed')
-               GROUP BY d.doc_type, c.final_primary"""
-        ).fetchall()
+    rows = db.get_class_counts()
 
     paper_counts = {}
     patent_counts = {}
@@ -67,7 +54,7 @@ def gap_summary() -> dict:
             patent_counts[code] = row["cnt"]
 
     gaps = []
-    for code in sorted(TAXONOMY.keys()):
+    for code in sorted(classes().keys()):
         papers = paper_counts.get(code, 0)
         patents = patent_counts.get(code, 0)
         gap_type = "none"
@@ -97,6 +84,7 @@ def gap_summary() -> dict:
     }
 
 
+@cached
 def gap_by_five_year_periods() -> list[dict]:
     """
     Gap analysis consolidated by 5-year periods as mentioned in the assignment.
@@ -122,7 +110,7 @@ def gap_by_five_year_periods() -> list[dict]:
         end = start + 4
         period_label = f"{start}-{end}"
 
-        for code in sorted(TAXONOMY.keys()):
+        for code in sorted(classes().keys()):
             paper_total = 0
             patent_total = 0
             for y in range(start, end + 1):
@@ -1,11 +1,23 @@
+import hashlib
+import json
 import logging
-from dataclasses import dataclass
-from typing import Optional
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Callable, Iterator, Optional
 
+import numpy as np
 import pandas as pd
 
 from app import db
-from app.db.connection import transaction
+from app.config import settings
+from app.corpus import current_corpus
+from app.db.connection import current_db_path, tuned_transaction, using_db
+from app.services.dedup import build_duplicate_index
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +51,16 @@ PATENT_MAPPING = CsvMapping(
     source_column="Display Key",
 )
 
+MAPPINGS = {"paper": PAPER_MAPPING, "patent": PATENT_MAPPING}
+
+
+def mapping_for(doc_type: str) -> CsvMapping:
+    """The current corpus's mapping for `doc_type`: the default one with its overrides applied."""
+    overrides = current_corpus().mappings.get(doc_type, {})
+    if doc_type in MAPPINGS:
+        return replace(MAPPINGS[doc_type], **overrides)
+    return CsvMapping(doc_type=doc_type, **overrides)
+
 
 def _clean_str(val) -> Optional[str]:
     if pd.isna(val):
@@ -56,77 +78,350 @@ def _clean_int(val) -> Optional[int]:
         return None
 
 
-def import_csv(csv_path: str, mapping: CsvMapping) -> dict:
-    """Generic CSV import using a column mapping."""
-    df = pd.read_csv(csv_path)
-    logger.info("Loading %ss from %s (%d rows)", mapping.doc_type, csv_path, len(df))
+def _str_column(chunk: pd.DataFrame, column: str) -> pd.Series:
+    """Vectorized _clean_str of one column (all None if the column is missing)."""
+    if column not in chunk:
+        return pd.Series(None, index=chunk.index, dtype=object)
+    values = chunk[column].str.strip()
+    blank = values.isna() | (values == "") | (values.str.lower() == "nan")
+    return values.astype(object).where(~blank, None)
+
+
+def _int_column(chunk: pd.DataFrame, column: str) -> pd.Series:
+    """Vectorized _clean_int of one column."""
+    if column not in chunk:
+        return pd.Series(None, index=chunk.index, dtype=object)
+    values = pd.to_numeric(chunk[column], errors="coerce")
+    values = np.trunc(values.where(np.isfinite(values)))
+    return values.astype("Int64").astype(object).where(values.notna(), None)
+
+
+def mapping_hash(mapping: CsvMapping) -> str:
+    """Short hash of a mapping: rows imported under another mapping count as changed."""
+    return hashlib.sha256(json.dumps(asdict(mapping), sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _row_fields(rows: pd.DataFrame, mapping: CsvMapping) -> list[tuple]:
+    """Document fields of each row: (doc_type, title, abstract, year, authors, source, original row)."""
+    authors = _str_column(rows, mapping.authors_column).str.split(mapping.authors_delimiter, regex=False)
+    columns = list(rows.columns)
+    originals = (dict(zip(columns, values)) for values in
+                 rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None))
+    return [
+        (mapping.doc_type, t, a, year,
+         [name.strip() for name in names if name.strip()] if isinstance(names, list) else [],
+         source, original)
+        for t, a, year, names, source, original in zip(
+            _str_column(rows, "Title"), _str_column(rows, "Abstract"), _int_column(rows, mapping.year_column),
+            authors, _str_column(rows, mapping.source_column), originals,
+        )
+    ]
+
+
+def _parse_chunk(chunk: pd.DataFrame, mapping: CsvMapping, db_path: str, source_file: str) -> tuple[list, list]:
+    """
+    Clean one chunk; runs in an import worker process. Returns the chunk's
+    importable rows, i.e. rows with a title and an abstract whose title
+    does not appear earlier in the chunk, as (index, normalized title,
+    serial or None, row hash, document fields). Also returns the other rows
+    as (index, reason). Rows that `db_path` already holds with the same
+    hash from `source_file` get None instead of fields, which saves building them.
+    """
+    title = _str_column(chunk, "Title")
+    abstract = _str_column(chunk, "Abstract")
+    norm_title = title.str.lower()
+    keep = title.notna() & abstract.notna()
+    # Only rows that would be imported claim their title
+    keep &= ~norm_title.where(keep).duplicated()
+    kept = chunk[keep]
+    reasons = np.select([title.isna(), abstract.isna()], ["missing title", "missing abstract"], "duplicate title")
+    rejected = list(zip(chunk.index[~keep], reasons[~keep]))
+
+    raw_serial = _str_column(kept, "#")
+    serials = (mapping.serial_prefix + raw_serial).where(raw_serial.notna(), None)
+    # Vectorized 64-bit hash of every source column, keyed by the mapping
+    hashes = pd.util.hash_pandas_object(kept, index=False, hash_key=mapping_hash(mapping)).map("{:016x}".format)
+    with using_db(db_path):
+        stored = db.get_row_hashes(serials.dropna().tolist())
+    own = {serial: row_hash for serial, (row_hash, stored_file) in stored.items()
+           if stored_file in (source_file, None)}
+    changed = serials.isna() | (serials.map(own).fillna("") != hashes)
+
+    built = iter(_row_fields(kept[changed], mapping))
+    fields = [next(built) if row_changed else None for row_changed in changed]
+    return list(zip(kept.index, norm_title[keep], serials, hashes, fields)), rejected
+
+
+def _select_rows(parsed: list, chunk: pd.DataFrame, mapping: CsvMapping, seen_titles: set, position: int,
+                 source_file: str, later_files: set, conn) -> tuple[list, list]:
+    """
+    The upsert_documents rows of a parsed chunk. Rows whose title appeared in
+    an earlier chunk of the file are dropped, and their indexes returned as
+    well. Rows without a serial are numbered from `position`, the count of
+    rows the file kept before this chunk. Rows whose source row has not
+    changed since `source_file` last wrote them are left out. So are rows last
+    written from one of `later_files`, which this import reads afterwards.
+    Files may number rows alike, and the later file wins, as it would in a
+    full re-import.
+    """
+    candidates = []
+    duplicates = []
+    for index, norm_title, serial, row_hash, fields in parsed:
+        if norm_title in seen_titles:
+            duplicates.append(index)
+            continue
+        seen_titles.add(norm_title)
+        serial = serial or f"{mapping.serial_prefix}_auto_{position + len(candidates)}"
+        candidates.append((index, serial, row_hash, fields))
+    stored = db.get_row_hashes([serial for _, serial, _, _ in candidates], conn=conn)
+
+    def unchanged(serial: str, row_hash: str) -> bool:
+        stored_hash, stored_file = stored.get(serial, (None, None))
+        if stored_file in later_files:
+            return True
+        # Only a hash from this file counts (or one recorded before files were)
+        return stored_file in (source_file, None) and stored_hash == row_hash
+
+    changed = [candidate for candidate in candidates if not unchanged(candidate[1], candidate[2])]
+
+    # The worker skipped fields of rows it found unchanged, but an earlier chunk of this
+    # import may have rewritten the same serial since
+    missing = [index for index, _, _, fields in changed if fields is None]
+    rebuilt = dict(zip(missing, _row_fields(chunk.loc[missing], mapping))) if missing else {}
+    rows = [(serial, *(fields or rebuilt[index]), row_hash, source_file)
+            for index, serial, row_hash, fields in changed]
+    return rows, duplicates
+
+
+def _rejections(chunk: pd.DataFrame, rejected: list) -> list[tuple]:
+    """(row, "#", title, reason) of each rejected (index, reason); rows are numbered from 1 below the header."""
+    missing = pd.Series(None, index=chunk.index, dtype=object)
+    serials, titles = chunk.get("#", missing), chunk.get("Title", missing)
+    return [(int(index) + 1, _clean_str(serials[index]), _clean_str(titles[index]), str(reason))
+            for index, reason in sorted(rejected)]
 
-    imported = 0
-    skipped = 0
-    seen_titles = set()
 
-    with transaction() as conn:
-        for _, row in df.iterrows():
-            title = _clean_str(row.get("Title"))
-            abstract = _clean_str(row.get("Abstract"))
+@contextmanager
+def _parse_pool(workers: int) -> Iterator[Callable[..., Future]]:
+    """submit() of a pool of `workers` processes, or one that runs calls inline for a single worker."""
+    if workers <= 1:
+        def submit(fn, *args) -> Future:
+            future = Future()
+            future.set_result(fn(*args))
+            return future
 
-            if not title or not abstract:
-                skipped += 1
+        yield submit
+        return
+    # spawn, not fork: the server process has threads (writer, maintenance, aio executor)
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        yield pool.submit
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+@dataclass
+class _FileImport:
+    """State of one file during import_files()."""
+    csv_path: str
+    mapping: CsvMapping
+    summary: dict
+    source: str = ""
+    stat: Optional[os.stat_result] = None
+    # The file's ledger entry, if it was last imported under the same mapping
+    entry: Optional[dict] = None
+    hashing: Optional[Future] = None
+    sha256: Optional[str] = None
+    seen_titles: set = field(default_factory=set)
+    position: int = 0
+    ledger: bool = True
+
+    def record(self, rows: int):
+        """Record the file in the import ledger with `rows` importable rows."""
+        if not self.ledger:
+            return
+        db.record_import(self.source, self.mapping.doc_type, self.sha256, self.stat.st_size, self.stat.st_mtime,
+                         mapping_hash(self.mapping), rows)
+
+    def finish(self):
+        self.summary["imported"] = self.summary["inserted"] + self.summary["updated"]
+        self.record(self.position)
+        logger.info("%s import: %s", self.mapping.doc_type.capitalize(), self.summary)
+
+
+def import_csv(csv_path: str, mapping: CsvMapping, chunk_rows: Optional[int] = None,
+               force: bool = False, workers: Optional[int] = None) -> dict:
+    """
+    Generic CSV import using a column mapping. The file is streamed in chunks of
+    `chunk_rows` rows (default IMPORT_CHUNK_ROWS), each cleaned column-wise and
+    written with executemany in its own bulk_load transaction, so memory stays
+    flat however large the export is. Rows without a title or abstract, and
+    repeated titles (case-insensitive, across the whole file), are skipped.
+
+    Imports are idempotent. The import ledger keeps each file's size, mtime
+    and SHA-256: a file that has not changed since its last import (under the
+    same mapping) is not read at all, unless `force`. In a changed file only
+    rows whose content hash differs from the one stored when this file last
+    wrote them are written; existing documents are updated in place, and a
+    changed abstract flags the document's AI results for re-classification
+    (see services.reclassify).
+    Chunks are parsed on `workers` processes; see import_files().
+    """
+    return import_files([(csv_path, mapping)], chunk_rows=chunk_rows, force=force, workers=workers)[0]
+
+
+def import_files(files: list[tuple[str, CsvMapping]], chunk_rows: Optional[int] = None,
+                 force: bool = False, workers: Optional[int] = None,
+                 progress: Optional[Callable[[int, dict, list], None]] = None,
+                 record_ledger: bool = True) -> list[dict]:
+    """
+    Import several CSV files with the same result as calling import_csv() on
+    each in turn, and return one summary per file.
+
+    Parsing and cleaning are CPU-bound, so they run on a pool of `workers`
+    processes (default IMPORT_WORKERS, 0 meaning one per CPU core). Each
+    file's content hash is a separate task, and so is each chunk of every
+    file. Small files therefore parse side by side and large ones spread
+    over all workers. This process is the only writer. It takes parsed
+    chunks back in file and chunk order, whatever order the workers finish
+    in. It then applies the file-wide title dedup, numbers serials without
+    a "#", and commits each chunk with one executemany, so serials and
+    skipped rows are deterministic. At most two chunks per worker are in
+    flight, which keeps memory bounded.
+
+    After each chunk is committed, `progress` is called with the file's
+    position in `files`, its summary so far and the chunk's skipped rows
+    (see _rejections).
+
+    With `record_ledger=False` the files are neither checked against nor
+    recorded in the import ledger (for one-off files such as uploads).
+    """
+    chunk_rows = chunk_rows or settings.import_chunk_rows
+    workers = workers or settings.import_workers or os.cpu_count() or 1
+    jobs = [_FileImport(csv_path, mapping, {
+        "imported": 0, "inserted": 0, "updated": 0, "unchanged": 0, "abstract_changed": 0,
+        "skipped": 0, "chunks": 0, "source": csv_path, "file_unchanged": False,
+    }, ledger=record_ledger) for csv_path, mapping in files]
+
+    with _parse_pool(workers) as submit:
+        for job in jobs:
+            job.source = str(Path(job.csv_path).resolve())
+            job.stat = os.stat(job.csv_path)
+            if not record_ledger:
                 continue
+            entry = next(iter(db.get_import_ledger(job.source)), None)
+            if not force and entry is not None and entry["mapping_hash"] == mapping_hash(job.mapping):
+                job.entry = entry
+            if job.entry and (job.entry["size"], job.entry["mtime"]) == (job.stat.st_size, job.stat.st_mtime):
+                logger.info("%s is unchanged since its last import; skipping", job.csv_path)
+                job.summary.update(unchanged=job.entry["rows"], file_unchanged=True)
+            else:
+                job.hashing = submit(file_sha256, job.csv_path)
 
-            norm_title = title.strip().lower()
-            if norm_title in seen_titles:
-                skipped += 1
+        to_read = []
+        for job in jobs:
+            if job.summary["file_unchanged"]:
                 continue
-            seen_titles.add(norm_title)
-
-            raw_serial = row.get("#")
-            serial = (
-                f"{mapping.serial_prefix}{raw_serial}"
-                if pd.notna(raw_serial)
-                else f"{mapping.serial_prefix}_auto_{imported}"
-            )
-
-            authors_raw = _clean_str(row.get(mapping.authors_column))
-            authors = (
-                [a.strip() for a in authors_raw.split(mapping.authors_delimiter) if a.strip()]
-                if authors_raw else []
-            )
-
-            year = _clean_int(row.get(mapping.year_column))
-            source = _clean_str(row.get(mapping.source_column))
-            original_data = {col: (None if pd.isna(row[col]) else row[col]) for col in df.columns}
-
-            db.insert_document(
-                serial_number=serial,
-                doc_type=mapping.doc_type,
-                title=title,
-                abstract=abstract,
-                year=year,
-                authors=authors,
-                source=source,
-                original_data=original_data,
-                conn=conn,
-            )
-            imported += 1
-
-    summary = {"imported": imported, "skipped": skipped, "source": csv_path}
-    logger.info("%s import: %s", mapping.doc_type.capitalize(), summary)
-    return summary
-
-
-def import_all() -> dict:
+            if job.hashing is not None:
+                job.sha256 = job.hashing.result()
+            if job.entry and job.entry["sha256"] == job.sha256:
+                # Touched but identical: remember the new mtime so the next check is cheap
+                job.record(job.entry["rows"])
+                logger.info("%s has the same content as its last import; skipping", job.csv_path)
+                job.summary.update(unchanged=job.entry["rows"], file_unchanged=True)
+            else:
+                to_read.append(job)
+
+        # Files with the same serial prefix share serials, and the later file wins: once an
+        # earlier one is read, an unchanged later one is read too, to restore rows it wrote
+        read_prefixes = set()
+        for job in jobs:
+            prefix = job.mapping.serial_prefix
+            if not job.summary["file_unchanged"]:
+                read_prefixes.add(prefix)
+            elif prefix in read_prefixes:
+                logger.info("Re-reading %s after an earlier %s file changed", job.csv_path, prefix)
+                job.sha256 = job.sha256 or job.entry["sha256"]
+                job.summary.update(unchanged=0, file_unchanged=False)
+        to_read = [job for job in jobs if not job.summary["file_unchanged"]]
+        later_files = {
+            id(job): {later.source for later in jobs[i + 1:]
+                      if later.mapping.serial_prefix == job.mapping.serial_prefix} - {job.source}
+            for i, job in enumerate(jobs)
+        }
+
+        db_path = current_db_path()
+
+        def parsed_chunks() -> Iterator[tuple[_FileImport, pd.DataFrame, Future]]:
+            for job in to_read:
+                logger.info("Loading %ss from %s in chunks of %d rows", job.mapping.doc_type, job.csv_path,
+                            chunk_rows)
+                # Every column as text: the stored source row keeps the file's values as written
+                # and column types cannot change from one chunk to the next
+                for chunk in pd.read_csv(job.csv_path, dtype=str, chunksize=chunk_rows):
+                    yield job, chunk, submit(_parse_chunk, chunk, job.mapping, db_path, job.source)
+
+        pending = deque()
+        chunks = parsed_chunks()
+        finished = 0
+        while True:
+            while len(pending) < 2 * workers and (item := next(chunks, None)) is not None:
+                pending.append(item)
+            if not pending:
+                break
+            job, chunk, future = pending.popleft()
+            parsed, rejected = future.result()
+            while to_read[finished] is not job:
+                to_read[finished].finish()
+                finished += 1
+            with tuned_transaction("bulk_load") as conn:
+                rows, duplicates = _select_rows(parsed, chunk, job.mapping, job.seen_titles, job.position,
+                                                job.source, later_files[id(job)], conn)
+                written = db.upsert_documents(rows, conn=conn) if rows else {}
+            rejected += [(index, "duplicate title") for index in duplicates]
+            kept = len(parsed) - len(duplicates)
+            for key, count in written.items():
+                job.summary[key] += count
+            job.summary["unchanged"] += kept - len(rows)
+            job.summary["skipped"] += len(rejected)
+            job.summary["chunks"] += 1
+            job.position += kept
+            if progress:
+                progress(jobs.index(job), job.summary, _rejections(chunk, rejected))
+        for job in to_read[finished:]:
+            job.finish()
+
+    return [job.summary for job in jobs]
+
+
+def import_all(force: bool = False) -> dict:
+    """
+    Import the current corpus's CSV files (see app.corpus) and rebuild the
+    duplicate index. Files unchanged since their last import are skipped.
+    """
     db.init_db()
 
-    papers = import_csv("data/MANI_KW_PAPERS_scopus.csv", PAPER_MAPPING)
-    patents_a = import_csv("data/MANI_KW_PATENTS_A_weds1969to2009.csv", PATENT_MAPPING)
-    patents_b = import_csv("data/MANI_KW_PATENTS_B_weds2010tonow.csv", PATENT_MAPPING)
+    imports = current_corpus().imports
+    results = import_files([(path, mapping_for(doc_type)) for path, doc_type in imports.values()], force=force)
+    summary = dict(zip(imports, results))
 
+    # Re-importing unchanged files leaves the duplicate groups as they were
+    if any(result["imported"] for result in summary.values()):
+        duplicates = build_duplicate_index()
+    else:
+        duplicates = {"skipped": "no documents changed"}
     counts = db.count_documents()
 
     return {
-        "papers": papers,
-        "patents_a": patents_a,
-        "patents_b": patents_b,
+        **summary,
+        "duplicates": duplicates,
         "totals": counts,
     }
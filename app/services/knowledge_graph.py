@@ -5,8 +5,9 @@ import tempfile
 import networkx as nx
 from pyvis.network import Network
 
+from app import db
 from app.db.connection import transaction
-from app.taxonomy import TAXONOMY
+from app.taxonomy import classes
 
 logger = logging.getLogger(__name__)
 
@@ -35,25 +36,12 @@ def build_graph(include_docs: bool = False) -> nx.Graph:
     """
     graph = nx.Graph()
 
-    with transaction() as conn:
+    with transaction(readonly=True) as conn:
         # Get classification counts per class per doc_type
-        rows = conn.execute(
-            """SELECT d.doc_type, c.final_primary, COUNT(*) as cnt
-               FROM documents d
-               JOIN classifications c ON d.serial_number = c.serial_number
-               WHERE c.status IN ('agreed', 'human_reviewed')
-               GROUP BY d.doc_type, c.final_primary"""
-        ).fetchall()
+        rows = db.get_class_counts(conn=conn)
 
         # Get co-occurrence edges (docs that share secondary/tertiary classes)
-        cooccurrence = conn.execute(
-            """SELECT c.final_primary, c.final_secondary, COUNT(*) as cnt
-               FROM classifications c
-               WHERE c.status IN ('agreed', 'human_reviewed')
-                 AND c.final_primary != c.final_secondary
-               GROUP BY c.final_primary, c.final_secondary
-               HAVING cnt >= 2"""
-        ).fetchall()
+        cooccurrence = db.get_cooccurrence(min_count=2, conn=conn)
 
         docs = []
         if include_docs:
@@ -75,7 +63,7 @@ def build_graph(include_docs: bool = False) -> nx.Graph:
         else:
             patent_counts[code] = row["cnt"]
 
-    for code, cls in TAXONOMY.items():
+    for code, cls in classes().items():
         papers = paper_counts.get(code, 0)
         patents = patent_counts.get(code, 0)
         total = papers + patents
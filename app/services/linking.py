@@ -1,11 +1,13 @@
 import json
 import logging
 from collections import defaultdict
+from typing import Optional
 
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 
 from app import db
+from app.db.changes import consume
 from app.db.connection import transaction
 
 logger = logging.getLogger(__name__)
@@ -90,18 +92,53 @@ def link_patents_to_papers(top_n: int = 3) -> dict:
     return result
 
 
-def crossref_assignees() -> dict:
+CROSSREF_CONSUMER = "crossref_assignees"
+
+
+def crossref_assignees(full: bool = False) -> dict:
     """
     Goal 4: Find patent assignees/inventors who also published papers.
     Match by normalized name comparison.
+
+    Incremental by default: only patents whose document or classification
+    changed since the last run are re-matched, and deleted documents are
+    dropped. A changed paper can match any patent, so it (like `full`, or a
+    first run) triggers a full recomputation.
     """
+    with consume(CROSSREF_CONSUMER, ("documents", "classifications")) as delta:
+        if full or delta.full:
+            return _crossref(None, set())
+
+        touched = delta.serials("documents") | delta.serials("classifications")
+        with transaction(readonly=True) as conn:
+            doc_types = dict(conn.execute(
+                """SELECT serial_number, doc_type FROM documents
+                   WHERE serial_number IN (SELECT value FROM json_each(?))""",
+                (json.dumps(sorted(touched)),),
+            ).fetchall())
+        if "paper" in doc_types.values():
+            return _crossref(None, set())
+        patents = sorted(serial for serial, doc_type in doc_types.items() if doc_type == "patent")
+        return _crossref(patents, touched - doc_types.keys())
+
+
+def _crossref(patent_serials: Optional[list[str]], removed: set[str]) -> dict:
+    """Re-match the given patents (all when None) and drop crossrefs of removed documents."""
+    scope = ""
+    params: tuple = ()
+    if patent_serials is not None:
+        scope = "AND d.serial_number IN (SELECT value FROM json_each(?))"
+        params = (json.dumps(patent_serials),)
+
     with transaction() as conn:
         patents = conn.execute(
-            """SELECT d.serial_number, d.authors, d.original_data,
+            f"""SELECT d.serial_number, d.authors, raw.data AS original_data,
                       c.final_primary
                FROM documents d
                JOIN classifications c ON d.serial_number = c.serial_number
-               WHERE d.doc_type = 'patent' AND c.status IN ('agreed', 'human_reviewed')"""
+               LEFT JOIN document_raw raw ON d.serial_number = raw.serial_number
+               WHERE d.doc_type = 'patent' AND c.status IN ('agreed', 'human_reviewed') {scope}""",
+            params,
         ).fetchall()
 
         papers = conn.execute(
@@ -114,9 +151,6 @@ def crossref_assignees() -> dict:
     patents = [dict(r) for r in patents]
     papers = [dict(r) for r in papers]
 
-    if not patents or not papers:
-        return {"matches": 0}
-
     # Build paper author index: normalized_name -> [(serial, primary_class)]
     paper_author_index = defaultdict(list)
     for paper in papers:
@@ -131,7 +165,7 @@ def crossref_assignees() -> dict:
     for patent in patents:
         inventors = json.loads(patent["authors"]) if patent["authors"] else []
         # Also check applicants/owners from original data
-        original = json.loads(patent["original_data"]) if patent["original_data"] else {}
+        original = db.unpack_original(patent["original_data"])
         applicants_raw = original.get("Applicants", "") or ""
         owners_raw = original.get("Owners", "") or ""
 
@@ -152,16 +186,29 @@ def crossref_assignees() -> dict:
                             patent["serial_number"], paper_serial, name.strip()
                         ))
 
-    # Batch write all crossrefs in a single transaction
-    if crossref_rows:
-        with transaction() as conn:
-            conn.executemany(
-                "INSERT OR REPLACE INTO assignee_crossrefs VALUES (?, ?, ?)",
-                crossref_rows,
+    # Replace the recomputed patents' crossrefs in a single transaction, so
+    # matches lost since the last run do not linger
+    with transaction() as conn:
+        if patent_serials is None:
+            conn.execute("DELETE FROM assignee_crossrefs")
+        else:
+            conn.execute(
+                "DELETE FROM assignee_crossrefs WHERE patent_serial IN (SELECT value FROM json_each(?))",
+                (json.dumps(patent_serials + sorted(removed)),),
             )
+            if removed:
+                conn.execute(
+                    "DELETE FROM assignee_crossrefs WHERE paper_serial IN (SELECT value FROM json_each(?))",
+                    (json.dumps(sorted(removed)),),
+                )
+        conn.executemany(
+            "INSERT OR REPLACE INTO assignee_crossrefs VALUES (?, ?, ?)",
+            crossref_rows,
+        )
 
     matches = len(crossref_rows)
-    result = {"matches": matches, "patents_checked": len(patents), "papers_checked": len(papers)}
+    result = {"matches": matches, "patents_checked": len(patents), "papers_checked": len(papers),
+              "full": patent_serials is None}
     logger.info("Assignee cross-reference complete: %s", result)
     return result
 
@@ -1,56 +1,145 @@
 import asyncio
 import logging
 import time
+import weakref
 from typing import Optional
 
 from app import db
+from app.db import aio
 from app.db.connection import transaction
+from app.db.writer import ResultWriter, get_writer
 from app.config import settings
+from app.corpus import current_corpus
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, CircuitBreaker
 from app.services.classifier import (
+    PROMPT_VERSION,
     BaseClassifier,
     ClassificationError,
     ClaudeClassifier,
     GPTClassifier,
+    ProviderError,
 )
 from app.services.consensus import check_consensus
+from app.services.dedup import propagate_labels
 from app.services.rate_limiter import TokenBucketRateLimiter
+from app.services.scheduling import get_policy
+from app.taxonomy import taxonomy_snapshot, taxonomy_version
 
 logger = logging.getLogger(__name__)
 
 
+def _save_result(conn, serial: str, model_name: str, result: dict,
+                 classifier: BaseClassifier, tax_version: str):
+    db.save_ai_result(serial, model_name,
+                      result["primary"], result["secondary"],
+                      result["tertiary"], result["reasoning"],
+                      conn=conn, prompt_version=PROMPT_VERSION,
+                      taxonomy_version=tax_version, model_id=classifier.model_id)
+
+
+def _commit(op):
+    with transaction() as conn:
+        return op(conn)
+
+
+async def _persist(writer: Optional[ResultWriter], op, acks: Optional[list] = None):
+    """Queue the write on the single writer, or commit it right away (on a DB thread) without one."""
+    if writer is None:
+        await aio.run(_commit, op)
+    else:
+        ack = await writer.submit(op)
+        if acks is not None:
+            acks.append(ack)
+
+
+def _is_provider_failure(error: BaseException) -> bool:
+    """Outages count against the circuit; a malformed answer does not."""
+    return isinstance(error, ProviderError) or not isinstance(error, ClassificationError)
+
+
 async def classify_one(
     doc: dict,
     gpt: BaseClassifier,
     claude: BaseClassifier,
     retries: int = 3,
+    breakers: Optional[dict[str, CircuitBreaker]] = None,
+    writer: Optional[ResultWriter] = None,
+    acks: Optional[list] = None,
 ) -> bool:
-    """Classify a single document with both models. Returns True on success."""
+    """
+    Classify a single document with both models. Returns True on success.
+    - A model that already answered is not called again on retry.
+    - With `breakers`, a model whose circuit is open is skipped; if the other
+      model answered, its result is stored with status 'pending_second_opinion'
+      and backfilled later (see backfill_second_opinions).
+    - With `writer`, results are queued for a grouped commit instead of
+      written in their own transaction (call writer.flush() before reading them);
+      the write's ack future is appended to `acks`.
+    """
     serial = doc["serial_number"]
     abstract = doc["abstract"]
+    tax_version = taxonomy_version()
+    classifiers = {"gpt": gpt, "claude": claude}
+    results: dict[str, dict] = {}
 
     for attempt in range(1, retries + 1):
         try:
-            gpt_result, claude_result = await asyncio.gather(
-                gpt.classify(abstract),
-                claude.classify(abstract),
+            todo = [name for name in classifiers
+                    if name not in results and (breakers is None or breakers[name].allow())]
+            outcomes = await asyncio.gather(
+                *[classifiers[name].classify(abstract) for name in todo],
+                return_exceptions=True,
             )
+            errors = []
+            for name, outcome in zip(todo, outcomes):
+                if isinstance(outcome, BaseException):
+                    errors.append(f"{name}: {outcome}")
+                    if breakers is not None:
+                        if _is_provider_failure(outcome):
+                            breakers[name].record_failure()
+                        else:
+                            breakers[name].release()
+                else:
+                    results[name] = outcome
+                    if breakers is not None:
+                        breakers[name].record_success()
 
-            final = check_consensus(gpt_result, claude_result)
-
-            # Atomic: save both AI results + final classification in one transaction
-            with transaction() as conn:
-                db.save_ai_result(serial, "gpt",
-                                  gpt_result["primary"], gpt_result["secondary"],
-                                  gpt_result["tertiary"], gpt_result["reasoning"],
-                                  conn=conn)
-                db.save_ai_result(serial, "claude",
-                                  claude_result["primary"], claude_result["secondary"],
-                                  claude_result["tertiary"], claude_result["reasoning"],
-                                  conn=conn)
-                db.finalize_classification(serial, final["primary"], final["secondary"],
-                                           final["tertiary"], final["reasoning"],
-                                           final["status"], conn=conn)
-            return True
+            if len(results) == 2:
+                final = check_consensus(results["gpt"], results["claude"])
+
+                # Atomic: both AI results + final classification in one transaction (or savepoint)
+                def write(conn):
+                    for name, result in results.items():
+                        _save_result(conn, serial, name, result, classifiers[name], tax_version)
+                    db.finalize_classification(serial, final["primary"], final["secondary"],
+                                               final["tertiary"], final["reasoning"],
+                                               final["status"], conn=conn)
+
+                await _persist(writer, write, acks)
+                return True
+
+            missing = [name for name in classifiers if name not in results]
+            if breakers is not None and results and all(not breakers[m].available() for m in missing):
+                # Degraded mode: keep the healthy model's answer, ask the other one later
+                (name, result), = results.items()
+
+                def write(conn):
+                    _save_result(conn, serial, name, result, classifiers[name], tax_version)
+                    db.finalize_classification(
+                        serial, result["primary"], result["secondary"], result["tertiary"],
+                        f"Single-model result from {name}; awaiting {missing[0]} "
+                        f"(circuit open). {name} reasoning: {result['reasoning']}",
+                        "pending_second_opinion", conn=conn,
+                    )
+
+                await _persist(writer, write, acks)
+                return True
+
+            if breakers is not None and not any(breakers[m].available() for m in missing):
+                logger.warning("All circuits open for %s; leaving it queued", serial)
+                return False
+
+            raise ClassificationError("; ".join(errors) or "no model answered")
 
         except ClassificationError as e:
             logger.warning("Attempt %d/%d failed for %s: %s", attempt, retries, serial, e)
@@ -69,50 +158,180 @@ async def classify_one(
     return False
 
 
+async def backfill_second_opinions(
+    classifiers: dict[str, BaseClassifier],
+    breakers: dict[str, CircuitBreaker],
+    concurrency: int,
+    writer: Optional[ResultWriter] = None,
+) -> int:
+    """
+    For every model whose circuit allows calls, classify the documents stored in
+    degraded mode without its result, then apply consensus. Returns the number backfilled.
+    """
+    if writer is not None:
+        await writer.flush()
+    backfilled = 0
+    tax_version = taxonomy_version()
+    for name, classifier in classifiers.items():
+        if not breakers[name].available():
+            continue
+        docs = await aio.get_pending_second_opinion(name)
+        start = 0
+        while start < len(docs):
+            # A half-open circuit gets a single trial call, not a whole batch
+            size = 1 if breakers[name].state == HALF_OPEN else concurrency
+            if not breakers[name].allow():
+                break
+            batch = docs[start:start + size]
+            start += len(batch)
+            outcomes = await asyncio.gather(
+                *[classifier.classify(d["abstract"]) for d in batch],
+                return_exceptions=True,
+            )
+            for doc, outcome in zip(batch, outcomes):
+                if isinstance(outcome, BaseException):
+                    if _is_provider_failure(outcome):
+                        breakers[name].record_failure()
+                    else:
+                        breakers[name].release()
+                    continue
+                breakers[name].record_success()
+                serial = doc["serial_number"]
+                pair = {name: outcome}
+                stored = await aio.get_classification(serial)
+                other = "claude" if name == "gpt" else "gpt"
+                pair[other] = {
+                    "primary": stored[f"{other}_primary"],
+                    "secondary": stored[f"{other}_secondary"],
+                    "tertiary": stored[f"{other}_tertiary"],
+                    "reasoning": stored[f"{other}_reasoning"] or "",
+                }
+                final = check_consensus(pair["gpt"], pair["claude"])
+
+                def write(conn, serial=serial, outcome=outcome, final=final):
+                    _save_result(conn, serial, name, outcome, classifier, tax_version)
+                    db.finalize_classification(serial, final["primary"], final["secondary"],
+                                               final["tertiary"], final["reasoning"],
+                                               final["status"], conn=conn)
+
+                await _persist(writer, write)
+                backfilled += 1
+    if backfilled:
+        logger.info("Backfilled %d second opinions", backfilled)
+    return backfilled
+
+
+# Token budgets per corpus, shared by every run of that corpus on one event loop
+# (a limiter's lock belongs to the loop it was first used on)
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+def corpus_limiters() -> dict[str, TokenBucketRateLimiter]:
+    """The current corpus's provider -> rate limiter, sized from its TPM limits."""
+    corpus = current_corpus()
+    limits = corpus.tpm_limits()
+    try:
+        per_loop = _limiters.setdefault(asyncio.get_running_loop(), {})
+    except RuntimeError:
+        per_loop = {}
+    key = (corpus.name, tuple(sorted(limits.items())))
+    if key not in per_loop:
+        per_loop[key] = {provider: TokenBucketRateLimiter(capacity=tpm, window_seconds=60.0)
+                         for provider, tpm in limits.items()}
+    return per_loop[key]
+
+
+def build_classifiers() -> dict[str, BaseClassifier]:
+    """One rate-limited classifier per model name used in ai_results."""
+    limiters = corpus_limiters()
+    gpt_limiter, claude_limiter = limiters["openai"], limiters["anthropic"]
+    return {
+        "gpt": GPTClassifier(api_key=settings.openai_api_key, rate_limiter=gpt_limiter),
+        "claude": ClaudeClassifier(api_key=settings.anthropic_api_key, rate_limiter=claude_limiter),
+    }
+
+
 async def run_classification(
     doc_type: Optional[str] = None,
     concurrency: Optional[int] = None,
     limit: Optional[int] = None,
+    policy: Optional[str] = None,
+    fair_share: Optional[str] = None,
 ) -> dict:
     """
     Run the full classification pipeline.
     - Resumes from where it left off (skips already-classified docs).
+    - Orders the queue with a scheduling policy (see services.scheduling).
     - Runs with bounded concurrency.
+    - Commits results through the single writer queue, in grouped transactions.
     - Tracks progress.
     """
     if concurrency is None:
         concurrency = settings.concurrency
+    scheduler = get_policy(policy or settings.schedule_policy,
+                           fair_share if fair_share is not None else settings.fair_share_weights)
+
+    # Near-duplicates of already classified documents need no API calls
+    propagated = await aio.run(propagate_labels)
+
+    classifiers = build_classifiers()
+    gpt, claude = classifiers["gpt"], classifiers["claude"]
+    breakers = {
+        name: CircuitBreaker(name, settings.breaker_failure_threshold, settings.breaker_cooldown_seconds)
+        for name in classifiers
+    }
 
-    gpt_limiter = TokenBucketRateLimiter(capacity=settings.openai_tpm_limit, window_seconds=60.0)
-    claude_limiter = TokenBucketRateLimiter(capacity=settings.anthropic_tpm_limit, window_seconds=60.0)
+    # Shared with other runs and requests, so failures are counted from this run's own acks
+    writer = get_writer()
+    commits_before = writer.commits
+    acks: list = []
 
-    gpt = GPTClassifier(api_key=settings.openai_api_key, rate_limiter=gpt_limiter)
-    claude = ClaudeClassifier(api_key=settings.anthropic_api_key, rate_limiter=claude_limiter)
+    # Second opinions still missing from an earlier degraded run
+    backfilled = await backfill_second_opinions(classifiers, breakers, concurrency, writer)
+    await writer.flush()
 
-    docs = db.get_unclassified_documents(doc_type)
+    # Some policies read the database or fit a model to order the queue
+    docs = await aio.run(scheduler.order, await aio.get_unclassified_documents(doc_type))
     if limit:
         docs = docs[:limit]
 
     total = len(docs)
     if total == 0:
         logger.info("No documents to classify.")
-        return {"total": 0, "success": 0, "failed": 0, "time_seconds": 0}
+        return {"total": 0, "success": 0, "failed": 0, "propagated": propagated,
+                "backfilled": backfilled, "time_seconds": 0}
 
-    logger.info("Starting classification: %d documents, concurrency=%d", total, concurrency)
+    snapshot = taxonomy_snapshot()
+    await aio.record_taxonomy_version(taxonomy_version(snapshot), snapshot)
+
+    logger.info("Starting classification: %d documents, concurrency=%d, policy=%s",
+                total, concurrency, scheduler.name)
 
     success = 0
     failed = 0
+    degraded = False
     start_time = time.time()
 
     # Process in fixed-size batches to prevent task pile-up on rate limits
     for batch_start in range(0, total, concurrency):
         batch = docs[batch_start:batch_start + concurrency]
 
+        if not any(b.available() for b in breakers.values()):
+            wait = min(b.retry_after() for b in breakers.values())
+            logger.warning("All provider circuits open; pausing %.0fs", wait)
+            await asyncio.sleep(wait)
+
         results = await asyncio.gather(
-            *[classify_one(doc, gpt, claude) for doc in batch],
+            *[classify_one(doc, gpt, claude, breakers=breakers, writer=writer, acks=acks) for doc in batch],
             return_exceptions=True,
         )
 
+        if any(b.state != CLOSED for b in breakers.values()):
+            degraded = True
+        elif degraded:
+            backfilled += await backfill_second_opinions(classifiers, breakers, concurrency, writer)
+            degraded = False
+
         for r in results:
             if r is True:
                 success += 1
@@ -130,11 +349,25 @@ async def run_classification(
             success, failed,
         )
 
+    if degraded:
+        backfilled += await backfill_second_opinions(classifiers, breakers, concurrency, writer)
+    await writer.flush()
+    # Results that were classified but could not be stored are failures too
+    unsaved = sum(not ack.result() for ack in acks)
+    success -= unsaved
+    failed += unsaved
+    propagated += await aio.run(propagate_labels)
+
     elapsed = time.time() - start_time
     result = {
         "total": total,
         "success": success,
         "failed": failed,
+        "propagated": propagated,
+        "backfilled": backfilled,
+        "pending_second_opinion": len(await aio.get_classifications_by_status("pending_second_opinion")),
+        "circuits": {name: b.snapshot() for name, b in breakers.items()},
+        "commits": writer.commits - commits_before,
         "time_seconds": round(elapsed, 1),
     }
     logger.info("Classification complete: %s", result)
@@ -0,0 +1,163 @@
+"""
+Dry-run planner for classification runs.
+
+Estimates tokens, the bottleneck provider, wall time and cost for the
+pending queue without calling either API. All per-document math is done
+as numpy array operations over abstract lengths, so planning the full
+corpus takes milliseconds.
+"""
+import logging
+import math
+from typing import Optional
+
+import numpy as np
+
+from app import db
+from app.config import settings
+from app.corpus import current_corpus
+from app.services.classifier import (
+    CLASSIFICATION_PROMPT,
+    ESTIMATED_TOKENS_PER_CALL,
+)
+from app.services.scheduling import get_policy
+from app.taxonomy import format_taxonomy_for_prompt
+
+logger = logging.getLogger(__name__)
+
+# Rough English-text tokenizer ratio shared by both providers
+CHARS_PER_TOKEN = 4.0
+
+# JSON answer with three codes + a sentence or two of reasoning
+OUTPUT_TOKENS_PER_CALL = 150
+
+# Typical end-to-end latency of one classification call
+SECONDS_PER_CALL = 5.0
+
+# USD per 1M tokens (list prices); batch APIs bill at BATCH_DISCOUNT of these
+PRICING = {
+    "gpt": {"input": 2.50, "output": 10.00},
+    "claude": {"input": 3.00, "output": 15.00},
+}
+BATCH_DISCOUNT = 0.5
+
+
+def prompt_overhead_tokens() -> int:
+    """Tokens in the classification prompt excluding the abstract itself."""
+    template = CLASSIFICATION_PROMPT.format(abstract="", taxonomy=format_taxonomy_for_prompt())
+    return math.ceil(len(template) / CHARS_PER_TOKEN)
+
+
+def estimate_input_tokens(abstract_lengths: np.ndarray) -> np.ndarray:
+    """Vectorized input-token estimate for an array of abstract lengths (chars)."""
+    lengths = np.asarray(abstract_lengths, dtype=np.float64)
+    return np.ceil(lengths / CHARS_PER_TOKEN).astype(np.int64) + prompt_overhead_tokens()
+
+
+def _token_stats(tokens: np.ndarray) -> dict:
+    if tokens.size == 0:
+        return {"count": 0, "mean": 0, "p50": 0, "p95": 0, "max": 0}
+    return {
+        "count": int(tokens.size),
+        "mean": round(float(tokens.mean()), 1),
+        "p50": int(np.percentile(tokens, 50)),
+        "p95": int(np.percentile(tokens, 95)),
+        "max": int(tokens.max()),
+    }
+
+
+def _cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    price = PRICING[model]
+    return (input_tokens * price["input"] + output_tokens * price["output"]) / 1_000_000
+
+
+def plan_classification(
+    doc_type: Optional[str] = None,
+    limit: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    policy: Optional[str] = None,
+    fair_share: Optional[str] = None,
+) -> dict:
+    """
+    Estimate a classification run over the pending queue.
+    - With a policy, `limit` picks the same documents the pipeline would.
+    - Every document is sent to both providers with the same prompt.
+    - Each provider's time is its token volume divided by its TPM limit
+      (the local rate limiter charges at least ESTIMATED_TOKENS_PER_CALL per call).
+    - The pipeline runs in batches of `concurrency`, each taking ~SECONDS_PER_CALL.
+    - Wall time is the slowest of those three constraints.
+    """
+    if concurrency is None:
+        concurrency = settings.concurrency
+
+    policy = policy or settings.schedule_policy
+    if fair_share is None:
+        fair_share = settings.fair_share_weights
+    if policy != "default" or fair_share:
+        docs = get_policy(policy, fair_share).order(db.get_unclassified_documents(doc_type))
+        rows = [(d["serial_number"], d["doc_type"], len(d["abstract"])) for d in docs]
+    else:
+        rows = db.get_pending_abstract_lengths(doc_type)
+    if limit:
+        rows = rows[:limit]
+
+    n = len(rows)
+    doc_types = np.array([r[1] for r in rows], dtype=object)
+    lengths = np.fromiter((r[2] or 0 for r in rows), dtype=np.int64, count=n)
+
+    input_tokens = estimate_input_tokens(lengths)
+    per_call_tokens = input_tokens + OUTPUT_TOKENS_PER_CALL
+    total_input = int(input_tokens.sum())
+    total_output = n * OUTPUT_TOKENS_PER_CALL
+
+    # Tokens each provider's budget is drained by (both see the same traffic)
+    throttled_tokens = int(np.maximum(per_call_tokens, ESTIMATED_TOKENS_PER_CALL).sum())
+    tpm = current_corpus().tpm_limits()
+    constraint_minutes = {
+        name: throttled_tokens / tpm_limit if tpm_limit > 0 else float("inf")
+        for name, tpm_limit in tpm.items()
+    }
+    constraint_minutes["concurrency"] = math.ceil(n / max(concurrency, 1)) * SECONDS_PER_CALL / 60
+
+    bottleneck = max(constraint_minutes, key=constraint_minutes.get) if n else None
+    wall_minutes = constraint_minutes[bottleneck] if n else 0.0
+
+    # Smallest concurrency that keeps the slowest provider saturated
+    slowest_tpm = min(tpm.values())
+    mean_tokens = float(per_call_tokens.mean()) if n else 0.0
+    docs_per_second = slowest_tpm / 60 / mean_tokens if mean_tokens else 0.0
+    recommended_concurrency = max(1, math.ceil(docs_per_second * SECONDS_PER_CALL))
+
+    cost = {model: _cost(model, total_input, total_output) for model in PRICING}
+    total_cost = sum(cost.values())
+
+    by_doc_type = {
+        t: _token_stats(input_tokens[doc_types == t])
+        for t in sorted(set(doc_types.tolist()))
+    }
+
+    plan = {
+        "documents": n,
+        "concurrency": concurrency,
+        "tokens": {
+            "prompt_overhead_per_call": prompt_overhead_tokens(),
+            "input_per_document": _token_stats(input_tokens),
+            "input_by_doc_type": by_doc_type,
+            "output_per_call": OUTPUT_TOKENS_PER_CALL,
+            "total_input_per_provider": total_input,
+            "total_output_per_provider": total_output,
+            "total_all_providers": 2 * (total_input + total_output),
+        },
+        "constraint_minutes": {k: round(v, 1) for k, v in constraint_minutes.items()},
+        "bottleneck": bottleneck,
+        "wall_time_minutes": round(wall_minutes, 1),
+        "recommended_concurrency": recommended_concurrency,
+        "cost_usd": {
+            "gpt": round(cost["gpt"], 2),
+            "claude": round(cost["claude"], 2),
+            "total": round(total_cost, 2),
+            "batch_total": round(total_cost * BATCH_DISCOUNT, 2),
+        },
+    }
+    logger.info("Classification plan: %d docs, bottleneck=%s, %.1f min, $%.2f",
+                n, bottleneck, wall_minutes, total_cost)
+    return plan
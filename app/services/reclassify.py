@@ -0,0 +1,198 @@
+"""
+Incremental re-classification after prompt, taxonomy or model changes, and
+for documents whose abstract a re-import changed.
+
+Every ai_results row is stamped with the prompt version, taxonomy version
+and model id that produced it. This module re-runs a single model on only
+the documents whose stored result is stale, archives the old result, and
+re-applies consensus against the other model's stored result.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from app import db
+from app.config import settings
+from app.db import aio
+from app.db.writer import get_writer
+from app.services.classifier import PROMPT_VERSION, BaseClassifier, ClassificationError
+from app.services.consensus import check_consensus
+from app.services.pipeline import build_classifiers
+from app.taxonomy import changed_classes, taxonomy_snapshot, taxonomy_version
+
+logger = logging.getLogger(__name__)
+
+OTHER_MODEL = {"gpt": "claude", "claude": "gpt"}
+
+# Human decisions are never overwritten by a model re-run
+PROTECTED_STATUSES = ("human_reviewed",)
+
+
+def _touches(row: dict, classes: set[int]) -> bool:
+    codes = (row["final_primary"], row["final_secondary"], row["final_tertiary"],
+             row["primary_code"], row["secondary_code"], row["tertiary_code"])
+    return any(code in classes for code in codes)
+
+
+def select_stale(
+    model_name: str,
+    changed_only: bool = False,
+    classes: Optional[set[int]] = None,
+    doc_type: Optional[str] = None,
+    model_id: Optional[str] = None,
+) -> tuple[list[dict], Optional[set[int]]]:
+    """
+    Return (stale rows, classes used for narrowing).
+    - classes: only documents whose current codes touch these classes.
+    - changed_only: derive `classes` from the taxonomy diff between each row's
+      stored taxonomy version and the current one. Rows whose taxonomy
+      version was never recorded cannot be diffed and are all kept.
+    Documents whose abstract changed are kept either way.
+    """
+    if model_name not in OTHER_MODEL:
+        raise ValueError(f"Unknown model '{model_name}'. Valid: {sorted(OTHER_MODEL)}")
+
+    current_snapshot = taxonomy_snapshot()
+    rows = db.get_stale_results(model_name, PROMPT_VERSION, taxonomy_version(current_snapshot),
+                                model_id=model_id, doc_type=doc_type)
+
+    if classes is None and changed_only:
+        snapshots = db.get_taxonomy_snapshots()
+        classes = set()
+        for version in {r["taxonomy_version"] for r in rows}:
+            if version not in snapshots:
+                logger.warning("Taxonomy version %s was never recorded; cannot narrow by class", version)
+                return rows, None
+            classes |= changed_classes(snapshots[version], current_snapshot)
+
+    if classes is not None:
+        # A changed abstract is stale whatever its classes
+        rows = [r for r in rows if r["abstract_changed"] or _touches(r, classes)]
+    return rows, classes
+
+
+def stale_summary(model_name: str, changed_only: bool = False,
+                  classes: Optional[set[int]] = None, doc_type: Optional[str] = None) -> dict:
+    rows, used_classes = select_stale(model_name, changed_only, classes, doc_type)
+    by_reason = {"prompt": 0, "taxonomy": 0, "unversioned": 0, "abstract": 0}
+    current_taxonomy = taxonomy_version()
+    for r in rows:
+        if r["prompt_version"] is None:
+            by_reason["unversioned"] += 1
+        elif r["prompt_version"] != PROMPT_VERSION:
+            by_reason["prompt"] += 1
+        elif r["taxonomy_version"] != current_taxonomy:
+            by_reason["taxonomy"] += 1
+        elif r["abstract_changed"]:
+            by_reason["abstract"] += 1
+    return {
+        "model": model_name,
+        "prompt_version": PROMPT_VERSION,
+        "taxonomy_version": current_taxonomy,
+        "classes": sorted(used_classes) if used_classes is not None else None,
+        "stale": len(rows),
+        "by_reason": by_reason,
+    }
+
+
+async def reclassify_one(row: dict, model_name: str, classifier: BaseClassifier) -> bool:
+    """Re-run one model on one document and re-apply consensus. Returns True on success."""
+    serial = row["serial_number"]
+    try:
+        result = await classifier.classify(row["abstract"])
+    except ClassificationError as e:
+        logger.warning("Re-classification failed for %s (%s): %s", serial, model_name, e)
+        return False
+
+    other_name = OTHER_MODEL[model_name]
+    other = await aio.get_ai_result(serial, other_name)
+    try:
+        tax_version = taxonomy_version()
+        await get_writer().write(lambda conn: _save_rerun(conn, row, model_name, result, other,
+                                                          classifier.model_id, tax_version))
+    except Exception as e:
+        logger.error("Could not store re-classification of %s (%s): %s", serial, model_name, e)
+        return False
+    return True
+
+
+def _save_rerun(conn, row: dict, model_name: str, result: dict, other: Optional[dict],
+                model_id: str, tax_version: str):
+    """Store the new result and, unless a human decided, re-apply consensus with the other model's."""
+    serial = row["serial_number"]
+    other_name = OTHER_MODEL[model_name]
+    db.save_ai_result(serial, model_name,
+                      result["primary"], result["secondary"], result["tertiary"],
+                      result["reasoning"], conn=conn,
+                      prompt_version=PROMPT_VERSION,
+                      taxonomy_version=tax_version,
+                      model_id=model_id)
+    if other and row["status"] not in PROTECTED_STATUSES:
+        other_result = {
+            "primary": other["primary_code"],
+            "secondary": other["secondary_code"],
+            "tertiary": other["tertiary_code"],
+            "reasoning": other["reasoning"] or "",
+        }
+        pair = {model_name: result, other_name: other_result}
+        final = check_consensus(pair["gpt"], pair["claude"])
+        db.finalize_classification(serial, final["primary"], final["secondary"],
+                                   final["tertiary"], final["reasoning"],
+                                   final["status"], conn=conn)
+
+
+async def run_reclassification(
+    model_name: str,
+    changed_only: bool = False,
+    classes: Optional[set[int]] = None,
+    doc_type: Optional[str] = None,
+    limit: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> dict:
+    """
+    Re-classify only the stale documents for one model.
+    Returns counts plus a side-by-side old/new comparison of the re-run documents.
+    """
+    if concurrency is None:
+        concurrency = settings.concurrency
+
+    classifier = build_classifiers()[model_name]
+    rows, used_classes = await aio.run(select_stale, model_name, changed_only, classes, doc_type,
+                                       model_id=classifier.model_id)
+    if limit:
+        rows = rows[:limit]
+
+    snapshot = taxonomy_snapshot()
+    await aio.record_taxonomy_version(taxonomy_version(snapshot), snapshot)
+
+    logger.info("Re-classifying %d stale documents with %s", len(rows), model_name)
+    start_time = time.time()
+    done = []
+    failed = 0
+    for batch_start in range(0, len(rows), concurrency):
+        batch = rows[batch_start:batch_start + concurrency]
+        results = await asyncio.gather(
+            *[reclassify_one(row, model_name, classifier) for row in batch],
+            return_exceptions=True,
+        )
+        for row, ok in zip(batch, results):
+            if ok is True:
+                done.append(row["serial_number"])
+            else:
+                failed += 1
+
+    comparison = await aio.get_result_changes(model_name, done)
+    result = {
+        "model": model_name,
+        "classes": sorted(used_classes) if used_classes is not None else None,
+        "total": len(rows),
+        "success": len(done),
+        "failed": failed,
+        "primary_changed": sum(1 for c in comparison if c["primary_changed"]),
+        "time_seconds": round(time.time() - start_time, 1),
+        "comparison": comparison,
+    }
+    logger.info("Re-classification complete: %d ok, %d failed, %d primary changes",
+                result["success"], failed, result["primary_changed"])
+    return result
@@ -0,0 +1,158 @@
+"""
+Scheduling policies for the classification queue.
+
+A policy takes the pending documents (as returned by
+db.get_unclassified_documents) and returns them in the order the
+pipeline should classify them. Policies are looked up by name, and any
+policy can be wrapped in a weighted fair share between doc types so a
+partial run covers both papers and patents.
+"""
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Optional
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulingPolicy(ABC):
+    name: str = ""
+
+    @abstractmethod
+    def order(self, docs: list[dict]) -> list[dict]:
+        ...
+
+
+class DefaultPolicy(SchedulingPolicy):
+    """Database order: doc_type, year, serial number."""
+    name = "default"
+
+    def order(self, docs: list[dict]) -> list[dict]:
+        return list(docs)
+
+
+class PatentsFirstPolicy(SchedulingPolicy):
+    """All patents before any paper, each in database order."""
+    name = "patents_first"
+
+    def order(self, docs: list[dict]) -> list[dict]:
+        return sorted(docs, key=lambda d: d["doc_type"] != "patent")
+
+
+class NewestFirstPolicy(SchedulingPolicy):
+    """Most recent publication year first; undated documents last."""
+    name = "newest_first"
+
+    def order(self, docs: list[dict]) -> list[dict]:
+        return sorted(docs, key=lambda d: (d["year"] is None, -(d["year"] or 0), d["serial_number"]))
+
+
+class ShortestFirstPolicy(SchedulingPolicy):
+    """
+    Cheapest estimated token cost first, for fast coverage.
+    The prompt overhead is the same for every call, so token cost
+    ranks the same as abstract length.
+    """
+    name = "shortest_first"
+
+    def order(self, docs: list[dict]) -> list[dict]:
+        return sorted(docs, key=lambda d: (len(d["abstract"] or ""), d["serial_number"]))
+
+
+class UncertaintyPolicy(SchedulingPolicy):
+    """
+    Least confident first, according to a local TF-IDF + logistic regression
+    model trained on the already finalized classifications.
+    Falls back to database order until at least two classes have been finalized.
+    """
+    name = "uncertainty"
+
+    def order(self, docs: list[dict]) -> list[dict]:
+        if not docs:
+            return []
+
+        training = [d for d in db.get_finalized_classifications() if d.get("abstract")]
+        labels = [d["final_primary"] for d in training]
+        if len(set(labels)) < 2:
+            logger.info("Uncertainty policy: not enough finalized classes yet, using default order")
+            return list(docs)
+
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+
+        vectorizer = TfidfVectorizer(max_features=10000, stop_words="english")
+        x_train = vectorizer.fit_transform([d["abstract"] for d in training])
+        model = LogisticRegression(max_iter=1000)
+        model.fit(x_train, labels)
+
+        confidence = model.predict_proba(vectorizer.transform([d["abstract"] for d in docs])).max(axis=1)
+        ranked = sorted(range(len(docs)), key=lambda i: (float(confidence[i]), docs[i]["serial_number"]))
+        return [docs[i] for i in ranked]
+
+
+class FairSharePolicy(SchedulingPolicy):
+    """
+    Weighted fair share between doc types (stride scheduling).
+    With weights {"patent": 3, "paper": 1}, three patents are scheduled for
+    every paper until one type runs out. Order within a type comes from `inner`.
+    Doc types without a weight get weight 1.
+    """
+    name = "fair_share"
+
+    def __init__(self, weights: dict[str, float], inner: Optional[SchedulingPolicy] = None):
+        self._weights = weights
+        self._inner = inner or DefaultPolicy()
+
+    def order(self, docs: list[dict]) -> list[dict]:
+        queues: dict[str, deque] = {}
+        for doc in self._inner.order(docs):
+            queues.setdefault(doc["doc_type"], deque()).append(doc)
+
+        strides = {t: 1.0 / self._weights.get(t, 1.0) for t in queues}
+        passes = {t: strides[t] for t in queues}
+
+        ordered = []
+        while queues:
+            doc_type = min(queues, key=lambda t: (passes[t], strides[t], t))
+            ordered.append(queues[doc_type].popleft())
+            passes[doc_type] += strides[doc_type]
+            if not queues[doc_type]:
+                del queues[doc_type]
+        return ordered
+
+
+POLICIES: dict[str, type[SchedulingPolicy]] = {
+    cls.name: cls
+    for cls in (DefaultPolicy, PatentsFirstPolicy, NewestFirstPolicy,
+                ShortestFirstPolicy, UncertaintyPolicy)
+}
+
+
+def parse_weights(spec: str) -> dict[str, float]:
+    """Parse 'patent:3,paper:1' into {'patent': 3.0, 'paper': 1.0}."""
+    weights = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        doc_type, sep, weight = part.partition(":")
+        try:
+            value = float(weight) if sep else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid fair-share weight '{part.strip()}'") from None
+        if value <= 0:
+            raise ValueError(f"Fair-share weight for '{doc_type.strip()}' must be positive")
+        weights[doc_type.strip()] = value
+    return weights
+
+
+def get_policy(name: Optional[str] = None, fair_share: Optional[str] = None) -> SchedulingPolicy:
+    """Build a policy by name, optionally wrapped in a fair share ('patent:3,paper:1')."""
+    name = name or "default"
+    if name not in POLICIES:
+        raise ValueError(f"Unknown scheduling policy '{name}'. Valid: {sorted(POLICIES)}")
+    policy = POLICIES[name]()
+    if fair_share:
+        policy = FairSharePolicy(parse_weights(fair_share), inner=policy)
+    return policy
@@ -0,0 +1,225 @@
+"""
+Upload-and-import jobs.
+
+POST /documents/upload streams a CSV or XLSX export into UPLOAD_DIR (default:
+an uploads/ directory beside the corpus's database) and queues an UploadJob.
+The job then runs in the background. An XLSX workbook is first converted
+row by row into a CSV. The job picks the CsvMapping whose columns the
+header contains (or the doc_type asked for) and imports the file with
+import_files(), leaving no import-ledger entry for it. Serials are the
+mapping's prefix plus the job id (e.g. "P-1a2b3c4d-17"), so an upload never
+overwrites documents from the repo's files or from another upload, whatever
+its "#" column holds. The job records row-level progress after every chunk
+and writes each skipped row to a rejected-rows CSV report. Every stage
+streams, so memory stays bounded however large the upload is. The uploaded
+file is deleted when the job ends; the report is kept until the job is evicted
+(the newest MAX_JOBS jobs are kept).
+"""
+import csv
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Optional
+
+import openpyxl
+
+from app.config import settings
+from app.corpus import current_corpus, using_corpus
+from app.db.connection import current_db_path
+from app.services.dedup import build_duplicate_index
+from app.services.importer import MAPPINGS, CsvMapping, import_files, mapping_for
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_FORMATS = (".csv", ".xlsx")
+MAX_JOBS = 100
+REJECTED_COLUMNS = ["row", "#", "title", "reason"]
+
+
+@dataclass
+class UploadJob:
+    id: str
+    corpus: str
+    filename: str
+    path: str
+    report_path: str
+    doc_type: Optional[str] = None
+    serial_prefix: Optional[str] = None
+    # receiving -> queued -> running -> done | failed
+    status: str = "receiving"
+    bytes: int = 0
+    rows: int = 0
+    rejected: int = 0
+    summary: dict = field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id, "corpus": self.corpus, "filename": self.filename, "doc_type": self.doc_type,
+            "serial_prefix": self.serial_prefix, "status": self.status, "bytes": self.bytes,
+            "rows": self.rows, "rejected": self.rejected,
+            "summary": self.summary, "error": self.error, "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+_jobs: "OrderedDict[str, UploadJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def upload_dir() -> Path:
+    path = Path(settings.upload_dir) if settings.upload_dir else Path(current_db_path()).parent / "uploads"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def doc_types() -> list[str]:
+    """The doc_types the current corpus has mappings for."""
+    return sorted(set(MAPPINGS) | set(current_corpus().mappings))
+
+
+def create_job(filename: str, doc_type: Optional[str] = None) -> UploadJob:
+    """
+    Register a job for an upload of `filename` in the current corpus; the
+    caller writes the file to job.path. Raises ValueError for a file type
+    other than CSV or XLSX, or an unknown doc_type.
+    """
+    suffix = Path(filename).suffix.lower()
+    if suffix not in UPLOAD_FORMATS:
+        raise ValueError(f"Expected a {' or '.join(UPLOAD_FORMATS)} file, got {filename!r}")
+    if doc_type is not None and doc_type not in doc_types():
+        raise ValueError(f"Unknown doc_type {doc_type!r}; expected one of {doc_types()}")
+    job_id = uuid.uuid4().hex
+    directory = upload_dir()
+    job = UploadJob(job_id, current_corpus().name, filename, str(directory / f"{job_id}{suffix}"),
+                    str(directory / f"{job_id}.rejected.csv"), doc_type)
+    with _jobs_lock:
+        _jobs[job_id] = job
+        finished = [old for old in _jobs.values() if old.finished_at is not None]
+        for old in finished[:max(0, len(_jobs) - MAX_JOBS)]:
+            del _jobs[old.id]
+            Path(old.report_path).unlink(missing_ok=True)
+    return job
+
+
+def get_job(job_id: str) -> Optional[UploadJob]:
+    """The job, if it belongs to the current corpus."""
+    job = _jobs.get(job_id)
+    return job if job is not None and job.corpus == current_corpus().name else None
+
+
+def list_jobs() -> list[UploadJob]:
+    """The current corpus's jobs, newest first."""
+    name = current_corpus().name
+    with _jobs_lock:
+        return [job for job in reversed(_jobs.values()) if job.corpus == name]
+
+
+def fail_job(job: UploadJob, error: str):
+    """End a job that never ran (e.g. the upload was cut short) and drop its file."""
+    job.status, job.error, job.finished_at = "failed", error, time.time()
+    Path(job.path).unlink(missing_ok=True)
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def xlsx_to_csv(xlsx_path: str, csv_path: str):
+    """Write the first sheet of a workbook as CSV, one row at a time."""
+    workbook = openpyxl.load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            for values in workbook.worksheets[0].iter_rows(values_only=True):
+                writer.writerow([_cell(value) for value in values])
+    finally:
+        workbook.close()
+
+
+def _header(csv_path: str) -> list[str]:
+    # utf-8-sig: spreadsheet programs often start CSV exports with a byte order mark
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), [])
+
+
+def detect_mapping(columns: list[str]) -> CsvMapping:
+    """
+    The current corpus's mapping whose columns (title, abstract, authors,
+    year and source) are all in `columns`. Raises ValueError if no mapping,
+    or more than one, fits.
+    """
+    present = set(columns)
+    matches = []
+    for doc_type in doc_types():
+        mapping = mapping_for(doc_type)
+        needed = {"Title", "Abstract", mapping.authors_column, mapping.year_column, mapping.source_column}
+        if needed <= present:
+            matches.append(mapping)
+    if len(matches) != 1:
+        found = "no mapping" if not matches else f"several mappings ({[m.doc_type for m in matches]})"
+        raise ValueError(f"Cannot tell the document type: {found} fits the columns {columns}; "
+                         f"pass doc_type")
+    return matches[0]
+
+
+def _chunk_count(csv_path: str) -> int:
+    """Upper bound on the chunks import_files() reads (a quoted field may span lines)."""
+    with open(csv_path, "rb") as f:
+        lines = sum(1 for _ in f)
+    return max(1, -(-(lines - 1) // settings.import_chunk_rows))
+
+
+def run_job(job_id: str):
+    """Import a received upload (blocking; the route runs it in the background)."""
+    job = _jobs[job_id]
+    job.status = "running"
+    csv_path = job.path
+    try:
+        with using_corpus(job.corpus):
+            if job.path.endswith(".xlsx"):
+                csv_path = job.path[:-len(".xlsx")] + ".csv"
+                xlsx_to_csv(job.path, csv_path)
+            mapping = mapping_for(job.doc_type) if job.doc_type else detect_mapping(_header(csv_path))
+            job.doc_type = mapping.doc_type
+            # Exports number rows from 1 (or not at all): keep this upload's serials its own
+            job.serial_prefix = f"{mapping.serial_prefix}-{job.id[:8]}-"
+            mapping = replace(mapping, serial_prefix=job.serial_prefix)
+
+            with open(job.report_path, "w", newline="", encoding="utf-8") as report:
+                writer = csv.writer(report)
+                writer.writerow(REJECTED_COLUMNS)
+
+                def progress(_, summary: dict, rejected: list):
+                    writer.writerows(rejected)
+                    job.rows = sum(summary[key] for key in ("inserted", "updated", "unchanged", "skipped"))
+                    job.rejected += len(rejected)
+                    job.summary = dict(summary)
+
+                # An upload is a one-off file: no ledger entry, and no more parse
+                # processes than it has chunks (a small file is parsed inline)
+                workers = min(settings.import_workers or os.cpu_count() or 1, _chunk_count(csv_path))
+                summary = import_files([(csv_path, mapping)], workers=workers, progress=progress,
+                                       record_ledger=False)[0]
+            job.summary = {**summary, "source": job.filename}
+            if summary["imported"]:
+                job.summary["duplicates"] = build_duplicate_index()
+        job.status = "done"
+    except Exception as e:
+        logger.exception("Upload import %s (%s) failed", job.id, job.filename)
+        job.status, job.error = "failed", str(e)
+    finally:
+        job.finished_at = time.time()
+        for path in {job.path, csv_path}:
+            Path(path).unlink(missing_ok=True)
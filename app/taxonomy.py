@@ -3,8 +3,14 @@ Ferrofluid classification taxonomy.
 
 Source: FEROFLUIDS_CLASS_DEFINITION.txt
 30 class codes across 5 major categories.
+
+This is the default corpus's taxonomy module. The helpers below work on the
+taxonomy of the current corpus (see app.corpus), whose module defines
+TAXONOMY the same way and optionally PROMPT_HEADER.
 """
 
+import hashlib
+import json
 from dataclasses import dataclass
 
 
@@ -52,6 +58,8 @@ TAXONOMY: dict[int, ClassCode] = {
 
 VALID_CODES = set(TAXONOMY.keys())
 
+PROMPT_HEADER = "FERROFLUID CLASSIFICATION CODES:"
+
 MAJOR_CATEGORIES = {
     1: "Material",
     2: "Computation",
@@ -61,29 +69,66 @@ MAJOR_CATEGORIES = {
 }
 
 
+def _module():
+    # Imported here: app.corpus loads taxonomy modules, this one included
+    from app.corpus import current_corpus
+    return current_corpus().taxonomy()
+
+
+def classes() -> dict[int, ClassCode]:
+    """The current corpus's class codes."""
+    return _module().TAXONOMY
+
+
+def valid_codes() -> set[int]:
+    return set(classes())
+
+
 def get_class_description(code: int) -> str:
     """Return 'Major Category > Description' for a class code."""
-    if code in TAXONOMY:
-        c = TAXONOMY[code]
+    taxonomy = classes()
+    if code in taxonomy:
+        c = taxonomy[code]
         return f"{c.major_category} > {c.description}"
     return f"Unknown class ({code})"
 
 
 def get_major_category(code: int) -> str:
     """Return the major category for a class code."""
-    if code in TAXONOMY:
-        return TAXONOMY[code].major_category
+    taxonomy = classes()
+    if code in taxonomy:
+        return taxonomy[code].major_category
     return "Unknown"
 
 
 def format_taxonomy_for_prompt() -> str:
     """Format the full taxonomy as text for inclusion in AI prompts."""
-    lines = ["FERROFLUID CLASSIFICATION CODES:", ""]
+    module = _module()
+    lines = [getattr(module, "PROMPT_HEADER", "CLASSIFICATION CODES:"), ""]
     current_major = ""
-    for code in sorted(TAXONOMY.keys()):
-        c = TAXONOMY[code]
+    for code in sorted(module.TAXONOMY.keys()):
+        c = module.TAXONOMY[code]
         if c.major_category != current_major:
             current_major = c.major_category
             lines.append(f"--- {current_major.upper()} ---")
         lines.append(f"  {c.code}: {c.description}")
     return "\n".join(lines)
+
+
+def taxonomy_snapshot() -> dict[str, str]:
+    """Return {code: 'Major Category > Description'} for versioning and diffing."""
+    return {str(code): get_class_description(code) for code in sorted(classes().keys())}
+
+
+def taxonomy_version(snapshot: dict[str, str] = None) -> str:
+    """Short content hash of the taxonomy; changes whenever any class changes."""
+    snapshot = snapshot if snapshot is not None else taxonomy_snapshot()
+    payload = json.dumps(snapshot, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:12]
+
+
+def changed_classes(old_snapshot: dict[str, str], new_snapshot: dict[str, str] = None) -> set[int]:
+    """Class codes added, removed or re-described between two snapshots."""
+    new_snapshot = new_snapshot if new_snapshot is not None else taxonomy_snapshot()
+    codes = set(old_snapshot) | set(new_snapshot)
+    return {int(c) for c in codes if old_snapshot.get(c) != new_snapshot.get(c)}
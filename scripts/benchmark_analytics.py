@@ -0,0 +1,86 @@
+"""
+Benchmark the aggregate analytics queries on SQLite vs DuckDB.
+
+Builds synthetic databases at 1x, 10x and 100x a base corpus size (see
+scripts/query_plans.build_synthetic_db), then times each function in
+app.db.analytics on ANALYTICS_ENGINE=sqlite and, after one snapshot refresh,
+on ANALYTICS_ENGINE=duckdb (median of several runs each).
+
+Usage: python -m scripts.benchmark_analytics [base_documents] [runs]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from app.config import settings
+from app.db import analytics
+from app.db.connection import close_pools
+from scripts.query_plans import build_synthetic_db
+
+BASE = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+RUNS = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+SCALES = (1, 10, 100)
+
+QUERIES = {
+    "disagreement_pairs": analytics.disagreement_pairs,
+    "major_category_agreement": analytics.major_category_agreement,
+    "human_picks": analytics.human_picks,
+    "year_range": analytics.year_range,
+    "link_stats": analytics.link_stats,
+    "decade_counts": lambda: analytics.decade_counts("paper"),
+    "class_counts_by_year": lambda: analytics.class_counts_by_year("patent"),
+}
+
+
+def _median_ms(fn) -> float:
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+def run(documents: int) -> dict:
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    settings.db_path = tmp.name
+    try:
+        build_synthetic_db(tmp.name, documents)
+        settings.analytics_engine = "sqlite"
+        sqlite = {name: _median_ms(fn) for name, fn in QUERIES.items()}
+        expected = {name: fn() for name, fn in QUERIES.items()}
+
+        settings.analytics_engine = "duckdb"
+        load_ms = analytics.refresh_snapshot(force=True)["load_ms"]
+        duck = {name: _median_ms(fn) for name, fn in QUERIES.items()}
+        mismatched = [name for name, fn in QUERIES.items() if fn() != expected[name]]
+        if mismatched:
+            raise AssertionError(f"DuckDB answers differ from SQLite: {mismatched}")
+        return {"sqlite": sqlite, "duckdb": duck, "load_ms": load_ms}
+    finally:
+        analytics.close_snapshots(tmp.name)
+        close_pools(tmp.name)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(tmp.name + suffix):
+                os.unlink(tmp.name + suffix)
+
+
+if __name__ == "__main__":
+    if analytics.duckdb is None:
+        sys.exit("duckdb is not installed (pip install duckdb)")
+    original = (settings.db_path, settings.analytics_engine)
+    for scale in SCALES:
+        documents = BASE * scale
+        result = run(documents)
+        print(f"\n{scale}x: {documents} documents, DuckDB snapshot load {result['load_ms']}ms")
+        print(f"{'':28}{'sqlite ms':>12}{'duckdb ms':>12}{'speedup':>10}")
+        for name in QUERIES:
+            before, after = result["sqlite"][name], result["duckdb"][name]
+            print(f"{name:28}{before:>12}{after:>12}{before / after if after else 0:>9.1f}x")
+        total_before, total_after = sum(result["sqlite"].values()), sum(result["duckdb"].values())
+        print(f"{'total':28}{round(total_before, 2):>12}{round(total_after, 2):>12}"
+              f"{total_before / total_after if total_after else 0:>9.1f}x")
+    settings.db_path, settings.analytics_engine = original
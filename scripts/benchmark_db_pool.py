@@ -0,0 +1,92 @@
+"""
+Benchmark pooled vs per-call SQLite connections.
+
+Builds a throwaway database, then measures
+  - per-request latency of GET /dashboard/api/results
+  - pipeline-style write throughput (2 AI results + final classification per document)
+with DB_POOL_SIZE=0 (a new connection per transaction) and with the pool enabled.
+
+Usage: python -m scripts.benchmark_db_pool [documents] [requests]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+
+from app import db
+from app.config import settings
+from app.db.connection import transaction
+from app.main import app
+
+DOCUMENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+REQUESTS = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+POOL_SIZE = settings.db_pool_size or 8
+
+
+def _seed(n: int):
+    with transaction() as conn:
+        for i in range(n):
+            serial = f"B{i:06d}"
+            db.insert_document(serial, "paper" if i % 2 else "patent", f"Title {i}",
+                               f"abstract {i}", 2000 + i % 25, [], None, {}, conn=conn)
+
+
+def _classify(serials: list[str]) -> float:
+    """Write results the way pipeline.classify_one does; returns documents per second."""
+    start = time.perf_counter()
+    for i, serial in enumerate(serials):
+        code = 11 + i % 5
+        with transaction() as conn:
+            db.save_ai_result(serial, "gpt", code, 13, 14, "gpt", conn=conn)
+            db.save_ai_result(serial, "claude", code, 13, 14, "claude", conn=conn)
+            db.finalize_classification(serial, code, 13, 14, "agreed", "agreed", conn=conn)
+    return len(serials) / (time.perf_counter() - start)
+
+
+def _latency(client: TestClient, path: str, n: int) -> dict:
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        client.get(path).raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": round(statistics.mean(timings), 2),
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "p95_ms": round(timings[int(len(timings) * 0.95)], 2),
+    }
+
+
+def run(pool_size: int) -> dict:
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    settings.db_path = tmp.name
+    settings.db_pool_size = pool_size
+    try:
+        db.init_db()
+        _seed(DOCUMENTS)
+        writes = _classify([f"B{i:06d}" for i in range(DOCUMENTS)])
+        latency = _latency(TestClient(app), "/dashboard/api/results", REQUESTS)
+        return {"writes_per_second": round(writes, 1), "dashboard_results": latency}
+    finally:
+        db.close_pools(tmp.name)
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(tmp.name + suffix):
+                os.unlink(tmp.name + suffix)
+
+
+if __name__ == "__main__":
+    original = (settings.db_path, settings.db_pool_size)
+    print(f"{DOCUMENTS} documents, {REQUESTS} requests\n")
+    before = run(0)
+    after = run(POOL_SIZE)
+    settings.db_path, settings.db_pool_size = original
+
+    print(f"{'':28}{'per-call':>12}{'pooled':>12}")
+    print(f"{'pipeline writes/s':28}{before['writes_per_second']:>12}{after['writes_per_second']:>12}")
+    for key in ("mean_ms", "p50_ms", "p95_ms"):
+        label = f"/dashboard/api/results {key}"
+        print(f"{label:28}{before['dashboard_results'][key]:>12}{after['dashboard_results'][key]:>12}")
@@ -0,0 +1,155 @@
+"""
+Benchmark the streaming CSV importer against the previous iterrows importer.
+
+Writes a synthetic Lens patent export (the columns of data/MANI_KW_PATENTS_*,
+random abstracts, some blank and duplicate rows), then imports it into a
+fresh database with each importer in its own process, reporting wall time,
+rows per second and the process's peak resident memory. The streaming run
+then re-imports the same file (skipped by the import ledger) and an updated
+export with 1% of the abstracts revised (only those rows are written).
+The streaming importer parses on `workers` processes (default IMPORT_WORKERS).
+
+Usage: python -m scripts.benchmark_import [rows] [chunk_rows] [workers] [--skip-legacy]
+"""
+import csv
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 1_000_000
+CHUNK_ROWS = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else 10_000
+WORKERS = int(sys.argv[3]) if len(sys.argv) > 3 and sys.argv[3].isdigit() else None
+SKIP_LEGACY = "--skip-legacy" in sys.argv
+
+COLUMNS = [
+    "#", "Jurisdiction", "Kind", "Display Key", "Lens ID", "Publication Date", "Publication Year",
+    "Application Number", "Application Date", "Priority Numbers", "Title", "Abstract", "Applicants",
+    "Inventors", "Owners", "URL", "Document Type", "Has Full Text", "Cites Patent Count",
+    "Cited by Patent Count", "Simple Family Size", "CPC Classifications", "IPCR Classifications",
+    "Legal Status",
+]
+WORDS = ("magnetic fluid ferrofluid seal bearing nanoparticle colloid viscosity field gradient "
+         "damper sensor actuator surfactant carrier oil suspension droplet pump cooling "
+         "transformer loudspeaker lubricant rotary shaft stability aggregation").split()
+
+
+def write_export(path: str, rows: int, seed: int = 7, revise_every: int = 0):
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for i in range(1, rows + 1):
+            year = rng.randint(1969, 2024)
+            title = " ".join(rng.choices(WORDS, k=8)).upper()
+            if i % 50 == 0:
+                title = "MAGNETIC FLUID SEAL"  # repeated titles are skipped
+            abstract = "" if i % 97 == 0 else " ".join(rng.choices(WORDS, k=rng.randint(60, 140)))
+            if revise_every and i % revise_every == 1:
+                abstract += " revised"
+            lens_id = f"{rng.randint(0, 999):03d}-{rng.randint(0, 999):03d}-{rng.randint(0, 999):03d}"
+            writer.writerow([
+                i, "US", "A1", f"US {year}/{i:07d} A1", lens_id, f"{year}-03-19", year,
+                f"US {year}{i:08d} A", f"{year}-01-15", f"US {year}{i:08d} A",
+                title, abstract, "ACME CORP;;MAGNETICS INC", "DOE JANE;SMITH JOHN",
+                "ACME CORP", f"https://lens.org/{lens_id}", "Patent Application", "yes",
+                rng.randint(0, 40), rng.randint(0, 40), rng.randint(1, 20), "H01F1/44;;F16J15/43",
+                "H01F1/44", "PENDING",
+            ])
+
+
+def _legacy_import(csv_path: str, mapping) -> dict:
+    """The importer as it was before streaming: whole file, iterrows, one row per insert."""
+    import pandas as pd
+
+    from app import db
+    from app.db.connection import tuned_transaction
+    from app.services.importer import _clean_int, _clean_str
+
+    df = pd.read_csv(csv_path)
+    imported = skipped = 0
+    seen_titles = set()
+    with tuned_transaction("bulk_load") as conn:
+        for _, row in df.iterrows():
+            title = _clean_str(row.get("Title"))
+            abstract = _clean_str(row.get("Abstract"))
+            if not title or not abstract or title.lower() in seen_titles:
+                skipped += 1
+                continue
+            seen_titles.add(title.lower())
+            raw_serial = row.get("#")
+            serial = (f"{mapping.serial_prefix}{raw_serial}" if pd.notna(raw_serial)
+                      else f"{mapping.serial_prefix}_auto_{imported}")
+            authors_raw = _clean_str(row.get(mapping.authors_column))
+            authors = ([a.strip() for a in authors_raw.split(mapping.authors_delimiter) if a.strip()]
+                       if authors_raw else [])
+            db.insert_document(serial, mapping.doc_type, title, abstract,
+                               _clean_int(row.get(mapping.year_column)),
+                               authors, _clean_str(row.get(mapping.source_column)),
+                               {col: (None if pd.isna(row[col]) else row[col]) for col in df.columns},
+                               conn=conn)
+            imported += 1
+    return {"imported": imported, "skipped": skipped}
+
+
+def _run(args) -> dict:
+    # In a fresh process, so peak RSS belongs to this importer alone
+    which, csv_path, db_path = args
+    from app import db
+    from app.config import settings
+    from app.services.importer import PATENT_MAPPING, import_csv
+
+    settings.db_path = db_path
+    db.init_db()
+    start = time.perf_counter()
+    if which == "legacy":
+        result = _legacy_import(csv_path, PATENT_MAPPING)
+    else:
+        result = import_csv(csv_path, PATENT_MAPPING, chunk_rows=CHUNK_ROWS, workers=WORKERS)
+    elapsed = time.perf_counter() - start
+    summary = {
+        "imported": result["imported"], "skipped": result["skipped"], "seconds": round(elapsed, 1),
+        "rows_per_second": round((result["imported"] + result["skipped"]) / elapsed),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024,
+    }
+    if which == "streaming":
+        start = time.perf_counter()
+        assert import_csv(csv_path, PATENT_MAPPING)["file_unchanged"]
+        summary["unchanged_reimport_seconds"] = round(time.perf_counter() - start, 3)
+
+        write_export(csv_path, ROWS, revise_every=100)
+        start = time.perf_counter()
+        result = import_csv(csv_path, PATENT_MAPPING, chunk_rows=CHUNK_ROWS, workers=WORKERS)
+        summary["updated_reimport_seconds"] = round(time.perf_counter() - start, 1)
+        summary["updated_reimport"] = {key: result[key] for key in ("inserted", "updated", "unchanged")}
+    db.close_pools()
+    return summary
+
+
+if __name__ == "__main__":
+    workdir = tempfile.mkdtemp()
+    csv_path = os.path.join(workdir, "lens_export.csv")
+    try:
+        write_export(csv_path, ROWS)
+        print(f"{ROWS} rows, {os.path.getsize(csv_path) / 1e6:.0f} MB CSV, chunks of {CHUNK_ROWS}, "
+              f"{WORKERS or 'IMPORT_WORKERS'} workers on {os.cpu_count()} cores\n")
+        runs = ["streaming"] if SKIP_LEGACY else ["legacy", "streaming"]
+        results = {}
+        ctx = multiprocessing.get_context("spawn")
+        for which in runs:
+            db_path = os.path.join(workdir, f"{which}.db")
+            # An executor, not multiprocessing.Pool: its worker may start the import's own pool
+            with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+                results[which] = pool.submit(_run, (which, csv_path, db_path)).result()
+            print(which, json.dumps(results[which]))
+        if len(results) == 2 and results["legacy"]["imported"] != results["streaming"]["imported"]:
+            raise AssertionError("The importers imported different row counts")
+    finally:
+        for name in os.listdir(workdir):
+            os.unlink(os.path.join(workdir, name))
+        os.rmdir(workdir)
@@ -0,0 +1,109 @@
+"""
+Benchmark keeping original_data inline in documents vs in compressed document_raw.
+
+Imports a CSV into a throwaway database (current layout), builds a copy with
+the old layout (original_data as a JSON TEXT column of documents), then
+compares
+  - bytes occupied by the documents table (the working set of every d.* scan)
+  - bytes for the source rows (plain JSON column vs zlib document_raw)
+  - time for a full `SELECT * FROM documents` scan
+  - time for the unclassified-documents query the pipeline runs
+
+Usage: python -m scripts.benchmark_original_data [csv] [repeats]
+"""
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from app import db
+from app.config import settings
+from app.services.importer import PATENT_MAPPING, import_csv
+
+CSV = sys.argv[1] if len(sys.argv) > 1 else "data/MANI_KW_PATENTS_A_weds1969to2009.csv"
+REPEATS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+UNCLASSIFIED = """SELECT d.* FROM documents d
+                  LEFT JOIN classifications c ON d.serial_number = c.serial_number
+                  WHERE c.serial_number IS NULL AND d.abstract IS NOT NULL AND d.abstract != ''"""
+
+
+def _build_legacy(current: str, legacy: str):
+    src = sqlite3.connect(current)
+    dst = sqlite3.connect(legacy)
+    dst.executescript("""
+        CREATE TABLE documents (
+            serial_number TEXT PRIMARY KEY, doc_type TEXT NOT NULL, title TEXT, abstract TEXT,
+            year INTEGER, authors TEXT, source TEXT, original_data TEXT NOT NULL
+        );
+        CREATE TABLE classifications (serial_number TEXT PRIMARY KEY, status TEXT);
+    """)
+    rows = src.execute(
+        """SELECT d.serial_number, d.doc_type, d.title, d.abstract, d.year, d.authors, d.source, r.data
+           FROM documents d JOIN document_raw r ON d.serial_number = r.serial_number"""
+    )
+    dst.executemany(
+        "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ((*row[:7], json.dumps(db.unpack_original(row[7]), default=str)) for row in rows),
+    )
+    dst.commit()
+    src.close()
+    dst.close()
+
+
+def _table_bytes(conn: sqlite3.Connection, table: str) -> int:
+    return conn.execute("SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name = ?", (table,)).fetchone()[0]
+
+
+def _timed_ms(conn: sqlite3.Connection, query: str) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        conn.execute(query).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+def measure(path: str) -> dict:
+    conn = sqlite3.connect(path)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+    if "original_data" in columns:
+        raw = conn.execute("SELECT SUM(length(original_data)) FROM documents").fetchone()[0]
+    else:
+        raw = _table_bytes(conn, "document_raw")
+    result = {
+        "documents_table_kb": _table_bytes(conn, "documents") // 1024,
+        "source_rows_kb": raw // 1024,
+        "scan_ms": _timed_ms(conn, "SELECT * FROM documents"),
+        "unclassified_ms": _timed_ms(conn, UNCLASSIFIED),
+    }
+    conn.close()
+    return result
+
+
+if __name__ == "__main__":
+    original = settings.db_path
+    current = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    legacy = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    os.unlink(legacy)
+    try:
+        settings.db_path = current
+        db.init_db()
+        imported = import_csv(CSV, PATENT_MAPPING)["imported"]
+        db.close_pools(current)
+        _build_legacy(current, legacy)
+
+        print(f"{CSV}: {imported} documents, median of {REPEATS} runs\n")
+        before, after = measure(legacy), measure(current)
+        print(f"{'':24}{'inline':>12}{'side table':>12}")
+        for key in before:
+            print(f"{key:24}{before[key]:>12}{after[key]:>12}")
+    finally:
+        settings.db_path = original
+        for path in (current, legacy):
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
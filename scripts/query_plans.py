@@ -0,0 +1,345 @@
+"""
+Query-plan check and index advisor.
+
+Builds a synthetic database, runs a workload through the API routes and
+the services (so the SQL is exactly what app/db, app/services and
+app/routes execute), records every statement with the function that ran
+it, and runs EXPLAIN QUERY PLAN on each. Plans are flagged for
+  - full table scans (SCAN <table> with no index), except of SMALL_TABLES
+  - temp B-tree sorts (USE TEMP B-TREE FOR ORDER BY / GROUP BY / DISTINCT)
+For each flagged statement a composite index over its equality, range and
+ORDER BY columns is tried, extended to a covering index if that helps, and
+reported only if the flag goes away.
+
+tests/test_query_plans.py runs the same check and fails on any flag that
+is not in its accepted list, so new queries can't silently regress.
+
+Usage: python -m scripts.query_plans [documents]
+"""
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import traceback
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+from app import db
+from app.config import settings
+from app.db.connection import traced, transaction
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+# Bounded by taxonomy size or single-row: scanning them is the cheapest plan
+SMALL_TABLES = {"data_version", "class_counts", "class_cooccurrence", "taxonomy_versions",
+                "sqlite_master", "sqlite_schema", "sqlite_stat1", "sqlite_sequence", "change_consumers"}
+
+_STATUSES = ["agreed"] * 6 + ["disagreed"] * 2 + ["human_reviewed", "pending", "pending_second_opinion"]
+_WORDS = ("ferrofluid magnetic seal bearing damper nanoparticle colloid viscosity sensor "
+          "actuator cooling loudspeaker drug delivery hyperthermia surfactant field").split()
+
+_SQL_KEYWORDS = {"WHERE", "ON", "LEFT", "JOIN", "INNER", "CROSS", "ORDER", "GROUP", "LIMIT",
+                 "USING", "AND", "OR", "SET", "VALUES", "SELECT", "UNION", "HAVING", "AS"}
+
+
+@dataclass
+class Statement:
+    sql: str
+    origin: str  # "app/db/documents.py:get_documents_page"
+
+
+@dataclass
+class PlanReport:
+    statement: Statement
+    plan: list[str]
+    findings: list[str]
+    suggestions: list[str] = field(default_factory=list)
+
+
+def build_synthetic_db(path: str, documents: int = 20000, seed: int = 7):
+    """Initialize `path` and fill it with `documents` documents and proportionate related rows."""
+    rng = random.Random(seed)
+    original = settings.db_path
+    settings.db_path = path
+    try:
+        db.init_db()
+        papers = [f"P{i}" for i in range(documents * 2 // 3)]
+        patents = [f"PT{i}" for i in range(documents - len(papers))]
+        with transaction() as conn:
+            for serials, doc_type in ((papers, "paper"), (patents, "patent")):
+                conn.executemany(
+                    "INSERT INTO documents (serial_number, doc_type, title, abstract, year, authors, source) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((s, doc_type, " ".join(rng.choices(_WORDS, k=6)), " ".join(rng.choices(_WORDS, k=60)),
+                      rng.choice([None] + list(range(1969, 2025))), f'["Author {rng.randrange(500)}"]',
+                      f"Source {rng.randrange(50)}") for s in serials),
+                )
+                conn.executemany(
+                    "INSERT INTO document_raw (serial_number, data) VALUES (?, ?)",
+                    ((s, db.documents.pack_original({"Title": s, "Assignee": f"Company {rng.randrange(300)}"}))
+                     for s in serials),
+                )
+            classified = rng.sample(papers + patents, int(documents * 0.8))
+            for model in ("gpt", "claude"):
+                conn.executemany(
+                    "INSERT INTO ai_results (serial_number, model_name, primary_code, secondary_code, "
+                    "tertiary_code, reasoning, prompt_version, taxonomy_version) VALUES (?, ?, ?, ?, ?, ?, 'v1', 'v1')",
+                    ((s, model, rng.randrange(11, 48), rng.randrange(11, 48), rng.randrange(11, 48), "reasoning")
+                     for s in classified),
+                )
+            conn.executemany(
+                "INSERT INTO classifications (serial_number, final_primary, final_secondary, final_tertiary, "
+                "final_reasoning, status) VALUES (?, ?, ?, ?, 'reasoning', ?)",
+                ((s, rng.randrange(11, 48), rng.randrange(11, 48), rng.randrange(11, 48), rng.choice(_STATUSES))
+                 for s in classified),
+            )
+            conn.executemany(
+                "INSERT INTO ai_results_history (serial_number, model_name, primary_code, secondary_code, "
+                "tertiary_code, prompt_version, taxonomy_version) VALUES (?, 'gpt', ?, ?, ?, 'v0', 'v0')",
+                ((s, rng.randrange(11, 48), rng.randrange(11, 48), rng.randrange(11, 48))
+                 for s in classified[: len(classified) // 10]),
+            )
+            for patent in patents:
+                for paper in rng.sample(papers, 3):
+                    conn.execute("INSERT INTO paper_patent_links VALUES (?, ?, ?)", (patent, paper, rng.random()))
+                if rng.random() < 0.2:
+                    conn.execute("INSERT OR IGNORE INTO assignee_crossrefs VALUES (?, ?, ?)",
+                                 (patent, rng.choice(papers), "Company"))
+            conn.executemany(
+                "INSERT INTO duplicate_groups (serial_number, representative, similarity) VALUES (?, ?, 0.9)",
+                ((s, papers[0]) for s in rng.sample(papers[1:], len(papers) // 50)),
+            )
+            db.rebuild_aggregates(conn)
+            conn.execute("ANALYZE")
+    finally:
+        db.close_pools(path)
+        settings.db_path = original
+
+
+def run_workload(output_dir: str):
+    """Exercise the routes and services whose SQL the check covers (against settings.db_path)."""
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.services import export, linking
+    from app.services.dedup import propagate_labels
+    from app.services.reclassify import select_stale
+
+    client = TestClient(app)
+    for url in ["/documents/stats", "/documents/?doc_type=paper&limit=20", "/documents/?offset=40&limit=20",
+                "/documents/search?q=magnetic+seal&doc_type=patent&year_from=1990",
+                "/documents/search?q=ferro*&primary=21&status=agreed", "/documents/P1",
+                "/review/pending", "/review/ui/stats", "/review/ui/next", "/review/ui/reviewed",
+                "/progress/api", "/dashboard/api/overview", "/dashboard/api/gap-analysis",
+                "/dashboard/api/classified?doc_type=paper&limit=50", "/dashboard/api/classified?offset=50",
+                "/dashboard/api/links?limit=50", "/dashboard/api/crossrefs", "/dashboard/api/results",
+                "/analysis/gaps", "/analysis/gaps/by-year", "/analysis/gaps/five-year",
+                "/analysis/duplicates", "/analysis/aggregates/check", "/analysis/changes?since=100&limit=50",
+                "/classify/stale?model=gpt", "/classify/changes?model=gpt", "/graph/?include_docs=true"]:
+        response = client.get(url)
+        assert response.status_code == 200, f"{url}: {response.status_code} {response.text[:200]}"
+        # Follow cursors so the keyset branches run too
+        body = response.json() if response.headers["content-type"].startswith("application/json") else {}
+        if isinstance(body, dict) and body.get("next_cursor"):
+            sep = "&" if "?" in url else "?"
+            assert client.get(f"{url}{sep}cursor={body['next_cursor']}").status_code == 200
+        if url == "/review/ui/next" and body.get("serial_number"):
+            assert client.get(f"{url}?after={body['serial_number']}").status_code == 200
+
+    db.get_unclassified_documents("paper")
+    db.get_pending_second_opinion("claude")
+    db.get_pending_abstract_lengths()
+    select_stale("gpt", changed_only=True, classes={21, 22}, doc_type="patent")
+    linking.crossref_assignees()
+    linking.link_patents_to_papers()
+    propagate_labels()
+    for fn in (export.export_classified_papers, export.export_classified_patents, export.export_gap_analysis,
+               export.export_patent_paper_links, export.export_assignee_crossrefs, export.export_disagreements):
+        fn(os.path.join(output_dir, f"{fn.__name__}.csv"))
+
+    linking.crossref_assignees()
+    disagreed = next(c["serial_number"] for c in db.get_classifications_by_status("disagreed")
+                     if c["serial_number"].startswith("PT"))
+    db.save_ai_result(disagreed, "gpt", 21, 22, 23, "new reasoning")
+    assert client.post("/review/resolve", json={
+        "serial_number": disagreed, "primary": 21, "secondary": 22, "tertiary": 23,
+    }).status_code == 200
+    # Only the resolved patent changed since the last run: the incremental path
+    assert not linking.crossref_assignees()["full"]
+
+
+def _origin() -> Optional[str]:
+    """The innermost app/ function on the current stack."""
+    for frame in reversed(traceback.extract_stack()):
+        path = Path(frame.filename)
+        if APP_DIR in path.parents:
+            return f"{path.relative_to(APP_DIR.parent)}:{frame.name}"
+    return None
+
+
+def _normalize(sql: str) -> str:
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\(\s*\?(\s*,\s*\?)*\s*\)", "(?)", sql)
+    return " ".join(sql.split())
+
+
+def capture(workload: Callable[[], None]) -> list[Statement]:
+    """Distinct queries (SELECT, UPDATE, DELETE, INSERT ... SELECT) run by `workload`, with their origin."""
+    seen: dict[tuple[str, str], Statement] = {}
+
+    def record(sql: str):
+        text = sql.strip()
+        head = text.split(None, 1)[0].upper() if text else ""
+        if head not in ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT"):
+            return
+        if head == "INSERT" and "SELECT" not in text.upper():
+            return
+        origin = _origin()
+        if origin is None:
+            return
+        seen.setdefault((origin, _normalize(text)), Statement(text, origin))
+
+    with traced(record):
+        workload()
+    return list(seen.values())
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> list[str]:
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def table_aliases(sql: str) -> dict[str, str]:
+    """alias -> table for every FROM/JOIN in `sql` (a table with no alias maps to itself)."""
+    aliases = {}
+    for table, alias in re.findall(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", sql, re.IGNORECASE):
+        aliases[table] = table
+        if alias and alias.upper() not in _SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def find_problems(plan: list[str], aliases: dict[str, str]) -> list[str]:
+    """Flags for full scans of non-small tables and for temp B-tree sorts (unless every table is small)."""
+    findings = []
+    only_small = bool(aliases) and set(aliases.values()) <= SMALL_TABLES
+    for detail in plan:
+        match = re.match(r"SCAN (\w+)$", detail)
+        if match:
+            table = aliases.get(match.group(1), match.group(1))
+            if table not in SMALL_TABLES:
+                findings.append(f"SCAN {table}")
+        match = re.match(r"USE TEMP B-TREE FOR (.+)$", detail)
+        if match and not only_small:
+            findings.append(f"TEMP B-TREE FOR {match.group(1)}")
+    return sorted(set(findings))
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _candidate_columns(sql: str, alias: str, columns: list[str], single_table: bool) -> tuple[list, list]:
+    """(key columns, other referenced columns) of `alias` in `sql`: equality, then range/ORDER BY."""
+    qualifier = rf"\b{re.escape(alias)}\." if not single_table else r"(?<![\w.])"
+    names = "|".join(re.escape(c) for c in columns)
+    where = re.split(r"\bORDER\s+BY\b", sql, flags=re.IGNORECASE)
+    order = where[1] if len(where) > 1 else ""
+    equality = re.findall(rf"{qualifier}({names})\s*(?:=|IN\s*\()", where[0], re.IGNORECASE)
+    ranged = re.findall(rf"{qualifier}({names})\s*(?:>=|<=|>|<|BETWEEN)", where[0], re.IGNORECASE)
+    ordered = re.findall(rf"{qualifier}({names})\b", order, re.IGNORECASE)
+    grouped = re.findall(rf"GROUP\s+BY\s+.*?{qualifier}({names})\b", sql, re.IGNORECASE)
+    keys = list(dict.fromkeys(equality + (ordered or grouped or ranged[:1])))
+    referenced = re.findall(rf"{qualifier}({names})\b", sql, re.IGNORECASE)
+    return keys, [c for c in dict.fromkeys(referenced) if c not in keys]
+
+
+def _improves(conn: sqlite3.Connection, sql: str, table: str, columns: list[str],
+              before: list[str], aliases: dict[str, str]) -> Optional[list[str]]:
+    conn.execute(f"CREATE INDEX advisor_candidate ON {table}({', '.join(columns)})")
+    try:
+        conn.execute(f"ANALYZE advisor_candidate")
+        plan = explain(conn, sql)
+    finally:
+        conn.execute("DROP INDEX advisor_candidate")
+    after = find_problems(plan, aliases)
+    return plan if len(after) < len(before) else None
+
+
+def suggest_indexes(conn: sqlite3.Connection, sql: str, findings: list[str]) -> list[str]:
+    """CREATE INDEX statements that remove at least one finding, verified against the plan."""
+    aliases = table_aliases(sql)
+    single_table = len(set(aliases.values())) == 1
+    suggestions = []
+    for alias, table in aliases.items():
+        if table in SMALL_TABLES or (alias != table and table in aliases and alias in aliases.values()):
+            continue
+        try:
+            columns = _columns(conn, table)
+        except sqlite3.Error:
+            continue
+        if not columns:
+            continue
+        keys, others = _candidate_columns(sql, alias, columns, single_table)
+        if not keys:
+            continue
+        plan = _improves(conn, sql, table, keys, findings, aliases)
+        if plan is None:
+            continue
+        chosen = keys
+        if others and len(keys) + len(others) <= 6 and not any("COVERING" in d for d in plan):
+            covering = _improves(conn, sql, table, keys + others, findings, aliases)
+            if covering is not None and any("COVERING" in d for d in covering):
+                chosen = keys + others
+        statement = f"CREATE INDEX idx_{table}_{'_'.join(chosen)} ON {table}({', '.join(chosen)})"
+        if statement not in suggestions:
+            suggestions.append(statement)
+    return suggestions
+
+
+def check(db_path: str, statements: list[Statement]) -> list[PlanReport]:
+    conn = sqlite3.connect(db_path)
+    try:
+        reports = []
+        for statement in statements:
+            aliases = table_aliases(statement.sql)
+            plan = explain(conn, statement.sql)
+            findings = find_problems(plan, aliases)
+            suggestions = suggest_indexes(conn, statement.sql, findings) if findings else []
+            reports.append(PlanReport(statement, plan, findings, suggestions))
+        return reports
+    finally:
+        conn.close()
+
+
+def run_check(documents: int = 20000) -> list[PlanReport]:
+    """Build a synthetic database, run the workload on it and check every captured statement."""
+    original = settings.db_path
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.db")
+        build_synthetic_db(path, documents)
+        settings.db_path = path
+        db.clear_cache()
+        try:
+            statements = capture(lambda: run_workload(tmp))
+            return check(path, statements)
+        finally:
+            db.close_pools(path)
+            db.clear_cache()
+            settings.db_path = original
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    reports = run_check(size)
+    flagged = [r for r in reports if r.findings]
+    print(f"{len(reports)} statements captured, {len(flagged)} flagged ({size} synthetic documents)\n")
+    for report in sorted(flagged, key=lambda r: r.statement.origin):
+        print(f"{report.statement.origin}: {', '.join(report.findings)}")
+        print("    " + " ".join(report.statement.sql.split())[:300])
+        for suggestion in report.suggestions:
+            print(f"    suggest: {suggestion}")
+        print()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+
+import pytest
+
+from app import db
+from app.config import settings
+from app.db.connection import transaction
+from app.services.gap_analysis import gap_summary, patent_class_frequency_by_year
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+def _classify(serial, doc_type, year, primary, secondary, status="agreed"):
+    db.insert_document(serial, doc_type, serial, "abstract", year, [], None, {})
+    db.save_ai_result(serial, "gpt", primary, secondary, 14, "r")
+    db.finalize_classification(serial, primary, secondary, 14, "r", status)
+
+
+def _counts(doc_type=None):
+    return {(r["doc_type"], r["final_primary"]): r["cnt"] for r in db.get_class_counts(doc_type)}
+
+
+class TestTriggers:
+    def test_insert_and_finalize(self):
+        _classify("P1", "paper", 2020, 11, 13)
+        _classify("P2", "paper", 2021, 11, 13)
+        _classify("PT1", "patent", 2020, 38, 11)
+
+        assert _counts() == {("paper", 11): 2, ("patent", 38): 1}
+        assert db.get_status_counts() == {"agreed": 3}
+        assert db.check_aggregates()["consistent"]
+
+    def test_status_change_moves_count(self):
+        _classify("P1", "paper", 2020, 11, 13, status="disagreed")
+        assert _counts() == {}
+        db.finalize_classification("P1", 12, 13, 14, "human", "human_reviewed")
+        assert _counts() == {("paper", 12): 1}
+        assert db.get_status_counts() == {"human_reviewed": 1}
+        assert db.check_aggregates()["consistent"]
+
+    def test_replace_and_delete(self):
+        _classify("P1", "paper", 2020, 11, 13)
+        with transaction() as conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO classifications (serial_number, final_primary, final_secondary, status)
+                   VALUES ('P1', 38, 11, 'agreed')"""
+            )
+        assert _counts() == {("paper", 38): 1}
+        with transaction() as conn:
+            conn.execute("DELETE FROM ai_results WHERE serial_number = 'P1'")
+            conn.execute("DELETE FROM classifications WHERE serial_number = 'P1'")
+        assert _counts() == {}
+        assert db.check_aggregates()["consistent"]
+
+    def test_document_reimport_keeps_counts(self):
+        _classify("P1", "paper", 2020, 11, 13)
+        db.insert_document("P1", "paper", "P1", "abstract", 2005, [], None, {})
+        years = {r["year"] for r in db.get_class_counts("paper", by_year=True)}
+        assert years == {2005}
+        assert db.check_aggregates()["consistent"]
+
+    def test_cooccurrence(self):
+        _classify("P1", "paper", 2020, 11, 13)
+        _classify("P2", "paper", 2020, 11, 13)
+        _classify("P3", "paper", 2020, 11, 11)
+        pairs = db.get_cooccurrence(min_count=2)
+        assert pairs == [{"final_primary": 11, "final_secondary": 13, "cnt": 2}]
+
+
+class TestRebuildAndCheck:
+    def test_check_detects_drift_and_rebuild_fixes_it(self):
+        _classify("P1", "paper", 2020, 11, 13)
+        with transaction() as conn:
+            conn.execute("UPDATE class_counts SET cnt = 5")
+        report = db.check_aggregates()
+        assert not report["consistent"]
+        assert report["class_counts"][0]["materialized"] == 5
+
+        db.rebuild_aggregates()
+        assert db.check_aggregates()["consistent"]
+
+    def test_init_db_backfills_existing_database(self):
+        _classify("P1", "paper", 2020, 11, 13)
+        with transaction() as conn:
+            conn.execute("DELETE FROM class_counts")
+        db.init_db()
+        assert _counts() == {("paper", 11): 1}
+
+
+class TestReadPaths:
+    def test_gap_summary_reads_aggregates(self):
+        _classify("P1", "paper", 2020, 11, 13)
+        _classify("PT1", "patent", 2020, 11, 13)
+        _classify("P2", "paper", 2020, 38, 13, status="disagreed")
+
+        summary = gap_summary()
+        by_code = {g["code"]: g for g in summary["by_class"]}
+        assert by_code[11]["papers"] == 1 and by_code[11]["patents"] == 1
+        assert by_code[38]["papers"] == 0
+        assert summary["total_papers_classified"] == 1
+
+    def test_frequency_by_year(self):
+        _classify("PT1", "patent", 2020, 11, 13)
+        _classify("PT2", "patent", None, 11, 13)
+        assert patent_class_frequency_by_year() == {2020: {11: 1}}
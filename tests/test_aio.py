@@ -0,0 +1,79 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+import httpx
+import pytest
+
+from app import db
+from app.config import settings
+from app.db import aio
+from app.main import app
+from app.routes import dashboard
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+class TestAsyncSurface:
+    def test_same_functions_as_db(self):
+        for name in db.__all__:
+            if name in ("get_connection", "transaction", "close_pools", "pool_stats",
+                        "clear_cache", "cache_stats", "unpack_original"):
+                continue
+            assert asyncio.iscoroutinefunction(getattr(aio, name)), name
+
+    def test_runs_off_the_event_loop(self):
+        db.insert_document("P1", "paper", "Test", "abstract", 2020, [], None, {})
+
+        async def main():
+            loop_thread = threading.get_ident()
+            seen = await aio.run(threading.get_ident)
+            doc = await aio.get_document("P1")
+            return loop_thread, seen, doc
+
+        loop_thread, seen, doc = asyncio.run(main())
+        assert seen != loop_thread
+        assert doc["title"] == "Test"
+
+    def test_honours_monkeypatched_db(self, monkeypatch):
+        monkeypatch.setattr(db, "count_documents", lambda: {"total": -1})
+        assert asyncio.run(aio.count_documents()) == {"total": -1}
+
+
+class TestConcurrentRequests:
+    def test_slow_query_does_not_block_other_requests(self, monkeypatch):
+        real_gap_summary = dashboard.gap_summary
+
+        def slow_gap_summary():
+            time.sleep(0.5)
+            return real_gap_summary()
+
+        monkeypatch.setattr(dashboard, "gap_summary", slow_gap_summary)
+
+        async def main():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                slow = asyncio.create_task(client.get("/dashboard/api/results"))
+                await asyncio.sleep(0.05)
+                start = time.perf_counter()
+                fast = await client.get("/dashboard/api/overview")
+                fast_elapsed = time.perf_counter() - start
+                slow_done_first = slow.done()
+                slow_response = await slow
+            return fast, fast_elapsed, slow_done_first, slow_response
+
+        fast, fast_elapsed, slow_done_first, slow_response = asyncio.run(main())
+        assert fast.status_code == 200
+        assert slow_response.status_code == 200
+        assert not slow_done_first
+        assert fast_elapsed < 0.4
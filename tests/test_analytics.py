@@ -0,0 +1,135 @@
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db
+from app.config import settings
+from app.db import analytics, maintenance
+from app.db.connection import transaction
+from app.main import app
+from app.services.gap_analysis import patent_class_frequency_by_year
+
+requires_duckdb = pytest.mark.skipif(analytics.duckdb is None, reason="duckdb is not installed")
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    _seed()
+    yield tmp.name
+    analytics.close_snapshots(tmp.name)
+    db.close_pools(tmp.name)
+    os.unlink(tmp.name)
+
+
+# serial, doc_type, year, status, final, gpt, claude
+_ROWS = [
+    ("P1", "paper", 1995, "agreed", 21, 21, 21),
+    ("P2", "paper", 2003, "disagreed", 21, 21, 34),
+    ("P3", "paper", None, "disagreed", 21, 21, 34),
+    ("P4", "paper", 2011, "human_reviewed", 34, 21, 34),
+    ("PT1", "patent", 2004, "disagreed", 22, 22, 25),
+    ("PT2", "patent", 2019, "human_reviewed", 22, 22, 41),
+    ("PT3", "patent", 2019, "pending", None, None, None),
+]
+
+
+def _seed():
+    with transaction() as conn:
+        for serial, doc_type, year, status, final, gpt, claude in _ROWS:
+            db.insert_document(serial, doc_type, f"Title {serial}", "abs", year, [], None, {}, conn=conn)
+            conn.execute("INSERT INTO classifications (serial_number, status, final_primary) VALUES (?, ?, ?)",
+                         (serial, status, final))
+            if gpt is not None:
+                db.save_ai_result(serial, "gpt", gpt, 11, 11, "r", conn=conn)
+                db.save_ai_result(serial, "claude", claude, 11, 11, "r", conn=conn)
+        conn.executemany("INSERT INTO paper_patent_links VALUES (?, ?, ?)",
+                         [("PT1", "P1", 0.5), ("PT1", "P2", 0.25), ("PT2", "P4", 0.75)])
+
+
+def _answers() -> dict:
+    return {
+        "pairs": analytics.disagreement_pairs(),
+        "major": analytics.major_category_agreement(),
+        "picks": analytics.human_picks(),
+        "years": analytics.year_range(),
+        "links": analytics.link_stats(),
+        "decades": analytics.decade_counts("paper"),
+        "by_year": analytics.class_counts_by_year("patent"),
+    }
+
+
+class TestQueries:
+    def test_sqlite_answers(self):
+        answers = _answers()
+        assert answers["pairs"] == [
+            {"gpt_code": 21, "claude_code": 34, "cnt": 3},
+            {"gpt_code": 22, "claude_code": 25, "cnt": 1},
+            {"gpt_code": 22, "claude_code": 41, "cnt": 1},
+        ]
+        assert answers["major"] == {"total": 3, "same_major": 1}
+        assert answers["picks"] == {"gpt": 1, "claude": 1}
+        assert answers["years"] == {"min": 1995, "max": 2019}
+        assert answers["links"] == {"total": 3, "avg_similarity": 0.5, "max_similarity": 0.75}
+        assert answers["decades"] == [{"decade": 1990, "cnt": 1}, {"decade": 2010, "cnt": 1}]
+        assert answers["by_year"] == [{"year": 2019, "final_primary": 22, "cnt": 1}]
+
+    def test_unknown_engine(self, monkeypatch):
+        monkeypatch.setattr(settings, "analytics_engine", "clickhouse")
+        with pytest.raises(ValueError, match="Unknown analytics engine"):
+            analytics.human_picks()
+
+    def test_missing_duckdb_falls_back(self, monkeypatch):
+        monkeypatch.setattr(settings, "analytics_engine", "duckdb")
+        monkeypatch.setattr(analytics, "duckdb", None)
+        assert analytics.refresh_snapshot() == {"skipped": "analytics engine is sqlite"}
+        assert analytics.human_picks() == {"gpt": 1, "claude": 1}
+
+
+@requires_duckdb
+class TestDuckDB:
+    @pytest.fixture(autouse=True)
+    def duckdb_engine(self, monkeypatch):
+        monkeypatch.setattr(settings, "analytics_engine", "duckdb")
+
+    def _queries(self):
+        return analytics.analytics_stats()["duckdb_queries"]
+
+    def test_same_answers_as_sqlite(self, monkeypatch):
+        monkeypatch.setattr(settings, "analytics_engine", "sqlite")
+        expected = _answers()
+        monkeypatch.setattr(settings, "analytics_engine", "duckdb")
+        result = analytics.refresh_snapshot()
+        assert result["rows"]["classifications"] == len(_ROWS)
+        before = self._queries()
+        assert _answers() == expected
+        assert self._queries() == before + len(expected)
+
+    def test_stale_snapshot_not_used(self):
+        analytics.refresh_snapshot()
+        assert analytics.refresh_snapshot()["skipped"] == "unchanged"
+        with transaction() as conn:
+            conn.execute("UPDATE classifications SET status = 'agreed' WHERE serial_number = 'PT1'")
+        before = self._queries()
+        assert analytics.major_category_agreement()["total"] == 2
+        assert self._queries() == before
+
+        assert "rows" in maintenance.run_task("analytics")
+        assert analytics.major_category_agreement()["total"] == 2
+        assert self._queries() == before + 1
+
+    def test_dashboard_results_match(self, monkeypatch):
+        client = TestClient(app)
+        monkeypatch.setattr(settings, "analytics_engine", "sqlite")
+        expected = client.get("/dashboard/api/results").json()
+        db.clear_cache()
+        monkeypatch.setattr(settings, "analytics_engine", "duckdb")
+        analytics.refresh_snapshot()
+        assert client.get("/dashboard/api/results").json() == expected
+        assert patent_class_frequency_by_year() == {2019: {22: 1}}
+        assert client.get("/dashboard/api/metrics").json()["analytics"]["snapshot"]["rows"]["documents"] == 7
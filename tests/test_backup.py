@@ -0,0 +1,176 @@
+import gzip
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db
+from app.config import settings
+from app.db import backup
+from app.db.connection import exclusive_access, transaction
+from app.main import app
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    db.close_pools(tmp.name)
+    shutil.rmtree(f"{tmp.name}.snapshots", ignore_errors=True)
+    for path in (tmp.name, tmp.name[:-3] + ".db.bak"):
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def _titles(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [r[0] for r in conn.execute("SELECT title FROM documents ORDER BY serial_number")]
+    finally:
+        conn.close()
+
+
+def _other_database(tmp_path, titles) -> bytes:
+    """Bytes of a separate, initialized database holding documents with `titles`."""
+    path = str(tmp_path / "other.db")
+    original = settings.db_path
+    settings.db_path = path
+    try:
+        db.init_db()
+        for i, title in enumerate(titles):
+            db.insert_document(f"X{i}", "paper", title, "abs", 2020, [], None, {})
+        backup.backup_database(str(tmp_path / "other-copy.db"))
+    finally:
+        db.close_pools(path)
+        settings.db_path = original
+    with open(tmp_path / "other-copy.db", "rb") as f:
+        return f.read()
+
+
+class TestSnapshot:
+    def test_reused_until_data_changes(self, tmp_path):
+        db.insert_document("P1", "paper", "First", "abs", 2020, [], None, {})
+        first = backup.get_snapshot()
+        assert backup.get_snapshot() == first
+
+        db.insert_document("P2", "paper", "Second", "abs", 2020, [], None, {})
+        second = backup.get_snapshot()
+        assert second != first
+        assert not first.exists()
+
+        plain = tmp_path / "snapshot.db"
+        with gzip.open(second, "rb") as src, open(plain, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        assert _titles(str(plain)) == ["First", "Second"]
+        assert backup.validate_database(str(plain))["documents"] == 2
+
+    def test_uncompressed(self):
+        db.insert_document("P1", "paper", "First", "abs", 2020, [], None, {})
+        path = backup.get_snapshot(compress=False)
+        assert _titles(str(path)) == ["First"]
+
+
+class TestValidate:
+    def test_rejects_non_sqlite(self, tmp_path):
+        path = tmp_path / "x.db"
+        path.write_bytes(b"not a database at all")
+        with pytest.raises(ValueError, match="Not a SQLite"):
+            backup.validate_database(str(path))
+
+    def test_rejects_missing_tables(self, tmp_path):
+        path = str(tmp_path / "x.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE documents (serial_number TEXT)")
+        conn.close()
+        with pytest.raises(ValueError, match="documents is missing columns"):
+            backup.validate_database(path)
+
+    def test_rejects_corruption(self, tmp_path):
+        for i in range(300):
+            db.insert_document(f"P{i}", "paper", f"Title {i}", "abstract " * 50, 2020, [], None, {})
+        path = str(tmp_path / "x.db")
+        backup.backup_database(path)
+        with open(path, "r+b") as f:
+            f.seek(4096 * 3)
+            f.write(b"\xff" * 4096)
+        with pytest.raises(ValueError):
+            backup.validate_database(path)
+
+
+class TestExclusiveAccess:
+    def test_waits_for_running_transactions(self):
+        entered, release = threading.Event(), threading.Event()
+
+        def hold():
+            with transaction(readonly=True):
+                entered.set()
+                release.wait()
+
+        worker = threading.Thread(target=hold)
+        worker.start()
+        entered.wait()
+        with pytest.raises(TimeoutError):
+            with exclusive_access(timeout=0.1):
+                pass
+        release.set()
+        with exclusive_access(timeout=5):
+            # The owner can still use the database
+            assert db.count_documents()["total"] == 0
+        worker.join()
+
+
+class TestRoutes:
+    def test_download_supports_range(self):
+        db.insert_document("P1", "paper", "First", "abs", 2020, [], None, {})
+        client = TestClient(app)
+        full = client.get("/dashboard/api/download-db")
+        assert full.status_code == 200
+        assert full.content[:2] == b"\x1f\x8b"
+
+        part = client.get("/dashboard/api/download-db", headers={"Range": "bytes=10-19"})
+        assert part.status_code == 206
+        assert part.content == full.content[10:20]
+
+    def test_upload_replaces_database(self, tmp_path, temp_db):
+        db.insert_document("P1", "paper", "Old", "abs", 2020, [], None, {})
+        payload = gzip.compress(_other_database(tmp_path, ["New A", "New B"]))
+
+        client = TestClient(app)
+        response = client.post("/dashboard/api/upload-db",
+                               files={"file": ("ferrofluids.db.gz", io.BytesIO(payload))})
+        assert response.status_code == 200, response.text
+        assert response.json()["counts"]["documents"] == 2
+        assert [d["title"] for d in db.get_documents()] == ["New A", "New B"]
+        assert _titles(temp_db[:-3] + ".db.bak") == ["Old"]
+        assert client.get("/documents/stats").json()["total"] == 2
+
+    def test_invalid_upload_keeps_database(self):
+        db.insert_document("P1", "paper", "Old", "abs", 2020, [], None, {})
+        client = TestClient(app)
+        response = client.post("/dashboard/api/upload-db",
+                               files={"file": ("ferrofluids.db", io.BytesIO(b"garbage" * 100))})
+        assert response.status_code == 400
+        assert [d["title"] for d in db.get_documents()] == ["Old"]
+        assert not [p for p in os.listdir(os.path.dirname(settings.db_path)) if p.startswith(".upload-")]
+
+    def test_gzip_expanding_past_limit_is_refused(self, monkeypatch):
+        db.insert_document("P1", "paper", "Old", "abs", 2020, [], None, {})
+        monkeypatch.setattr(settings, "max_upload_mb", 1)
+        # A few KB that expand to 3 MB
+        payload = gzip.compress(b"\0" * (3 * 1024 * 1024))
+        assert len(payload) < 1024 * 1024
+
+        client = TestClient(app)
+        response = client.post("/dashboard/api/upload-db",
+                               files={"file": ("bomb.db.gz", io.BytesIO(payload))})
+        assert response.status_code == 413
+        assert [d["title"] for d in db.get_documents()] == ["Old"]
+        assert not [p for p in os.listdir(os.path.dirname(settings.db_path)) if p.startswith(".upload-")]
@@ -0,0 +1,112 @@
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db
+from app.config import settings
+from app.db.cache import cached
+from app.main import app
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    db.clear_cache()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+class TestDataVersion:
+    def test_bumped_by_writes(self):
+        v0 = db.get_data_version()
+        db.insert_document("P1", "paper", "T", "abstract", 2020, [], None, {})
+        v1 = db.get_data_version()
+        db.save_ai_result("P1", "gpt", 11, 12, 13, "r")
+        v2 = db.get_data_version()
+        db.save_paper_patent_link("P1", "P1", 0.5)
+        v3 = db.get_data_version()
+        assert v0 < v1 < v2 < v3
+
+    def test_reads_do_not_bump(self):
+        db.insert_document("P1", "paper", "T", "abstract", 2020, [], None, {})
+        before = db.data_token()
+        db.count_documents()
+        db.get_document("P1")
+        assert db.data_token() == before
+
+
+class TestResultCache:
+    def test_memoized_until_next_write(self):
+        calls = []
+
+        @cached
+        def expensive(x):
+            calls.append(x)
+            return x * 2
+
+        assert expensive(2) == 4
+        assert expensive(2) == 4
+        assert calls == [2]
+
+        db.insert_document("P1", "paper", "T", "abstract", 2020, [], None, {})
+        expensive(2)
+        assert calls == [2, 2]
+
+    def test_lru_eviction(self, monkeypatch):
+        monkeypatch.setattr(settings, "cache_size", 2)
+        calls = []
+
+        @cached
+        def f(x):
+            calls.append(x)
+            return x
+
+        f(1), f(2), f(1), f(3)  # 2 is least recently used
+        f(1)
+        f(2)
+        assert calls == [1, 2, 3, 2]
+        assert db.cache_stats()["entries"] == 2
+
+    def test_count_documents_sees_writes(self):
+        assert db.count_documents()["total"] == 0
+        db.insert_document("P1", "paper", "T", "abstract", 2020, [], None, {})
+        assert db.count_documents()["total"] == 1
+
+
+class TestETag:
+    def test_not_modified_until_write(self):
+        client = TestClient(app)
+        first = client.get("/progress/api")
+        etag = first.headers["etag"]
+
+        again = client.get("/progress/api", headers={"If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.content == b""
+
+        db.insert_document("P1", "paper", "T", "abstract", 2020, [], None, {})
+        changed = client.get("/progress/api", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+        assert changed.json()["total"] == 1
+
+    def test_duplicate_rebuild_changes_tag(self):
+        abstract = "ferrofluid seal with magnetic nanoparticles in a carrier oil for rotary shafts"
+        db.insert_document("P1", "paper", "A", abstract, 2020, [], None, {})
+        db.insert_document("P2", "paper", "B", abstract + " and bearings", 2021, [], None, {})
+        client = TestClient(app)
+        first = client.get("/analysis/duplicates")
+        assert first.json()["groups"] == 0
+
+        assert client.post("/analysis/duplicates/rebuild?threshold=0.5").status_code == 200
+        changed = client.get("/analysis/duplicates", headers={"If-None-Match": first.headers["etag"]})
+        assert changed.status_code == 200
+        assert changed.json()["groups"] == 1
+
+    def test_not_applied_to_other_endpoints(self):
+        client = TestClient(app)
+        assert "etag" not in client.get("/classify/stale?model=gpt").headers
@@ -0,0 +1,179 @@
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db
+from app.config import settings
+from app.db import maintenance
+from app.db.changes import changes_since, consume
+from app.db.connection import transaction
+from app.main import app
+from app.services.linking import crossref_assignees
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    db.close_pools(tmp.name)
+    os.unlink(tmp.name)
+
+
+def _insert(serial, doc_type="paper", authors=("Jane Doe",), primary=21):
+    db.insert_document(serial, doc_type, f"Title {serial}", "abs", 2020, list(authors), None, {})
+    with transaction() as conn:
+        conn.execute(
+            "INSERT INTO classifications (serial_number, final_primary, final_secondary, final_tertiary, "
+            "final_reasoning, status) VALUES (?, ?, 22, 23, 'r', 'agreed')",
+            (serial, primary),
+        )
+
+
+def _crossrefs():
+    with transaction(readonly=True) as conn:
+        return sorted(tuple(r) for r in conn.execute(
+            "SELECT patent_serial, paper_serial FROM assignee_crossrefs"))
+
+
+class TestChangeLog:
+    def test_records_each_operation(self):
+        db.insert_document("P1", "paper", "Title", "abs", 2020, [], None, {})
+        with transaction() as conn:
+            conn.execute("UPDATE documents SET title = 'New' WHERE serial_number = 'P1'")
+            conn.execute("DELETE FROM documents WHERE serial_number = 'P1'")
+        changes = db.get_changes(tables=("documents",))
+        assert [(c["serial_number"], c["op"]) for c in changes] == [("P1", "I"), ("P1", "U"), ("P1", "D")]
+        assert changes[-1]["seq"] == db.latest_change()
+
+    def test_links_logged_by_patent(self):
+        _insert("P1")
+        _insert("PT1", "patent")
+        db.save_paper_patent_link("PT1", "P1", 0.5)
+        assert db.get_changes(tables=("paper_patent_links",))[0]["serial_number"] == "PT1"
+
+    def test_untracked_table(self):
+        with pytest.raises(ValueError, match="Untracked"):
+            db.get_changes(tables=("taxonomy_versions",))
+
+
+class TestConsumers:
+    def test_first_run_is_full(self):
+        _insert("P1")
+        delta = changes_since("export")
+        assert delta.full and delta.end == db.latest_change()
+
+    def test_delta_since_cursor(self):
+        _insert("P1")
+        _insert("P2")
+        with consume("export"):
+            pass
+        assert not changes_since("export")
+
+        with transaction() as conn:
+            conn.execute("UPDATE documents SET title = 'New' WHERE serial_number = 'P1'")
+            conn.execute("DELETE FROM classifications WHERE serial_number = 'P2'")
+            conn.execute("DELETE FROM document_raw WHERE serial_number = 'P2'")
+            conn.execute("DELETE FROM documents WHERE serial_number = 'P2'")
+        _insert("P3")
+        delta = changes_since("export", ("documents", "classifications"))
+        assert not delta.full
+        assert delta.changed == {"documents": {"P1", "P3"}, "classifications": {"P3"}}
+        assert delta.deleted == {"documents": {"P2"}, "classifications": {"P2"}}
+
+    def test_cursor_kept_on_failure(self):
+        with consume("export"):
+            pass
+        _insert("P1")
+        with pytest.raises(RuntimeError):
+            with consume("export") as delta:
+                assert delta.changed["documents"] == {"P1"}
+                raise RuntimeError("boom")
+        assert changes_since("export").changed["documents"] == {"P1"}
+
+    def test_prune_keeps_unprocessed_changes(self):
+        _insert("P1")
+        with consume("fast"):
+            pass
+        with consume("slow"):
+            pass
+        _insert("P2")
+        with consume("fast"):
+            pass
+        assert db.prune_change_log()["deleted"] > 0
+        assert changes_since("slow").changed["documents"] == {"P2"}
+
+        # Past the retention window, a lagging consumer falls back to a full run
+        db.prune_change_log(retention_days=-1)
+        assert changes_since("slow").full
+        assert db.change_stats()["retained"] == 0
+
+    def test_reset_consumer(self):
+        with consume("export"):
+            pass
+        db.reset_consumer("export")
+        assert changes_since("export").full
+
+
+class TestIncrementalCrossref:
+    def test_rematches_only_changed_patents(self):
+        _insert("P1", authors=["Jane Doe"])
+        _insert("PT1", "patent", authors=["Jane Doe"])
+        assert crossref_assignees()["full"]
+        assert _crossrefs() == [("PT1", "P1")]
+
+        _insert("PT2", "patent", authors=["Jane Doe"])
+        result = crossref_assignees()
+        assert not result["full"] and result["patents_checked"] == 1
+        assert _crossrefs() == [("PT1", "P1"), ("PT2", "P1")]
+
+        # A reclassified patent loses its stale match
+        db.finalize_classification("PT1", 30, 22, 23, "r", "agreed")
+        crossref_assignees()
+        assert _crossrefs() == [("PT2", "P1")]
+
+    def test_changed_paper_triggers_full_run(self):
+        _insert("P1", authors=["Jane Doe"])
+        _insert("PT1", "patent", authors=["Jane Doe"])
+        crossref_assignees()
+        _insert("P2", authors=["Jane Doe"])
+        assert crossref_assignees()["full"]
+        assert _crossrefs() == [("PT1", "P1"), ("PT1", "P2")]
+
+    def test_deleted_paper_is_incremental(self):
+        _insert("P1", authors=["Jane Doe"])
+        _insert("P2", authors=["Jane Doe"])
+        _insert("PT1", "patent", authors=["Jane Doe"])
+        crossref_assignees()
+        with transaction() as conn:
+            conn.execute("DELETE FROM assignee_crossrefs WHERE paper_serial = 'P1'")
+            conn.execute("DELETE FROM classifications WHERE serial_number = 'P1'")
+            conn.execute("DELETE FROM document_raw WHERE serial_number = 'P1'")
+            conn.execute("DELETE FROM documents WHERE serial_number = 'P1'")
+        result = crossref_assignees()
+        assert not result["full"] and result["patents_checked"] == 0
+        assert _crossrefs() == [("PT1", "P2")]
+
+
+class TestRoutes:
+    def test_change_feed(self):
+        _insert("P1")
+        client = TestClient(app)
+        body = client.get("/analysis/changes?limit=1").json()
+        assert body["changes"][0]["table_name"] == "documents"
+        assert len(body["changes"]) == 1
+        rest = client.get(f"/analysis/changes?since={body['next']}").json()
+        assert rest["changes"][0]["seq"] == body["next"] + 1
+        assert rest["next"] == db.latest_change()
+
+    def test_prune_task_and_stats(self):
+        _insert("P1")
+        with consume("export"):
+            pass
+        assert maintenance.run_task("prune_changes")["deleted"] > 0
+        stats = maintenance.maintenance_stats()["changes"]
+        assert stats["consumers"]["export"]["lag"] == 0
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from app import db
+from app.config import settings
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.services.classifier import BaseClassifier, ProviderError
+from app.services.pipeline import backfill_second_opinions, classify_one
+from tests.test_pipeline import FakeClassifier
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class DownClassifier(BaseClassifier):
+    """Simulates a provider outage."""
+    def __init__(self):
+        self.calls = 0
+
+    async def classify(self, abstract: str) -> dict:
+        self.calls += 1
+        raise ProviderError("503 Service Unavailable")
+
+
+class SlowClassifier(FakeClassifier):
+    """Answers after a pause, so concurrent callers overlap the call."""
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def classify(self, abstract: str) -> dict:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return await super().classify(abstract)
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker("gpt", failure_threshold=3, cooldown_seconds=10, clock=FakeClock())
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_success_resets_count(self):
+        breaker = CircuitBreaker("gpt", failure_threshold=2, clock=FakeClock())
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+    def test_half_open_after_cooldown(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("gpt", failure_threshold=1, cooldown_seconds=10, clock=clock)
+        breaker.record_failure()
+        assert breaker.retry_after() == 10
+        clock.now = 10
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()
+
+    def test_half_open_allows_one_trial(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("gpt", failure_threshold=1, cooldown_seconds=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow()
+        assert not breaker.available() and not breaker.allow()
+        breaker.release()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        clock.now = 20
+        assert breaker.allow()
+
+    def test_half_open_failure_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("gpt", failure_threshold=5, cooldown_seconds=10, clock=clock)
+        for _ in range(5):
+            breaker.record_failure()
+        clock.now = 10
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.retry_after() == 10
+
+    def test_half_open_success_closes(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker("gpt", failure_threshold=1, cooldown_seconds=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.snapshot()["consecutive_failures"] == 0
+
+
+class TestDegradedMode:
+    def _breakers(self, clock):
+        return {name: CircuitBreaker(name, failure_threshold=1, cooldown_seconds=60, clock=clock)
+                for name in ("gpt", "claude")}
+
+    def test_saves_single_model_result(self):
+        db.insert_document("P1", "paper", "Test", "abstract text", 2020, [], None, {})
+        breakers = self._breakers(FakeClock())
+
+        ok = asyncio.run(classify_one(db.get_document("P1"), FakeClassifier(primary=11),
+                                      DownClassifier(), breakers=breakers))
+
+        assert ok is True
+        cls = db.get_classification("P1")
+        assert cls["status"] == "pending_second_opinion"
+        assert cls["final_primary"] == 11
+        assert cls["claude_primary"] is None
+        assert breakers["claude"].state == OPEN
+
+    def test_open_circuit_is_not_called(self):
+        db.insert_document("P1", "paper", "Test", "abstract text", 2020, [], None, {})
+        breakers = self._breakers(FakeClock())
+        breakers["claude"].record_failure()
+        claude = DownClassifier()
+
+        asyncio.run(classify_one(db.get_document("P1"), FakeClassifier(), claude, breakers=breakers))
+
+        assert claude.calls == 0
+        assert db.get_classification("P1")["status"] == "pending_second_opinion"
+
+    def test_all_circuits_open_leaves_document_queued(self):
+        db.insert_document("P1", "paper", "Test", "abstract text", 2020, [], None, {})
+        breakers = self._breakers(FakeClock())
+
+        ok = asyncio.run(classify_one(db.get_document("P1"), DownClassifier(),
+                                      DownClassifier(), breakers=breakers))
+
+        assert ok is False
+        assert db.get_classification("P1") is None
+        assert len(db.get_unclassified_documents()) == 1
+
+    def test_half_open_trial_is_single_among_concurrent_callers(self):
+        for i in range(5):
+            db.insert_document(f"P{i}", "paper", "Test", f"abstract {i}", 2020, [], None, {})
+        clock = FakeClock()
+        breakers = self._breakers(clock)
+        breakers["claude"].record_failure()
+        clock.now = 60
+        claude = SlowClassifier()
+
+        async def run():
+            return await asyncio.gather(*[
+                classify_one(db.get_document(f"P{i}"), FakeClassifier(), claude, breakers=breakers)
+                for i in range(5)])
+
+        assert all(asyncio.run(run()))
+        assert claude.calls == 1
+        assert breakers["claude"].state == CLOSED
+        statuses = [db.get_classification(f"P{i}")["status"] for i in range(5)]
+        assert sorted(statuses) == ["agreed"] + ["pending_second_opinion"] * 4
+
+    def test_backfill_after_recovery(self):
+        db.insert_document("P1", "paper", "Test", "abstract text", 2020, [], None, {})
+        clock = FakeClock()
+        breakers = self._breakers(clock)
+        gpt = FakeClassifier(primary=11, secondary=13, tertiary=14)
+        asyncio.run(classify_one(db.get_document("P1"), gpt, DownClassifier(), breakers=breakers))
+
+        clock.now = 60
+        claude = FakeClassifier(primary=11, secondary=13, tertiary=14)
+        backfilled = asyncio.run(backfill_second_opinions(
+            {"gpt": gpt, "claude": claude}, breakers, concurrency=5))
+
+        assert backfilled == 1
+        cls = db.get_classification("P1")
+        assert cls["status"] == "agreed"
+        assert cls["claude_primary"] == 11
+        assert breakers["claude"].state == CLOSED
+        assert db.get_pending_second_opinion("claude") == []
+
+    def test_backfill_skips_open_circuit(self):
+        db.insert_document("P1", "paper", "Test", "abstract text", 2020, [], None, {})
+        breakers = self._breakers(FakeClock())
+        asyncio.run(classify_one(db.get_document("P1"), FakeClassifier(),
+                                 DownClassifier(), breakers=breakers))
+
+        claude = DownClassifier()
+        backfilled = asyncio.run(backfill_second_opinions(
+            {"gpt": FakeClassifier(), "claude": claude}, breakers, concurrency=5))
+
+        assert backfilled == 0
+        assert claude.calls == 0
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db
+from app.config import settings
+from app.corpus import corpora, current_corpus, get_corpus, using_corpus
+from app.db import maintenance
+from app.db.cache import cached
+from app.db.connection import transaction
+from app.db.writer import close_writer, get_writer
+from app.main import app
+from app.services.importer import PATENT_MAPPING, mapping_for
+from app.services.pipeline import corpus_limiters
+from app.taxonomy import ClassCode, format_taxonomy_for_prompt, get_class_description, valid_codes
+
+# This module doubles as the second corpus's taxonomy module
+TAXONOMY = {
+    61: ClassCode(61, "Fluid", "Magnetorheological"),
+    62: ClassCode(62, "Fluid", "Electrorheological"),
+}
+PROMPT_HEADER = "SMART FLUID CLASSIFICATION CODES:"
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    paths = []
+    for _ in range(2):
+        tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        tmp.close()
+        paths.append(tmp.name)
+    registry = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    json.dump({"smart": {
+        "db_path": paths[1],
+        "taxonomy": "tests.test_corpus",
+        "mappings": {"patent": {"authors_delimiter": "|"}},
+        "imports": {"patents": ["data/SMART.csv", "patent"]},
+        "openai_tpm_limit": 1000,
+    }}, registry)
+    registry.close()
+    monkeypatch.setattr(settings, "db_path", paths[0])
+    monkeypatch.setattr(settings, "corpora_file", registry.name)
+    db.init_db()
+    with using_corpus("smart"):
+        db.init_db()
+    yield paths
+    db.close_pools()
+    for path in paths + [registry.name]:
+        os.unlink(path)
+
+
+def _insert(serial):
+    db.insert_document(serial, "paper", f"Title {serial}", "abs", 2020, [], None, {})
+
+
+class TestRegistry:
+    def test_default_and_configured(self, temp_db):
+        assert set(corpora()) == {"ferrofluids", "smart"}
+        assert current_corpus().name == "ferrofluids"
+        assert get_corpus("ferrofluids").path == temp_db[0]
+        assert get_corpus("smart").tpm_limits() == {"openai": 1000, "anthropic": settings.anthropic_tpm_limit}
+
+    def test_unknown_corpus(self):
+        with pytest.raises(KeyError, match="Unknown corpus"):
+            get_corpus("nope")
+
+    def test_invalid_registry(self, monkeypatch, temp_db):
+        for entry, error in [({"taxonomy": "app.taxonomy"}, "own db_path"),
+                             ({"db_path": temp_db[0]}, "share a database"),
+                             ({"db_path": "x.db", "colour": "red"}, "unknown settings"),
+                             ({"db_path": "x.db", "mappings": {"patent": {"colour": "red"}}}, "unknown fields"),
+                             ({"db_path": "x.db", "mappings": {"thesis": {"serial_prefix": "T"}}},
+                              "needs the mapping fields"),
+                             ({"db_path": "x.db", "imports": {"t": ["t.csv", "thesis"]}}, "mapped doc_type")]:
+            with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+                json.dump({"bad": entry}, f)
+            monkeypatch.setattr(settings, "corpora_file", f.name)
+            try:
+                with pytest.raises(ValueError, match=error):
+                    corpora()
+            finally:
+                os.unlink(f.name)
+
+
+class TestIsolation:
+    def test_databases(self):
+        _insert("P1")
+        with using_corpus("smart"):
+            assert db.count_documents()["total"] == 0
+            _insert("S1")
+            _insert("S2")
+            assert db.count_documents()["total"] == 2
+        assert db.count_documents()["total"] == 1
+
+    def test_taxonomy(self):
+        assert 11 in valid_codes()
+        with using_corpus("smart"):
+            assert valid_codes() == {61, 62}
+            assert get_class_description(61) == "Fluid > Magnetorheological"
+            assert format_taxonomy_for_prompt().startswith(PROMPT_HEADER)
+        assert format_taxonomy_for_prompt().startswith("FERROFLUID CLASSIFICATION CODES:")
+
+    def test_caches(self):
+        calls = []
+
+        @cached
+        def f():
+            calls.append(current_corpus().name)
+            return current_corpus().name
+
+        assert f() == "ferrofluids"
+        with using_corpus("smart"):
+            assert f() == "smart"
+            assert f() == "smart"
+            assert db.cache_stats()["hits"] == 1
+        assert f() == "ferrofluids"
+        assert calls == ["ferrofluids", "smart"]
+
+    def test_writers(self):
+        async def main():
+            with using_corpus("smart"):
+                smart = get_writer()
+            default = get_writer()
+            assert smart is not default
+            # Whichever context drives the writer, it commits to its own database
+            await smart.write(lambda conn: db.insert_document("S1", "paper", "T", "abs", 2020, [], None, {},
+                                                              conn=conn))
+            await close_writer()
+
+        asyncio.run(main())
+        assert db.count_documents()["total"] == 0
+        with using_corpus("smart"):
+            assert db.count_documents()["total"] == 1
+
+    def test_rate_limiters(self):
+        async def main():
+            default = corpus_limiters()
+            assert corpus_limiters() is default
+            with using_corpus("smart"):
+                smart = corpus_limiters()
+            assert smart["openai"] is not default["openai"]
+            assert smart["openai"]._capacity == 1000
+
+        asyncio.run(main())
+
+    def test_mappings(self):
+        assert mapping_for("patent") == PATENT_MAPPING
+        with using_corpus("smart"):
+            assert mapping_for("patent").authors_delimiter == "|"
+            assert mapping_for("patent").year_column == PATENT_MAPPING.year_column
+
+    def test_maintenance_stats_per_database(self):
+        with using_corpus("smart"):
+            maintenance.run_task("optimize")
+            assert "optimize" in maintenance.maintenance_stats()["tasks"]
+        assert "optimize" not in maintenance.maintenance_stats()["tasks"]
+
+
+class TestRouting:
+    def test_prefix_and_header(self):
+        _insert("P1")
+        with using_corpus("smart"):
+            _insert("S1")
+            _insert("S2")
+        client = TestClient(app)
+        assert client.get("/documents/stats").json()["total"] == 1
+        assert client.get("/corpora/smart/documents/stats").json()["total"] == 2
+        assert client.get("/documents/stats", headers={"X-Corpus": "smart"}).json()["total"] == 2
+        assert client.get("/corpora/ferrofluids/documents/S1").status_code == 404
+
+    def test_unknown_corpus(self):
+        client = TestClient(app)
+        assert client.get("/corpora/nope/documents/stats").status_code == 404
+        assert client.get("/documents/stats", headers={"X-Corpus": "nope"}).status_code == 404
+
+    def test_review_uses_corpus_taxonomy(self):
+        with using_corpus("smart"):
+            _insert("S1")
+            with transaction() as conn:
+                conn.execute("INSERT INTO classifications (serial_number, status) VALUES ('S1', 'disagreed')")
+        client = TestClient(app)
+        body = {"serial_number": "S1", "primary": 11, "secondary": 11, "tertiary": 11}
+        assert client.post("/corpora/smart/review/resolve", json=body).status_code == 400
+        body.update(primary=61, secondary=62, tertiary=61)
+        assert client.post("/corpora/smart/review/resolve", json=body).status_code == 200
+        with using_corpus("smart"):
+            assert db.get_classification("S1")["final_primary"] == 61
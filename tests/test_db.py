@@ -1,4 +1,5 @@
 import os
+import sqlite3
 import tempfile
 
 import pytest
@@ -53,6 +54,7 @@ class TestDocumentCRUD:
         assert counts["total"] == 3
         assert counts["papers"] == 2
         assert counts["patents"] == 1
+        assert counts["by_type"] == {"paper": 2, "patent": 1}
         assert counts["pending"] == 3
 
     def test_unclassified_documents(self):
@@ -84,6 +86,37 @@ class TestDocumentCRUD:
         assert len(docs) == 1
 
 
+class TestOriginalData:
+    def test_stored_compressed_and_loaded_separately(self):
+        original = {"Title": "Test Paper", "Lens ID": "000-111", "Notes": "x" * 2000}
+        db.insert_document("P1", "paper", "Test Paper", "abs", 2020, [], None, original)
+
+        assert "original_data" not in db.get_document("P1")
+        assert db.get_original_data("P1") == original
+        assert db.get_original_data("nope") is None
+        with transaction(readonly=True) as conn:
+            size = conn.execute("SELECT length(data) FROM document_raw WHERE serial_number = 'P1'").fetchone()[0]
+        assert size < 200
+
+    def test_replaced_with_document(self):
+        db.insert_document("P1", "paper", "Paper", "abs", 2020, [], None, {"v": 1})
+        db.insert_document("P1", "paper", "Paper", "abs", 2020, [], None, {"v": 2})
+        assert db.get_original_data("P1") == {"v": 2}
+
+    def test_migrates_legacy_column(self):
+        with transaction() as conn:
+            conn.execute("ALTER TABLE documents ADD COLUMN original_data TEXT")
+            conn.execute("""INSERT INTO documents (serial_number, doc_type, title, original_data)
+                            VALUES ('P1', 'paper', 'Old', '{"Title": "Old"}')""")
+        db.init_db()
+
+        with transaction(readonly=True) as conn:
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(documents)")}
+        assert "original_data" not in columns
+        assert db.get_original_data("P1") == {"Title": "Old"}
+        assert db.get_document("P1")["title"] == "Old"
+
+
 class TestClassificationCRUD:
     def test_save_and_get(self):
         db.insert_document("P1", "paper", "Test", "abs", 2020, [], None, {})
@@ -140,6 +173,67 @@ class TestClassificationCRUD:
         assert row["primary_code"] == 25
 
 
+class TestModelColumns:
+    def _model_codes(self, serial):
+        with transaction(readonly=True) as conn:
+            row = conn.execute(
+                """SELECT gpt_primary, gpt_secondary, gpt_tertiary,
+                          claude_primary, claude_secondary, claude_tertiary
+                   FROM classifications WHERE serial_number = ?""", (serial,)
+            ).fetchone()
+        return tuple(row)
+
+    def test_follow_ai_results(self):
+        db.insert_document("P1", "paper", "Test", "abs", 2020, [], None, {})
+        db.save_ai_result("P1", "gpt", 11, 13, 14, "r")
+        assert self._model_codes("P1") == (11, 13, 14, None, None, None)
+        db.save_ai_result("P1", "claude", 21, 22, None, "r")
+        db.save_ai_result("P1", "gpt", 12, 13, 14, "r", prompt_version="v2")
+        db.save_ai_result("P1", "gemini", 31, 32, 33, "r")
+        assert self._model_codes("P1") == (12, 13, 14, 21, 22, None)
+
+        with transaction() as conn:
+            conn.execute("DELETE FROM ai_results WHERE serial_number = 'P1' AND model_name = 'claude'")
+        assert self._model_codes("P1") == (12, 13, 14, None, None, None)
+
+    def test_backfilled_for_existing_databases(self):
+        db.insert_document("P1", "paper", "Test", "abs", 2020, [], None, {})
+        db.save_ai_result("P1", "gpt", 11, 13, 14, "r")
+        db.save_ai_result("P1", "claude", 21, 22, 23, "r")
+        with transaction() as conn:
+            for name in [r["name"] for r in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE name LIKE 'trg_model_%'")]:
+                conn.execute(f"DROP TRIGGER {name}")
+            for model in ("gpt", "claude"):
+                for rank in ("primary", "secondary", "tertiary"):
+                    conn.execute(f"ALTER TABLE classifications DROP COLUMN {model}_{rank}")
+        db.init_db()
+        assert self._model_codes("P1") == (11, 13, 14, 21, 22, 23)
+
+    def test_list_queries_do_not_join_ai_results(self):
+        from app.routes.dashboard import _dashboard_classified, _dashboard_overview
+        from app.routes.review_ui import _list_human_reviewed
+
+        statements = []
+        with transaction(readonly=True) as conn:
+            conn.set_trace_callback(statements.append)
+        try:
+            db.get_finalized_classifications()
+            _dashboard_classified.uncached("paper", 10, 0)
+            _dashboard_overview.uncached()
+            _list_human_reviewed()
+        finally:
+            with transaction(readonly=True) as conn:
+                conn.set_trace_callback(None)
+
+        selects = [s for s in statements if "classifications" in s and s.lstrip().upper().startswith("SELECT")]
+        assert len(selects) >= 4
+        with transaction(readonly=True) as conn:
+            for sql in selects:
+                plan = " ".join(r["detail"] for r in conn.execute("EXPLAIN QUERY PLAN " + sql))
+                assert "ai_results" not in plan, sql
+
+
 class TestLinks:
     def test_save_and_get_link(self):
         db.insert_document("PT1", "patent", "Patent", "abs", 2020, [], None, {})
@@ -159,3 +253,49 @@ class TestLinks:
         refs = db.get_crossrefs_for_patent("PT1")
         assert len(refs) == 1
         assert refs[0]["matched_name"] == "John Smith"
+
+
+class TestConnectionPool:
+    def test_connections_are_reused(self):
+        with transaction() as first:
+            pass
+        with transaction() as second:
+            pass
+        assert first is second
+
+    def test_read_and_write_pools_are_separate(self):
+        with transaction() as write_conn:
+            pass
+        with transaction(readonly=True) as read_conn:
+            pass
+        assert read_conn is not write_conn
+
+    def test_readonly_rejects_writes(self):
+        with pytest.raises(sqlite3.OperationalError):
+            with transaction(readonly=True) as conn:
+                conn.execute("DELETE FROM documents")
+
+    def test_rolled_back_connection_is_clean(self):
+        with pytest.raises(ValueError):
+            with transaction() as conn:
+                conn.execute("INSERT INTO documents (serial_number, doc_type) VALUES ('P1', 'paper')")
+                raise ValueError("boom")
+        with transaction() as conn:
+            assert not conn.in_transaction
+        assert db.get_document("P1") is None
+
+    def test_pool_size_zero_disables_pooling(self, monkeypatch):
+        monkeypatch.setattr(settings, "db_pool_size", 0)
+        with transaction() as first:
+            pass
+        with transaction() as second:
+            pass
+        assert first is not second
+
+    def test_close_pools(self):
+        with transaction() as first:
+            pass
+        db.close_pools(settings.db_path)
+        with transaction() as second:
+            pass
+        assert first is not second
@@ -0,0 +1,114 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from app import db
+from app.config import settings
+from app.services.dedup import (
+    build_duplicate_index,
+    dedup_report,
+    estimated_jaccard,
+    minhash,
+    propagate_labels,
+    shingles,
+)
+from app.services.pipeline import run_classification
+from tests.test_pipeline import FakeClassifier
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+ABSTRACT = (
+    "A magnetic fluid seal for a rotating shaft comprises a permanent magnet, two pole pieces "
+    "and a ferrofluid retained in the gap between the pole pieces and the shaft so that the "
+    "seal withstands a pressure difference while allowing rotation at high speed without wear"
+)
+FAMILY_MEMBER = ABSTRACT + " of the sealing surfaces"
+UNRELATED = (
+    "Iron oxide nanoparticles were synthesized by coprecipitation and coated with oleic acid "
+    "to obtain a stable colloid whose magnetization and viscosity were measured as a function "
+    "of particle concentration and temperature in a rheometer"
+)
+
+
+class TestMinHash:
+    def test_shingles(self):
+        assert shingles("A b c d") == {"a b c", "b c d"}
+        assert shingles("short") == {"short"}
+
+    def test_similar_texts_have_similar_signatures(self):
+        assert estimated_jaccard(minhash(ABSTRACT), minhash(FAMILY_MEMBER)) > 0.85
+        assert estimated_jaccard(minhash(ABSTRACT), minhash(UNRELATED)) < 0.2
+
+    def test_deterministic(self):
+        assert (minhash(ABSTRACT) == minhash(ABSTRACT)).all()
+
+
+class TestDuplicateIndex:
+    def test_groups_near_duplicates_within_doc_type(self):
+        db.insert_document("PT1", "patent", "Seal", ABSTRACT, 2001, [], None, {})
+        db.insert_document("PT2", "patent", "Seal (family)", FAMILY_MEMBER, 2003, [], None, {})
+        db.insert_document("P1", "paper", "Seal paper", ABSTRACT, 2001, [], None, {})
+        db.insert_document("PT3", "patent", "Nanoparticles", UNRELATED, 2005, [], None, {})
+
+        result = build_duplicate_index()
+        assert result["groups"] == 1
+        assert result["duplicates"] == 1
+
+        pending = [d["serial_number"] for d in db.get_unclassified_documents()]
+        assert "PT2" not in pending
+        assert {"PT1", "P1", "PT3"} <= set(pending)
+
+    def test_classified_member_becomes_representative(self):
+        db.insert_document("PT1", "patent", "Seal", ABSTRACT, 2001, [], None, {})
+        db.insert_document("PT2", "patent", "Seal (family)", FAMILY_MEMBER, 2003, [], None, {})
+        db.save_ai_result("PT2", "gpt", 47, 47, 47, "r")
+        db.finalize_classification("PT2", 47, 47, 47, "ok", "agreed")
+
+        result = build_duplicate_index()
+        assert result["propagated"] == 1
+        c = db.get_classification("PT1")
+        assert c["final_primary"] == 47
+        assert c["propagated_from"] == "PT2"
+
+    def test_disagreement_is_not_propagated_until_resolved(self):
+        db.insert_document("PT1", "patent", "Seal", ABSTRACT, 2001, [], None, {})
+        db.insert_document("PT2", "patent", "Seal (family)", FAMILY_MEMBER, 2003, [], None, {})
+        build_duplicate_index()
+        db.save_ai_result("PT1", "gpt", 47, 47, 47, "r")
+        db.finalize_classification("PT1", 47, 47, 47, "split", "disagreed")
+        assert propagate_labels() == 0
+
+        db.finalize_classification("PT1", 38, 38, 38, "human", "human_reviewed")
+        assert propagate_labels(["PT1"]) == 1
+        assert db.get_classification("PT2")["status"] == "human_reviewed"
+        assert propagate_labels() == 0
+
+
+class TestPipelineReuse:
+    def test_classifies_representative_only(self, monkeypatch):
+        db.insert_document("PT1", "patent", "Seal", ABSTRACT, 2001, [], None, {})
+        db.insert_document("PT2", "patent", "Seal (family)", FAMILY_MEMBER, 2003, [], None, {})
+        build_duplicate_index()
+
+        monkeypatch.setattr("app.services.pipeline.GPTClassifier", lambda **kw: FakeClassifier(primary=47))
+        monkeypatch.setattr("app.services.pipeline.ClaudeClassifier", lambda **kw: FakeClassifier(primary=47))
+
+        result = asyncio.run(run_classification(concurrency=2))
+        assert result["total"] == 1
+        assert result["propagated"] == 1
+
+        report = dedup_report()
+        assert report["propagated"] == 1
+        assert report["provider_calls_saved"] == 2
+        assert report["awaiting_representative"] == 0
@@ -1,12 +1,17 @@
 import csv
 import os
 import tempfile
+from dataclasses import replace
 
 import pytest
 
 from app import db
 from app.config import settings
-from app.services.importer import import_csv, CsvMapping, _clean_str, _clean_int
+from app.db.connection import transaction, using_db
+from app.services.importer import import_csv, import_files, CsvMapping, PATENT_MAPPING, _clean_str, _clean_int
+from app.services.classifier import PROMPT_VERSION
+from app.services.reclassify import stale_summary
+from app.taxonomy import taxonomy_version
 
 
 @pytest.fixture(autouse=True)
@@ -116,10 +121,8 @@ class TestImportCsv:
         ], csv_file)
 
         import_csv(csv_file, PAPER_MAPPING)
-        doc = db.get_document("P1")
-        assert doc is not None
-        import json
-        original = json.loads(doc["original_data"])
+        assert db.get_document("P1") is not None
+        original = db.get_original_data("P1")
         assert "Title" in original
         assert "Authors" in original
 
@@ -136,3 +139,193 @@ class TestImportCsv:
 
         counts = db.count_documents()
         assert counts["papers"] == 50
+
+
+class TestChunkedImport:
+    def _rows(self, n, **overrides):
+        return [{"#": str(i), "Title": f"Paper {i}", "Abstract": f"abs {i}", "Authors": "A, B",
+                 "Year": "2020", "Source title": "J1", **overrides} for i in range(n)]
+
+    def test_chunks_match_single_pass(self, tmp_path):
+        csv_file = str(tmp_path / "papers.csv")
+        rows = self._rows(25)
+        rows[20]["Title"] = "paper 3"  # duplicate of a title in an earlier chunk
+        _write_csv(rows, csv_file)
+
+        result = import_csv(csv_file, PAPER_MAPPING, chunk_rows=10)
+        assert (result["imported"], result["skipped"], result["chunks"]) == (24, 1, 3)
+        assert db.count_documents()["papers"] == 24
+        assert db.get_document("P20") is None
+
+    def test_cleans_columns(self, tmp_path):
+        csv_file = str(tmp_path / "papers.csv")
+        _write_csv([
+            {"#": "", "Title": "  Padded  ", "Abstract": "abc", "Authors": " A ,, B ", "Year": "2019.7", "Source title": "nan"},
+            {"#": "7", "Title": "Bad year", "Abstract": "abc", "Authors": "", "Year": "unknown", "Source title": "J"},
+        ], csv_file)
+
+        import_csv(csv_file, PAPER_MAPPING)
+        auto = db.get_document("P_auto_0")
+        assert auto["title"] == "Padded"
+        assert auto["year"] == 2019
+        assert auto["source"] is None
+        assert auto["authors"] == '["A", "B"]'
+        assert db.get_document("P7")["year"] is None
+        assert db.get_original_data("P7")["Year"] == "unknown"
+
+    def test_skipped_row_does_not_claim_title(self, tmp_path):
+        csv_file = str(tmp_path / "papers.csv")
+        _write_csv([
+            {"#": "1", "Title": "Same", "Abstract": "", "Authors": "A", "Year": "2020", "Source title": "J"},
+            {"#": "2", "Title": "Same", "Abstract": "abc", "Authors": "A", "Year": "2020", "Source title": "J"},
+        ], csv_file)
+
+        assert import_csv(csv_file, PAPER_MAPPING)["imported"] == 1
+        assert db.get_document("P2") is not None
+
+
+class TestIncrementalImport:
+    def _rows(self, n):
+        return [{"#": str(i), "Title": f"Paper {i}", "Abstract": f"abs {i}", "Authors": "A",
+                 "Year": "2020", "Source title": "J1"} for i in range(n)]
+
+    def test_unchanged_file_is_skipped(self, tmp_path):
+        csv_file = str(tmp_path / "papers.csv")
+        _write_csv(self._rows(5), csv_file)
+        import_csv(csv_file, PAPER_MAPPING)
+        version = db.get_data_version()
+
+        result = import_csv(csv_file, PAPER_MAPPING)
+        assert result["file_unchanged"] and result["unchanged"] == 5
+        # Same content with a new mtime: hashed, still skipped, ledger refreshed
+        os.utime(csv_file, (1, 1))
+        assert import_csv(csv_file, PAPER_MAPPING)["file_unchanged"]
+        assert db.get_import_ledger(os.path.realpath(csv_file))[0]["mtime"] == 1
+        assert db.get_data_version() == version
+
+        forced = import_csv(csv_file, PAPER_MAPPING, force=True)
+        assert not forced["file_unchanged"] and forced["unchanged"] == 5 and forced["imported"] == 0
+
+    def test_only_changed_rows_written(self, tmp_path):
+        csv_file = str(tmp_path / "papers.csv")
+        rows = self._rows(5)
+        _write_csv(rows, csv_file)
+        import_csv(csv_file, PAPER_MAPPING)
+        versions = {"prompt_version": PROMPT_VERSION, "taxonomy_version": taxonomy_version()}
+        db.save_ai_result("P1", "gpt", 11, 12, 13, "r", **versions)
+        db.save_ai_result("P2", "gpt", 11, 12, 13, "r", **versions)
+
+        rows[1]["Abstract"] = "rewritten abstract"
+        rows[2]["Source title"] = "J2"
+        rows.append({"#": "9", "Title": "New", "Abstract": "abs", "Authors": "A", "Year": "2021",
+                     "Source title": "J1"})
+        _write_csv(rows, csv_file)
+        result = import_csv(csv_file, PAPER_MAPPING)
+        assert (result["inserted"], result["updated"], result["unchanged"]) == (1, 2, 3)
+        assert result["abstract_changed"] == 1
+
+        assert db.get_document("P1")["abstract"] == "rewritten abstract"
+        assert db.get_document("P2")["source"] == "J2"
+        # Updated in place: the classification and results survive
+        assert db.get_classification("P1") is not None
+        assert db.get_ai_result("P1", "gpt")["abstract_changed"] == 1
+        assert db.get_ai_result("P2", "gpt")["abstract_changed"] == 0
+        assert stale_summary("gpt")["by_reason"]["abstract"] == 1
+
+        # A new result for the new abstract clears the flag
+        db.save_ai_result("P1", "gpt", 11, 12, 13, "r", **versions)
+        assert db.get_ai_result("P1", "gpt")["abstract_changed"] == 0
+
+    def test_mapping_change_reimports(self, tmp_path):
+        csv_file = str(tmp_path / "papers.csv")
+        _write_csv(self._rows(3), csv_file)
+        import_csv(csv_file, PAPER_MAPPING)
+        result = import_csv(csv_file, replace(PAPER_MAPPING, source_column="Title"))
+        assert not result["file_unchanged"] and result["updated"] == 3
+        assert db.get_document("P0")["source"] == "Paper 0"
+
+    def test_files_sharing_serials(self, tmp_path):
+        # Both patent files number rows from 1 under the same prefix; the later file wins
+        def patents(n, era):
+            return [{"#": str(i), "Title": f"{era} patent {i}", "Abstract": f"{era} claims {i}",
+                     "Inventors": "X", "Publication Year": era, "Display Key": f"US {era}-{i}"}
+                    for i in range(1, n + 1)]
+
+        older, newer = patents(5, "1990"), patents(3, "2015")
+        files = [(str(tmp_path / "a.csv"), PATENT_MAPPING), (str(tmp_path / "b.csv"), PATENT_MAPPING)]
+        _write_csv(older, files[0][0])
+        _write_csv(newer, files[1][0])
+        import_files(files)
+        expected = [db.get_document(f"PT{i}")["title"] for i in range(1, 6)]
+        assert expected == ["2015 patent 1", "2015 patent 2", "2015 patent 3", "1990 patent 4", "1990 patent 5"]
+        db.save_ai_result("PT2", "gpt", 11, 12, 13, "r")
+
+        # Editing a row the later file overrides rewrites nothing
+        older[1]["Abstract"] = "edited"
+        older[4]["Abstract"] = "edited"
+        _write_csv(older, files[0][0])
+        first, second = import_files(files)
+        assert (first["updated"], first["unchanged"]) == (1, 4)
+        assert not second["file_unchanged"] and second["imported"] == 0
+        assert db.get_document("PT5")["abstract"] == "edited"
+        assert [db.get_document(f"PT{i}")["title"] for i in range(1, 4)] == expected[:3]
+        assert db.get_ai_result("PT2", "gpt")["abstract_changed"] == 0
+
+        # A forced import of both files ends the same way
+        first, second = import_files(files, force=True)
+        assert first["imported"] == second["imported"] == 0
+
+
+class TestParallelImport:
+    def _files(self, tmp_path):
+        papers = [{"#": str(i) if i % 3 else "", "Title": f"Paper {i % 40}", "Abstract": f"abs {i}",
+                   "Authors": "A, B", "Year": "2020", "Source title": "J1"} for i in range(60)]
+        patents = [{"#": str(i), "Title": f"Paper {i}", "Abstract": f"claims {i}", "Inventors": "X;Y",
+                    "Publication Year": "2011", "Display Key": f"US {i}"} for i in range(30)]
+        _write_csv(papers, str(tmp_path / "papers.csv"))
+        _write_csv(patents, str(tmp_path / "patents.csv"))
+        return [(str(tmp_path / "papers.csv"), PAPER_MAPPING), (str(tmp_path / "patents.csv"), PATENT_MAPPING)]
+
+    def _documents(self):
+        with transaction() as conn:
+            return [tuple(row) for row in conn.execute(
+                "SELECT serial_number, doc_type, title, abstract, authors, source FROM documents ORDER BY serial_number")]
+
+    def test_pool_matches_single_process(self, tmp_path):
+        files = self._files(tmp_path)
+        expected = import_files(files, chunk_rows=7, workers=1)
+        documents = self._documents()
+
+        other = str(tmp_path / "parallel.db")
+        with using_db(other):
+            db.init_db()
+            try:
+                assert import_files(files, chunk_rows=7, workers=2) == expected
+                assert self._documents() == documents
+            finally:
+                db.close_pools(other)
+
+        # Titles repeat within a file only; each file's dedup is its own
+        assert [(r["imported"], r["skipped"]) for r in expected] == [(40, 20), (30, 0)]
+        assert db.get_document("P_auto_0")["abstract"] == "abs 0"
+        assert db.get_document("PT7")["title"] == "Paper 7"
+
+    def test_unchanged_files_skipped_with_pool(self, tmp_path):
+        files = self._files(tmp_path)
+        import_files(files, chunk_rows=7, workers=1)
+        results = import_files(files, chunk_rows=7, workers=2)
+        assert all(result["file_unchanged"] for result in results)
+
+    def test_serial_repeated_across_chunks(self, tmp_path):
+        csv_file = str(tmp_path / "papers.csv")
+        rows = [{"#": str(i), "Title": f"Paper {i}", "Abstract": f"abs {i}", "Authors": "A", "Year": "2020",
+                 "Source title": "J1"} for i in range(6)]
+        rows[4]["#"] = "1"
+        _write_csv(rows, csv_file)
+        import_csv(csv_file, PAPER_MAPPING, chunk_rows=3, workers=1)
+        assert db.get_document("P1")["title"] == "Paper 4"
+
+        # Chunk 2 is parsed before chunk 1 rewrites P1, so its worker sees P1 as unchanged
+        result = import_csv(csv_file, PAPER_MAPPING, chunk_rows=3, force=True, workers=1)
+        assert result["updated"] == 2
+        assert db.get_document("P1")["title"] == "Paper 4"
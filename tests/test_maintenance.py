@@ -0,0 +1,143 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db
+from app.config import settings
+from app.db import maintenance
+from app.db.connection import apply_profile, get_connection, transaction, tuned_transaction
+from app.main import app
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    db.close_pools(tmp.name)
+    os.unlink(tmp.name)
+
+
+def _insert(count, size=2000):
+    for i in range(count):
+        db.insert_document(f"P{i}", "paper", f"Title {i}", "x" * size, 2020, [], None, {})
+
+
+class TestProfiles:
+    def test_serving_by_role(self):
+        with transaction() as conn:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+            assert conn.execute("PRAGMA mmap_size").fetchone()[0] == 0
+        with transaction(readonly=True) as conn:
+            assert conn.execute("PRAGMA mmap_size").fetchone()[0] > 0
+
+    def test_configured_profile(self, monkeypatch):
+        monkeypatch.setattr(settings, "db_profile", "durable")
+        conn = get_connection()
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+        conn.close()
+
+    def test_unknown_profile(self):
+        conn = get_connection()
+        with pytest.raises(ValueError, match="Unknown DB profile"):
+            apply_profile(conn, "turbo")
+        conn.close()
+
+    def test_tuned_transaction_restores(self):
+        with tuned_transaction("bulk_load") as conn:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 0  # OFF
+            db.insert_document("P1", "paper", "Title", "abs", 2020, [], None, {}, conn=conn)
+        assert db.count_documents()["total"] == 1
+        with transaction() as conn:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+    def test_tuned_transaction_rolls_back(self):
+        with pytest.raises(RuntimeError):
+            with tuned_transaction("bulk_load") as conn:
+                db.insert_document("P1", "paper", "Title", "abs", 2020, [], None, {}, conn=conn)
+                raise RuntimeError("boom")
+        assert db.count_documents()["total"] == 0
+
+
+class TestTasks:
+    def test_new_database_is_incremental(self):
+        assert maintenance.storage_stats()["auto_vacuum"] == "incremental"
+
+    def test_vacuum_returns_free_pages(self):
+        _insert(50)
+        with transaction() as conn:
+            conn.execute("DELETE FROM documents")
+        assert maintenance.storage_stats()["free_bytes"] > 0
+        result = maintenance.run_task("vacuum")
+        assert result["freed_pages"] > 0
+        assert maintenance.storage_stats()["free_bytes"] == 0
+
+    def test_checkpoint_truncates_large_wal(self, monkeypatch):
+        _insert(20)
+        assert maintenance.run_task("checkpoint")["mode"] == "PASSIVE"
+        monkeypatch.setattr(settings, "wal_truncate_mb", 0)
+        _insert(20)
+        result = maintenance.run_task("checkpoint")
+        assert result["mode"] == "TRUNCATE"
+        assert result["wal_bytes"] == 0
+
+    def test_optimize_analyzes_once(self):
+        _insert(5)
+        assert maintenance.run_task("optimize") == {"analyzed": True}
+        assert maintenance.run_task("optimize") == {"analyzed": False}
+
+    def test_full_vacuum_keeps_search_index(self):
+        _insert(30)
+        with transaction() as conn:
+            conn.execute("PRAGMA auto_vacuum=NONE")
+            conn.execute("VACUUM")
+            conn.execute("DELETE FROM documents WHERE serial_number IN ('P0', 'P1')")
+        assert maintenance.run_task("vacuum")["skipped"] == "auto_vacuum is none"
+        maintenance.run_task("full_vacuum")
+        assert maintenance.storage_stats()["auto_vacuum"] == "incremental"
+        rows, _ = db.search_documents("Title", limit=100)
+        assert {r["serial_number"] for r in rows} == {f"P{i}" for i in range(2, 30)}
+        with transaction() as conn:
+            conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('integrity-check')")
+
+    def test_timings_recorded(self):
+        before = maintenance.maintenance_stats()["tasks"].get("checkpoint", {}).get("runs", 0)
+        maintenance.run_task("checkpoint")
+        entry = maintenance.maintenance_stats()["tasks"]["checkpoint"]
+        assert entry["runs"] == before + 1
+        assert entry["last_ms"] >= 0
+        assert entry["last_result"]["mode"] == "PASSIVE"
+
+
+class TestScheduler:
+    def test_runs_tasks_periodically(self):
+        before = maintenance.maintenance_stats()["tasks"].get("vacuum", {}).get("runs", 0)
+
+        async def scenario():
+            scheduler = maintenance.MaintenanceScheduler(interval=0.01, vacuum_interval=0.01)
+            scheduler.start()
+            await asyncio.sleep(0.2)
+            await scheduler.stop()
+
+        asyncio.run(scenario())
+        assert maintenance.maintenance_stats()["tasks"]["vacuum"]["runs"] > before
+
+
+class TestRoutes:
+    def test_metrics(self):
+        client = TestClient(app)
+        assert client.post("/dashboard/api/maintenance/optimize").status_code == 200
+        data = client.get("/dashboard/api/metrics").json()
+        assert data["profile"] == "serving"
+        assert data["tasks"]["optimize"]["runs"] >= 1
+        assert data["storage"]["db_bytes"] > 0
+        assert "writer" in data and "cache" in data
+
+    def test_unknown_task(self):
+        client = TestClient(app)
+        assert client.post("/dashboard/api/maintenance/defrag").status_code == 404
@@ -0,0 +1,145 @@
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db
+from app.config import settings
+from app.db.connection import transaction
+from app.db.pagination import ASC, DESC, after_clause, decode_cursor, encode_cursor
+from app.main import app
+from app.routes.dashboard import _dashboard_classified, _dashboard_links
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+def _walk(fetch):
+    """Follow next_cursor from the first page to the last, collecting every row."""
+    rows, cursor = [], None
+    while True:
+        items, cursor = fetch(cursor)
+        rows.extend(items)
+        if cursor is None:
+            return rows
+
+
+class TestCursor:
+    def test_roundtrip(self):
+        values = ["paper", 2020, "P-001"]
+        assert decode_cursor(encode_cursor(values), 3) == values
+
+    @pytest.mark.parametrize("cursor", ["not base64!", encode_cursor([1, 2]), "e30"])
+    def test_invalid(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor, 3)
+
+    def test_mixed_directions(self):
+        clause, params = after_clause([("a", ASC), ("b", DESC)], [1, 0.5])
+        assert clause == "a >= ? AND ((a > ?) OR (a = ? AND b < ?))"
+        assert params == [1, 1, 1, 0.5]
+
+
+class TestDocumentsPage:
+    def _insert(self):
+        for i in range(25):
+            year = None if i % 7 == 0 else 2000 + i % 5
+            db.insert_document(f"P{i:02d}", "paper", "t", "a", year, [], None, {})
+        for i in range(10):
+            db.insert_document(f"T{i:02d}", "patent", "t", "a", 2010 - i, [], None, {})
+
+    @pytest.mark.parametrize("doc_type", [None, "paper", "patent"])
+    def test_matches_offset_order(self, doc_type):
+        self._insert()
+        expected, total = db.get_documents_paginated(doc_type, limit=100)
+        rows = _walk(lambda c: db.get_documents_page(doc_type, limit=4, cursor=c))
+        assert [r["serial_number"] for r in rows] == [r["serial_number"] for r in expected]
+        assert len(rows) == total
+
+    def test_uses_index(self):
+        with transaction(readonly=True) as conn:
+            plan = " ".join(r["detail"] for r in conn.execute(
+                """EXPLAIN QUERY PLAN SELECT * FROM documents
+                   WHERE doc_type = ? AND COALESCE(year, 0) >= ?
+                     AND (COALESCE(year, 0), serial_number) > (?, ?)
+                   ORDER BY COALESCE(year, 0), serial_number LIMIT 10""",
+                ("paper", 2000, 2000, "P01"),
+            ))
+        assert "idx_doc_type_year_serial" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_route(self):
+        self._insert()
+        client = TestClient(app)
+        first = client.get("/documents/", params={"doc_type": "patent", "limit": 6}).json()
+        assert first["total"] == 10 and first["showing"] == 6
+        second = client.get("/documents/", params={"doc_type": "patent", "limit": 6,
+                                                   "cursor": first["next_cursor"]}).json()
+        assert second["showing"] == 4 and second["next_cursor"] is None
+
+        assert client.get("/documents/", params={"cursor": "garbage"}).status_code == 400
+
+        # A doc_type from a corpus mapping is counted like the built-in ones
+        db.insert_document("TH1", "thesis", "t", "a", 2020, [], None, {})
+        assert client.get("/documents/", params={"doc_type": "thesis"}).json()["total"] == 1
+
+
+class TestDashboardPages:
+    def _insert(self):
+        for i in range(20):
+            serial = f"P{i:02d}"
+            db.insert_document(serial, "paper", "t", "a", None if i % 6 == 0 else 2000 + i % 3, [], None, {})
+            secondary = None if i % 5 == 0 else 13
+            db.save_ai_result(serial, "gpt", 11 + i % 4, secondary, None, "r")
+            db.finalize_classification(serial, 11 + i % 4, secondary, None, "r", "agreed")
+        for i in range(4):
+            db.insert_document(f"T{i}", "patent", "t", "a", 2010, [], None, {})
+        links = [(f"T{i % 4}", f"P{i:02d}", round(0.5 + (i % 3) / 10, 1)) for i in range(20)]
+        with transaction() as conn:
+            conn.executemany("INSERT INTO paper_patent_links VALUES (?, ?, ?)", links)
+
+    def test_classified_matches_offset_order(self):
+        self._insert()
+        expected = _dashboard_classified.uncached("paper", 100, 0)
+        assert expected["total"] == 20 and expected["next_cursor"] is None
+
+        def fetch(cursor):
+            result = _dashboard_classified("paper", 3, 0, cursor)
+            return result["rows"], result["next_cursor"]
+        assert _walk(fetch) == expected["rows"]
+
+    def test_links_matches_offset_order(self):
+        self._insert()
+        expected = _dashboard_links.uncached(100, 0)
+        assert expected["total"] == 20
+
+        def fetch(cursor):
+            result = _dashboard_links(3, 0, cursor)
+            return result["rows"], result["next_cursor"]
+        assert _walk(fetch) == expected["rows"]
+
+    def test_invalid_cursor(self):
+        client = TestClient(app)
+        assert client.get("/dashboard/api/links", params={"cursor": "garbage"}).status_code == 400
+
+
+class TestReviewNext:
+    def test_skip_with_after(self):
+        for serial in ("P1", "P2", "P3"):
+            db.insert_document(serial, "paper", "t", "a", 2020, [], None, {})
+            db.save_ai_result(serial, "gpt", 11, 13, 14, "r")
+            db.finalize_classification(serial, None, None, None, None, "disagreed")
+        client = TestClient(app)
+        first = client.get("/review/ui/next").json()
+        assert first["document"]["serial_number"] == "P1" and first["remaining"] == 3
+        second = client.get("/review/ui/next", params={"after": "P1"}).json()
+        assert second["document"]["serial_number"] == "P2"
+        assert client.get("/review/ui/next", params={"after": "P3"}).json() == {"done": True}
@@ -1,6 +1,7 @@
 import asyncio
 import os
 import tempfile
+import time
 
 import pytest
 
@@ -125,7 +126,59 @@ class TestRunClassification:
         assert result["total"] == 1  # Only P2
         assert result["success"] == 1
 
+    def test_limit_follows_policy(self, monkeypatch):
+        db.insert_document("P1", "paper", "Paper", "abstract", 2020, [], None, {})
+        db.insert_document("PT1", "patent", "Patent", "abstract2", 2021, [], None, {})
+
+        monkeypatch.setattr(
+            "app.services.pipeline.GPTClassifier",
+            lambda **kw: FakeClassifier(primary=38),
+        )
+        monkeypatch.setattr(
+            "app.services.pipeline.ClaudeClassifier",
+            lambda **kw: FakeClassifier(primary=38),
+        )
+
+        result = asyncio.run(run_classification(concurrency=1, limit=1, policy="patents_first"))
+        assert result["total"] == 1
+        assert db.get_classification("PT1") is not None
+        assert db.get_classification("P1") is None
+
     def test_empty_returns_zero(self):
         result = asyncio.run(run_classification(concurrency=1))
         assert result["total"] == 0
         assert result["success"] == 0
+
+    def test_loop_stays_responsive(self, monkeypatch):
+        db.insert_document("P1", "paper", "Paper", "abstract", 2020, [], None, {})
+        monkeypatch.setattr(
+            "app.services.pipeline.GPTClassifier",
+            lambda **kw: FakeClassifier(primary=38),
+        )
+        monkeypatch.setattr(
+            "app.services.pipeline.ClaudeClassifier",
+            lambda **kw: FakeClassifier(primary=38),
+        )
+
+        def slow(get):
+            def wrapper(*args, **kwargs):
+                time.sleep(0.1)
+                return get(*args, **kwargs)
+            return wrapper
+
+        # Blocking steps must run on the DB threads, not the event loop
+        monkeypatch.setattr("app.services.pipeline.propagate_labels", slow(lambda: 0))
+        monkeypatch.setattr(db, "get_unclassified_documents", slow(db.get_unclassified_documents))
+
+        async def main():
+            longest, last = 0.0, time.monotonic()
+            run = asyncio.ensure_future(run_classification(concurrency=1))
+            while not run.done():
+                await asyncio.sleep(0.01)
+                now = time.monotonic()
+                longest, last = max(longest, now - last), now
+            return longest, run.result()
+
+        longest, result = asyncio.run(main())
+        assert result["success"] == 1
+        assert longest < 0.08
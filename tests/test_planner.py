@@ -0,0 +1,81 @@
+import os
+import tempfile
+
+import pytest
+
+from app import db
+from app.config import settings
+from app.services.planner import (
+    OUTPUT_TOKENS_PER_CALL,
+    estimate_input_tokens,
+    plan_classification,
+    prompt_overhead_tokens,
+)
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+class TestEstimateTokens:
+    def test_adds_prompt_overhead(self):
+        tokens = estimate_input_tokens([0, 400])
+        overhead = prompt_overhead_tokens()
+        assert tokens[0] == overhead
+        assert tokens[1] == overhead + 100
+
+
+class TestPlanClassification:
+    def test_empty_queue(self):
+        plan = plan_classification()
+        assert plan["documents"] == 0
+        assert plan["bottleneck"] is None
+        assert plan["cost_usd"]["total"] == 0
+
+    def test_counts_only_pending(self):
+        db.insert_document("P1", "paper", "Done", "a" * 400, 2020, [], None, {})
+        db.insert_document("P2", "paper", "Pending", "b" * 800, 2021, [], None, {})
+        db.insert_document("PT1", "patent", "Pending", "c" * 400, 2021, [], None, {})
+        db.save_ai_result("P1", "gpt", 11, 11, 11, "r")
+        db.finalize_classification("P1", 11, 11, 11, "ok", "agreed")
+
+        plan = plan_classification()
+        assert plan["documents"] == 2
+        assert set(plan["tokens"]["input_by_doc_type"]) == {"paper", "patent"}
+        expected_input = 2 * prompt_overhead_tokens() + 200 + 100
+        assert plan["tokens"]["total_input_per_provider"] == expected_input
+        assert plan["tokens"]["total_output_per_provider"] == 2 * OUTPUT_TOKENS_PER_CALL
+
+    def test_doc_type_and_limit(self):
+        for i in range(5):
+            db.insert_document(f"P{i}", "paper", f"Paper {i}", "abstract", 2020, [], None, {})
+        db.insert_document("PT1", "patent", "Patent", "abstract", 2020, [], None, {})
+
+        plan = plan_classification(doc_type="paper", limit=3)
+        assert plan["documents"] == 3
+        assert list(plan["tokens"]["input_by_doc_type"]) == ["paper"]
+
+    def test_bottleneck_is_slowest_provider(self, monkeypatch):
+        monkeypatch.setattr(settings, "openai_tpm_limit", 1_000)
+        monkeypatch.setattr(settings, "anthropic_tpm_limit", 1_000_000)
+        for i in range(20):
+            db.insert_document(f"P{i}", "paper", f"Paper {i}", "x" * 1000, 2020, [], None, {})
+
+        plan = plan_classification(concurrency=50)
+        assert plan["bottleneck"] == "openai"
+        assert plan["wall_time_minutes"] == plan["constraint_minutes"]["openai"]
+
+    def test_bottleneck_is_concurrency(self, monkeypatch):
+        monkeypatch.setattr(settings, "openai_tpm_limit", 10_000_000)
+        monkeypatch.setattr(settings, "anthropic_tpm_limit", 10_000_000)
+        for i in range(20):
+            db.insert_document(f"P{i}", "paper", f"Paper {i}", "abstract", 2020, [], None, {})
+
+        plan = plan_classification(concurrency=1)
+        assert plan["bottleneck"] == "concurrency"
@@ -0,0 +1,102 @@
+import os
+import sqlite3
+
+import pytest
+
+from scripts.query_plans import explain, find_problems, run_check, suggest_indexes, table_aliases
+
+# Flags that are the intended work of the query: whole-table exports, aggregate
+# recounts, full recomputations, BM25 ranking, and ORDER BYs spanning two
+# tables. Anything else fails; run `python -m scripts.query_plans` for the plan
+# and suggested index.
+ACCEPTED = {
+    "app/db/aggregates.py:_diff": {"SCAN classifications", "TEMP B-TREE FOR GROUP BY"},
+    "app/db/analytics.py:_query": {"SCAN paper_patent_links", "TEMP B-TREE FOR GROUP BY",
+                                   "TEMP B-TREE FOR ORDER BY"},
+    "app/db/classifications.py:get_pending_second_opinion": {"TEMP B-TREE FOR ORDER BY"},
+    "app/db/documents.py:count_documents": {"SCAN documents"},
+    "app/db/search.py:search_documents": {"TEMP B-TREE FOR ORDER BY"},
+    # Class codes live in classifications, so no index serves the whole order; with
+    # statistics, idx_doc_type_year_serial serves the year key and only each year is sorted
+    "app/routes/dashboard.py:_dashboard_classified": {"TEMP B-TREE FOR ORDER BY",
+                                                      "TEMP B-TREE FOR RIGHT PART OF ORDER BY"},
+    "app/routes/dashboard.py:_dashboard_crossrefs": {"SCAN assignee_crossrefs", "TEMP B-TREE FOR ORDER BY"},
+    "app/routes/review.py:_list_disagreements": {"TEMP B-TREE FOR ORDER BY"},
+    "app/routes/review_ui.py:_review_stats": {"TEMP B-TREE FOR GROUP BY"},
+    "app/services/dedup.py:dedup_report": {"SCAN classifications", "SCAN duplicate_groups",
+                                           "TEMP B-TREE FOR GROUP BY"},
+    "app/services/dedup.py:propagate_labels": {"SCAN duplicate_groups"},
+    "app/services/export.py:_fetch_classified_rows": {"TEMP B-TREE FOR ORDER BY"},
+    "app/services/export.py:export_assignee_crossrefs": {"SCAN assignee_crossrefs", "TEMP B-TREE FOR ORDER BY"},
+    "app/services/export.py:export_disagreements": {"TEMP B-TREE FOR ORDER BY"},
+    "app/services/linking.py:_crossref": {"SCAN assignee_crossrefs"},
+}
+
+
+TRACKED_OUTPUT = os.path.join("output", "gap_by_5year_periods.csv")
+
+
+def _mtime(path):
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+
+@pytest.fixture(scope="module")
+def reports():
+    before = _mtime(TRACKED_OUTPUT)
+    reports = run_check(documents=3000)
+    # The workload's exports go to a temp dir, never over the real results in output/
+    assert _mtime(TRACKED_OUTPUT) == before
+    return reports
+
+
+class TestQueryPlans:
+    def test_covers_every_layer(self, reports):
+        origins = {r.statement.origin.split("/")[1] for r in reports}
+        assert origins == {"db", "routes", "services"}
+        assert len(reports) > 50
+
+    def test_no_unexpected_scans_or_sorts(self, reports):
+        unexpected = []
+        for report in reports:
+            extra = set(report.findings) - ACCEPTED.get(report.statement.origin, set())
+            if extra:
+                unexpected.append(f"{report.statement.origin}: {sorted(extra)} {report.suggestions}\n"
+                                  f"  {' '.join(report.statement.sql.split())}")
+        assert not unexpected, "\n".join(unexpected)
+
+    def test_listings_use_their_index(self, reports):
+        plans = {r.statement.origin: r.plan for r in reports
+                 if r.statement.origin.endswith(("get_documents_page", "get_unclassified_documents",
+                                                   "_dashboard_classified"))}
+        assert plans
+        for plan in plans.values():
+            assert any("idx_doc_type_year_serial" in detail for detail in plan)
+
+
+class TestAdvisor:
+    def _conn(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, a TEXT, b INTEGER, c TEXT, d TEXT)")
+        conn.executemany("INSERT INTO t (a, b, c, d) VALUES (?, ?, ?, ?)",
+                         ((f"k{i % 50}", i, f"c{i}", "x" * 100) for i in range(5000)))
+        conn.execute("ANALYZE")
+        return conn
+
+    def test_flags_scan_and_sort(self):
+        conn = self._conn()
+        sql = "SELECT c FROM t WHERE a = 'k1' ORDER BY b"
+        assert find_problems(explain(conn, sql), table_aliases(sql)) == [
+            "SCAN t", "TEMP B-TREE FOR ORDER BY"]
+
+    def test_proposes_covering_index(self):
+        conn = self._conn()
+        sql = "SELECT c FROM t WHERE a = 'k1' ORDER BY b"
+        findings = find_problems(explain(conn, sql), table_aliases(sql))
+        assert suggest_indexes(conn, sql, findings) == ["CREATE INDEX idx_t_a_b_c ON t(a, b, c)"]
+        assert not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = 't'").fetchone()
+
+    def test_small_tables_are_not_flagged(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE class_counts (doc_type TEXT, cnt INTEGER)")
+        sql = "SELECT doc_type, SUM(cnt) FROM class_counts GROUP BY doc_type"
+        assert find_problems(explain(conn, sql), table_aliases(sql)) == []
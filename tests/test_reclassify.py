@@ -0,0 +1,110 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from app import db
+from app.config import settings
+from app.services.classifier import PROMPT_VERSION
+from app.services.reclassify import run_reclassification, select_stale, stale_summary
+from app.taxonomy import changed_classes, taxonomy_snapshot, taxonomy_version
+from tests.test_pipeline import FakeClassifier
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+def _classified(serial, gpt_primary, claude_primary, status="agreed", **versions):
+    db.insert_document(serial, "paper", f"Title {serial}", f"abstract {serial}", 2020, [], None, {})
+    db.save_ai_result(serial, "gpt", gpt_primary, gpt_primary, gpt_primary, "g", **versions)
+    db.save_ai_result(serial, "claude", claude_primary, claude_primary, claude_primary, "c", **versions)
+    db.finalize_classification(serial, gpt_primary, gpt_primary, gpt_primary, "r", status)
+
+
+CURRENT = {"prompt_version": PROMPT_VERSION, "taxonomy_version": taxonomy_version()}
+
+
+class TestTaxonomyVersioning:
+    def test_version_is_stable(self):
+        assert taxonomy_version() == taxonomy_version(taxonomy_snapshot())
+
+    def test_changed_classes(self):
+        old = taxonomy_snapshot()
+        old["38"] = "Application > Something else"
+        del old["51"]
+        assert changed_classes(old) == {38, 51}
+
+
+class TestStaleSelection:
+    def test_current_results_are_not_stale(self):
+        _classified("P1", 11, 11, **CURRENT)
+        rows, _ = select_stale("gpt")
+        assert rows == []
+
+    def test_unversioned_and_old_prompt_are_stale(self):
+        _classified("P1", 11, 11)
+        _classified("P2", 11, 11, prompt_version="old", taxonomy_version=taxonomy_version())
+        _classified("P3", 11, 11, **CURRENT)
+        summary = stale_summary("gpt")
+        assert summary["stale"] == 2
+        assert summary["by_reason"] == {"prompt": 1, "taxonomy": 0, "unversioned": 1, "abstract": 0}
+
+    def test_changed_only_narrows_to_touched_classes(self):
+        old = taxonomy_snapshot()
+        old["47"] = "Application > Bearing"
+        old_version = taxonomy_version(old)
+        db.record_taxonomy_version(old_version, old)
+        _classified("P1", 47, 47, prompt_version=PROMPT_VERSION, taxonomy_version=old_version)
+        _classified("P2", 11, 11, prompt_version=PROMPT_VERSION, taxonomy_version=old_version)
+
+        rows, classes = select_stale("gpt", changed_only=True)
+        assert classes == {47}
+        assert [r["serial_number"] for r in rows] == ["P1"]
+
+    def test_unknown_model(self):
+        with pytest.raises(ValueError):
+            select_stale("gemini")
+
+
+class TestRunReclassification:
+    def test_reruns_stale_and_compares(self, monkeypatch):
+        _classified("P1", 11, 38, status="disagreed", prompt_version="old", taxonomy_version="old")
+        _classified("P2", 11, 11, model_id="FakeClassifier", **CURRENT)
+        monkeypatch.setattr(
+            "app.services.pipeline.GPTClassifier",
+            lambda **kw: FakeClassifier(primary=38, secondary=42, tertiary=42),
+        )
+
+        result = asyncio.run(run_reclassification("gpt", concurrency=2))
+        assert result["total"] == 1
+        assert result["success"] == 1
+        assert result["primary_changed"] == 1
+        item = result["comparison"][0]
+        assert (item["old_primary"], item["new_primary"]) == (11, 38)
+        assert item["new_prompt_version"] == PROMPT_VERSION
+
+        c = db.get_classification("P1")
+        assert c["status"] == "agreed"
+        assert c["gpt_primary"] == 38
+        assert stale_summary("gpt")["stale"] == 0
+
+    def test_keeps_human_decision(self, monkeypatch):
+        _classified("P1", 11, 38, status="human_reviewed")
+        monkeypatch.setattr(
+            "app.services.pipeline.GPTClassifier",
+            lambda **kw: FakeClassifier(primary=38),
+        )
+
+        asyncio.run(run_reclassification("gpt"))
+        c = db.get_classification("P1")
+        assert c["status"] == "human_reviewed"
+        assert c["final_primary"] == 11
+        assert c["gpt_primary"] == 38
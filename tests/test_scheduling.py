@@ -0,0 +1,90 @@
+import os
+import tempfile
+
+import pytest
+
+from app import db
+from app.config import settings
+from app.services.scheduling import (
+    FairSharePolicy,
+    get_policy,
+    parse_weights,
+)
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+def _doc(serial, doc_type="paper", year=2020, abstract="abstract"):
+    return {"serial_number": serial, "doc_type": doc_type, "year": year, "abstract": abstract}
+
+
+def _serials(docs):
+    return [d["serial_number"] for d in docs]
+
+
+class TestPolicies:
+    def test_default_keeps_order(self):
+        docs = [_doc("P2"), _doc("P1")]
+        assert _serials(get_policy("default").order(docs)) == ["P2", "P1"]
+
+    def test_patents_first(self):
+        docs = [_doc("P1"), _doc("PT1", "patent"), _doc("P2"), _doc("PT2", "patent")]
+        assert _serials(get_policy("patents_first").order(docs)) == ["PT1", "PT2", "P1", "P2"]
+
+    def test_newest_first_puts_undated_last(self):
+        docs = [_doc("P1", year=1990), _doc("P2", year=None), _doc("P3", year=2020)]
+        assert _serials(get_policy("newest_first").order(docs)) == ["P3", "P1", "P2"]
+
+    def test_shortest_first(self):
+        docs = [_doc("P1", abstract="x" * 300), _doc("P2", abstract="x" * 10), _doc("P3", abstract="x" * 100)]
+        assert _serials(get_policy("shortest_first").order(docs)) == ["P2", "P3", "P1"]
+
+    def test_uncertainty_falls_back_without_training_data(self):
+        docs = [_doc("P2"), _doc("P1")]
+        assert _serials(get_policy("uncertainty").order(docs)) == ["P2", "P1"]
+
+    def test_uncertainty_ranks_ambiguous_first(self):
+        for i in range(6):
+            db.insert_document(f"M{i}", "paper", f"Mat {i}", f"nanoparticle synthesis chemistry surfactant {i}", 2020, [], None, {})
+            db.save_ai_result(f"M{i}", "gpt", 11, 11, 11, "r")
+            db.finalize_classification(f"M{i}", 11, 11, 11, "ok", "agreed")
+            db.insert_document(f"S{i}", "paper", f"Seal {i}", f"rotary seal bearing lubricant shaft {i}", 2020, [], None, {})
+            db.save_ai_result(f"S{i}", "gpt", 47, 47, 47, "r")
+            db.finalize_classification(f"S{i}", 47, 47, 47, "ok", "agreed")
+
+        docs = [
+            _doc("clear", abstract="rotary seal bearing lubricant shaft"),
+            _doc("mixed", abstract="nanoparticle surfactant seal lubricant"),
+        ]
+        assert _serials(get_policy("uncertainty").order(docs))[0] == "mixed"
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError, match="Unknown scheduling policy"):
+            get_policy("random")
+
+
+class TestFairShare:
+    def test_parse_weights(self):
+        assert parse_weights("patent:3, paper:1") == {"patent": 3.0, "paper": 1.0}
+
+    def test_parse_weights_rejects_non_positive(self):
+        with pytest.raises(ValueError):
+            parse_weights("patent:0")
+
+    def test_weighted_interleaving(self):
+        docs = [_doc(f"P{i}") for i in range(4)] + [_doc(f"PT{i}", "patent") for i in range(6)]
+        ordered = FairSharePolicy({"patent": 3, "paper": 1}).order(docs)
+        assert [d["doc_type"] for d in ordered[:8]] == ["patent", "patent", "patent", "paper"] * 2
+
+    def test_drains_remaining_type(self):
+        docs = [_doc("P1"), _doc("PT1", "patent")]
+        ordered = get_policy("default", "patent:5").order(docs)
+        assert _serials(ordered) == ["PT1", "P1"]
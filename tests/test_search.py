@@ -0,0 +1,122 @@
+import os
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db
+from app.config import settings
+from app.db.connection import transaction
+from app.db.search import to_match_query
+from app.main import app
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+def _serials(query, **filters):
+    rows, _ = db.search_documents(query, **filters)
+    return [r["serial_number"] for r in rows]
+
+
+def _seed():
+    db.insert_document("P1", "paper", "Ferrofluid rotary seals", "Magnetic fluid seals for shafts.",
+                       2001, ["Rosensweig R"], "J Magn", {})
+    db.insert_document("P2", "paper", "Heat transfer in ferrofluids", "Convection with a seal mentioned once.",
+                       2010, ["Smith J"], "Int J Heat", {})
+    db.insert_document("PT1", "patent", "Magnetic seal assembly", "A seal for a rotating shaft.",
+                       1995, ["Moskowitz R"], None, {})
+    db.save_ai_result("P1", "gpt", 21, 22, 23, "r")
+    db.finalize_classification("P1", 21, 22, 23, "r", "agreed")
+
+
+class TestMatchQuery:
+    def test_quotes_terms(self):
+        assert to_match_query('rotary seal') == '"rotary" "seal"'
+        assert to_match_query('AND "x') == '"AND" """x"'
+
+    def test_prefix(self):
+        assert to_match_query("magnet*") == '"magnet"*'
+
+    def test_empty(self):
+        with pytest.raises(ValueError):
+            to_match_query("  * ")
+
+
+class TestSearch:
+    def test_ranks_title_matches_first(self):
+        _seed()
+        results = _serials("seal")
+        assert set(results) == {"P1", "P2", "PT1"}
+        assert results[-1] == "P2"
+
+    def test_stemming_and_prefix(self):
+        _seed()
+        assert "P1" in _serials("sealing")
+        assert _serials("ferroflu*") == _serials("ferrofluid*")
+        assert _serials("moskowitz") == ["PT1"]
+
+    def test_filters(self):
+        _seed()
+        assert _serials("seal", doc_type="patent") == ["PT1"]
+        assert _serials("seal", year_from=2000, year_to=2005) == ["P1"]
+        assert _serials("seal", primary=21) == ["P1"]
+        assert _serials("seal", status="agreed") == ["P1"]
+
+    def test_highlight_is_escaped(self):
+        db.insert_document("P1", "paper", "<script>seal</script>", "abstract", 2020, [], None, {})
+        rows, _ = db.search_documents("seal")
+        assert rows[0]["title"] == "&lt;script&gt;<mark>seal</mark>&lt;/script&gt;"
+
+    def test_pages(self):
+        for i in range(7):
+            db.insert_document(f"P{i}", "paper", f"Seal {i}", "seal " * (i + 1), 2020, [], None, {})
+        seen, cursor = [], None
+        while True:
+            rows, cursor = db.search_documents("seal", limit=3, cursor=cursor)
+            seen += [r["serial_number"] for r in rows]
+            if cursor is None:
+                break
+        assert seen == _serials("seal", limit=100)
+        assert len(seen) == 7
+
+
+class TestIndexMaintenance:
+    def test_follows_updates_and_deletes(self):
+        _seed()
+        db.insert_document("P2", "paper", "Thermal convection", "No matching words.", 2010, [], None, {})
+        assert "P2" not in _serials("seal")
+        with transaction() as conn:
+            conn.execute("UPDATE documents SET title = 'Bearing seals' WHERE serial_number = 'P2'")
+            conn.execute("DELETE FROM documents WHERE serial_number = 'PT1'")
+        assert set(_serials("seal")) == {"P1", "P2"}
+        with transaction() as conn:
+            conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('integrity-check')")
+
+    def test_rebuild_indexes_existing_documents(self):
+        _seed()
+        with transaction() as conn:
+            conn.execute("DROP TABLE documents_fts")
+        db.init_db()
+        assert set(_serials("seal")) == {"P1", "P2", "PT1"}
+
+
+class TestSearchRoute:
+    def test_search(self):
+        _seed()
+        client = TestClient(app)
+        data = client.get("/documents/search", params={"q": "seal", "doc_type": "patent"}).json()
+        assert [r["serial_number"] for r in data["results"]] == ["PT1"]
+        assert data["next_cursor"] is None
+
+    def test_bad_requests(self):
+        client = TestClient(app)
+        assert client.get("/documents/search", params={"q": " "}).status_code == 400
+        assert client.get("/documents/search", params={"q": "x", "cursor": "bad"}).status_code == 400
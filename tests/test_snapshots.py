@@ -0,0 +1,204 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db
+from app.config import settings
+from app.db import maintenance
+from app.db.connection import snapshot_reads, snapshot_stats, transaction
+from app.main import app
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    monkeypatch.setattr(settings, "read_snapshots", True)
+    monkeypatch.setattr(settings, "snapshot_min_age_seconds", 60.0)
+    monkeypatch.setattr(settings, "snapshot_max_age_seconds", 60.0)
+    db.init_db()
+    yield tmp.name
+    db.close_pools(tmp.name)
+    os.unlink(tmp.name)
+
+
+def _insert(serial):
+    db.insert_document(serial, "paper", f"Title {serial}", "abs", 2020, [], None, {})
+
+
+def _snapshot_titles():
+    with snapshot_reads():
+        return [d["title"] for d in db.get_documents()]
+
+
+def _stats():
+    return snapshot_stats()[settings.db_path]
+
+
+class TestSnapshotReads:
+    def test_reads_are_pinned_until_refresh(self, monkeypatch):
+        _insert("P1")
+        assert _snapshot_titles() == ["Title P1"]
+        _insert("P2")
+        # Within SNAPSHOT_MIN_AGE_SECONDS the snapshot is reused...
+        assert _snapshot_titles() == ["Title P1"]
+        # ...but reads outside snapshot_reads() see every commit
+        assert len(db.get_documents()) == 2
+
+        monkeypatch.setattr(settings, "snapshot_min_age_seconds", 0.0)
+        assert _snapshot_titles() == ["Title P1", "Title P2"]
+        assert _stats()["opened"] == 2
+
+    def test_refreshed_after_max_age_without_writes(self, monkeypatch):
+        _snapshot_titles()
+        monkeypatch.setattr(settings, "snapshot_max_age_seconds", 0.0)
+        _snapshot_titles()
+        assert _stats()["opened"] == 2
+
+    def test_refreshed_after_another_process_writes(self, monkeypatch, temp_db):
+        _insert("P1")
+        assert _snapshot_titles() == ["Title P1"]
+        monkeypatch.setattr(settings, "snapshot_min_age_seconds", 0.0)
+        assert _snapshot_titles() == ["Title P1"]
+        assert _stats()["opened"] == 1
+
+        # A commit this process never saw (another process, a CLI import, ...)
+        other = sqlite3.connect(temp_db)
+        with other:
+            other.execute("UPDATE documents SET title = 'Edited' WHERE serial_number = 'P1'")
+        other.close()
+        assert _snapshot_titles() == ["Edited"]
+        assert _stats()["opened"] == 2
+
+    def test_one_connection_per_thread(self):
+        _insert("P1")
+        entered, release = threading.Barrier(3), threading.Event()
+        seen = []
+
+        def reader():
+            with snapshot_reads(), transaction(readonly=True) as conn:
+                seen.append((id(conn), conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]))
+                entered.wait()
+                release.wait()
+
+        threads = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        entered.wait()
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len({conn for conn, _ in seen}) == 2
+        assert [count for _, count in seen] == [1, 1]
+        assert _stats()["opened"] == 1
+
+    def test_threads_share_one_state_across_a_write(self):
+        _insert("P1")
+        release = threading.Event()
+        counts, snapshots = {}, {}
+
+        def reader(name, read):
+            with snapshot_reads(), transaction(readonly=True) as conn:
+                counts[name] = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+                snapshots[name] = _stats()["opened"]
+                read.set()
+                release.wait()
+
+        def start(name):
+            read = threading.Event()
+            thread = threading.Thread(target=reader, args=(name, read))
+            thread.start()
+            read.wait()
+            return thread
+
+        threads = [start("first")]
+        _insert("P2")
+        # Joining the first thread's snapshot would read a newer state than it does
+        threads.append(start("second"))
+        # With nothing written since, a third thread joins the second's snapshot
+        threads.append(start("third"))
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert counts == {"first": 1, "second": 2, "third": 2}
+        assert snapshots == {"first": 1, "second": 2, "third": 2}
+
+    def test_off_by_default(self, monkeypatch):
+        monkeypatch.setattr(settings, "read_snapshots", False)
+        _insert("P1")
+        assert _snapshot_titles() == ["Title P1"]
+        assert settings.db_path not in snapshot_stats()
+
+    def test_rejects_writes(self):
+        with snapshot_reads(), transaction(readonly=True) as conn:
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("INSERT INTO taxonomy_versions (version, snapshot) VALUES ('x', '{}')")
+
+
+class TestLongReaders:
+    def _hold_snapshot(self):
+        entered, release = threading.Event(), threading.Event()
+
+        def reader():
+            with snapshot_reads(), transaction(readonly=True) as conn:
+                conn.execute("SELECT COUNT(*) FROM documents").fetchone()
+                entered.set()
+                release.wait()
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        entered.wait()
+        return thread, release
+
+    def test_writers_not_blocked(self, monkeypatch):
+        thread, release = self._hold_snapshot()
+        start = time.monotonic()
+        for i in range(20):
+            _insert(f"P{i}")
+        assert time.monotonic() - start < 2
+        assert db.count_documents()["total"] == 20
+        release.set()
+        thread.join()
+
+    def test_replaced_snapshot_closes_with_last_reader(self, monkeypatch):
+        thread, release = self._hold_snapshot()
+        _insert("P1")
+        monkeypatch.setattr(settings, "snapshot_min_age_seconds", 0.0)
+        assert _snapshot_titles() == ["Title P1"]
+        assert _stats()["retired_in_use"] == 1
+        release.set()
+        thread.join()
+        assert _stats()["retired_in_use"] == 0
+
+    def test_truncating_checkpoint_does_not_wait(self, monkeypatch):
+        _insert("P0")
+        thread, release = self._hold_snapshot()
+        for i in range(1, 20):
+            _insert(f"P{i}")
+        monkeypatch.setattr(settings, "wal_truncate_mb", 0)
+        start = time.monotonic()
+        result = maintenance.run_task("checkpoint")
+        assert time.monotonic() - start < 1
+        assert result["mode"] == "TRUNCATE" and result["busy"]
+        release.set()
+        thread.join()
+
+        # The idle snapshot is released before checkpointing
+        result = maintenance.run_task("checkpoint")
+        assert not result["busy"]
+        assert result["wal_bytes"] == 0
+
+
+class TestSnapshotRoutes:
+    def test_get_requests_use_snapshot(self):
+        _insert("P1")
+        client = TestClient(app)
+        for _ in range(3):
+            assert client.get("/documents/stats").json()["total"] == 1
+        assert client.get("/dashboard/api/metrics").json()["snapshots"][settings.db_path]["opened"] == 1
@@ -0,0 +1,140 @@
+import csv
+import io
+import os
+import tempfile
+from collections import OrderedDict
+
+import openpyxl
+import pytest
+from fastapi.testclient import TestClient
+
+from app import db
+from app.config import settings
+from app.main import app
+from app.services import importer, uploads
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch, tmp_path):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+    monkeypatch.setattr(uploads, "_jobs", OrderedDict())
+    db.init_db()
+    yield tmp.name
+    db.close_pools(tmp.name)
+    os.unlink(tmp.name)
+
+
+PAPER_COLUMNS = ["#", "Title", "Abstract", "Authors", "Year", "Source title"]
+PATENT_COLUMNS = ["#", "Title", "Abstract", "Inventors", "Publication Year", "Display Key"]
+
+
+def _csv(rows: list[list]) -> bytes:
+    out = io.StringIO()
+    csv.writer(out).writerows(rows)
+    return out.getvalue().encode("utf-8")
+
+
+def _upload(client, name: str, payload: bytes, **params):
+    return client.post("/documents/upload", params=params, files={"file": (name, io.BytesIO(payload))})
+
+
+class TestUpload:
+    def test_csv_progress_and_rejected_rows(self, monkeypatch, tmp_path):
+        payload = _csv([
+            PAPER_COLUMNS,
+            ["1", "Ferrofluid seals", "abs", "A, B", "2020", "J1"],
+            ["2", "No abstract", "", "A", "2020", "J1"],
+            ["3", "FERROFLUID SEALS", "abs", "A", "2021", "J2"],
+            ["4", "Magnetic damping", "abs", "C", "2019", "J3"],
+        ])
+        pools = []
+        parse_pool = importer._parse_pool
+        monkeypatch.setattr(importer, "_parse_pool", lambda workers: pools.append(workers) or parse_pool(workers))
+        client = TestClient(app)
+        response = _upload(client, "scopus export.csv", payload)
+        assert response.status_code == 202, response.text
+        assert response.json()["bytes"] == len(payload)
+
+        # TestClient runs the background import before returning
+        job = client.get(f"/documents/uploads/{response.json()['id']}").json()
+        assert (job["status"], job["doc_type"], job["rows"], job["rejected"]) == ("done", "paper", 4, 2)
+        assert job["summary"]["imported"] == 2
+        assert db.get_document(job["serial_prefix"] + "4")["title"] == "Magnetic damping"
+        # One chunk is parsed inline, and the deleted upload is not in the import ledger
+        assert pools == [1]
+        assert db.get_import_ledger() == []
+
+        report = client.get(f"/documents/uploads/{job['id']}/rejected")
+        assert list(csv.reader(io.StringIO(report.text))) == [
+            ["row", "#", "title", "reason"],
+            ["2", "2", "No abstract", "missing abstract"],
+            ["3", "3", "FERROFLUID SEALS", "duplicate title"],
+        ]
+        # Only the report is kept
+        assert os.listdir(tmp_path / "uploads") == [f"{job['id']}.rejected.csv"]
+        assert [j["id"] for j in client.get("/documents/uploads").json()["jobs"]] == [job["id"]]
+
+    def test_xlsx(self, tmp_path):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(PATENT_COLUMNS)
+        sheet.append([5, "Magnetic fluid seal", "claims", "X;Y", 2011, "US 5"])
+        sheet.append([6.0, "Rotary shaft", "claims", "Z", 2012.0, "US 6"])
+        path = tmp_path / "lens.xlsx"
+        workbook.save(path)
+
+        client = TestClient(app)
+        job = _upload(client, "lens.xlsx", path.read_bytes()).json()
+        job = client.get(f"/documents/uploads/{job['id']}").json()
+        assert (job["status"], job["doc_type"], job["summary"]["imported"]) == ("done", "patent", 2)
+        assert db.get_document(job["serial_prefix"] + "6")["year"] == 2012
+        assert db.get_document(job["serial_prefix"] + "5")["authors"] == '["X", "Y"]'
+
+    def test_uploads_keep_their_own_serials(self):
+        db.insert_document("P1", "paper", "Imported", "abs", 2020, [], None, {})
+        client = TestClient(app)
+        titles = {}
+        for name in ("a", "b"):
+            # No "#" column: serials are numbered from 0 in every upload
+            payload = _csv([["Title", "Abstract", "Authors", "Year", "Source title"],
+                            [f"{name} one", "abs", "A", "2020", "J"], [f"{name} two", "abs", "A", "2020", "J"]])
+            job = _upload(client, f"{name}.csv", payload).json()
+            job = client.get(f"/documents/uploads/{job['id']}").json()
+            assert (job["summary"]["inserted"], job["summary"]["updated"]) == (2, 0)
+            titles[name] = [db.get_document(f"{job['serial_prefix']}_auto_{i}")["title"] for i in range(2)]
+        assert titles == {"a": ["a one", "a two"], "b": ["b one", "b two"]}
+
+        # An export numbering rows from 1 does not replace P1
+        job = _upload(client, "c.csv", _csv([PAPER_COLUMNS, ["1", "c one", "abs", "A", "2020", "J"]])).json()
+        job = client.get(f"/documents/uploads/{job['id']}").json()
+        assert job["summary"]["inserted"] == 1
+        assert db.get_document("P1")["title"] == "Imported"
+        assert db.count_documents()["total"] == 6
+
+    def test_mapping_choice(self):
+        client = TestClient(app)
+        unknown = _csv([["Title", "Abstract", "Creator"], ["T", "abs", "A"]])
+        job = _upload(client, "other.csv", unknown).json()
+        job = client.get(f"/documents/uploads/{job['id']}").json()
+        assert job["status"] == "failed" and "Cannot tell the document type" in job["error"]
+
+        # doc_type overrides detection; missing columns just come through empty
+        job = _upload(client, "other.csv", unknown, doc_type="paper").json()
+        assert client.get(f"/documents/uploads/{job['id']}").json()["summary"]["imported"] == 1
+
+        with pytest.raises(ValueError, match="several mappings"):
+            uploads.detect_mapping(sorted(set(PAPER_COLUMNS) | set(PATENT_COLUMNS)))
+
+    def test_rejected_uploads(self, monkeypatch, tmp_path):
+        client = TestClient(app)
+        assert _upload(client, "export.json", b"{}").status_code == 400
+        assert _upload(client, "export.csv", b"", doc_type="thesis").status_code == 400
+
+        monkeypatch.setattr(settings, "max_upload_mb", 0)
+        assert _upload(client, "big.csv", _csv([PAPER_COLUMNS])).status_code == 413
+        assert uploads.list_jobs()[0].status == "failed"
+        assert not os.listdir(tmp_path / "uploads")
+        assert client.get("/documents/uploads/nope").status_code == 404
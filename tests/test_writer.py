@@ -0,0 +1,138 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from app import db
+from app.config import settings
+from app.db.writer import ResultWriter, get_writer
+from app.services.pipeline import run_classification
+from tests.test_pipeline import FakeClassifier
+
+
+@pytest.fixture(autouse=True)
+def temp_db(monkeypatch):
+    tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    tmp.close()
+    monkeypatch.setattr(settings, "db_path", tmp.name)
+    db.init_db()
+    yield tmp.name
+    os.unlink(tmp.name)
+
+
+def _insert(serial):
+    return lambda conn: db.insert_document(serial, "paper", serial, "abstract", 2020, [], None, {}, conn=conn)
+
+
+class TestResultWriter:
+    def test_groups_writes_into_one_commit(self):
+        async def main():
+            writer = ResultWriter(batch_size=50, max_delay=0.1)
+            for i in range(20):
+                await writer.submit(_insert(f"P{i}"))
+            await writer.close()
+            return writer
+
+        writer = asyncio.run(main())
+        assert writer.commits == 1
+        assert writer.records == 20
+        assert db.count_documents()["total"] == 20
+
+    def test_batch_size_bounds_group(self):
+        async def main():
+            writer = ResultWriter(batch_size=5, max_delay=0.1)
+            for i in range(12):
+                await writer.submit(_insert(f"P{i}"))
+            await writer.close()
+            return writer
+
+        assert asyncio.run(main()).commits == 3
+
+    def test_failing_record_does_not_lose_group(self):
+        def bad(conn):
+            conn.execute("INSERT INTO no_such_table VALUES (1)")
+
+        async def main():
+            writer = ResultWriter(max_delay=0.1)
+            await writer.submit(_insert("P1"))
+            with pytest.raises(Exception):
+                await asyncio.gather(writer.write(bad), writer.submit(_insert("P2")))
+            await writer.close()
+            return writer
+
+        writer = asyncio.run(main())
+        assert writer.failed == 1
+        assert db.get_document("P1") is not None
+        assert db.get_document("P2") is not None
+
+    def test_submit_acks_each_record(self):
+        def bad(conn):
+            conn.execute("INSERT INTO no_such_table VALUES (1)")
+
+        async def main():
+            writer = ResultWriter(max_delay=0.1)
+            acks = [await writer.submit(_insert("P1")), await writer.submit(bad)]
+            await writer.close()
+            return [ack.result() for ack in acks]
+
+        assert asyncio.run(main()) == [True, False]
+
+    def test_write_waits_for_commit(self):
+        async def main():
+            writer = ResultWriter(max_delay=0.1)
+            await writer.write(_insert("P1"))
+            found = db.get_document("P1") is not None
+            await writer.close()
+            return found
+
+        assert asyncio.run(main())
+
+    def test_backpressure(self):
+        async def main():
+            writer = ResultWriter(batch_size=1, max_delay=0, max_pending=1)
+            await writer.submit(_insert("P1"))
+            await writer.submit(_insert("P2"))
+            # The queue holds one record; the third waits until the writer catches up
+            blocked = asyncio.ensure_future(writer.submit(_insert("P3")))
+            await asyncio.sleep(0)
+            was_blocked = not blocked.done()
+            await blocked
+            await writer.close()
+            return was_blocked
+
+        assert asyncio.run(main())
+        assert db.count_documents()["total"] == 3
+
+
+class TestPipelineCommits:
+    def test_one_commit_per_batch_instead_of_per_document(self, monkeypatch):
+        for i in range(20):
+            db.insert_document(f"P{i:02d}", "paper", "Paper", f"abstract {i}", 2020, [], None, {})
+        monkeypatch.setattr("app.services.pipeline.GPTClassifier", lambda **kw: FakeClassifier(primary=38))
+        monkeypatch.setattr("app.services.pipeline.ClaudeClassifier", lambda **kw: FakeClassifier(primary=38))
+
+        result = asyncio.run(run_classification(concurrency=20))
+
+        assert result["success"] == 20
+        assert result["commits"] <= 2
+        assert len(db.get_classifications_by_status("agreed")) == 20
+
+    def test_counts_only_its_own_write_failures(self, monkeypatch):
+        for i in range(5):
+            db.insert_document(f"P{i}", "paper", "Paper", f"abstract {i}", 2020, [], None, {})
+        monkeypatch.setattr("app.services.pipeline.GPTClassifier", lambda **kw: FakeClassifier(primary=38))
+        monkeypatch.setattr("app.services.pipeline.ClaudeClassifier", lambda **kw: FakeClassifier(primary=38))
+
+        def bad(conn):
+            conn.execute("INSERT INTO no_such_table VALUES (1)")
+
+        async def main():
+            run = asyncio.ensure_future(run_classification(concurrency=5))
+            # Someone else's write fails on the shared writer during the run
+            other = await get_writer().submit(bad)
+            return await run, await other
+
+        result, other_ok = asyncio.run(main())
+        assert other_ok is False
+        assert (result["success"], result["failed"]) == (5, 0)